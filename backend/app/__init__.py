@@ -6,7 +6,11 @@ from dotenv import load_dotenv
 import os
 
 from app.models.db import db
+from app.models import search_index
 from app.utils.logger import setup_logging
+from app.utils.classification_queue import init_classification_queue
+from app.utils.habit_materializer import init_habit_materializer
+from app.cli import register_commands
 
 def create_app():
     # Load environment variables
@@ -20,12 +24,52 @@ def create_app():
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'dev-key-change-in-production')
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = 60 * 60 * 24 * 7  # 7 days
+
+    # Background classification (POST /api/content in async mode)
+    app.config['CLASSIFIER_QUEUE_WORKERS'] = int(os.getenv('CLASSIFIER_QUEUE_WORKERS', 4))
+    app.config['CLASSIFIER_QUEUE_MAX_DEPTH'] = int(os.getenv('CLASSIFIER_QUEUE_MAX_DEPTH', 100))
+    app.config['CLASSIFIER_QUEUE_MAX_RETRIES'] = int(os.getenv('CLASSIFIER_QUEUE_MAX_RETRIES', 3))
+    app.config['CLASSIFIER_QUEUE_RETRY_BACKOFF'] = float(os.getenv('CLASSIFIER_QUEUE_RETRY_BACKOFF', 5))
+    app.config['CLASSIFIER_QUEUE_POLL_INTERVAL'] = float(os.getenv('CLASSIFIER_QUEUE_POLL_INTERVAL', 2))
+    app.config['CLASSIFIER_QUEUE_AUTOSTART'] = os.getenv('CLASSIFIER_QUEUE_AUTOSTART', 'true').lower() == 'true'
+
+    # Maximum texts accepted by POST /api/content/batch
+    app.config['CLASSIFIER_BATCH_MAX_SIZE'] = int(os.getenv('CLASSIFIER_BATCH_MAX_SIZE', 50))
+
+    # Idempotency-Key handling on create endpoints, in seconds
+    app.config['IDEMPOTENCY_TTL'] = int(os.getenv('IDEMPOTENCY_TTL', 24 * 3600))
+    app.config['IDEMPOTENCY_WAIT'] = float(os.getenv('IDEMPOTENCY_WAIT', 30))
+    app.config['IDEMPOTENCY_LEASE'] = float(os.getenv('IDEMPOTENCY_LEASE', 60))
+
+    # What to do with classifier requests over the user's quota: 'reject' (429) or 'degrade' (store a thought)
+    app.config['CLASSIFIER_THROTTLE_MODE'] = os.getenv('CLASSIFIER_THROTTLE_MODE', 'reject').lower()
+
+    # Storing habit instances ahead of time (optional, occurrences are computed on read)
+    app.config['HABIT_MATERIALIZER_ENABLED'] = os.getenv('HABIT_MATERIALIZER_ENABLED', 'false').lower() == 'true'
+    app.config['HABIT_MATERIALIZER_HOUR'] = int(os.getenv('HABIT_MATERIALIZER_HOUR', 3))
+    app.config['HABIT_MATERIALIZER_HORIZON'] = int(os.getenv('HABIT_MATERIALIZER_HORIZON', 30))
+    app.config['HABIT_MATERIALIZER_CHUNK_SIZE'] = int(os.getenv('HABIT_MATERIALIZER_CHUNK_SIZE', 500))
+    app.config['HABIT_MATERIALIZER_MAX_SECONDS'] = float(os.getenv('HABIT_MATERIALIZER_MAX_SECONDS', 300))
+
+    # Maximum entries created from one input in split mode
+    app.config['CLASSIFIER_SPLIT_MAX_ITEMS'] = int(os.getenv('CLASSIFIER_SPLIT_MAX_ITEMS', 10))
       # Initialize extensions
     db.init_app(app)
-    migrate = Migrate(app, db)
+    # Batch mode lets migrations alter tables on SQLite; the search index is managed by its own DDL
+    migrate = Migrate(app, db, directory=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'migrations'),
+                      render_as_batch=True, include_name=search_index.include_name)
     jwt = JWTManager(app)
       # Set up logging
     setup_logging(app)
+
+    # Set up the background classification workers
+    init_classification_queue(app)
+
+    # Set up the off-peak habit instance materializer
+    init_habit_materializer(app)
+
+    # Register CLI commands
+    register_commands(app)
     
     # Remove Flask-CORS and use custom CORS handling
     # CORS(app, 
@@ -42,8 +86,10 @@ def create_app():
         # Set CORS headers on every response
         response.headers['Access-Control-Allow-Origin'] = frontend_url
         response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
-        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, X-Requested-With, Accept, Origin'
+        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, X-Requested-With, Accept, Origin, Idempotency-Key'
         response.headers['Access-Control-Allow-Credentials'] = 'true'
+        # Let the web client read when to retry a throttled or replayed request
+        response.headers['Access-Control-Expose-Headers'] = 'Retry-After, Idempotent-Replayed'
         
         return response
     
@@ -55,7 +101,7 @@ def create_app():
             response = make_response()
             response.headers['Access-Control-Allow-Origin'] = frontend_url
             response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
-            response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, X-Requested-With, Accept, Origin'
+            response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, X-Requested-With, Accept, Origin, Idempotency-Key'
             response.headers['Access-Control-Allow-Credentials'] = 'true'
             return response
       # Import blueprints here to avoid circular imports
@@ -64,6 +110,7 @@ def create_app():
     from app.api.habits import habits_bp
     from app.api.auth import auth_bp
     from app.api.content import content_bp
+    from app.api.search import search_bp
     from app.utils.helpers import APIError, handle_api_error
     
     # Register error handlers
@@ -72,10 +119,34 @@ def create_app():
     app.register_blueprint(todos_bp, url_prefix='/api/todos')
     app.register_blueprint(habits_bp, url_prefix='/api/habits')
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
-    app.register_blueprint(content_bp, url_prefix='/api/content')# Health check endpoint
+    app.register_blueprint(content_bp, url_prefix='/api/content')
+    app.register_blueprint(search_bp, url_prefix='/api/search')# Health check endpoint
     @app.route('/api/health')
     def health_check():
         return {'status': 'ok'}
+
+    # Classifier counters for monitoring (per worker process)
+    @app.route('/api/health/classifier')
+    def classifier_health():
+        from app.utils.classification_cache import get_classification_cache
+        from app.utils.singleflight import get_singleflight
+        from app.utils.resilience import get_circuit_breaker
+        from app.utils.local_classifier import get_local_classifier
+        from app.utils.classifier_backends import get_classifier_backend
+        from app.utils.model_router import get_model_router
+        from app.utils.fair_scheduler import get_fair_scheduler
+        cache = get_classification_cache()
+        local_classifier = get_local_classifier()
+        return {
+            'cache': cache.stats() if cache else None,
+            'local_classifier': local_classifier.stats() if local_classifier else None,
+            'singleflight': get_singleflight().stats(),
+            'circuit_breaker': get_circuit_breaker().stats(),
+            'queue': app.extensions['classification_queue'].stats(),
+            'backend': get_classifier_backend().stats(),
+            'routing': get_model_router().stats(),
+            'scheduler': get_fair_scheduler().stats()
+        }
       # Root endpoint for Render health checks
     @app.route('/')
     def root():
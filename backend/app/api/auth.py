@@ -3,7 +3,8 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from app.models.db import db
 from app.models.user import User
-from app.models.habit import Habit, HabitInstance
+from app.models.habit import Habit
+from app.utils.habit_analytics import get_habit_analytics
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -123,18 +124,11 @@ def get_user_stats():
     # Count habits and habit completion stats
     active_habits = Habit.query.filter_by(user_id=user_id, is_active=True).all()
     habit_count = len(active_habits)
-      # Get habit instances from the last 30 days
-    from datetime import date, timedelta
-    today = date.today()
-    thirty_days_ago = today - timedelta(days=30)
-    recent_instances = HabitInstance.query.filter(
-        HabitInstance.user_id == user_id,
-        HabitInstance.due_date >= thirty_days_ago,
-        HabitInstance.due_date <= today
-    ).all()
-    
-    total_instances = len(recent_instances)
-    completed_instances = sum(1 for instance in recent_instances if instance.completed)
+      # Habit occurrences due in the last 30 days, from the cached analytics
+    recent = [habit['completion']['30d'] for habit in get_habit_analytics(user_id)['habits']]
+    
+    total_instances = sum(window['due'] for window in recent)
+    completed_instances = sum(window['completed'] for window in recent)
     
     return jsonify({
         'thoughts_count': thought_count,
@@ -1,15 +1,26 @@
 """
 API routes for handling content (thoughts and todos)
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.db import db
 from app.models.thought import Thought
 from app.models.todo import Todo
 from app.models.habit import Habit, HabitInstance
-from app.api.habits import generate_habit_instances
-from app.utils.ai_classifier import classify_input
+from app.models.pending_content import PendingContent
+from app.utils.ai_classifier import classify_input, classify_batch, classify_items
+from app.utils.classification_queue import get_classification_queue
 from app.utils.logger import get_logger
+from app.utils.idempotency import idempotent
+from app.utils.fair_scheduler import charge_to, get_fair_scheduler, Throttled, QUOTA
+from app.utils.helpers import APIError
+from app.utils.habit_analytics import invalidate_habit_analytics
+from app.utils.pagination import SortKey, listing, merged_listing
+from app.utils.date_windows import in_window, window_args
+from app.api.thoughts import THOUGHT_ORDER
+from app.api.todos import TODO_ORDER
+from app.api.habits import HABIT_ORDER
+import math
 from datetime import datetime, timedelta
 import pytz # Added import
 
@@ -17,8 +28,12 @@ logger = get_logger(__name__)
 
 content_bp = Blueprint('content', __name__)
 
+# Todos in the timeline are ordered like thoughts and habits, newest first
+TIMELINE_TODO_ORDER = [SortKey(Todo.created_at, descending=True), SortKey(Todo.id, descending=True)]
+
 @content_bp.route('', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_content():
     """Create new content - either a thought or todo based on AI classification"""
     user_id = get_jwt_identity()
@@ -31,9 +46,132 @@ def create_content():
     # Retrieve user_timezone from the request body, defaulting to 'UTC' if not provided.
     user_timezone = data.get('timezone', 'UTC') 
     
+    # In async mode store the raw text now and classify it in the background
+    if data.get('async') or request.args.get('async', '').lower() == 'true':
+        return enqueue_content(user_id, text, user_timezone)
+    
+    # Clients that opt in get every entry of a compound input back as a list
+    if data.get('split') or request.args.get('split', '').lower() == 'true':
+        return create_content_items(user_id, text, user_timezone)
+    
     # Use AI to classify the content as thought or todo
-    content_type, formatted_data = classify_input(text, user_timezone)
+    (content_type, formatted_data), = classify_fairly(user_id, [text], lambda: [classify_input(text, user_timezone)])
+    
+    if content_type not in ('thought', 'todo', 'habit'):
+        # This shouldn't happen given our classifier logic
+        return jsonify({'error': 'Failed to classify content'}), 500
+    
+    new_item = create_content_item(user_id, content_type, formatted_data, user_timezone)
+    
+    return jsonify({
+        'type': content_type,
+        'data': new_item.to_dict()
+    }), 201
+
+def classify_fairly(user_id, texts, classify):
+    """
+    Run a classifier call under the user's quota and fair share of classifier slots.
+    
+    Only the Gemini calls it makes are charged, one quota token per text
+    sent; answers from the cache and the local classifier are free.
+    
+    Args:
+        user_id (str): User the call is charged to
+        texts (list): The inputs being classified
+        classify (callable): Makes the call and returns a list of (content_type, formatted_data)
+        
+    Returns:
+        list: The classify() result, or every text as a plain thought when the
+        user is throttled and CLASSIFIER_THROTTLE_MODE is 'degrade'
+        
+    Raises:
+        APIError: 429 over quota, 503 when no slot came free, both with Retry-After
+    """
+    try:
+        with charge_to(user_id):
+            return classify()
+    except Throttled as e:
+        if current_app.config['CLASSIFIER_THROTTLE_MODE'] == 'degrade':
+            logger.info(f"Storing {len(texts)} unclassified thought(s) for throttled user {user_id}: {e}")
+            return [('thought', {'content': text}) for text in texts]
+        raise throttled_error(e)
+
+def throttled_error(throttled):
+    """The APIError to answer a Throttled request with"""
+    retry_after = max(1, math.ceil(throttled.retry_after))
+    if throttled.reason == QUOTA:
+        return APIError('Classification quota exceeded, try again later', 429,
+                        payload={'retry_after': retry_after}, headers={'Retry-After': str(retry_after)})
+    return APIError('Classifier is busy, try again later', 503,
+                    payload={'retry_after': retry_after}, headers={'Retry-After': str(retry_after)})
+
+def create_content_items(user_id, text, user_timezone):
+    """Split text into entries with one AI call and create them together"""
+    max_items = current_app.config['CLASSIFIER_SPLIT_MAX_ITEMS']
+    classified = classify_fairly(user_id, [text], lambda: classify_items(text, user_timezone, max_items=max_items))
+    
+    # Create every entry in a single transaction
+    try:
+        items = [
+            (content_type, create_content_item(user_id, content_type, formatted_data, user_timezone, commit=False))
+            for content_type, formatted_data in classified
+        ]
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error creating split content: {e}")
+        return jsonify({'error': 'Failed to create content'}), 500
+    
+    return jsonify({
+        'items': [
+            {'type': content_type, 'data': item.to_dict()}
+            for content_type, item in items
+        ]
+    }), 201
+
+def enqueue_content(user_id, text, user_timezone):
+    """Persist text as a pending item and hand it to the background workers"""
+    classification_queue = get_classification_queue()
+    
+    # Apply backpressure before accepting more work than the pool can queue
+    if not classification_queue.has_capacity():
+        response = jsonify({'error': 'Classification queue is full, try again later'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    
+    # Queued items don't hold a request thread, so only the quota applies
+    try:
+        get_fair_scheduler().take(user_id)
+    except Throttled as e:
+        raise throttled_error(e)
     
+    pending = PendingContent(
+        user_id=user_id,
+        text=text,
+        timezone=user_timezone
+    )
+    db.session.add(pending)
+    db.session.commit()
+    
+    classification_queue.submit(pending.id)
+    
+    return jsonify(pending.to_dict()), 202
+
+def create_content_item(user_id, content_type, formatted_data, user_timezone, commit=True):
+    """
+    Create the Thought, Todo or Habit for a classification result.
+    
+    Args:
+        user_id (str): Owner of the new item
+        content_type (str): thought, todo or habit
+        formatted_data (dict): Classifier output
+        user_timezone (str): IANA timezone string for the user
+        commit (bool): Commit the session; pass False to batch several items
+            into one transaction (the items are only flushed)
+        
+    Returns:
+        Thought, Todo or Habit: The created model instance
+    """
     if content_type == 'thought':
         # Create a thought
         new_thought = Thought(
@@ -42,12 +180,11 @@ def create_content():
         )
         
         db.session.add(new_thought)
-        db.session.commit()
+        if commit:
+            db.session.commit()
         
-        return jsonify({
-            'type': 'thought',
-            'data': new_thought.to_dict()
-        }), 201    
+        return new_thought
+    
     elif content_type == 'todo':          # Parse due date if provided
         due_date = None
         if formatted_data['due_date']:
@@ -64,12 +201,10 @@ def create_content():
         )
         
         db.session.add(new_todo)
-        db.session.commit()
+        if commit:
+            db.session.commit()
         
-        return jsonify({
-            'type': 'todo',
-            'data': new_todo.to_dict()
-        }), 201
+        return new_todo
     
     elif content_type == 'habit':
         # Parse start date if provided
@@ -103,75 +238,124 @@ def create_content():
         )
         
         db.session.add(new_habit)
-        db.session.commit()
+        if commit:
+            db.session.commit()
+        invalidate_habit_analytics(user_id)
         
-        # Generate initial habit instances
-        generate_habit_instances(new_habit)
-        
-        return jsonify({
-            'type': 'habit',
-            'data': new_habit.to_dict()
-        }), 201
+        return new_habit
     
-    else:
-        # This shouldn't happen given our classifier logic
-        return jsonify({'error': 'Failed to classify content'}), 500
+    raise ValueError(f"Unknown content type: {content_type}")
+
+@content_bp.route('/batch', methods=['POST'])
+@jwt_required()
+@idempotent
+def create_content_batch():
+    """Classify several texts with one AI call and create them together"""
+    user_id = get_jwt_identity()
+    data = request.json
+    
+    texts = data.get('texts') if data else None
+    if not isinstance(texts, list) or not texts:
+        return jsonify({'error': 'A non-empty list of texts is required'}), 400
+    
+    max_size = current_app.config['CLASSIFIER_BATCH_MAX_SIZE']
+    if len(texts) > max_size:
+        return jsonify({'error': f'At most {max_size} texts can be sent in one batch'}), 400
+    
+    if not all(isinstance(text, str) and text.strip() for text in texts):
+        return jsonify({'error': 'Every text must be a non-empty string'}), 400
+    
+    texts = [text.strip() for text in texts]
+    user_timezone = data.get('timezone', 'UTC')
+    
+    classified = classify_fairly(user_id, texts, lambda: classify_batch(texts, user_timezone))
+    
+    # Create every item in a single transaction
+    try:
+        items = [
+            (content_type, create_content_item(user_id, content_type, formatted_data, user_timezone, commit=False))
+            for content_type, formatted_data in classified
+        ]
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error creating batch content: {e}")
+        return jsonify({'error': 'Failed to create batch content'}), 500
+    
+    return jsonify([{
+        'index': index,
+        'type': content_type,
+        'data': item.to_dict()
+    } for index, (content_type, item) in enumerate(items)]), 201
+
+@content_bp.route('/pending/<pending_id>', methods=['GET'])
+@jwt_required()
+def get_pending_content(pending_id):
+    """
+    Poll an item submitted in async mode.
+    
+    Pass ?wait=<seconds> to long-poll until the item is classified.
+    """
+    user_id = get_jwt_identity()
+    
+    pending = PendingContent.query.filter_by(id=pending_id, user_id=user_id).first()
+    
+    if not pending:
+        return jsonify({'error': 'Pending content not found'}), 404
+    
+    wait = min(request.args.get('wait', 0, type=float), 30)
+    if wait > 0 and pending.status not in ('done', 'failed'):
+        pending = get_classification_queue().wait(pending_id, wait)
+    
+    result = pending.to_dict()
+    if pending.status == 'done':
+        model = {'thought': Thought, 'todo': Todo, 'habit': Habit}[pending.result_type]
+        created = db.session.get(model, pending.result_id)
+        result['result'] = {
+            'type': pending.result_type,
+            'data': created.to_dict() if created else None
+        }
+    
+    return jsonify(result)
 
 @content_bp.route('', methods=['GET'])
 @jwt_required()
 def get_all_content():
-    """Get all content (thoughts, todos, and habits) for the user"""
-    user_id = get_jwt_identity()
+    """
+    Get the user's thoughts, todos and active habits as one timeline, newest first.
     
-    # Get thoughts
-    thoughts = Thought.query.filter_by(user_id=user_id).all()
-    thought_data = [{
-        'type': 'thought',
-        'data': thought.to_dict()
-    } for thought in thoughts]
-    
-    # Get todos
-    todos = Todo.query.filter_by(user_id=user_id).all()
-    todo_data = [{
-        'type': 'todo',
-        'data': todo.to_dict()
-    } for todo in todos]
-      # Get habits (active habits only)
-    habits = Habit.query.filter_by(user_id=user_id, is_active=True).all()
-    habit_data = [{
-        'type': 'habit',
-        'data': habit.to_dict()
-    } for habit in habits]
-    
-    # Combine and sort by created_at/due_date (newest first)
-    all_content = thought_data + todo_data + habit_data
-    
-    # Sort with a function that handles different data types
-    def sort_key(item):
-        data = item['data']
-        if item['type'] == 'habit':
-            # For habits, use due_date as the primary sort key
-            return data.get('due_date', data.get('created_at', ''))
-        else:
-            # For thoughts and todos, use created_at
-            return data.get('created_at', '')
+    The three tables are read in created_at order and merged, a page at a
+    time if a limit is given, so only the page is loaded and serialized.
+    With a date window, thoughts and habits created in it and todos due in
+    it are returned.
+    """
+    user_id = get_jwt_identity()
+    window = window_args()
     
-    all_content.sort(key=sort_key, reverse=True)
+    sources = [
+        ('thought', in_window(Thought.query.filter_by(user_id=user_id), Thought.created_at, window), THOUGHT_ORDER),
+        ('todo', in_window(Todo.query.filter_by(user_id=user_id), Todo.due_date, window), TIMELINE_TODO_ORDER),
+        ('habit', in_window(Habit.query.filter_by(user_id=user_id, is_active=True), Habit.created_at, window),
+         HABIT_ORDER)
+    ]
     
-    return jsonify(all_content)
+    return jsonify(merged_listing(sources, lambda content_type, item: {
+        'type': content_type,
+        'data': item.to_dict()
+    }))
 
 @content_bp.route('/thoughts', methods=['GET'])
 @jwt_required()
 def get_thoughts():
-    """Get all thoughts for the user"""
+    """Get the user's thoughts, a page at a time if a limit is given"""
     user_id = get_jwt_identity()
-    thoughts = Thought.query.filter_by(user_id=user_id).order_by(Thought.created_at.desc()).all()
-    return jsonify([thought.to_dict() for thought in thoughts])
+    query = in_window(Thought.query.filter_by(user_id=user_id), Thought.created_at, window_args())
+    return jsonify(listing(query, THOUGHT_ORDER))
 
 @content_bp.route('/todos', methods=['GET'])
 @jwt_required()
 def get_todos():
-    """Get all todos for the user"""
+    """Get the user's todos, a page at a time if a limit is given"""
     user_id = get_jwt_identity()
     # Get query parameters for filtering
     completed = request.args.get('completed')
@@ -184,15 +368,10 @@ def get_todos():
         completed_bool = completed.lower() == 'true'
         query = query.filter_by(completed=completed_bool)
     
-    # Custom ordering
-    todos = query.order_by(
-        Todo.completed,  # False (0) comes before True (1)
-        Todo.due_date.is_(None),  # Not null values first
-        Todo.due_date,  # Earlier dates first
-        Todo.created_at.desc()  # Newest first
-    ).all()
+    query = in_window(query, Todo.due_date, window_args())
     
-    return jsonify([todo.to_dict() for todo in todos])
+    # Same order as /api/todos
+    return jsonify(listing(query, TODO_ORDER))
 
 @content_bp.route('/test-date-parsing', methods=['POST'])
 def test_date_parsing():
@@ -1,8 +1,15 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.db import db
-from app.models.habit import Habit, HabitInstance
+from app.models.habit import Habit, HabitInstance, HabitMonth
 from app.utils.logger import get_logger
+from app.utils.idempotency import idempotent
+from app.utils.habit_instances import (
+    ID_EPOCH, delete_untouched_instances, list_instances, materialize_instance, truncate_months
+)
+from app.utils.recurrence import parse_frequency_data
+from app.utils.habit_analytics import get_habit_analytics, invalidate_habit_analytics
+from app.utils.pagination import SortKey, listing
 from datetime import datetime, date, timedelta
 import json
 
@@ -10,8 +17,12 @@ logger = get_logger(__name__)
 
 habits_bp = Blueprint('habits', __name__)
 
+# Newest first; the ID breaks ties so cursors are exact
+HABIT_ORDER = [SortKey(Habit.created_at, descending=True), SortKey(Habit.id, descending=True)]
+
 @habits_bp.route('', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_habit():
     user_id = get_jwt_identity()
     data = request.json
@@ -30,6 +41,9 @@ def create_habit():
             start_date = datetime.fromisoformat(data['start_date']).date()
         except ValueError:
             return jsonify({'error': 'Invalid start_date format'}), 400
+        # Occurrence IDs can't encode days before it
+        if start_date < ID_EPOCH:
+            return jsonify({'error': f'start_date can\'t be before {ID_EPOCH.isoformat()}'}), 400
     else:
         start_date = date.today()
     
@@ -52,6 +66,10 @@ def create_habit():
     # Parse frequency data if provided
     frequency_data = None
     if 'frequency_data' in data and data['frequency_data']:
+        try:
+            parse_frequency_data(data['frequency'], data['frequency_data'], start_date)
+        except ValueError as e:
+            return jsonify({'error': f'Invalid frequency_data: {e}'}), 400
         frequency_data = json.dumps(data['frequency_data'])
       # Create habit
     new_habit = Habit(
@@ -67,9 +85,7 @@ def create_habit():
     
     db.session.add(new_habit)
     db.session.commit()
-    
-    # Generate initial habit instances
-    generate_habit_instances(new_habit)
+    invalidate_habit_analytics(user_id)
     
     return jsonify(new_habit.to_dict()), 201
 
@@ -89,9 +105,7 @@ def get_habits():
         active_bool = is_active.lower() == 'true'
         query = query.filter_by(is_active=active_bool)
     
-    habits = query.order_by(Habit.created_at.desc()).all()
-    
-    return jsonify([habit.to_dict() for habit in habits])
+    return jsonify(listing(query, HABIT_ORDER))
 
 @habits_bp.route('/<habit_id>', methods=['GET'])
 @jwt_required()
@@ -124,7 +138,15 @@ def update_habit(habit_id):
         habit.description = data['description']
         
     if 'is_active' in data:
-        habit.is_active = bool(data['is_active'])
+        is_active = bool(data['is_active'])
+        if 'end_date' not in data:
+            if habit.is_active and not is_active:
+                # End it today like DELETE does, so its past occurrences still count
+                habit.end_date = min(habit.end_date or date.today(), date.today())
+            elif is_active and not habit.is_active and habit.end_date and habit.end_date <= date.today():
+                # Resuming a habit that deactivating ended
+                habit.end_date = None
+        habit.is_active = is_active
         
     if 'end_date' in data:
         if data['end_date'] is None:
@@ -136,6 +158,7 @@ def update_habit(habit_id):
                 return jsonify({'error': 'Invalid end_date format'}), 400
     
     db.session.commit()
+    invalidate_habit_analytics(user_id)
     
     return jsonify(habit.to_dict())
 
@@ -155,6 +178,7 @@ def delete_habit(habit_id):
     if delete_all_future:
         # Delete the habit and all its instances
         HabitInstance.query.filter_by(habit_id=habit_id).delete()
+        HabitMonth.query.filter_by(habit_id=habit_id).delete()
         db.session.delete(habit)
     else:
         # Just mark the habit as inactive from today
@@ -167,9 +191,18 @@ def delete_habit(habit_id):
         ).delete()
     
     db.session.commit()
+    invalidate_habit_analytics(user_id)
     
     return jsonify({'message': 'Habit deleted successfully'})
 
+@habits_bp.route('/analytics', methods=['GET'])
+@jwt_required()
+def get_habits_analytics():
+    """Current and longest streak and 7, 30 and 90-day completion rates per habit"""
+    user_id = get_jwt_identity()
+    
+    return jsonify(get_habit_analytics(user_id))
+
 # Habit instances endpoints
 @habits_bp.route('/instances', methods=['GET'])
 @jwt_required()
@@ -181,32 +214,30 @@ def get_habit_instances():
     end_date = request.args.get('end_date')
     completed = request.args.get('completed')
     
-    # Base query
-    query = HabitInstance.query.filter_by(user_id=user_id)
-    
     # Apply date filters
+    start_date_obj = None
     if start_date:
         try:
             start_date_obj = datetime.fromisoformat(start_date).date()
-            query = query.filter(HabitInstance.due_date >= start_date_obj)
         except ValueError:
             return jsonify({'error': 'Invalid start_date format'}), 400
     
+    end_date_obj = None
     if end_date:
         try:
             end_date_obj = datetime.fromisoformat(end_date).date()
-            query = query.filter(HabitInstance.due_date <= end_date_obj)
         except ValueError:
             return jsonify({'error': 'Invalid end_date format'}), 400
     
     # Apply completion filter
+    completed_bool = None
     if completed is not None:
         completed_bool = completed.lower() == 'true'
-        query = query.filter_by(completed=completed_bool)
     
-    instances = query.order_by(HabitInstance.due_date.desc()).all()
+    # Occurrences nobody has touched yet are computed, not stored
+    instances = list_instances(user_id, start_date_obj, end_date_obj, completed_bool)
     
-    return jsonify([instance.to_dict() for instance in instances])
+    return jsonify(instances)
 
 @habits_bp.route('/instances/<instance_id>', methods=['PUT'])
 @jwt_required()
@@ -214,7 +245,8 @@ def update_habit_instance(instance_id):
     user_id = get_jwt_identity()
     data = request.json
     
-    instance = HabitInstance.query.filter_by(id=instance_id, user_id=user_id).first()
+    # Store a virtual occurrence on first update
+    instance = materialize_instance(user_id, instance_id)
     
     if not instance:
         return jsonify({'error': 'Habit instance not found'}), 404
@@ -236,6 +268,7 @@ def update_habit_instance(instance_id):
             instance.completed_at = None
     
     db.session.commit()
+    invalidate_habit_analytics(user_id)
     
     return jsonify(instance.to_dict())
 
@@ -245,7 +278,7 @@ def delete_habit_instance(instance_id):
     user_id = get_jwt_identity()
     data = request.json or {}
     
-    instance = HabitInstance.query.filter_by(id=instance_id, user_id=user_id).first()
+    instance = materialize_instance(user_id, instance_id)
     
     if not instance:
         return jsonify({'error': 'Habit instance not found'}), 404
@@ -258,41 +291,44 @@ def delete_habit_instance(instance_id):
             HabitInstance.habit_id == instance.habit_id,
             HabitInstance.due_date >= instance.due_date
         ).delete()
+        truncate_months(instance.habit_id, instance.due_date)
         
-        # Also mark the habit as inactive
-        habit = Habit.query.get(instance.habit_id)
+        # Also mark the habit as inactive, ending the day before so no occurrence is left
+        habit = db.session.get(Habit, instance.habit_id)
         if habit:
             habit.is_active = False
-            habit.end_date = instance.due_date
+            habit.end_date = instance.due_date - timedelta(days=1)
     else:
-        # Just delete this single instance
-        db.session.delete(instance)
+        # Keep the row as a marker, or the occurrence would be computed again
+        instance.deleted = True
     
     db.session.commit()
+    invalidate_habit_analytics(user_id)
     
     return jsonify({'message': 'Habit instance deleted successfully'})
 
 @habits_bp.route('/regenerate', methods=['POST'])
 @jwt_required()
 def regenerate_habit_instances():
-    """Regenerate habit instances for all active habits (useful for fixing past instances)"""
+    """
+    Recompute the instances of all active habits.
+    
+    Occurrences are computed on read, so this only drops stored instances
+    that were never completed, skipped or deleted, e.g. ones generated ahead
+    of time; they come back as identical virtual occurrences.
+    """
     user_id = get_jwt_identity()
     
     try:
         # Get all active habits for the user
         active_habits = Habit.query.filter_by(user_id=user_id, is_active=True).all()
         
-        # Delete existing future instances (keep past completed ones)
-        today = date.today()
-        for habit in active_habits:
-            HabitInstance.query.filter(
-                HabitInstance.habit_id == habit.id,
-                HabitInstance.due_date >= today
-            ).delete()
+        # Delete the instances the user hasn't touched, in one statement
+        delete_untouched_instances([habit.id for habit in active_habits])
         
-        # Regenerate instances for each habit
+        # The materializer stores them again on its next run
         for habit in active_habits:
-            generate_habit_instances(habit)
+            habit.materialized_through = None
         
         db.session.commit()
         
@@ -305,56 +341,3 @@ def regenerate_habit_instances():
         db.session.rollback()
         logger.error(f"Error regenerating habit instances: {e}")
         return jsonify({'error': 'Failed to regenerate habit instances'}), 500
-
-def generate_habit_instances(habit):
-    """Generate habit instances based on frequency"""
-    if not habit.is_active:
-        return
-    
-    # Generate instances starting from today or the habit start date, whichever is later
-    today = date.today()
-    current_date = max(habit.start_date, today)  # Start from today or later
-    end_generation_date = today + timedelta(days=30)
-    
-    if habit.end_date and habit.end_date < end_generation_date:
-        end_generation_date = habit.end_date
-    
-    while current_date <= end_generation_date:
-        # Check if instance already exists
-        existing = HabitInstance.query.filter_by(
-            habit_id=habit.id,
-            due_date=current_date
-        ).first()
-        
-        if not existing:
-            instance = HabitInstance(
-                habit_id=habit.id,
-                user_id=habit.user_id,
-                due_date=current_date
-            )
-            db.session.add(instance)
-        
-        # Move to next occurrence based on frequency
-        if habit.frequency == 'daily':
-            current_date += timedelta(days=1)
-        elif habit.frequency == 'weekly':
-            current_date += timedelta(days=7)
-        elif habit.frequency == 'monthly':
-            # Simple monthly increment - move to same day next month
-            if current_date.month == 12:
-                next_month = current_date.replace(year=current_date.year + 1, month=1)
-            else:
-                try:
-                    next_month = current_date.replace(month=current_date.month + 1)
-                except ValueError:
-                    # Handle end of month edge cases
-                    next_month = current_date.replace(month=current_date.month + 1, day=1)
-                    next_month += timedelta(days=current_date.day - 1)
-                    if next_month.day != current_date.day:
-                        # If the day doesn't exist in the next month, use the last day
-                        next_month = next_month.replace(day=1)
-                        next_month += timedelta(days=32)
-                        next_month = next_month.replace(day=1) - timedelta(days=1)
-            current_date = next_month
-    
-    db.session.commit()
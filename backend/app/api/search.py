@@ -0,0 +1,23 @@
+"""
+API route for full-text search over thoughts, todos and habits
+"""
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.utils.pagination import page_args
+from app.utils.search import DEFAULT_LIMIT, search
+
+search_bp = Blueprint('search', __name__)
+
+@search_bp.route('', methods=['GET'])
+@jwt_required()
+def search_content():
+    """
+    Search the user's thoughts, todos and habits, title matches first, then newest.
+    
+    Always paginated: {"items": [{"type", "data"}], "next_cursor"}, with
+    DEFAULT_LIMIT results per page unless a limit is given.
+    """
+    user_id = get_jwt_identity()
+    limit, cursor = page_args(default_limit=DEFAULT_LIMIT)
+    items, next_cursor = search(user_id, request.args.get('q', ''), limit, cursor)
+    return jsonify({'items': items, 'next_cursor': next_cursor})
@@ -2,11 +2,18 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.db import db
 from app.models.thought import Thought
+from app.utils.idempotency import idempotent
+from app.utils.pagination import SortKey, listing
+from app.utils.date_windows import in_window, window_args
 
 thoughts_bp = Blueprint('thoughts', __name__)
 
+# Newest first; the ID breaks ties so cursors are exact
+THOUGHT_ORDER = [SortKey(Thought.created_at, descending=True), SortKey(Thought.id, descending=True)]
+
 @thoughts_bp.route('', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_thought():
     user_id = get_jwt_identity()
     data = request.json
@@ -31,10 +38,10 @@ def create_thought():
 def get_thoughts():
     user_id = get_jwt_identity()
     
-    # Get all thoughts for the current user, sorted by creation date (newest first)
-    thoughts = Thought.query.filter_by(user_id=user_id).order_by(Thought.created_at.desc()).all()
-    
-    return jsonify([thought.to_dict() for thought in thoughts])
+    # Thoughts for the current user, newest first, a page at a time if a limit is given,
+    # created in the requested date window if any
+    query = in_window(Thought.query.filter_by(user_id=user_id), Thought.created_at, window_args())
+    return jsonify(listing(query, THOUGHT_ORDER))
 
 @thoughts_bp.route('/<thought_id>', methods=['GET'])
 @jwt_required()
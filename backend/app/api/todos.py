@@ -3,14 +3,31 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.db import db
 from app.models.todo import Todo
 from app.utils.logger import get_logger
+from app.utils.idempotency import idempotent
+from app.utils.pagination import SortKey, listing
+from app.utils.date_windows import in_window, window_args
 from datetime import datetime
 
 logger = get_logger(__name__)
 
 todos_bp = Blueprint('todos', __name__)
 
+# Custom ordering:
+# 1. Incomplete todos first
+# 2. Todos with due dates before those without
+# 3. Earlier due dates before later ones
+# 4. Most recently created first
+# The ID breaks ties so cursors are exact
+TODO_ORDER = [
+    SortKey(Todo.completed),  # False (0) comes before True (1)
+    SortKey(Todo.due_date, nulls_last=True),
+    SortKey(Todo.created_at, descending=True),
+    SortKey(Todo.id, descending=True)
+]
+
 @todos_bp.route('', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_todo():
     user_id = get_jwt_identity()
     data = request.json
@@ -59,19 +76,10 @@ def get_todos():
         completed_bool = completed.lower() == 'true'
         query = query.filter_by(completed=completed_bool)
     
-    # Custom ordering:
-    # 1. Incomplete todos first
-    # 2. Todos with due dates before those without
-    # 3. Earlier due dates before later ones
-    # 4. Most recently created first
-    todos = query.order_by(
-        Todo.completed,  # False (0) comes before True (1)
-        Todo.due_date.is_(None),  # Not null values first
-        Todo.due_date,  # Earlier dates first
-        Todo.created_at.desc()  # Newest first
-    ).all()
-    
-    return jsonify([todo.to_dict() for todo in todos])
+    # Todos due in the requested date window
+    query = in_window(query, Todo.due_date, window_args())
+    
+    return jsonify(listing(query, TODO_ORDER))
 
 @todos_bp.route('/<todo_id>', methods=['GET'])
 @jwt_required()
@@ -0,0 +1,166 @@
+"""
+CLI commands, available through `flask <group> <command>`.
+"""
+import json
+import os
+
+import click
+from flask.cli import AppGroup
+
+classifier_cli = AppGroup('classifier', help='Manage the content classifier.')
+
+
+@classifier_cli.command('train')
+def train_local_classifier():
+    """Retrain the local pre-classifier from stored Gemini labels."""
+    from app.utils.local_classifier import NaiveBayesClassifier, load_cached_labels
+
+    cache_path = os.getenv('CLASSIFIER_CACHE_PATH', 'classifier_cache.db')
+    model_path = os.getenv('CLASSIFIER_LOCAL_MODEL_PATH', 'classifier_model.json')
+
+    labels = load_cached_labels(cache_path)
+    model = NaiveBayesClassifier().fit((text, label) for text, label, _ in labels)
+    model.save(model_path)
+
+    click.echo(f"Trained on {model.examples} examples: {json.dumps(model.class_counts)}")
+    click.echo(f"Saved model to {model_path}")
+
+
+@classifier_cli.command('eval')
+@click.option('--holdout', default=0.2, show_default=True, help='Fraction of newest labels used for evaluation.')
+@click.option('--threshold', default=None, type=float, help='Confidence threshold (defaults to CLASSIFIER_LOCAL_THRESHOLD).')
+def evaluate_local_classifier(holdout, threshold):
+    """Report agreement with Gemini and the fraction of calls avoided."""
+    from app.utils.local_classifier import evaluate, load_cached_labels
+
+    if threshold is None:
+        threshold = float(os.getenv('CLASSIFIER_LOCAL_THRESHOLD', 0.95))
+
+    labels = load_cached_labels(os.getenv('CLASSIFIER_CACHE_PATH', 'classifier_cache.db'))
+    report = evaluate([(text, label) for text, label, _ in labels], holdout=holdout, threshold=threshold)
+    click.echo(json.dumps(report, indent=2))
+
+
+@classifier_cli.command('usage')
+@click.option('--days', default=30, show_default=True, help='Only count requests from the last N days (0 for all).')
+@click.option('--json', 'as_json', is_flag=True, help='Print the report as JSON.')
+def usage_report(days, as_json):
+    """Report token spend per content type."""
+    import time
+    from app.utils.token_usage import UsageLedger
+
+    ledger = UsageLedger(os.getenv('CLASSIFIER_USAGE_PATH') or os.getenv('CLASSIFIER_CACHE_PATH', 'classifier_cache.db'))
+    report = ledger.report(since=time.time() - days * 24 * 3600 if days else None)
+
+    if as_json:
+        click.echo(json.dumps(report, indent=2))
+        return
+    if not report:
+        click.echo("No token usage recorded")
+        return
+
+    click.echo(f"{'type':<14}{'items':>8}{'calls':>8}{'input':>12}{'output':>10}{'cached':>10}{'in/item':>10}{'out/item':>10}")
+    for row in report:
+        click.echo(
+            f"{row['content_type']:<14}{row['items']:>8}{row['calls']:>8}{row['input_tokens']:>12}"
+            f"{row['output_tokens']:>10}{row['cached_tokens']:>10}{row['avg_input_tokens']:>10}{row['avg_output_tokens']:>10}"
+        )
+
+
+@classifier_cli.command('mock-server')
+@click.option('--host', default='127.0.0.1', show_default=True)
+@click.option('--port', default=8765, show_default=True)
+@click.option('--latency-median', default=0.4, show_default=True, help='Median response latency in seconds.')
+@click.option('--latency-p99', default=2.0, show_default=True, help='99th percentile latency in seconds.')
+@click.option('--error-rate', default=0.0, show_default=True, help='Fraction of requests that fail.')
+@click.option('--error-codes', default='429,500,503', show_default=True, help='HTTP status codes used for failures.')
+@click.option('--seed', default=None, type=int, help='Random seed for reproducible runs.')
+def mock_server(host, port, latency_median, latency_p99, error_rate, error_codes, seed):
+    """Run a local stand-in for the Gemini API."""
+    from app.utils.mock_gemini import MockGeminiServer
+
+    server = MockGeminiServer(
+        host=host, port=port, latency_median=latency_median, latency_p99=latency_p99,
+        error_rate=error_rate, error_codes=[int(code) for code in error_codes.split(',') if code],
+        seed=seed
+    )
+    click.echo(f"Mock Gemini listening on {server.base_url} (set GEMINI_BASE_URL to use it)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        click.echo(json.dumps(server.stats()))
+
+
+habits_cli = AppGroup('habits', help='Maintain habit instances.')
+
+
+@habits_cli.command('materialize')
+@click.option('--horizon', default=None, type=int, help='Days ahead to store instances for (defaults to HABIT_MATERIALIZER_HORIZON).')
+@click.option('--chunk-size', default=None, type=int, help='Habits per transaction (defaults to HABIT_MATERIALIZER_CHUNK_SIZE).')
+@click.option('--max-seconds', default=None, type=float, help='Stop after this long; the next run resumes.')
+def materialize_habit_instances(horizon, chunk_size, max_seconds):
+    """Store habit instances up to the horizon, resuming from each habit's watermark."""
+    from flask import current_app
+    from app.utils.habit_materializer import HabitMaterializer
+
+    materializer = HabitMaterializer(
+        horizon_days=horizon or current_app.config['HABIT_MATERIALIZER_HORIZON'],
+        chunk_size=chunk_size or current_app.config['HABIT_MATERIALIZER_CHUNK_SIZE']
+    )
+    report = materializer.run(max_seconds=max_seconds)
+    click.echo(json.dumps(report, indent=2))
+
+
+@habits_cli.command('compact')
+@click.option('--before', default=None, help='Compact months before this one, as YYYY-MM (defaults to the current month).')
+@click.option('--chunk-size', default=None, type=int, help='Habits per transaction (defaults to HABIT_MATERIALIZER_CHUNK_SIZE).')
+@click.option('--max-seconds', default=None, type=float, help='Stop after this long; the next run resumes.')
+def compact_habit_instances(before, chunk_size, max_seconds):
+    """Fold the instances of closed months into one bitmap row per habit and month."""
+    from datetime import datetime
+    from flask import current_app
+    from app.utils.habit_compaction import compact_instances
+
+    if before:
+        try:
+            before = datetime.strptime(before, '%Y-%m').date()
+        except ValueError:
+            raise click.BadParameter('expected YYYY-MM', param_hint='--before')
+    report = compact_instances(
+        before=before,
+        chunk_size=chunk_size or current_app.config['HABIT_MATERIALIZER_CHUNK_SIZE'],
+        max_seconds=max_seconds
+    )
+    click.echo(json.dumps(report, indent=2))
+
+
+search_cli = AppGroup('search', help='Maintain the full-text search index.')
+
+
+@search_cli.command('rebuild')
+def rebuild_search():
+    """Repopulate the search index from every thought, todo and habit."""
+    import time
+    from app.models.db import db
+    from app.models.search_index import create_search_index, rebuild_search_index
+
+    started = time.monotonic()
+    with db.engine.begin() as connection:
+        create_search_index(connection)
+        counts = rebuild_search_index(connection)
+    click.echo(json.dumps({'indexed': counts, 'duration_seconds': round(time.monotonic() - started, 3)}, indent=2))
+
+
+def register_commands(app):
+    """
+    Register CLI command groups on the app.
+
+    Args:
+        app: Flask application instance
+    """
+    app.cli.add_command(classifier_cli)
+    app.cli.add_command(habits_cli)
+    app.cli.add_command(search_cli)
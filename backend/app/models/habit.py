@@ -5,6 +5,10 @@ import json
 
 class Habit(db.Model):
     __tablename__ = 'habits'
+    __table_args__ = (
+        # Listings and the timeline: a user's habits, newest first
+        db.Index('ix_habits_user_id_created_at', 'user_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
@@ -16,6 +20,7 @@ class Habit(db.Model):
     end_date = db.Column(db.Date, nullable=True)  # Optional end date
     due_time = db.Column(db.Time, nullable=True)  # Optional time for the habit
     is_active = db.Column(db.Boolean, default=True)
+    materialized_through = db.Column(db.Date, nullable=True)  # Instances are stored up to this date
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -44,6 +49,13 @@ class Habit(db.Model):
 
 class HabitInstance(db.Model):
     __tablename__ = 'habit_instances'
+    __table_args__ = (
+        # One instance per habit and day, so concurrent generation can't duplicate
+        # Also the index for a habit's instances by date
+        db.UniqueConstraint('habit_id', 'due_date', name='uq_habit_instances_habit_id_due_date'),
+        # A user's instances in a date range
+        db.Index('ix_habit_instances_user_id_due_date', 'user_id', 'due_date'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     habit_id = db.Column(db.String(36), db.ForeignKey('habits.id'), nullable=False)
@@ -52,6 +64,7 @@ class HabitInstance(db.Model):
     completed = db.Column(db.Boolean, default=False)
     completed_at = db.Column(db.DateTime, nullable=True)
     skipped = db.Column(db.Boolean, default=False)
+    deleted = db.Column(db.Boolean, default=False)  # Hides the occurrence without ending the habit
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -71,3 +84,17 @@ class HabitInstance(db.Model):
             'updated_at': self.updated_at.isoformat() + 'Z' if self.updated_at else None,
             'habit': self.habit.to_dict() if self.habit else None
         }
+
+class HabitMonth(db.Model):
+    """A closed month of a habit's instances, compacted into day bitmaps (bit 0 is the 1st)"""
+    __tablename__ = 'habit_months'
+    __table_args__ = (
+        db.Index('ix_habit_months_user_id_month', 'user_id', 'month'),
+    )
+    
+    habit_id = db.Column(db.String(36), db.ForeignKey('habits.id'), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)  # First day of the month
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    skipped = db.Column(db.Integer, nullable=False, default=0)
+    deleted = db.Column(db.Integer, nullable=False, default=0)
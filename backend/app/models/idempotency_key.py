@@ -0,0 +1,16 @@
+from app.models.db import db
+from datetime import datetime
+
+class IdempotencyKey(db.Model):
+    """Response stored for an Idempotency-Key, replayed when the request is retried"""
+    __tablename__ = 'idempotency_keys'
+
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), primary_key=True)
+    key = db.Column(db.String(255), primary_key=True)
+    fingerprint = db.Column(db.String(64), nullable=False)  # SHA-256 of method, path and body
+    status = db.Column(db.String(20), nullable=False, default='in_progress')  # in_progress, done
+    response_status = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    response_headers = db.Column(db.Text, nullable=True)  # JSON object of the headers replayed with it
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
@@ -0,0 +1,35 @@
+from app.models.db import db
+from datetime import datetime
+import uuid
+
+class PendingContent(db.Model):
+    """Raw text waiting for background classification"""
+    __tablename__ = 'pending_content'
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    timezone = db.Column(db.String(64), nullable=False, default='UTC')
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, processing, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    result_type = db.Column(db.String(20), nullable=True)  # thought, todo, habit
+    result_id = db.Column(db.String(36), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'text': self.text,
+            'status': self.status,
+            'attempts': self.attempts,
+            'result_type': self.result_type,
+            'result_id': self.result_id,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() + 'Z' if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() + 'Z' if self.updated_at else None
+        }
@@ -0,0 +1,206 @@
+"""
+Full-text search index over thoughts, todos and habits.
+
+The index isn't part of the models' metadata, since it's a different
+structure on each database:
+
+- SQLite: `search_index` maps each item to an INTEGER PRIMARY KEY, which
+  is the rowid of its row in the FTS5 table `search_index_fts`. The rowid
+  of the item's own table can't be used, since VACUUM may renumber it.
+- Postgres: `search_index` holds each item's tsvector, with a GIN index.
+
+Both are kept in sync by triggers on the indexed tables, so bulk updates
+and deletes that bypass the ORM are indexed too. The DDL runs after
+db.create_all() and from the search index migration;
+rebuild_search_index() repopulates it from the tables.
+"""
+import sqlalchemy as sa
+from sqlalchemy import event
+
+from app.models.db import db
+
+# kind, table, title column, description column
+SOURCES = [
+    ('thought', 'thoughts', 'content', None),
+    ('todo', 'todos', 'title', 'description'),
+    ('habit', 'habits', 'title', 'description'),
+]
+
+# Text search configuration on Postgres
+POSTGRES_CONFIG = 'english'
+
+search_index = sa.table(
+    'search_index',
+    sa.column('id', sa.Integer),
+    sa.column('kind', sa.String),
+    sa.column('item_id', sa.String),
+    sa.column('user_id', sa.String),
+    sa.column('document'),
+)
+
+# SQLite only
+search_index_fts = sa.table('search_index_fts', sa.column('rowid', sa.Integer))
+
+
+def include_name(name, type_, parent_names):
+    """Alembic autogenerate filter that skips the search index's tables"""
+    return not (type_ == 'table' and (name == 'search_index' or name.startswith('search_index_fts')))
+
+
+def _sqlite_ddl():
+    statements = [
+        """CREATE TABLE IF NOT EXISTS search_index (
+            id INTEGER PRIMARY KEY,
+            kind VARCHAR(10) NOT NULL,
+            item_id VARCHAR(36) NOT NULL,
+            user_id VARCHAR(36) NOT NULL,
+            UNIQUE (kind, item_id)
+        )""",
+        """CREATE VIRTUAL TABLE IF NOT EXISTS search_index_fts USING fts5(
+            title, description, tokenize = 'porter unicode61'
+        )""",
+    ]
+    for kind, table, title, description in SOURCES:
+        columns = ', '.join(filter(None, (title, description)))
+        new_description = f'NEW.{description}' if description else 'NULL'
+        rowid = "(SELECT id FROM search_index WHERE kind = '%s' AND item_id = %s.id)"
+        statements += [
+            f"""CREATE TRIGGER IF NOT EXISTS search_index_{table}_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO search_index (kind, item_id, user_id) VALUES ('{kind}', NEW.id, NEW.user_id);
+                INSERT INTO search_index_fts (rowid, title, description)
+                VALUES ({rowid % (kind, 'NEW')}, NEW.{title}, {new_description});
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS search_index_{table}_update AFTER UPDATE OF {columns} ON {table} BEGIN
+                UPDATE search_index_fts SET title = NEW.{title}, description = {new_description}
+                WHERE rowid = {rowid % (kind, 'NEW')};
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS search_index_{table}_delete AFTER DELETE ON {table} BEGIN
+                DELETE FROM search_index_fts WHERE rowid = {rowid % (kind, 'OLD')};
+                DELETE FROM search_index WHERE kind = '{kind}' AND item_id = OLD.id;
+            END""",
+        ]
+    return statements
+
+
+def _document(title, description, row):
+    """A row's weighted tsvector, titles ranking above descriptions"""
+    document = f"setweight(to_tsvector('{POSTGRES_CONFIG}', coalesce({row}.{title}, '')), 'A')"
+    if description:
+        document += f" || setweight(to_tsvector('{POSTGRES_CONFIG}', coalesce({row}.{description}, '')), 'B')"
+    return document
+
+
+def _postgres_ddl():
+    statements = [
+        """CREATE TABLE IF NOT EXISTS search_index (
+            kind VARCHAR(10) NOT NULL,
+            item_id VARCHAR(36) NOT NULL,
+            user_id VARCHAR(36) NOT NULL,
+            document TSVECTOR NOT NULL,
+            PRIMARY KEY (kind, item_id)
+        )""",
+        'CREATE INDEX IF NOT EXISTS ix_search_index_document ON search_index USING GIN (document)',
+        'CREATE INDEX IF NOT EXISTS ix_search_index_user_id ON search_index (user_id)',
+    ]
+    for kind, table, title, description in SOURCES:
+        statements += [
+            f"""CREATE OR REPLACE FUNCTION search_index_{table}() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    DELETE FROM search_index WHERE kind = '{kind}' AND item_id = OLD.id;
+                    RETURN OLD;
+                END IF;
+                INSERT INTO search_index (kind, item_id, user_id, document)
+                VALUES ('{kind}', NEW.id, NEW.user_id, {_document(title, description, 'NEW')})
+                ON CONFLICT (kind, item_id) DO UPDATE SET document = EXCLUDED.document;
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql""",
+            f'DROP TRIGGER IF EXISTS search_index_{table} ON {table}',
+            f"""CREATE TRIGGER search_index_{table}
+            AFTER INSERT OR UPDATE OF {', '.join(filter(None, (title, description)))} OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION search_index_{table}()""",
+        ]
+    return statements
+
+
+def _execute(connection, statements):
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+
+
+def create_search_index(connection):
+    """
+    Create the search index and its triggers if they don't exist.
+
+    Args:
+        connection: Connection of the database, in a transaction
+    """
+    if connection.dialect.name == 'postgresql':
+        _execute(connection, _postgres_ddl())
+    else:
+        _execute(connection, _sqlite_ddl())
+
+
+def drop_search_index(connection):
+    """Drop the search index and its triggers"""
+    if connection.dialect.name == 'postgresql':
+        statements = [f'DROP TRIGGER IF EXISTS search_index_{table} ON {table}' for _, table, _, _ in SOURCES]
+        statements += [f'DROP FUNCTION IF EXISTS search_index_{table}()' for _, table, _, _ in SOURCES]
+        statements.append('DROP TABLE IF EXISTS search_index')
+    else:
+        statements = [
+            f'DROP TRIGGER IF EXISTS search_index_{table}_{event_name}'
+            for _, table, _, _ in SOURCES for event_name in ('insert', 'update', 'delete')
+        ]
+        statements += ['DROP TABLE IF EXISTS search_index_fts', 'DROP TABLE IF EXISTS search_index']
+    _execute(connection, statements)
+
+
+def rebuild_search_index(connection):
+    """
+    Repopulate the search index from the indexed tables.
+
+    For databases whose rows were written before the index existed, or
+    with the triggers disabled.
+
+    Args:
+        connection: Connection of the database, in a transaction
+
+    Returns:
+        dict: Number of indexed items per kind
+    """
+    if connection.dialect.name == 'postgresql':
+        statements = ['TRUNCATE search_index']
+        for kind, table, title, description in SOURCES:
+            statements.append(
+                f"INSERT INTO search_index (kind, item_id, user_id, document) "
+                f"SELECT '{kind}', id, user_id, {_document(title, description, table)} FROM {table}"
+            )
+    else:
+        statements = ['DELETE FROM search_index_fts', 'DELETE FROM search_index']
+        for kind, table, title, description in SOURCES:
+            statements += [
+                f"INSERT INTO search_index (kind, item_id, user_id) SELECT '{kind}', id, user_id FROM {table}",
+                f"INSERT INTO search_index_fts (rowid, title, description) "
+                f"SELECT search_index.id, {table}.{title}, {f'{table}.{description}' if description else 'NULL'} "
+                f"FROM {table} JOIN search_index ON search_index.kind = '{kind}' AND search_index.item_id = {table}.id",
+            ]
+        # Merge the index's b-trees, which a bulk load leaves fragmented
+        statements.append("INSERT INTO search_index_fts (search_index_fts) VALUES ('optimize')")
+    _execute(connection, statements)
+
+    counts = connection.execute(
+        sa.select(search_index.c.kind, sa.func.count()).group_by(search_index.c.kind)
+    ).all()
+    return {kind: 0 for kind, _, _, _ in SOURCES} | dict(counts)
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_after_tables(target, connection, **kw):
+    create_search_index(connection)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _drop_before_tables(target, connection, **kw):
+    drop_search_index(connection)
@@ -4,6 +4,10 @@ import uuid
 
 class Thought(db.Model):
     __tablename__ = 'thoughts'
+    __table_args__ = (
+        # Listings and the timeline: a user's thoughts, newest first
+        db.Index('ix_thoughts_user_id_created_at', 'user_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
@@ -18,6 +18,17 @@ class Todo(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        # The list order (incomplete first, due dates first and earliest, newest),
+        # with due_date IS NULL as an indexed expression so no sort is needed
+        db.Index('ix_todos_user_id_completed_due_date', user_id, completed, due_date.is_(None), due_date,
+                 created_at.desc(), id.desc()),
+        # Todos due in a date window
+        db.Index('ix_todos_user_id_due_date', 'user_id', 'due_date'),
+        # The timeline: a user's todos, newest first
+        db.Index('ix_todos_user_id_created_at', 'user_id', 'created_at', 'id'),
+    )
+    
     def to_dict(self):
         due_date_str = None
         if self.due_date:
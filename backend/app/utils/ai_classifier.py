@@ -1,26 +1,49 @@
 """
 AI classifier for distinguishing between thoughts and todos.
-Uses Google's Gemini 2.0 Flash model for classification.
+Uses Google's Gemini 2.0 Flash model for classification, through the backend
+selected in app.utils.classifier_backends.
 """
 import json
 import os
-from typing import Dict, Tuple, Union
-from datetime import datetime, timedelta
+import re
+import time
+from typing import Dict, List, Optional, Tuple, Union
+from datetime import datetime
 import pytz  # Added import for timezone handling
-from google import genai
 from dotenv import load_dotenv
 from app.utils.logger import get_logger
+from app.utils.classification_cache import get_classification_cache, make_cache_key, normalize_text
+from app.utils.singleflight import get_singleflight
+from app.utils.local_classifier import get_local_classifier
+from app.utils.temporal_parser import TemporalResult, parse_temporal
+from app.utils.resilience import CircuitOpenError, Deadline, DeadlineExceeded, call_with_resilience, get_circuit_breaker
+from app.utils.model_router import ERROR, FAST, INVALID_JSON, MISSING_FIELDS, STRONG, UNKNOWN_TYPE, get_model_router
+from app.utils.classifier_backends import ReplayMissError, get_classifier_backend
+from app.utils.classifier_prompts import (
+    Prompt, build_batch_prompt, build_full_prompt, build_minimal_prompt, build_split_prompt, build_type_prompt
+)
+from app.utils.token_usage import record_call, track_request
+from app.utils.fair_scheduler import Throttled, classifier_slot
 
 # Load environment variables
 load_dotenv()
 
 logger = get_logger(__name__)
 
-# Configure the Gemini API with the key from the environment
-client=genai.Client(api_key=os.getenv("API_KEY"))
+# Latency budget per classification and timeout per Gemini attempt, in seconds
+REQUEST_BUDGET = float(os.getenv("CLASSIFIER_REQUEST_BUDGET", 10))
+CALL_TIMEOUT = float(os.getenv("CLASSIFIER_CALL_TIMEOUT", 5))
+BATCH_CALL_TIMEOUT = float(os.getenv("CLASSIFIER_BATCH_CALL_TIMEOUT", 30))
+MAX_RETRIES = int(os.getenv("CLASSIFIER_MAX_RETRIES", 2))
+
+# Commas, semicolons, line breaks and sentence ends may separate entries
+_ENTRY_SEPARATOR_RE = re.compile(r'[,;\n]|[.!?]\s+\S')
+
+class ClassificationError(Exception):
+    """Raised when classification fails and the thought fallback is disabled"""
 
 # Updated function signature to include user_timezone_str
-def classify_input(text: str, user_timezone_str: str) -> Tuple[str, Dict[str, Union[str, bool, None]]]:
+def classify_input(text: str, user_timezone_str: str, fallback: bool = True) -> Tuple[str, Dict[str, Union[str, bool, None]]]:
     try:
         user_tz = pytz.timezone(user_timezone_str)
         now_in_user_tz = datetime.now(user_tz)
@@ -31,104 +54,389 @@ def classify_input(text: str, user_timezone_str: str) -> Tuple[str, Dict[str, Un
         now_in_user_tz = datetime.now(user_tz)
         user_timezone_str = "UTC"  # Update user_timezone_str for the prompt
 
-    today = now_in_user_tz.strftime('%Y-%m-%d')
-    time = now_in_user_tz.strftime('%H:%M:%S')
-    
-    prompt = f"""
-    Analyze the following text and determine if it is a thought, a todo, or a habit.
-
-    If it's a THOUGHT, respond with a JSON object with these fields:
-    {{
-        "type": "thought",
-        "content": "[original text in lowercase]"
-    }}
-
-    If it's a TODO, respond with a JSON object with these fields:
-    {{
-        "type": "todo",
-        "title": "[concise title in lower case]",
-        "description": "[optional detailed description in lower case, if all information is in the title, simply put null here. DO NOT ADD EXTRA INFORMATION]",
-        "due_date": "[any due date mentioned in ISO format, or null if none]"
-    }}    
-
-    If it's a HABIT (recurring activity like daily exercise, weekly cleaning, etc.), respond with a JSON object with these fields:
-    {{
-        "type": "habit",
-        "title": "[concise title in lower case]",
-        "description": "[optional detailed description in lower case, if all information is in the title, simply put null here. DO NOT ADD EXTRA INFORMATION]",
-        "frequency": "[daily, weekly, or monthly based on context]",        
-        "start_date": "[when to start the habit in ISO format, default to {today} if not specified]",
-        "due_time": "[REQUIRED IF TIME MENTIONED: time in 24-hour HH:MM format like 15:00 for 3pm, 07:00 for 7am]"
-    }}
-    
-    FOR HABITS WITH TIME - EXAMPLES:
-    "exercise at 6pm daily" → include "due_time": "18:00"
-    "meditate at 7am every day" → include "due_time": "07:00" 
-    "go to gym at 3 PM" → include "due_time": "15:00"
-    "walk in the morning" → include "due_time": "09:00"    FOR TODOS - due_date field rules:
-    - With time: "YYYY-MM-DDTHH:MM:SS" (e.g., "2025-06-17T15:30:00")  
-    - Date only: "YYYY-MM-DD" (e.g., "2025-06-17")
-    - No date mentioned: null
-    - Today is {today}, current time is {time}
-    EXAMPLES (current user's date/time is {today} {time} {user_timezone_str}):
-    - "Call John tomorrow at 3pm" → due_date: "{(now_in_user_tz + timedelta(days=1)).strftime('%Y-%m-%d')}T15:00:00"
-    - "Buy groceries by Friday" → due_date: "2025-06-20" (if Friday is the 20th, actual date will depend on {today})
-    - "Remember to breathe" → due_date: null    Text to analyze: "{text}"
-    
-    CRITICAL: If this text mentions ANY time (like "3pm", "7am", "morning", "evening"), include due_time field for habits!
-    
-    IMPORTANT: Respond ONLY with the JSON object, nothing else.
-    """
-    
+    # Serve repeated inputs from the cache instead of calling Gemini again
+    cache = get_classification_cache()
+    if cache:
+        cached = cache.get(text, now_in_user_tz)
+        if cached:
+            logger.debug(f"Classification cache hit for: {text}")
+            return cached
+
+    # Dates, times and recurrence are extracted locally when possible
+    temporal = parse_temporal(text, now_in_user_tz)
+
+    # Confident inputs are answered by the local model without calling Gemini
+    local_classifier = get_local_classifier()
+    if local_classifier:
+        local_result = local_classifier.classify(text, temporal)
+        if local_result:
+            return local_result
+
+    # Identical requests already in flight share one Gemini call. A leader
+    # throttled by its own user's quota doesn't decide for the followers,
+    # they retry under their own.
+    def classify_and_cache():
+        with classifier_slot(), track_request() as usage:
+            result = _classify_with_gemini(text, now_in_user_tz, user_timezone_str, temporal)
+            usage.content_types = [result[0]]
+        if result[0] is not None:
+            if cache:
+                cache.set(text, now_in_user_tz, *result)
+            if local_classifier:
+                local_classifier.learn(normalize_text(text), result[0])
+        return result
+
+    flight_key = make_cache_key(text, now_in_user_tz) or f"{normalize_text(text)}|{user_timezone_str}"
+    shared_lookup = (lambda: cache.get(text, now_in_user_tz, record_stats=False)) if cache else None
+
     try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=prompt,
+        content_type, formatted_data = get_singleflight().do(
+            flight_key, classify_and_cache, shared_lookup, private_errors=(Throttled,)
         )
-        response_text = response.text.strip()
-          # Clean up the response in case it has markdown code block formatting
-        if response_text.startswith('```json'):
-            response_text = response_text.replace('```json', '', 1)
-        if response_text.endswith('```'):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
-        
-        # Parse JSON
-        result = json.loads(response_text)
-        
-        # Log the result for debugging
-        logger.debug(f"AI classifier result: {result}")
-        
-        if result["type"] == "thought":
-            return "thought", {
-                "content": result["content"]
-            }
-        elif result["type"] == "todo":
-            # Log the due_date specifically for debugging
-            logger.debug(f"Todo due_date from AI: {result.get('due_date')}")
-            return "todo", {
-                "title": result["title"],
-                "description": result["description"],
-                "due_date": result["due_date"]
-            }
-        elif result["type"] == "habit":
-            logger.debug(f"Habit classified: {result}")
-            return "habit", {
-                "title": result["title"],
-                "description": result["description"],
-                "frequency": result["frequency"],
-                "start_date": result.get("start_date"),
-                "due_time": result.get("due_time")
-            }
-        else:
-            # Default to thought if the classification is unclear
-            return "thought", {
-                "content": text
-            }
-            
+        formatted_data = dict(formatted_data)
+    except Throttled:
+        # Over quota or no free slot, the caller decides what to answer
+        raise
     except Exception as e:
         # If any error occurs, treat it as a thought
         logger.error(f"Error classifying input: {e}")
+        if not fallback:
+            raise ClassificationError(str(e)) from e
+        return "thought", {
+            "content": text
+        }
+
+    if content_type is None:
+        # Default to thought if the classification is unclear
         return "thought", {
             "content": text
         }
+
+    return content_type, formatted_data
+
+def classify_batch(texts: List[str], user_timezone_str: str) -> List[Tuple[str, Dict[str, Union[str, bool, None]]]]:
+    """
+    Classify several texts with a single Gemini call.
+
+    Cached texts are answered from the cache, confident ones by the local
+    classifier, and only the rest are sent to the model. Items missing from, or malformed in, the batch response are
+    classified one at a time with classify_input.
+
+    Args:
+        texts (list): Raw user inputs
+        user_timezone_str (str): IANA timezone string for the user
+
+    Returns:
+        list: (content_type, formatted_data) per input, in input order
+    """
+    try:
+        user_tz = pytz.timezone(user_timezone_str)
+    except pytz.exceptions.UnknownTimeZoneError:
+        logger.warning(f"Unknown timezone '{user_timezone_str}'. Defaulting to UTC.")
+        user_tz = pytz.utc
+        user_timezone_str = "UTC"
+    now_in_user_tz = datetime.now(user_tz)
+
+    results = [None] * len(texts)
+    cache = get_classification_cache()
+    if cache:
+        for i, text in enumerate(texts):
+            results[i] = cache.get(text, now_in_user_tz)
+
+    local_classifier = get_local_classifier()
+    if local_classifier:
+        for i, text in enumerate(texts):
+            if results[i] is None:
+                results[i] = local_classifier.classify(text, parse_temporal(text, now_in_user_tz))
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        try:
+            with classifier_slot(cost=len(missing)), track_request('batch') as usage:
+                usage.content_types = [None] * len(missing)
+                batch_results = _classify_batch_with_gemini(
+                    [texts[i] for i in missing], now_in_user_tz, user_timezone_str
+                )
+                usage.content_types = [content_type for content_type, _ in batch_results]
+        except Throttled:
+            raise
+        except Exception as e:
+            logger.error(f"Error classifying batch, falling back to single items: {e}")
+            batch_results = [(None, {})] * len(missing)
+
+        for i, (content_type, formatted_data) in zip(missing, batch_results):
+            if content_type is None:
+                results[i] = classify_input(texts[i], user_timezone_str)
+                continue
+            results[i] = (content_type, formatted_data)
+            if cache:
+                cache.set(texts[i], now_in_user_tz, content_type, formatted_data)
+            if local_classifier:
+                local_classifier.learn(normalize_text(texts[i]), content_type)
+
+    return results
+
+def classify_items(text: str, user_timezone_str: str, max_items: int = 10) -> List[Tuple[str, Dict[str, Union[str, bool, None]]]]:
+    """
+    Classify text that may hold several entries, with one Gemini call.
+
+    "buy milk, call mom at 5, and I'm exhausted" becomes two todos and a
+    thought. Text without entry separators goes through classify_input, as
+    does text the model couldn't split. Text already cached, whole or split,
+    or that the local classifier is confident about as one item, costs no
+    Gemini call.
+
+    Args:
+        text (str): Raw user input
+        user_timezone_str (str): IANA timezone string for the user
+        max_items (int): Most entries returned, extra entries are dropped
+
+    Returns:
+        list: (content_type, formatted_data) per entry, in order of appearance
+    """
+    if not _ENTRY_SEPARATOR_RE.search(text):
+        return [classify_input(text, user_timezone_str)]
+
+    try:
+        user_tz = pytz.timezone(user_timezone_str)
+    except pytz.exceptions.UnknownTimeZoneError:
+        logger.warning(f"Unknown timezone '{user_timezone_str}'. Defaulting to UTC.")
+        user_tz = pytz.utc
+        user_timezone_str = "UTC"
+    now_in_user_tz = datetime.now(user_tz)
+
+    cache = get_classification_cache()
+    if cache:
+        cached = cache.get_items(text, now_in_user_tz)
+        if cached:
+            logger.debug(f"Split cache hit for: {text}")
+            return cached[:max_items]
+        cached = cache.get(text, now_in_user_tz)
+        if cached:
+            return [cached]
+
+    local_classifier = get_local_classifier()
+    if local_classifier:
+        local_result = local_classifier.classify(text, parse_temporal(text, now_in_user_tz))
+        if local_result:
+            return [local_result]
+
+    try:
+        with classifier_slot(), track_request('split') as usage:
+            items = _split_with_gemini(text, now_in_user_tz, user_timezone_str)
+            usage.content_types = [content_type for content_type, _ in items] or [None]
+    except Throttled:
+        raise
+    except Exception as e:
+        logger.error(f"Error splitting input, classifying it as one item: {e}")
+        items = []
+
+    items = [item for item in items if item[0] is not None]
+    if not items:
+        return [classify_input(text, user_timezone_str)]
+    if cache:
+        cache.set_items(text, now_in_user_tz, items)
+    return items[:max_items]
+
+def _classify_with_gemini(text: str, now_in_user_tz: datetime, user_timezone_str: str, temporal: Optional[TemporalResult] = None) -> Tuple[Optional[str], Dict[str, Union[str, bool, None]]]:
+    """
+    Ask Gemini to classify the text.
+
+    Simple inputs go to the fast model with a minimal prompt first, and are
+    escalated to the strong model with the full prompt if the answer can't
+    be used. When the temporal parser understood every date and time in the
+    text, either model only decides the type and title, and the parsed
+    values are filled in afterwards.
+
+    Returns:
+        tuple: (content_type, formatted_data), content_type is None if the
+        model returned an unknown type. Raises on API or parsing errors.
+    """
+    router = get_model_router()
+    deadline = Deadline(REQUEST_BUDGET)
+    # Temporal phrases the parser didn't understand are left to the model
+    has_unresolved_dates = temporal is not None and temporal.unresolved
+    if has_unresolved_dates:
+        temporal = None
+
+    if router.route(text) == FAST:
+        prompt = build_type_prompt(text) if temporal else build_minimal_prompt(text, now_in_user_tz, user_timezone_str)
+        try:
+            # No retries, a failed fast call is escalated instead
+            result = _ask_tier(router, FAST, prompt, deadline, temporal, max_retries=0)
+            reason, detail = _doubt(result, has_unresolved_dates)
+        except (CircuitOpenError, DeadlineExceeded):
+            raise
+        except json.JSONDecodeError as e:
+            reason, detail = INVALID_JSON, str(e)
+        except (KeyError, TypeError) as e:
+            reason, detail = MISSING_FIELDS, str(e)
+        except Exception as e:
+            reason, detail = ERROR, str(e)
+        if reason is None:
+            return result
+        router.record_escalation(reason, detail)
+
+    prompt = build_type_prompt(text) if temporal else build_full_prompt(text, now_in_user_tz, user_timezone_str)
+    return _ask_tier(router, STRONG, prompt, deadline, temporal)
+
+def _ask_tier(router, tier: str, prompt: Prompt, deadline: Deadline, temporal: Optional[TemporalResult] = None,
+              max_retries: int = MAX_RETRIES) -> Tuple[Optional[str], Dict[str, Union[str, bool, None]]]:
+    """Run a prompt on one model tier and parse the answer"""
+    started = time.monotonic()
+    response_text = _generate(prompt, model=router.model_for(tier), deadline=deadline, max_retries=max_retries)
+    router.record_latency(tier, time.monotonic() - started)
+
+    result = json.loads(_strip_code_fence(response_text))
+    logger.debug(f"AI classifier result ({tier} tier): {result}")
+
+    if temporal is not None and isinstance(result, dict):
+        # Fill in the values the parser extracted
+        result["due_date"] = temporal.due_date
+        result["start_date"] = temporal.start_date
+        result["due_time"] = temporal.due_time
+        if temporal.frequency:
+            result["frequency"] = temporal.frequency
+
+    return _parse_result(result)
+
+def _doubt(result: Tuple[Optional[str], Dict], has_unresolved_dates: bool) -> Tuple[Optional[str], str]:
+    """Reason to escalate a fast-tier answer, or (None, '') if it can be used"""
+    content_type, data = result
+    if content_type is None:
+        return UNKNOWN_TYPE, ''
+    if content_type == "habit" and data.get("frequency") not in ("daily", "weekly", "monthly"):
+        return MISSING_FIELDS, "frequency"
+    if content_type == "todo" and has_unresolved_dates and not data.get("due_date"):
+        return MISSING_FIELDS, "due_date"
+    return None, ''
+
+def _classify_batch_with_gemini(texts: List[str], now_in_user_tz: datetime, user_timezone_str: str) -> List[Tuple[Optional[str], Dict[str, Union[str, bool, None]]]]:
+    """
+    Ask Gemini to classify several texts in one call.
+
+    Returns:
+        list: (content_type, formatted_data) per text, content_type is None
+        for entries the model left out or returned malformed.
+    """
+    response_text = _generate(
+        build_batch_prompt(texts, now_in_user_tz, user_timezone_str), call_timeout=BATCH_CALL_TIMEOUT, budget=2 * BATCH_CALL_TIMEOUT, model=get_model_router().strong_model
+    )
+    results = json.loads(_strip_code_fence(response_text))
+    logger.debug(f"AI batch classifier result: {results}")
+    
+    if not isinstance(results, list):
+        raise ValueError("Batch response is not a JSON array")
+    
+    parsed = [(None, {})] * len(texts)
+    for position, result in enumerate(results):
+        if not isinstance(result, dict):
+            continue
+        index = result.get("index", position)
+        if not isinstance(index, int) or not 0 <= index < len(texts):
+            continue
+        try:
+            parsed[index] = _parse_result(result)
+        except (KeyError, TypeError) as e:
+            logger.debug(f"Malformed batch entry {index}: {e}")
+    return parsed
+
+def _split_with_gemini(text: str, now_in_user_tz: datetime, user_timezone_str: str) -> List[Tuple[Optional[str], Dict[str, Union[str, bool, None]]]]:
+    """
+    Ask Gemini for every entry in a compound text.
+
+    Returns:
+        list: (content_type, formatted_data) per entry, content_type is None
+        for malformed entries.
+    """
+    response_text = _generate(
+        build_split_prompt(text, now_in_user_tz, user_timezone_str), model=get_model_router().strong_model
+    )
+    results = json.loads(_strip_code_fence(response_text))
+    logger.debug(f"AI split classifier result: {results}")
+    
+    if isinstance(results, dict):
+        results = [results]
+    if not isinstance(results, list):
+        raise ValueError("Split response is not a JSON array")
+    
+    parsed = []
+    for result in results:
+        try:
+            parsed.append(_parse_result(result))
+        except (KeyError, TypeError) as e:
+            logger.debug(f"Malformed split entry: {e}")
+            parsed.append((None, {}))
+    return parsed
+
+def _generate(prompt: Prompt, call_timeout: float = CALL_TIMEOUT, budget: float = REQUEST_BUDGET,
+              model: Optional[str] = None, deadline: Optional[Deadline] = None, max_retries: int = MAX_RETRIES) -> str:
+    """
+    Call the classifier backend within a latency budget, retrying transient errors.
+
+    Raises CircuitOpenError without calling the backend while the breaker is open.
+    Tokens spent are attributed to the request being tracked.
+
+    Returns:
+        str: Raw response text
+    """
+    backend = get_classifier_backend()
+
+    def attempt(timeout):
+        return backend.generate(prompt.contents, timeout, model=model, system=prompt.system)
+
+    generation = call_with_resilience(
+        attempt,
+        deadline or Deadline(budget),
+        breaker=get_circuit_breaker(),
+        max_retries=max_retries,
+        call_timeout=call_timeout,
+        is_retryable=_is_retryable,
+        slow_call_threshold=call_timeout if call_timeout != CALL_TIMEOUT else None
+    )
+    record_call(model, generation.input_tokens, generation.output_tokens, generation.cached_tokens)
+    return generation.text
+
+def _is_retryable(error: Exception) -> bool:
+    """Retry timeouts, rate limits and server errors, but not bad requests"""
+    if isinstance(error, ReplayMissError):
+        return False
+    from google.genai import errors as genai_errors
+    if isinstance(error, genai_errors.APIError):
+        return error.code == 429 or (error.code or 500) >= 500
+    return True
+
+def _strip_code_fence(response_text: str) -> str:
+    """Clean up the response in case it has markdown code block formatting"""
+    response_text = response_text.strip()
+    if response_text.startswith('```json'):
+        response_text = response_text.replace('```json', '', 1)
+    if response_text.endswith('```'):
+        response_text = response_text[:-3]
+    return response_text.strip()
+
+def _parse_result(result: Dict) -> Tuple[Optional[str], Dict[str, Union[str, bool, None]]]:
+    """Convert a parsed model response into (content_type, formatted_data)"""
+    if result["type"] == "thought":
+        return "thought", {
+            "content": result["content"]
+        }
+    elif result["type"] == "todo":
+        # Log the due_date specifically for debugging
+        logger.debug(f"Todo due_date from AI: {result.get('due_date')}")
+        return "todo", {
+            "title": result["title"],
+            "description": result["description"],
+            "due_date": result["due_date"]
+        }
+    elif result["type"] == "habit":
+        logger.debug(f"Habit classified: {result}")
+        return "habit", {
+            "title": result["title"],
+            "description": result["description"],
+            "frequency": result["frequency"],
+            "start_date": result.get("start_date"),
+            "due_time": result.get("due_time")
+        }
+    else:
+        return None, {}
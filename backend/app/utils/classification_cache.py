@@ -0,0 +1,385 @@
+"""
+Two-tier cache for AI classification results.
+
+Results are kept in a small in-process LRU and in a SQLite file that every
+worker on the host shares. Dates in cached results are stored relative to the
+user's local day, so "tomorrow at 3pm" classified on Monday still resolves to
+the right day when the cached entry is reused on Thursday.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from app.utils.logger import get_logger
+from app.utils.temporal_parser import parse_temporal
+
+logger = get_logger(__name__)
+
+# Fields in classifier output that hold local dates/datetimes
+DATE_FIELDS = ('due_date', 'start_date')
+
+# Content type of the rows holding a whole split result
+SPLIT = 'split'
+
+# Text that names a specific calendar day can't be shifted between days, so
+# it is cached per local date instead of per weekday.
+_ANCHORED_DATE_RE = re.compile(
+    r'\b(jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?\s+\d'
+    r'|\b\d{1,2}\s+(jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)'
+    r'|\b\d{1,2}/\d{1,2}\b'
+    r'|\b\d{4}-\d{2}-\d{2}\b'
+    r'|\b\d{1,2}(st|nd|rd|th)\b'
+    r'|\b(next|this)\s+(month|year)\b',
+    re.IGNORECASE
+)
+
+# Text relative to the current time of day gives a different answer every
+# minute, so it is never cached. Bare times are found by the temporal parser.
+_UNCACHEABLE_RE = re.compile(
+    r'\bin\s+(a|an|half\s+an|\d+)\s*(min|mins|minute|minutes|hr|hrs|hour|hours)\b'
+    r'|\b(right\s+now|later\s+today|asap)\b',
+    re.IGNORECASE
+)
+
+
+def normalize_text(text: str) -> str:
+    """Normalize input text for use in a cache key"""
+    return ' '.join(text.lower().split())
+
+
+def _tz_bucket(now_in_user_tz: datetime) -> str:
+    """Bucket timezones by their current UTC offset"""
+    offset = now_in_user_tz.utcoffset() or timedelta(0)
+    minutes = int(offset.total_seconds() // 60)
+    sign = '+' if minutes >= 0 else '-'
+    return f"{sign}{abs(minutes) // 60:02d}{abs(minutes) % 60:02d}"
+
+
+def make_cache_key(text: str, now_in_user_tz: datetime, kind: Optional[str] = None) -> Optional[str]:
+    """
+    Build the cache key for a piece of text.
+
+    Args:
+        text (str): Raw user input
+        now_in_user_tz (datetime): Current time in the user's timezone
+        kind (str, optional): Keeps results of another kind of call, like
+            SPLIT, apart from single classifications of the same text
+
+    Returns:
+        str or None: Hex digest key, or None if the text shouldn't be cached
+    """
+    normalized = normalize_text(text)
+    if not normalized or _UNCACHEABLE_RE.search(normalized):
+        return None
+    # A time without a date ("call mom at 5") is today or tomorrow depending
+    # on when it's said, which no day-level key can capture
+    if parse_temporal(normalized, now_in_user_tz).clock_relative:
+        return None
+
+    # Relative phrases like "by friday" only depend on the weekday
+    if _ANCHORED_DATE_RE.search(normalized):
+        day_part = now_in_user_tz.strftime('%Y-%m-%d')
+    else:
+        day_part = now_in_user_tz.strftime('%a')
+
+    parts = [normalized, _tz_bucket(now_in_user_tz), day_part]
+    raw_key = json.dumps(parts + [kind] if kind else parts)
+    return hashlib.sha256(raw_key.encode('utf-8')).hexdigest()
+
+
+def to_relative(formatted_data: Dict, today) -> Dict:
+    """Replace absolute dates in classifier output with offsets from today"""
+    relative = dict(formatted_data)
+    for field in DATE_FIELDS:
+        value = relative.get(field)
+        if not isinstance(value, str) or not value:
+            continue
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            continue
+        time_part = value.split('T', 1)[1] if 'T' in value else None
+        relative[field] = {
+            'days': (parsed.date() - today).days,
+            'time': time_part
+        }
+    return relative
+
+
+def from_relative(formatted_data: Dict, today) -> Dict:
+    """Resolve day offsets stored by to_relative against today"""
+    resolved = dict(formatted_data)
+    for field in DATE_FIELDS:
+        value = resolved.get(field)
+        if not isinstance(value, dict):
+            continue
+        day = (today + timedelta(days=value['days'])).isoformat()
+        resolved[field] = f"{day}T{value['time']}" if value.get('time') else day
+    return resolved
+
+
+class ClassificationCache:
+    """
+    In-process LRU backed by a SQLite table shared between workers.
+
+    Attributes:
+        db_path (str): Path to the shared SQLite file
+        ttl (int): Seconds an entry stays valid
+        memory_size (int): Maximum entries in the in-process tier
+        max_entries (int): Maximum entries in the shared tier
+    """
+    def __init__(self, db_path, ttl=30 * 24 * 3600, memory_size=1024, max_entries=100000):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.memory_size = memory_size
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes_since_evict = 0
+        self._stats = {
+            'memory_hits': 0,
+            'shared_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0,
+            'errors': 0
+        }
+        self._ensure_schema()
+
+    def _connect(self):
+        """Get this thread's connection to the shared database"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _ensure_schema(self):
+        try:
+            conn = self._connect()
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS classification_cache ('
+                ' key TEXT PRIMARY KEY,'
+                ' text TEXT NOT NULL,'
+                ' content_type TEXT NOT NULL,'
+                ' payload TEXT NOT NULL,'
+                ' created_at REAL NOT NULL,'
+                ' last_used_at REAL NOT NULL,'
+                ' hits INTEGER NOT NULL DEFAULT 0)'
+            )
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS ix_classification_cache_last_used '
+                'ON classification_cache (last_used_at)'
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Classification cache unavailable at '{self.db_path}': {e}")
+            self._stats['errors'] += 1
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, text: str, now_in_user_tz: datetime, record_stats: bool = True) -> Optional[Tuple[str, Dict]]:
+        """
+        Look up a cached classification.
+
+        Args:
+            text (str): Raw user input
+            now_in_user_tz (datetime): Current time in the user's timezone
+            record_stats (bool): Count the lookup in the hit/miss counters
+
+        Returns:
+            tuple or None: (content_type, formatted_data) on a hit
+        """
+        entry = self._read(make_cache_key(text, now_in_user_tz), record_stats)
+        if entry is None:
+            return None
+        return entry[0], from_relative(entry[1], now_in_user_tz.date())
+
+    def get_items(self, text: str, now_in_user_tz: datetime) -> Optional[List[Tuple[str, Dict]]]:
+        """
+        Look up a cached split of text into several entries.
+
+        Returns:
+            list or None: (content_type, formatted_data) per entry on a hit
+        """
+        entry = self._read(make_cache_key(text, now_in_user_tz, SPLIT))
+        if entry is None:
+            return None
+        today = now_in_user_tz.date()
+        return [(content_type, from_relative(payload, today)) for content_type, payload in entry[1]]
+
+    def _read(self, key: Optional[str], record_stats: bool = True) -> Optional[Tuple[str, object]]:
+        """Find the (content_type, payload) stored under a key, in memory first"""
+        if key is None:
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and entry[2] > now:
+                self._memory.move_to_end(key)
+                if record_stats:
+                    self._stats['memory_hits'] += 1
+                return entry[0], entry[1]
+            if entry:
+                del self._memory[key]
+
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                'SELECT content_type, payload, created_at FROM classification_cache WHERE key = ?',
+                (key,)
+            ).fetchone()
+            if row and row[2] + self.ttl > now:
+                conn.execute(
+                    'UPDATE classification_cache SET last_used_at = ?, hits = hits + 1 WHERE key = ?',
+                    (now, key)
+                )
+                conn.commit()
+                content_type, payload = row[0], json.loads(row[1])
+                self._remember(key, content_type, payload, row[2] + self.ttl)
+                if record_stats:
+                    self._count('shared_hits')
+                return content_type, payload
+        except sqlite3.Error as e:
+            logger.warning(f"Classification cache read failed: {e}")
+            self._count('errors')
+
+        if record_stats:
+            self._count('misses')
+        return None
+
+    def set(self, text: str, now_in_user_tz: datetime, content_type: str, formatted_data: Dict):
+        """
+        Store a classification result.
+
+        Args:
+            text (str): Raw user input
+            now_in_user_tz (datetime): Current time in the user's timezone
+            content_type (str): thought, todo or habit
+            formatted_data (dict): Classifier output for the text
+        """
+        payload = to_relative(formatted_data, now_in_user_tz.date())
+        self._write(make_cache_key(text, now_in_user_tz), text, content_type, payload)
+
+    def set_items(self, text: str, now_in_user_tz: datetime, items: List[Tuple[str, Dict]]):
+        """
+        Store the entries text was split into.
+
+        Args:
+            text (str): Raw user input
+            now_in_user_tz (datetime): Current time in the user's timezone
+            items (list): (content_type, formatted_data) per entry
+        """
+        today = now_in_user_tz.date()
+        payload = [[content_type, to_relative(formatted_data, today)] for content_type, formatted_data in items]
+        self._write(make_cache_key(text, now_in_user_tz, SPLIT), text, SPLIT, payload)
+
+    def _write(self, key: Optional[str], text: str, content_type: str, payload):
+        if key is None:
+            return
+
+        now = time.time()
+        self._remember(key, content_type, payload, now + self.ttl)
+
+        try:
+            conn = self._connect()
+            conn.execute(
+                'INSERT OR REPLACE INTO classification_cache '
+                '(key, text, content_type, payload, created_at, last_used_at, hits) '
+                'VALUES (?, ?, ?, ?, ?, ?, 0)',
+                (key, normalize_text(text), content_type, json.dumps(payload), now, now)
+            )
+            conn.commit()
+            self._count('stores')
+            self._maybe_evict(conn, now)
+        except sqlite3.Error as e:
+            logger.warning(f"Classification cache write failed: {e}")
+            self._count('errors')
+
+    def _remember(self, key, content_type, payload, expires_at):
+        with self._lock:
+            self._memory[key] = (content_type, payload, expires_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _maybe_evict(self, conn, now):
+        """Drop expired rows and trim the shared tier to max_entries"""
+        with self._lock:
+            self._writes_since_evict += 1
+            if self._writes_since_evict < 100:
+                return
+            self._writes_since_evict = 0
+
+        expired = conn.execute(
+            'DELETE FROM classification_cache WHERE created_at < ?',
+            (now - self.ttl,)
+        ).rowcount
+        overflow = conn.execute(
+            'DELETE FROM classification_cache WHERE key IN ('
+            ' SELECT key FROM classification_cache ORDER BY last_used_at DESC'
+            ' LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        ).rowcount
+        conn.commit()
+        with self._lock:
+            self._stats['evictions'] += expired + overflow
+
+    def clear(self):
+        """Remove every entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+        try:
+            conn = self._connect()
+            conn.execute('DELETE FROM classification_cache')
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Classification cache clear failed: {e}")
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters for this worker"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_rate'] = round((lookups - stats['misses']) / lookups, 3) if lookups else 0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_classification_cache() -> Optional[ClassificationCache]:
+    """
+    Get the process-wide classification cache, configured from the environment.
+
+    Returns:
+        ClassificationCache or None: None when CLASSIFIER_CACHE_ENABLED is false
+    """
+    global _cache
+    if os.getenv('CLASSIFIER_CACHE_ENABLED', 'true').lower() != 'true':
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ClassificationCache(
+                    db_path=os.getenv('CLASSIFIER_CACHE_PATH', 'classifier_cache.db'),
+                    ttl=int(os.getenv('CLASSIFIER_CACHE_TTL', 30 * 24 * 3600)),
+                    memory_size=int(os.getenv('CLASSIFIER_CACHE_MEMORY_SIZE', 1024)),
+                    max_entries=int(os.getenv('CLASSIFIER_CACHE_MAX_ENTRIES', 100000))
+                )
+    return _cache
@@ -0,0 +1,276 @@
+"""
+Background classification of content submitted in async mode.
+
+Raw text is stored as a PendingContent row before the request returns. A
+bounded pool of worker threads classifies pending rows and promotes them to
+a Thought, Todo or Habit. Rows are claimed with a conditional UPDATE, so
+several gunicorn workers can share the table, and anything left pending or
+half-processed by a crashed process is picked up again by the sweeper.
+"""
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from app.models.db import db
+from app.models.pending_content import PendingContent
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ClassificationQueue:
+    """
+    Bounded worker pool that classifies PendingContent rows.
+
+    Attributes:
+        app: Flask application the workers run under
+        workers (int): Number of worker threads
+        max_depth (int): Maximum number of queued items per process
+        max_retries (int): Attempts before falling back to a plain thought
+        retry_backoff (float): Base delay in seconds between attempts
+        poll_interval (float): Seconds between sweeps of the pending table
+        lease (int): Seconds before an unfinished claim is considered abandoned
+    """
+    def __init__(self, app, workers=4, max_depth=100, max_retries=3,
+                 retry_backoff=5.0, poll_interval=2.0, lease=300):
+        self.app = app
+        self.workers = workers
+        self.max_depth = max_depth
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self._queue = queue.Queue(maxsize=max_depth)
+        # IDs in the queue or being processed, so sweeps don't queue them twice
+        self._queued = set()
+        self._queued_lock = threading.Lock()
+        self._threads = []
+        self._started = False
+        self._start_lock = threading.Lock()
+        self._done = threading.Condition()
+
+    def start(self):
+        """Start the worker and sweeper threads (idempotent)"""
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._run_worker,
+                    name=f"classifier-worker-{i}",
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+            sweeper = threading.Thread(target=self._run_sweeper, name="classifier-sweeper", daemon=True)
+            sweeper.start()
+            self._threads.append(sweeper)
+            logger.info(f"Started classification queue with {self.workers} workers")
+
+    def has_capacity(self) -> bool:
+        """Whether a new item can be queued without blocking"""
+        return not self._queue.full()
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, pending_id: str) -> bool:
+        """
+        Queue a pending item for classification.
+
+        Args:
+            pending_id (str): ID of a committed PendingContent row
+
+        Returns:
+            bool: False if the queue is full; the sweeper will pick it up later
+        """
+        self.start()
+        return self._put(pending_id)
+
+    def _put(self, pending_id: str) -> bool:
+        """Queue an ID unless it's already queued; False if the queue is full"""
+        with self._queued_lock:
+            if pending_id in self._queued:
+                return True
+            try:
+                self._queue.put_nowait(pending_id)
+            except queue.Full:
+                return False
+            self._queued.add(pending_id)
+            return True
+
+    def wait(self, pending_id: str, timeout: float):
+        """
+        Block until the item is finished or the timeout expires.
+
+        Items finished by another process are noticed by polling the table.
+
+        Returns:
+            PendingContent or None
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            db.session.expire_all()
+            item = db.session.get(PendingContent, pending_id)
+            remaining = deadline - time.monotonic()
+            if item is None or item.status in ('done', 'failed') or remaining <= 0:
+                return item
+            with self._done:
+                self._done.wait(min(remaining, 0.5))
+
+    def _run_worker(self):
+        while True:
+            pending_id = self._queue.get()
+            try:
+                with self.app.app_context():
+                    self.process(pending_id)
+            except Exception as e:
+                logger.error(f"Classification worker failed on {pending_id}: {e}")
+            finally:
+                # Claimed or finished by now, so a sweep may queue it again if it's due
+                with self._queued_lock:
+                    self._queued.discard(pending_id)
+                self._queue.task_done()
+
+    def _run_sweeper(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    try:
+                        self.sweep()
+                    except Exception:
+                        db.session.rollback()
+                        raise
+            except Exception as e:
+                logger.warning(f"Classification sweep failed: {str(e).splitlines()[0]}")
+            time.sleep(self.poll_interval)
+
+    def sweep(self):
+        """Release abandoned claims and queue items that are due"""
+        now = datetime.utcnow()
+        PendingContent.query.filter(
+            PendingContent.status == 'processing',
+            PendingContent.claimed_at < now - timedelta(seconds=self.lease)
+        ).update({'status': 'pending', 'claimed_at': None}, synchronize_session=False)
+        db.session.commit()
+
+        free_slots = self.max_depth - self._queue.qsize()
+        if free_slots <= 0:
+            return
+        with self._queued_lock:
+            queued = list(self._queued)
+        due = db.session.query(PendingContent.id).filter(
+            PendingContent.status == 'pending',
+            db.or_(PendingContent.next_attempt_at.is_(None), PendingContent.next_attempt_at <= now),
+            PendingContent.id.notin_(queued)
+        ).order_by(PendingContent.created_at).limit(free_slots).all()
+        for (pending_id,) in due:
+            if not self._put(pending_id):
+                break
+
+    def _claim(self, pending_id: str) -> bool:
+        """Atomically move a row from pending to processing"""
+        now = datetime.utcnow()
+        claimed = PendingContent.query.filter(
+            PendingContent.id == pending_id,
+            PendingContent.status == 'pending',
+            db.or_(PendingContent.next_attempt_at.is_(None), PendingContent.next_attempt_at <= now)
+        ).update({
+            'status': 'processing',
+            'claimed_at': now,
+            'attempts': PendingContent.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+        return claimed == 1
+
+    def process(self, pending_id: str):
+        """Classify one pending item and promote it to a real content row"""
+        # Import here to avoid circular imports
+        from app.api.content import create_content_item
+        from app.utils.ai_classifier import classify_input, ClassificationError
+
+        if not self._claim(pending_id):
+            return
+
+        item = db.session.get(PendingContent, pending_id)
+        # On the last attempt accept the thought fallback instead of failing
+        last_attempt = item.attempts >= self.max_retries
+
+        try:
+            content_type, formatted_data = classify_input(item.text, item.timezone, fallback=last_attempt)
+            # The new item and the pending row's status are committed together,
+            # so a worker dying in between can't leave a row to classify again
+            created = create_content_item(item.user_id, content_type, formatted_data, item.timezone, commit=False)
+            db.session.flush()
+            self._finish(item, status='done', result_type=content_type, result_id=created.id)
+        except ClassificationError as e:
+            db.session.rollback()
+            self._schedule_retry(item, str(e))
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to promote pending content {pending_id}: {e}")
+            if last_attempt:
+                self._finish(item, status='failed', error=str(e))
+            else:
+                self._schedule_retry(item, str(e))
+
+    def _schedule_retry(self, item, error):
+        delay = self.retry_backoff * (2 ** (item.attempts - 1))
+        item.status = 'pending'
+        item.claimed_at = None
+        item.error = error
+        item.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+        db.session.commit()
+        logger.info(f"Retrying pending content {item.id} in {delay}s (attempt {item.attempts})")
+
+    def _finish(self, item, status, result_type=None, result_id=None, error=None):
+        item.status = status
+        item.result_type = result_type
+        item.result_id = result_id
+        item.error = error
+        item.claimed_at = None
+        db.session.commit()
+        with self._done:
+            self._done.notify_all()
+
+    def stats(self):
+        return {
+            'started': self._started,
+            'workers': self.workers,
+            'depth': self.depth(),
+            'max_depth': self.max_depth
+        }
+
+
+def init_classification_queue(app):
+    """
+    Create the classification queue for an app from its config.
+
+    Args:
+        app: Flask application instance
+    """
+    classification_queue = ClassificationQueue(
+        app,
+        workers=app.config['CLASSIFIER_QUEUE_WORKERS'],
+        max_depth=app.config['CLASSIFIER_QUEUE_MAX_DEPTH'],
+        max_retries=app.config['CLASSIFIER_QUEUE_MAX_RETRIES'],
+        retry_backoff=app.config['CLASSIFIER_QUEUE_RETRY_BACKOFF'],
+        poll_interval=app.config['CLASSIFIER_QUEUE_POLL_INTERVAL']
+    )
+    app.extensions['classification_queue'] = classification_queue
+
+    # Resume items left over from a previous run
+    if app.config['CLASSIFIER_QUEUE_AUTOSTART']:
+        classification_queue.start()
+
+    return classification_queue
+
+
+def get_classification_queue() -> ClassificationQueue:
+    """Get the running classification queue for the current app"""
+    from flask import current_app
+    classification_queue = current_app.extensions['classification_queue']
+    classification_queue.start()
+    return classification_queue
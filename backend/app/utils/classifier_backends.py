@@ -0,0 +1,467 @@
+"""
+Classifier backends that turn a prompt into the model's raw response text.
+
+The classifier builds prompts and parses responses; a backend only generates
+text. Besides Gemini there is a deterministic local backend for offline use
+and a record/replay backend driven by fixture files.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import weakref
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+import pytz
+
+from app.utils.logger import get_logger
+from app.utils.temporal_parser import parse_temporal
+
+logger = get_logger(__name__)
+
+DEFAULT_MODEL = "gemini-2.0-flash"
+
+
+class ReplayMissError(LookupError):
+    """Raised when a replay fixture has no response for a prompt"""
+
+
+class Generation(NamedTuple):
+    """A model response and the tokens it cost"""
+    text: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Rough token count for backends that don't report one"""
+    return len(text or '') // 4
+
+
+class ClassifierBackend:
+    """
+    Base class for classifier backends.
+
+    Attributes:
+        name (str): Backend name reported in logs and stats
+    """
+    name = 'base'
+
+    def generate(self, prompt: str, timeout: float, model: Optional[str] = None,
+                 system: Optional[str] = None) -> Generation:
+        """
+        Generate the model's response to a prompt.
+
+        Args:
+            prompt (str): Per-request prompt text
+            timeout (float): Seconds allowed for this call
+            model (str, optional): Model to use instead of the backend's default
+            system (str, optional): Static system instruction sent ahead of the prompt
+
+        Returns:
+            Generation: Raw response text and token counts
+        """
+        raise NotImplementedError
+
+    def warm_up(self, connect: bool = True):
+        """Prepare the backend before the first request, e.g. open connections"""
+
+    def reset(self):
+        """Drop state that must not be shared across a fork"""
+
+    def stats(self) -> Dict:
+        return {'backend': self.name}
+
+
+class GeminiBackend(ClassifierBackend):
+    """
+    Calls the Gemini API.
+
+    The client is created on first use, so importing the classifier never
+    needs an API key or network access. HTTP connections are kept alive in a
+    bounded pool and reused across calls.
+
+    Attributes:
+        api_key (str): Gemini API key
+        model (str): Model name
+        base_url (str): Alternative API endpoint, e.g. the mock server
+        pool_size (int): Maximum pooled keep-alive connections
+        keepalive_expiry (float): Seconds an idle connection is kept open
+    """
+    name = 'gemini'
+
+    def __init__(self, api_key: Optional[str] = None, model: str = DEFAULT_MODEL, base_url: Optional[str] = None,
+                 pool_size: int = 10, keepalive_expiry: float = 60):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.keepalive_expiry = keepalive_expiry
+        self._client = None
+        self._lock = threading.Lock()
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self._streams = weakref.WeakSet()
+        self.metrics = {
+            'client_init_seconds': None,
+            'first_call_seconds': None,
+            'warmed': False,
+            'calls': 0,
+            'connections_opened': 0,
+            'connections_reused': 0
+        }
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    started = time.perf_counter()
+                    import httpx
+                    from google import genai
+                    from google.genai import types
+
+                    http_options = types.HttpOptions(
+                        base_url=self.base_url,
+                        client_args={
+                            'limits': httpx.Limits(
+                                max_connections=self.pool_size,
+                                max_keepalive_connections=self.pool_size,
+                                keepalive_expiry=self.keepalive_expiry
+                            ),
+                            'event_hooks': {'response': [self._track_connection]}
+                        }
+                    )
+                    self._client = genai.Client(api_key=self.api_key, http_options=http_options)
+                    self.metrics['client_init_seconds'] = round(time.perf_counter() - started, 4)
+        return self._client
+
+    def _track_connection(self, response):
+        """Count whether a response came over a new or a pooled connection"""
+        stream = response.extensions.get('network_stream')
+        if stream is None:
+            return
+        with self._lock:
+            if stream in self._streams:
+                self.metrics['connections_reused'] += 1
+            else:
+                self._streams.add(stream)
+                self.metrics['connections_opened'] += 1
+
+    def generate(self, prompt: str, timeout: float, model: Optional[str] = None,
+                 system: Optional[str] = None) -> Generation:
+        from google.genai import types
+
+        started = time.perf_counter()
+        response = self.client.models.generate_content(
+            model=model or self.model,
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                system_instruction=system,
+                http_options=types.HttpOptions(timeout=int(timeout * 1000))
+            ),
+        )
+        with self._lock:
+            self.metrics['calls'] += 1
+            if self.metrics['first_call_seconds'] is None:
+                self.metrics['first_call_seconds'] = round(time.perf_counter() - started, 4)
+
+        usage = response.usage_metadata
+        return Generation(
+            text=response.text,
+            input_tokens=(usage and usage.prompt_token_count) or 0,
+            output_tokens=(usage and usage.candidates_token_count) or 0,
+            cached_tokens=(usage and usage.cached_content_token_count) or 0
+        )
+
+    def warm_up(self, connect: bool = True):
+        """
+        Create the client and, optionally, open a pooled connection.
+
+        Args:
+            connect (bool): Make a cheap model lookup so the TLS handshake
+                happens now instead of on the first classification
+        """
+        client = self.client
+        if connect:
+            client.models.get(model=self.model)
+        self.metrics['warmed'] = True
+
+    def reset(self):
+        with self._lock:
+            self._client = None
+            self._reset_metrics()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            metrics = dict(self.metrics)
+        requests = metrics['connections_opened'] + metrics['connections_reused']
+        metrics['connection_reuse_rate'] = round(metrics['connections_reused'] / requests, 4) if requests else None
+        return {'backend': self.name, 'model': self.model, 'pid': os.getpid(), 'pool_size': self.pool_size, **metrics}
+
+
+class LocalBackend(ClassifierBackend):
+    """
+    Deterministic rule-based stand-in for Gemini.
+
+    Answers the classifier's prompts with the temporal parser and a few
+    keyword rules. The same prompt always gets the same response.
+    """
+    name = 'local'
+
+    def generate(self, prompt: str, timeout: float, model: Optional[str] = None,
+                 system: Optional[str] = None) -> Generation:
+        text = synthesize_response(prompt)
+        return Generation(text, estimate_tokens(system) + estimate_tokens(prompt), estimate_tokens(text))
+
+
+class ReplayBackend(ClassifierBackend):
+    """
+    Serves responses from a fixture file, optionally recording new ones.
+
+    Fixtures map a prompt fingerprint to the response text. Dates and times
+    are masked in the fingerprint so fixtures keep matching on later days.
+
+    Attributes:
+        path (str): JSON fixture file
+        upstream (ClassifierBackend): Backend used to record missing prompts,
+            or None to raise ReplayMissError
+    """
+    name = 'replay'
+
+    def __init__(self, path: str, upstream: Optional[ClassifierBackend] = None):
+        self.path = path
+        self.upstream = upstream
+        self._lock = threading.Lock()
+        self.fixtures = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as f:
+            return json.load(f)
+
+    def _save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.fixtures, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def generate(self, prompt: str, timeout: float, model: Optional[str] = None,
+                 system: Optional[str] = None) -> Generation:
+        key = prompt_fingerprint(prompt, model, system)
+        with self._lock:
+            fixture = self.fixtures.get(key)
+        if fixture is not None:
+            return Generation(
+                fixture['response'], fixture.get('input_tokens', 0),
+                fixture.get('output_tokens', 0), fixture.get('cached_tokens', 0)
+            )
+
+        if self.upstream is None:
+            raise ReplayMissError(f"No replay fixture for prompt {key[:12]} in '{self.path}'")
+
+        generation = self.upstream.generate(prompt, timeout, model, system)
+        with self._lock:
+            self.fixtures[key] = {
+                'model': model,
+                'prompt': prompt,
+                'response': generation.text,
+                'input_tokens': generation.input_tokens,
+                'output_tokens': generation.output_tokens,
+                'cached_tokens': generation.cached_tokens
+            }
+            self._save()
+        logger.info(f"Recorded classifier fixture {key[:12]} to '{self.path}'")
+        return generation
+
+    def warm_up(self, connect: bool = True):
+        if self.upstream:
+            self.upstream.warm_up(connect)
+
+    def reset(self):
+        if self.upstream:
+            self.upstream.reset()
+
+    def stats(self) -> Dict:
+        return {
+            'backend': self.name,
+            'fixtures': len(self.fixtures),
+            'upstream': self.upstream.stats() if self.upstream else None
+        }
+
+
+_VOLATILE_RE = re.compile(r'\d{4}-\d{2}-\d{2}(T\d{2}:\d{2}:\d{2})?|\b\d{2}:\d{2}:\d{2}\b')
+
+
+def prompt_fingerprint(prompt: str, model: Optional[str] = None, system: Optional[str] = None) -> str:
+    """Hash a prompt (with its model and system instruction) with dates, times and indentation masked"""
+    masked = _VOLATILE_RE.sub('<date>', f"{system}\n{prompt}" if system else prompt)
+    masked = '\n'.join(line.strip() for line in masked.strip().splitlines())
+    if model:
+        masked = f"{model}\n{masked}"
+    return hashlib.sha256(masked.encode('utf-8')).hexdigest()
+
+
+_SINGLE_TEXT_RE = re.compile(r'^\s*Text to analyze: "(.*)"\s*$', re.MULTILINE)
+_BATCH_TEXT_RE = re.compile(r'^\s*(\d+)\. (".*")\s*$', re.MULTILINE)
+_NOW_RE = re.compile(r"current user's date/time is (\S+) (\S+) (\S+)\)")
+_THOUGHT_RE = re.compile(
+    r"^(i|i'm|im|i've|my|me|life|today was|why|what if|sometimes|maybe)\b|\b(feel|feeling|wonder|grateful|anxious|happy|sad)\b|\?$",
+    re.IGNORECASE
+)
+_ENTRY_SPLIT_RE = re.compile(r'\s*(?:[,;\n]|(?<=[.!?])\s)\s*(?:and\s+)?')
+_FILLER_RE = re.compile(r'^(remember to|don\'t forget to|need to|i need to|have to)\s+', re.IGNORECASE)
+
+
+def _prompt_now(prompt: str) -> datetime:
+    """Read the user's current date and time back out of a full prompt"""
+    match = _NOW_RE.search(prompt)
+    if match:
+        try:
+            tz = pytz.timezone(match.group(3))
+            return tz.localize(datetime.strptime(f"{match.group(1)} {match.group(2)}", '%Y-%m-%d %H:%M:%S'))
+        except (ValueError, pytz.exceptions.UnknownTimeZoneError):
+            pass
+    return datetime.now(pytz.utc)
+
+
+def synthesize_classification(text: str, now_in_user_tz: datetime) -> Dict:
+    """
+    Classify text with keyword rules, in the response format Gemini uses.
+
+    Args:
+        text (str): Raw user input
+        now_in_user_tz (datetime): Current time in the user's timezone
+
+    Returns:
+        dict: Response object with a "type" field
+    """
+    temporal = parse_temporal(text, now_in_user_tz)
+    title = _FILLER_RE.sub('', temporal.remainder or text).lower()
+
+    if temporal.frequency:
+        return {
+            'type': 'habit',
+            'title': title,
+            'description': None,
+            'frequency': temporal.frequency,
+            'start_date': temporal.start_date or now_in_user_tz.strftime('%Y-%m-%d'),
+            'due_time': temporal.due_time
+        }
+    if _THOUGHT_RE.search(text.strip()):
+        return {'type': 'thought', 'content': text.lower()}
+    return {'type': 'todo', 'title': title, 'description': None, 'due_date': temporal.due_date}
+
+
+def synthesize_response(prompt: str) -> str:
+    """
+    Answer a classifier prompt the way Gemini would, without a model.
+
+    Handles single-text, split and numbered batch prompts.
+    """
+    now_in_user_tz = _prompt_now(prompt)
+
+    batch = _BATCH_TEXT_RE.findall(prompt)
+    if batch and 'EACH of the following' in prompt:
+        results: List[Dict] = []
+        for index, quoted in batch:
+            result = synthesize_classification(json.loads(quoted), now_in_user_tz)
+            result['index'] = int(index)
+            results.append(result)
+        return json.dumps(results)
+
+    match = _SINGLE_TEXT_RE.search(prompt)
+    if not match:
+        return json.dumps({'type': 'unknown'})
+
+    if 'Split and classify' in prompt:
+        entries = [entry for entry in _ENTRY_SPLIT_RE.split(match.group(1)) if entry.strip()]
+        return json.dumps([synthesize_classification(entry.strip(), now_in_user_tz) for entry in entries])
+
+    return json.dumps(synthesize_classification(match.group(1), now_in_user_tz))
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_backend(kind: str) -> ClassifierBackend:
+    """
+    Create a backend by name.
+
+    Args:
+        kind (str): 'gemini', 'local', 'replay' or 'record'
+
+    Returns:
+        ClassifierBackend: The configured backend
+    """
+    gemini = lambda: GeminiBackend(
+        api_key=os.getenv('API_KEY'),
+        model=os.getenv('CLASSIFIER_MODEL', DEFAULT_MODEL),
+        base_url=os.getenv('GEMINI_BASE_URL') or None,
+        pool_size=int(os.getenv('CLASSIFIER_POOL_SIZE', 10)),
+        keepalive_expiry=float(os.getenv('CLASSIFIER_KEEPALIVE_EXPIRY', 60))
+    )
+    replay_path = os.getenv('CLASSIFIER_REPLAY_PATH', 'classifier_fixtures.json')
+
+    if kind == 'gemini':
+        return gemini()
+    if kind == 'local':
+        return LocalBackend()
+    if kind == 'replay':
+        return ReplayBackend(replay_path)
+    if kind == 'record':
+        return ReplayBackend(replay_path, upstream=gemini())
+    raise ValueError(f"Unknown classifier backend '{kind}'")
+
+
+def get_classifier_backend() -> ClassifierBackend:
+    """
+    Get the process-wide classifier backend, configured from the environment.
+
+    Returns:
+        ClassifierBackend: The backend selected by CLASSIFIER_BACKEND
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                kind = os.getenv('CLASSIFIER_BACKEND', 'gemini').lower()
+                _backend = create_backend(kind)
+                logger.info(f"Using '{_backend.name}' classifier backend")
+    return _backend
+
+
+def warm_classifier_backend():
+    """
+    Warm up the classifier backend in a freshly started worker.
+
+    Meant for a gunicorn post_fork hook: drops any client inherited from the
+    master process, then creates the client and opens a connection so the
+    first classification doesn't pay for it. Failures are logged, never
+    raised, so a worker still boots while the API is unreachable.
+    """
+    backend = get_classifier_backend()
+    backend.reset()
+    connect = os.getenv('CLASSIFIER_WARMUP_CONNECT', 'true').lower() == 'true'
+    started = time.perf_counter()
+    try:
+        backend.warm_up(connect=connect)
+        logger.info(f"Warmed up '{backend.name}' classifier backend in {time.perf_counter() - started:.3f}s (pid {os.getpid()})")
+    except Exception as e:
+        logger.warning(f"Classifier warm-up failed (pid {os.getpid()}): {e}")
+
+
+def set_classifier_backend(backend: Optional[ClassifierBackend]):
+    """Replace the process-wide backend, or reset it with None"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -0,0 +1,125 @@
+"""
+Prompts for the AI classifier.
+
+Every prompt is split into a static system instruction, identical for every
+request so the provider can cache it as a prefix, and a short per-request
+part with the user's date, time and text. The date lines only change per
+(timezone, day) and are memoized.
+"""
+import json
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import List, NamedTuple
+
+_RESPONSE_FORMATS = """\
+{"type": "thought", "content": "<original text in lowercase>"}
+{"type": "todo", "title": "<concise title in lowercase>", "description": "<extra detail in lowercase, or null if the title says it all; never add information>", "due_date": "<YYYY-MM-DDTHH:MM:SS if a time is mentioned, YYYY-MM-DD for a date only, null if none>"}
+{"type": "habit", "title": "<concise title in lowercase>", "description": "<as for todos>", "frequency": "<daily, weekly or monthly>", "start_date": "<YYYY-MM-DD, today if not specified>", "due_time": "<HH:MM 24-hour, required if any time is mentioned, else null>"}"""
+
+FULL_INSTRUCTIONS = f"""\
+Classify the user's text as a thought, a todo, or a habit (a recurring activity like daily exercise or weekly cleaning).
+Respond ONLY with one JSON object in one of these formats:
+{_RESPONSE_FORMATS}
+Resolve relative dates and times against the user's current date and time, given with the text.
+Examples:
+"Call John tomorrow at 3pm" -> todo, due_date "<tomorrow>T15:00:00"
+"Buy groceries by Friday" -> todo, due_date "<date of the coming Friday>"
+"Remember to breathe" -> due_date null
+"exercise at 6pm daily" -> habit, frequency "daily", due_time "18:00"
+"meditate at 7am every day" -> habit, frequency "daily", due_time "07:00"
+"walk in the morning" -> due_time "09:00"
+"""
+
+BATCH_INSTRUCTIONS = f"""\
+{FULL_INSTRUCTIONS}
+The user sends several numbered texts. Apply the rules to each text independently and respond ONLY with a JSON array
+containing one object per text, in the same order, each with an added "index" field holding the number of its text."""
+
+SPLIT_INSTRUCTIONS = f"""\
+{FULL_INSTRUCTIONS}
+The text may hold several independent entries, e.g. "buy milk, call mom at 5, and I'm exhausted" is two todos and a thought.
+Split it into entries, keeping each entry's own wording and details together, and never split a single entry.
+Respond ONLY with a JSON array containing one object per entry, in the order they appear."""
+
+MINIMAL_INSTRUCTIONS = f"""\
+Classify the user's text as a thought, a todo, or a habit (recurring activity).
+Respond ONLY with one JSON object:
+{_RESPONSE_FORMATS}"""
+
+TYPE_INSTRUCTIONS = """\
+Decide if the user's text is a thought, a todo, or a habit (a recurring activity).
+Dates and times have already been extracted, so leave them out of titles.
+Respond ONLY with one JSON object:
+{"type": "thought", "content": "<original text in lowercase>"}
+{"type": "todo", "title": "<concise title in lowercase>", "description": "<extra detail in lowercase, or null; never add information>"}
+{"type": "habit", "title": "<concise title in lowercase>", "description": "<extra detail in lowercase, or null>", "frequency": "<daily, weekly or monthly>"}"""
+
+
+class Prompt(NamedTuple):
+    """A static system instruction and the per-request contents"""
+    system: str
+    contents: str
+
+
+@lru_cache(maxsize=1024)
+def date_context(user_timezone_str: str, today: str) -> str:
+    """
+    Describe the user's day, memoized per (timezone, date).
+
+    Args:
+        user_timezone_str (str): IANA timezone string for the user
+        today (str): The user's local date, YYYY-MM-DD
+
+    Returns:
+        str: Lines naming today, tomorrow and the coming weekdays
+    """
+    day = datetime.strptime(today, '%Y-%m-%d')
+    upcoming = ', '.join(
+        f"{(day + timedelta(days=offset)).strftime('%A')} {(day + timedelta(days=offset)).strftime('%Y-%m-%d')}"
+        for offset in range(1, 8)
+    )
+    return (
+        f"Timezone: {user_timezone_str}. Today is {day.strftime('%A')} {today}.\n"
+        f"Coming days: {upcoming}."
+    )
+
+
+def _now_lines(now_in_user_tz: datetime, user_timezone_str: str) -> str:
+    today = now_in_user_tz.strftime('%Y-%m-%d')
+    time = now_in_user_tz.strftime('%H:%M:%S')
+    return (
+        f"{date_context(user_timezone_str, today)}\n"
+        f"(current user's date/time is {today} {time} {user_timezone_str})"
+    )
+
+
+def build_full_prompt(text: str, now_in_user_tz: datetime, user_timezone_str: str) -> Prompt:
+    """The complete rules and examples, for the strong model"""
+    return Prompt(FULL_INSTRUCTIONS, f'{_now_lines(now_in_user_tz, user_timezone_str)}\nText to analyze: "{text}"')
+
+
+def build_minimal_prompt(text: str, now_in_user_tz: datetime, user_timezone_str: str) -> Prompt:
+    """A short prompt for the fast model"""
+    return Prompt(MINIMAL_INSTRUCTIONS, f'{_now_lines(now_in_user_tz, user_timezone_str)}\nText to analyze: "{text}"')
+
+
+def build_type_prompt(text: str) -> Prompt:
+    """Ask for the type and title only, dates come from the temporal parser"""
+    return Prompt(TYPE_INSTRUCTIONS, f'Text to analyze: "{text}"')
+
+
+def build_batch_prompt(texts: List[str], now_in_user_tz: datetime, user_timezone_str: str) -> Prompt:
+    """The complete rules applied to several numbered texts"""
+    numbered = "\n".join(f"{i}. {json.dumps(text)}" for i, text in enumerate(texts))
+    return Prompt(
+        BATCH_INSTRUCTIONS,
+        f"{_now_lines(now_in_user_tz, user_timezone_str)}\nApply the rules to EACH of the following numbered texts:\n{numbered}"
+    )
+
+
+def build_split_prompt(text: str, now_in_user_tz: datetime, user_timezone_str: str) -> Prompt:
+    """The complete rules, asking for every entry in a compound text"""
+    return Prompt(
+        SPLIT_INSTRUCTIONS,
+        f'{_now_lines(now_in_user_tz, user_timezone_str)}\nSplit and classify the entries of this text:\nText to analyze: "{text}"'
+    )
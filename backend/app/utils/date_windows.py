@@ -0,0 +1,94 @@
+"""
+Local day and date-range windows for list endpoints.
+
+Clients ask for `date=YYYY-MM-DD`, or `from` and/or `to` dates (inclusive),
+in their own timezone (`tz`, an IANA name, UTC by default). The window is
+converted once into naive UTC bounds, the form timestamps are stored in,
+so it can be answered with a range condition on an indexed column.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Optional, Tuple
+
+import pytz
+from flask import request
+
+from app.utils.helpers import APIError
+
+# Half-open [start, end) bounds in naive UTC
+Window = Tuple[Optional[datetime], Optional[datetime]]
+
+
+def _parse_date(name: str, value: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise APIError(f'Invalid {name}, expected YYYY-MM-DD', 400)
+
+
+def _utc_midnight(day: date, tz) -> datetime:
+    """The start of a local day, as naive UTC"""
+    return tz.localize(datetime.combine(day, time.min)).astimezone(pytz.utc).replace(tzinfo=None)
+
+
+def local_window(first: Optional[date], last: Optional[date], timezone: str = 'UTC') -> Window:
+    """
+    UTC bounds of the local days from first to last, inclusive.
+
+    Args:
+        first (date, optional): First local day, unbounded if None
+        last (date, optional): Last local day, unbounded if None
+        timezone (str): IANA timezone name
+
+    Raises:
+        APIError: If the timezone is unknown or last is before first
+    """
+    try:
+        tz = pytz.timezone(timezone)
+    except pytz.exceptions.UnknownTimeZoneError:
+        raise APIError(f'Unknown timezone: {timezone}', 400)
+    if first and last and last < first:
+        raise APIError('to must not be before from', 400)
+    return (
+        _utc_midnight(first, tz) if first else None,
+        _utc_midnight(last + timedelta(days=1), tz) if last else None
+    )
+
+
+def window_args() -> Optional[Window]:
+    """
+    The date window of the current request.
+
+    Returns:
+        tuple or None: (start, end) UTC bounds, either may be None; None if the
+        request has no date, from or to parameter
+
+    Raises:
+        APIError: If a parameter is invalid, or date is combined with from/to
+    """
+    day = request.args.get('date')
+    first = request.args.get('from')
+    last = request.args.get('to')
+    timezone = request.args.get('tz') or 'UTC'
+    if day:
+        if first or last:
+            raise APIError('date can\'t be combined with from or to', 400)
+        first = last = day
+    if not (first or last):
+        return None
+    return local_window(
+        _parse_date('from' if not day else 'date', first) if first else None,
+        _parse_date('to' if not day else 'date', last) if last else None,
+        timezone
+    )
+
+
+def in_window(query, column, window: Optional[Window]):
+    """Restrict a query to rows whose column falls in the window"""
+    if window is None:
+        return query
+    start, end = window
+    if start is not None:
+        query = query.filter(column >= start)
+    if end is not None:
+        query = query.filter(column < end)
+    return query
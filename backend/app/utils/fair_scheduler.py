@@ -0,0 +1,324 @@
+"""
+Per-user quotas and fair scheduling for classifier traffic.
+
+Every user has a token bucket that refills at a steady rate, and a request
+that finds it empty is throttled. Admitted requests then wait for one of a
+fixed number of classifier slots. Slots are handed out round-robin across
+the users that are waiting, and no user holds more than a share of them,
+so one user pasting hundreds of lines queues behind themselves instead of
+occupying every worker thread. Queue wait time is recorded per user.
+
+Only calls that reach Gemini are charged: a request runs its classifier
+under charge_to(user_id), and the Gemini call sites take their slot with
+classifier_slot(), so cache and local-classifier answers are free.
+"""
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Throttling reasons
+QUOTA = 'quota'
+BUSY = 'busy'
+
+_charged_user = contextvars.ContextVar('classifier_charged_user', default=None)
+
+
+class Throttled(Exception):
+    """
+    Raised when a request is over its user's quota or can't get a slot in time.
+
+    Attributes:
+        reason (str): QUOTA or BUSY
+        retry_after (float): Seconds after which a retry can succeed
+    """
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Classifier request throttled ({reason}), retry after {retry_after:.1f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    """A request waiting for a slot"""
+    __slots__ = ('granted',)
+
+    def __init__(self):
+        self.granted = False
+
+
+class FairScheduler:
+    """
+    Token-bucket quotas and round-robin slot allocation across users.
+
+    Attributes:
+        slots (int): Classifier calls allowed to run at once in this process
+        per_user (int): Slots a single user may hold at once
+        rate (float): Tokens added to each bucket per second, 0 to disable quotas
+        burst (int): Bucket capacity, the largest burst a user can send
+        max_wait (float): Seconds a request may wait for a slot
+        max_users (int): Users whose buckets and statistics are kept in memory
+    """
+    def __init__(self, slots: int = 8, per_user: int = 4, rate: float = 0.5, burst: int = 20,
+                 max_wait: float = 10.0, max_users: int = 10000):
+        self.slots = slots
+        self.per_user = max(1, min(per_user, slots))
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self.max_users = max_users
+        self._cond = threading.Condition()
+        self._free = slots
+        self._running: Dict[str, int] = {}
+        self._waiting: 'OrderedDict[str, deque]' = OrderedDict()  # round-robin order
+        self._buckets: 'OrderedDict[str, list]' = OrderedDict()  # user -> [tokens, updated_at]
+        self._waits: 'OrderedDict[str, list]' = OrderedDict()  # user -> [requests, total, max, throttled]
+
+    def take(self, user_id: str, cost: int = 1):
+        """
+        Charge a request to the user's bucket.
+
+        Costs above the bucket size are capped, so a large request needs a
+        full bucket rather than never fitting.
+
+        Raises:
+            Throttled: If the bucket doesn't hold enough tokens
+        """
+        if self.rate <= 0:
+            return
+        cost = min(cost, self.burst)
+        now = time.monotonic()
+        with self._cond:
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                bucket = self._buckets[user_id] = [float(self.burst), now]
+                self._trim(self._buckets)
+            else:
+                self._buckets.move_to_end(user_id)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            if bucket[0] < cost:
+                self._record(user_id, throttled=True)
+                raise Throttled(QUOTA, (cost - bucket[0]) / self.rate)
+            bucket[0] -= cost
+
+    def refund(self, user_id: str, cost: int = 1):
+        """Give back tokens taken for a request that never ran"""
+        if self.rate <= 0:
+            return
+        with self._cond:
+            bucket = self._buckets.get(user_id)
+            if bucket is not None:
+                bucket[0] = min(self.burst, bucket[0] + min(cost, self.burst))
+
+    def acquire(self, user_id: str) -> float:
+        """
+        Wait for a classifier slot, in turn with other users.
+
+        Returns:
+            float: Seconds spent waiting
+
+        Raises:
+            Throttled: If no slot came free within max_wait
+        """
+        started = time.monotonic()
+        deadline = started + self.max_wait
+        ticket = _Ticket()
+        with self._cond:
+            if user_id not in self._waiting:
+                self._waiting[user_id] = deque()
+            self._waiting[user_id].append(ticket)
+            self._dispatch()
+
+            while not ticket.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._withdraw(user_id, ticket)
+                    self._record(user_id, time.monotonic() - started, throttled=True)
+                    raise Throttled(BUSY, 1.0)
+                self._cond.wait(remaining)
+
+            waited = time.monotonic() - started
+            self._record(user_id, waited)
+        if waited > 1.0:
+            logger.info(f"User {user_id} waited {waited:.2f}s for a classifier slot")
+        return waited
+
+    def release(self, user_id: str):
+        with self._cond:
+            self._free += 1
+            running = self._running.get(user_id, 0) - 1
+            if running > 0:
+                self._running[user_id] = running
+            else:
+                self._running.pop(user_id, None)
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, user_id: str, cost: int = 1):
+        """
+        Charge the user's quota and hold a classifier slot inside the block.
+
+        The charge is refunded if no slot came free.
+
+        Raises:
+            Throttled: If the user is over quota or no slot came free in time
+        """
+        self.take(user_id, cost)
+        try:
+            self.acquire(user_id)
+        except Throttled:
+            self.refund(user_id, cost)
+            raise
+        try:
+            yield
+        finally:
+            self.release(user_id)
+
+    def _dispatch(self):
+        """Grant free slots to waiting users in round-robin order, lock held"""
+        granted = False
+        while self._free > 0:
+            user_id = next(
+                (user for user in self._waiting if self._running.get(user, 0) < self.per_user),
+                None
+            )
+            if user_id is None:
+                break
+            tickets = self._waiting[user_id]
+            tickets.popleft().granted = True
+            if tickets:
+                self._waiting.move_to_end(user_id)
+            else:
+                del self._waiting[user_id]
+            self._running[user_id] = self._running.get(user_id, 0) + 1
+            self._free -= 1
+            granted = True
+        if granted:
+            self._cond.notify_all()
+
+    def _withdraw(self, user_id: str, ticket: _Ticket):
+        tickets = self._waiting.get(user_id)
+        if tickets is not None:
+            tickets.remove(ticket)
+            if not tickets:
+                del self._waiting[user_id]
+
+    def _record(self, user_id: str, waited: float = 0.0, throttled: bool = False):
+        """Update the user's wait statistics, lock held"""
+        waits = self._waits.get(user_id)
+        if waits is None:
+            waits = self._waits[user_id] = [0, 0.0, 0.0, 0]
+            self._trim(self._waits)
+        else:
+            self._waits.move_to_end(user_id)
+        if throttled:
+            waits[3] += 1
+        else:
+            waits[0] += 1
+        waits[1] += waited
+        waits[2] = max(waits[2], waited)
+
+    def _trim(self, table: OrderedDict):
+        while len(table) > self.max_users:
+            table.popitem(last=False)
+
+    def user_stats(self, user_id: str) -> Optional[Dict]:
+        """Queue wait statistics for one user, None if unknown"""
+        with self._cond:
+            waits = self._waits.get(user_id)
+            return _wait_summary(waits) if waits else None
+
+    def stats(self, top: int = 20) -> Dict:
+        """
+        Slot usage and the users with the longest queue waits.
+
+        Args:
+            top (int): Number of users to include
+        """
+        with self._cond:
+            users = sorted(self._waits.items(), key=lambda item: item[1][2], reverse=True)[:top]
+            return {
+                'slots': self.slots,
+                'per_user': self.per_user,
+                'busy_slots': self.slots - self._free,
+                'waiting': sum(len(tickets) for tickets in self._waiting.values()),
+                'quota': {'rate_per_minute': round(self.rate * 60, 2), 'burst': self.burst} if self.rate > 0 else None,
+                'users': {user_id: _wait_summary(waits) for user_id, waits in users}
+            }
+
+
+def _wait_summary(waits) -> Dict:
+    requests, total, longest, throttled = waits
+    attempts = requests + throttled
+    return {
+        'requests': requests,
+        'throttled': throttled,
+        'avg_wait_ms': round(total / attempts * 1000, 1) if attempts else None,
+        'max_wait_ms': round(longest * 1000, 1)
+    }
+
+
+@contextmanager
+def charge_to(user_id: str):
+    """Charge the classifier_slot() blocks run inside this block to a user"""
+    token = _charged_user.set(user_id)
+    try:
+        yield
+    finally:
+        _charged_user.reset(token)
+
+
+@contextmanager
+def classifier_slot(cost: int = 1):
+    """
+    Hold a classifier slot around a Gemini call.
+
+    Charged to the user of the enclosing charge_to() block; calls made
+    outside one, like the background queue's, aren't scheduled.
+
+    Args:
+        cost (int): Quota tokens, one per text sent to Gemini
+
+    Raises:
+        Throttled: If the user is over quota or no slot came free in time
+    """
+    user_id = _charged_user.get()
+    if user_id is None:
+        yield
+        return
+    with get_fair_scheduler().slot(user_id, cost):
+        yield
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_fair_scheduler() -> FairScheduler:
+    """
+    Get the process-wide fair scheduler, configured from the environment.
+
+    Setting CLASSIFIER_QUOTA_PER_MINUTE to 0 disables quotas; slots are
+    still shared fairly.
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                slots = int(os.getenv('CLASSIFIER_SLOTS', 8))
+                _scheduler = FairScheduler(
+                    slots=slots,
+                    per_user=int(os.getenv('CLASSIFIER_SLOTS_PER_USER', max(1, slots // 2))),
+                    rate=float(os.getenv('CLASSIFIER_QUOTA_PER_MINUTE', 30)) / 60,
+                    burst=int(os.getenv('CLASSIFIER_QUOTA_BURST', 20)),
+                    max_wait=float(os.getenv('CLASSIFIER_SLOT_WAIT', 10))
+                )
+    return _scheduler
@@ -0,0 +1,303 @@
+"""
+Streak and completion analytics for habits.
+
+A user's instances are read with one query that projects only the habit,
+date and status columns, and compacted months are read as their bitmaps,
+shifted into place. For each habit they are folded into integer
+bitsets indexed by day (scheduled, completed, skipped), with the scheduled
+days coming from the habit's recurrence rule. Completion rates over a
+window are then popcounts of masked bitsets, and streaks are a walk over
+the scheduled days. Results are cached per user under a version of the
+user's habits and instances read from the database, so a write through
+any worker process is seen by all of them.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+
+from app.models.db import db
+from app.models.habit import Habit, HabitInstance, HabitMonth
+from app.utils.habit_instances import has_occurrences, occurrence_dates
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Rolling windows, in days ending today, for completion rates
+WINDOWS = (7, 30, 90)
+
+
+class HabitHistory:
+    """
+    Bitsets of one habit's days, bit i standing for origin + i days.
+
+    Attributes:
+        origin (date): The day of bit 0
+        scheduled (int): Days the habit was due
+        completed (int): Days it was completed
+        skipped (int): Days it was skipped
+    """
+    __slots__ = ('origin', 'scheduled', 'completed', 'skipped')
+
+    def __init__(self, origin: date):
+        self.origin = origin
+        self.scheduled = 0
+        self.completed = 0
+        self.skipped = 0
+
+    def bit(self, day: date) -> int:
+        return 1 << (day - self.origin).days
+
+    def window(self, first: date, last: date) -> int:
+        """Mask of the days from first to last, inclusive"""
+        first = max(first, self.origin)
+        if last < first:
+            return 0
+        return ((1 << ((last - first).days + 1)) - 1) << (first - self.origin).days
+
+    def days(self, mask: int) -> List[int]:
+        """Offsets of the set bits, ascending"""
+        offsets = []
+        while mask:
+            low = mask & -mask
+            offsets.append(low.bit_length() - 1)
+            mask ^= low
+        return offsets
+
+
+def _popcount(mask: int) -> int:
+    return bin(mask).count('1')
+
+
+def build_histories(user_id: str, habits: List[Habit], today: date) -> Dict[str, HabitHistory]:
+    """
+    Bitset histories of a user's habits, up to today.
+
+    Args:
+        user_id (str): Owner of the habits
+        habits (list): The user's habits
+        today (date): Last day to include
+
+    Returns:
+        dict: HabitHistory per habit ID
+    """
+    # One projected query, no ORM objects for the instances
+    rows = db.session.execute(
+        db.select(
+            HabitInstance.habit_id, HabitInstance.due_date, HabitInstance.completed,
+            HabitInstance.skipped, HabitInstance.deleted
+        ).where(HabitInstance.user_id == user_id, HabitInstance.due_date <= today)
+    ).all()
+    months = db.session.execute(
+        db.select(
+            HabitMonth.habit_id, HabitMonth.month, HabitMonth.completed, HabitMonth.skipped, HabitMonth.deleted
+        ).where(HabitMonth.user_id == user_id, HabitMonth.month <= today)
+    ).all()
+
+    earliest = {}
+    for habit_id, due_date, *_ in rows + months:
+        if due_date < earliest.get(habit_id, due_date + timedelta(days=1)):
+            earliest[habit_id] = due_date
+
+    histories = {}
+    for habit in habits:
+        history = HabitHistory(min(habit.start_date, earliest.get(habit.id, habit.start_date)))
+        if has_occurrences(habit):
+            for day in occurrence_dates(habit, history.origin, today):
+                history.scheduled |= history.bit(day)
+        histories[habit.id] = history
+
+    # Compacted months first, so live rows override them
+    for habit_id, month, completed, skipped, deleted in months:
+        history = histories.get(habit_id)
+        if history is None:
+            continue
+        shift = (month - history.origin).days
+        upto_today = history.window(history.origin, today)
+        completed, skipped = completed << shift & upto_today, skipped << shift & upto_today
+        history.scheduled = (history.scheduled | completed | skipped) & ~(deleted << shift)
+        history.completed |= completed
+        history.skipped |= skipped
+
+    for habit_id, due_date, completed, skipped, deleted in rows:
+        history = histories.get(habit_id)
+        if history is None:
+            continue
+        bit = history.bit(due_date)
+        history.completed &= ~bit
+        history.skipped &= ~bit
+        if deleted:
+            history.scheduled &= ~bit
+            continue
+        # Stored rows count even if the rule has changed since they were due
+        history.scheduled |= bit
+        if completed:
+            history.completed |= bit
+        elif skipped:
+            history.skipped |= bit
+
+    return histories
+
+
+def summarize(history: HabitHistory, today: date) -> Dict:
+    """
+    Streaks and rolling completion rates of one habit.
+
+    Skipped days neither break nor extend a streak and don't count towards
+    rates. A day that is due today but not done yet doesn't count against
+    the habit until the day is over.
+    """
+    today_bit = history.bit(today) if today >= history.origin else 0
+    pending = today_bit if (history.scheduled & today_bit) and not (history.completed & today_bit) else 0
+    counted = history.scheduled & ~history.skipped & ~pending
+
+    longest = run = 0
+    for offset in history.days(counted):
+        if history.completed >> offset & 1:
+            run += 1
+            longest = max(longest, run)
+        else:
+            run = 0
+    current = run
+
+    rates = {}
+    for days in WINDOWS:
+        window = history.window(today - timedelta(days=days - 1), today)
+        due = _popcount(counted & window)
+        done = _popcount(history.completed & counted & window)
+        rates[f'{days}d'] = {
+            'due': due,
+            'completed': done,
+            'rate': round(done / due, 4) if due else None
+        }
+
+    return {
+        'current_streak': current,
+        'longest_streak': longest,
+        'completion': rates
+    }
+
+
+def compute_analytics(user_id: str, today: Optional[date] = None) -> Dict:
+    """
+    Analytics for every habit of a user.
+
+    Returns:
+        dict: date and, per habit, its streaks and completion rates
+    """
+    today = today or date.today()
+    habits = Habit.query.filter_by(user_id=user_id).order_by(Habit.created_at.desc()).all()
+    histories = build_histories(user_id, habits, today)
+    return {
+        'date': today.isoformat(),
+        'habits': [
+            {
+                'habit_id': habit.id,
+                'title': habit.title,
+                'is_active': habit.is_active,
+                **summarize(histories[habit.id], today)
+            }
+            for habit in habits
+        ]
+    }
+
+
+def data_version(user_id: str) -> tuple:
+    """
+    Version of a user's habits and instances, the same in every worker.
+
+    Inserts and deletes change a row count, and updates move the latest
+    updated_at, which is set on every write. Read with one query.
+    """
+    def count_and_latest(model):
+        where = model.user_id == user_id
+        return (
+            db.select(func.count()).select_from(model).where(where).scalar_subquery(),
+            db.select(func.max(model.updated_at)).where(where).scalar_subquery(),
+        )
+
+    return tuple(db.session.execute(
+        db.select(*count_and_latest(Habit), *count_and_latest(HabitInstance))
+    ).one())
+
+
+class AnalyticsCache:
+    """
+    In-process per-user cache of analytics results.
+
+    Entries are stored under the user's data_version() and only served
+    while it is unchanged, so a write made through another worker process
+    is seen at once. They also expire after ttl seconds and at the end of
+    the day, and invalidate() drops an entry right after a local write.
+
+    Attributes:
+        ttl (float): Seconds an entry is served
+        max_users (int): Entries kept before the least recently used is dropped
+    """
+    def __init__(self, ttl: float = 60.0, max_users: int = 10000):
+        self.ttl = ttl
+        self.max_users = max_users
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, user_id: str, today: date, version: tuple) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[:2] == (today, version) and entry[2] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self._hits += 1
+                return entry[3]
+            self._misses += 1
+            return None
+
+    def set(self, user_id: str, today: date, version: tuple, result: Dict):
+        with self._lock:
+            self._entries[user_id] = (today, version, time.monotonic() + self.ttl, result)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'users': len(self._entries), 'hits': self._hits, 'misses': self._misses}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_analytics_cache() -> AnalyticsCache:
+    """Get the process-wide analytics cache, configured from the environment"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AnalyticsCache(ttl=float(os.getenv('HABIT_ANALYTICS_CACHE_TTL', 60)))
+    return _cache
+
+
+def get_habit_analytics(user_id: str) -> Dict:
+    """Analytics for a user, served from the cache while their data is unchanged"""
+    today = date.today()
+    version = data_version(user_id)
+    cache = get_analytics_cache()
+    result = cache.get(user_id, today, version)
+    if result is None:
+        result = compute_analytics(user_id, today)
+        cache.set(user_id, today, version, result)
+    return result
+
+
+def invalidate_habit_analytics(user_id: str):
+    """Drop a user's cached analytics after their habits or instances change"""
+    get_analytics_cache().invalidate(user_id)
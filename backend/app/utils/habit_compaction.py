@@ -0,0 +1,146 @@
+"""
+Compaction of closed months of habit instances.
+
+A stored instance is a full row (UUID key, two foreign keys, timestamps)
+for a single checkbox. Once a month is over, its rows are folded into one
+`habit_months` row per habit, holding bitmaps of the completed, skipped and
+deleted days, and the rows are deleted. Untouched rows, e.g. ones stored
+ahead of time by the materializer, are dropped, since they are identical
+to the computed occurrences. Reads merge the bitmaps back in (see
+app.utils.habit_instances), so clients see the same occurrences with the
+same IDs; only completed_at and the timestamps of compacted days are lost.
+
+Editing a compacted day stores a live row for it again, which takes
+precedence over the bitmaps until the next run folds it back in. Only the
+rows a chunk read are deleted, and on Postgres they are locked until it
+commits, so rows written during a run are left for the next one. Run it
+from cron with `flask habits compact`, e.g. on the 1st of each month.
+"""
+import time
+from datetime import date
+from typing import Dict, Optional
+
+from app.models.db import db
+from app.models.habit import HabitInstance, HabitMonth
+from app.utils.habit_instances import BATCH_SIZE, month_start
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+STATUSES = ('completed', 'skipped', 'deleted')
+
+
+def compact_instances(before: Optional[date] = None, chunk_size: int = BATCH_SIZE,
+                      max_seconds: Optional[float] = None) -> Dict:
+    """
+    Fold the instances of months before a date into monthly bitmaps.
+
+    Works through habits in chunks, each committed on its own, so a run
+    stopped by its time budget can simply be started again. Needs an app
+    context.
+
+    Args:
+        before (date, optional): Compact months before the month of this date,
+            defaults to the current month
+        chunk_size (int): Habits per chunk and transaction
+        max_seconds (float, optional): Stop after the chunk that exceeds this budget
+
+    Returns:
+        dict: before, habits, rows_compacted, months_written, chunks,
+        duration_seconds and whether the run completed
+    """
+    before = month_start(before or date.today())
+    started = time.monotonic()
+    report = {'before': before.isoformat(), 'habits': 0, 'rows_compacted': 0, 'months_written': 0,
+              'chunks': 0, 'complete': False}
+
+    last_id = ''
+    while True:
+        # Keyset over the habits that still have rows in closed months
+        habit_ids = db.session.execute(
+            db.select(HabitInstance.habit_id).distinct()
+            .where(HabitInstance.due_date < before, HabitInstance.habit_id > last_id)
+            .order_by(HabitInstance.habit_id).limit(chunk_size)
+        ).scalars().all()
+        if not habit_ids:
+            report['complete'] = True
+            break
+
+        try:
+            rows, months = _compact_chunk(habit_ids, before)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        report['habits'] += len(habit_ids)
+        report['rows_compacted'] += rows
+        report['months_written'] += months
+        report['chunks'] += 1
+        last_id = habit_ids[-1]
+        if max_seconds is not None and time.monotonic() - started >= max_seconds:
+            break
+
+    report['duration_seconds'] = round(time.monotonic() - started, 3)
+    logger.info(
+        f"Compacted habit instances before {before}: {report['rows_compacted']} rows into "
+        f"{report['months_written']} months for {report['habits']} habits in {report['chunks']} chunks, "
+        f"{report['duration_seconds']}s{'' if report['complete'] else ' (stopped early, will resume)'}"
+    )
+    return report
+
+
+def _compact_chunk(habit_ids, before: date):
+    """Fold one chunk of habits; returns (rows compacted, months written). Doesn't commit."""
+    # Locked on Postgres, so they can't be edited before they are deleted
+    rows = db.session.execute(
+        db.select(
+            HabitInstance.id, HabitInstance.habit_id, HabitInstance.user_id, HabitInstance.due_date,
+            HabitInstance.completed, HabitInstance.skipped, HabitInstance.deleted
+        ).where(HabitInstance.habit_id.in_(habit_ids), HabitInstance.due_date < before)
+        .with_for_update()
+    ).all()
+    months = {
+        (month.habit_id, month.month): month
+        for month in HabitMonth.query.filter(HabitMonth.habit_id.in_(habit_ids), HabitMonth.month < before)
+    }
+
+    written = set()
+    for _, habit_id, user_id, due_date, completed, skipped, deleted in rows:
+        key = (habit_id, month_start(due_date))
+        month = months.get(key)
+        if month is None:
+            month = months[key] = HabitMonth(habit_id=habit_id, month=key[1], user_id=user_id,
+                                             completed=0, skipped=0, deleted=0)
+            db.session.add(month)
+        # The live row replaces whatever the bitmaps held for its day
+        bit = 1 << (due_date.day - 1)
+        for status in STATUSES:
+            setattr(month, status, getattr(month, status) & ~bit)
+        if deleted:
+            month.deleted |= bit
+        elif completed:
+            month.completed |= bit
+        elif skipped:
+            month.skipped |= bit
+        written.add(key)
+
+    kept = 0
+    for key in written:
+        month = months[key]
+        if month.completed or month.skipped or month.deleted:
+            kept += 1
+        elif month in db.session.new:
+            db.session.expunge(month)
+        else:
+            db.session.delete(month)
+
+    # Only the rows folded in above; ones stored since are left for the next run
+    row_ids = [row.id for row in rows]
+    for offset in range(0, len(row_ids), BATCH_SIZE):
+        db.session.execute(
+            db.delete(HabitInstance)
+            .where(HabitInstance.id.in_(row_ids[offset:offset + BATCH_SIZE]))
+            .execution_options(synchronize_session=False)
+        )
+    return len(rows), kept
@@ -0,0 +1,392 @@
+"""
+Habit occurrences and their instances.
+
+Occurrences are computed on the fly from a habit's recurrence rule,
+start_date and end_date. A `habit_instances` row is only stored once the user
+completes, skips or deletes an occurrence; until then the occurrence is
+virtual. Every occurrence has a stable ID derived from its habit and date,
+which the stored row keeps, so clients can't tell the two apart.
+
+Rows can also be generated ahead of time in bulk: occurrence dates are
+computed in memory, existing instances are fetched with one query per batch
+of habits, and the missing ones are written with a single INSERT ... ON
+CONFLICT DO NOTHING, which the unique (habit_id, due_date) constraint makes
+safe to run concurrently.
+
+Closed months can be compacted (see app.utils.habit_compaction) into one
+`habit_months` row per habit and month, holding bitmaps of the completed,
+skipped and deleted days. Reads merge them back in; a live row for a day
+takes precedence over the bitmaps.
+"""
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import insert
+
+from app.models.db import db
+from app.models.habit import Habit, HabitInstance, HabitMonth
+from app.utils.logger import get_logger
+from app.utils.recurrence import habit_rule
+
+logger = get_logger(__name__)
+
+# Days of instances kept ahead of today
+HORIZON_DAYS = 30
+
+# Habits per existence query; keeps IN lists well below database parameter limits
+BATCH_SIZE = 500
+
+# Occurrence IDs count days from this date in four hex digits, so habits
+# can't start before it
+ID_EPOCH = date(2000, 1, 1)
+
+
+def instance_id(habit_id: str, due_date: date) -> str:
+    """
+    The stable ID of a habit's occurrence on a date.
+
+    The habit's UUID in hex followed by the day number in hex: 36 characters
+    like a UUID, without dashes, and reversible with parse_instance_id.
+    """
+    return f"{uuid.UUID(habit_id).hex}{(due_date - ID_EPOCH).days:04x}"
+
+
+def parse_instance_id(value: str) -> Optional[Tuple[str, date]]:
+    """
+    Split an occurrence ID into its habit ID and date.
+
+    Returns:
+        tuple or None: (habit_id, due_date), None if value isn't an occurrence ID
+    """
+    if len(value) != 36 or '-' in value:
+        return None
+    try:
+        return str(uuid.UUID(value[:32])), ID_EPOCH + timedelta(days=int(value[32:], 16))
+    except ValueError:
+        return None
+
+
+def occurrence_dates(habit: Habit, start: date, end: date) -> List[date]:
+    """
+    Dates on which a habit occurs between start and end, inclusive.
+
+    Follows the habit's compiled recurrence rule (see app.utils.recurrence),
+    within its start_date and end_date.
+
+    Args:
+        habit (Habit): The habit
+        start (date): First date of the window
+        end (date): Last date of the window
+
+    Returns:
+        list: Occurrence dates in ascending order
+    """
+    if habit.end_date and habit.end_date < end:
+        end = habit.end_date
+    return habit_rule(habit).occurrences(start, end)
+
+
+def generate_instances(habits: Sequence[Habit], start: Optional[date] = None,
+                       end: Optional[date] = None, commit: bool = True) -> int:
+    """
+    Create the missing instances of several habits between start and end.
+
+    Args:
+        habits (list): Habits to generate instances for; inactive ones are skipped
+        start (date, optional): First date, defaults to today
+        end (date, optional): Last date, defaults to HORIZON_DAYS after today
+        commit (bool): Commit the session; pass False to keep the inserts in
+            the caller's transaction
+
+    Returns:
+        int: Number of instances inserted
+    """
+    today = date.today()
+    start = start or today
+    end = end or today + timedelta(days=HORIZON_DAYS)
+
+    windows = [(habit, start) for habit in habits if habit.is_active]
+    inserted = 0
+    for offset in range(0, len(windows), BATCH_SIZE):
+        inserted += generate_batch(windows[offset:offset + BATCH_SIZE], end)
+
+    if commit:
+        db.session.commit()
+    return inserted
+
+
+def generate_habit_instances(habit: Habit, commit: bool = True) -> int:
+    """Create the missing instances of one habit for the coming HORIZON_DAYS"""
+    return generate_instances([habit], commit=commit)
+
+
+def generate_batch(windows: Sequence[Tuple[Habit, date]], end: date) -> int:
+    """
+    Create the missing instances of a batch of habits, each from its own start date.
+
+    Issues one query for the existing instances and one bulk INSERT; keep
+    batches to BATCH_SIZE habits. Doesn't commit.
+
+    Args:
+        windows (list): (habit, first date) pairs
+        end (date): Last date for every habit
+
+    Returns:
+        int: Number of instances inserted
+    """
+    wanted = {
+        (habit.id, due_date): habit
+        for habit, start in windows
+        for due_date in occurrence_dates(habit, start, end)
+    }
+    if not wanted:
+        return 0
+    start = min(due_date for _, due_date in wanted)
+
+    # One query for every instance that already exists in the window
+    existing = db.session.execute(
+        db.select(HabitInstance.habit_id, HabitInstance.due_date).where(
+            HabitInstance.habit_id.in_({habit_id for habit_id, _ in wanted}),
+            HabitInstance.due_date.between(start, end)
+        )
+    ).all()
+    missing = wanted.keys() - {tuple(row) for row in existing}
+    if not missing:
+        return 0
+
+    now = datetime.utcnow()
+    rows = [
+        {
+            'id': instance_id(habit_id, due_date),
+            'habit_id': habit_id,
+            'user_id': wanted[(habit_id, due_date)].user_id,
+            'due_date': due_date,
+            'completed': False,
+            'skipped': False,
+            'deleted': False,
+            'created_at': now,
+            'updated_at': now
+        }
+        for habit_id, due_date in sorted(missing)
+    ]
+    result = db.session.execute(insert_ignoring_duplicates(HabitInstance.__table__), rows)
+    inserted = result.rowcount if result.rowcount >= 0 else len(rows)
+    logger.debug(f"Inserted {inserted} habit instances between {start} and {end}")
+    return inserted
+
+
+def insert_ignoring_duplicates(table):
+    """
+    Core INSERT into a table that skips rows violating a unique constraint.
+
+    Uses ON CONFLICT DO NOTHING on SQLite and PostgreSQL, and a plain INSERT
+    on other databases.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return insert(table)
+    return dialect_insert(table).on_conflict_do_nothing()
+
+
+def delete_untouched_instances(habit_ids: Sequence[str], since: Optional[date] = None) -> int:
+    """
+    Delete stored instances that were never completed, skipped or deleted.
+
+    They are identical to the virtual occurrences that replace them.
+
+    Args:
+        habit_ids (list): Habits to clean up
+        since (date, optional): Only delete instances from this date on
+
+    Returns:
+        int: Number of instances deleted
+    """
+    if not habit_ids:
+        return 0
+    query = HabitInstance.query.filter(
+        HabitInstance.habit_id.in_(habit_ids),
+        HabitInstance.completed.is_(False),
+        HabitInstance.skipped.is_(False),
+        HabitInstance.deleted.isnot(True)
+    )
+    if since:
+        query = query.filter(HabitInstance.due_date >= since)
+    return query.delete(synchronize_session=False)
+
+
+def has_occurrences(habit: Habit) -> bool:
+    """Active habits recur indefinitely; inactive ones only up to their end_date"""
+    return bool(habit.is_active or habit.end_date)
+
+
+def virtual_instance(habit: Habit, due_date: date) -> Dict:
+    """An occurrence nobody has touched yet, shaped like HabitInstance.to_dict()"""
+    return {
+        'id': instance_id(habit.id, due_date),
+        'habit_id': habit.id,
+        'user_id': habit.user_id,
+        'due_date': due_date.isoformat(),
+        'completed': False,
+        'completed_at': None,
+        'skipped': False,
+        'created_at': None,
+        'updated_at': None,
+        'habit': habit.to_dict()
+    }
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def month_days(month: date, bits: int) -> List[date]:
+    """The days of a month whose bits are set, ascending"""
+    days = []
+    while bits:
+        low = bits & -bits
+        days.append(month.replace(day=low.bit_length()))
+        bits ^= low
+    return days
+
+
+def compacted_statuses(user_id: str, start: Optional[date], end: date,
+                       habit_id: Optional[str] = None) -> Dict[Tuple[str, date], str]:
+    """
+    Statuses of compacted days between start and end, inclusive.
+
+    Args:
+        user_id (str): Owner of the habits
+        start (date, optional): First date, defaults to the earliest compacted month
+        end (date): Last date
+        habit_id (str, optional): Only this habit
+
+    Returns:
+        dict: 'completed', 'skipped' or 'deleted' per (habit_id, due_date)
+    """
+    query = db.select(HabitMonth).where(HabitMonth.user_id == user_id, HabitMonth.month <= end)
+    if start:
+        query = query.where(HabitMonth.month >= month_start(start))
+    if habit_id:
+        query = query.where(HabitMonth.habit_id == habit_id)
+
+    statuses = {}
+    for month in db.session.execute(query).scalars():
+        for status in ('completed', 'skipped', 'deleted'):
+            for day in month_days(month.month, getattr(month, status)):
+                if (start is None or day >= start) and day <= end:
+                    statuses[(month.habit_id, day)] = status
+    return statuses
+
+
+def truncate_months(habit_id: str, since: date):
+    """Clear a habit's compacted days from since on, like deleting its instances"""
+    db.session.execute(
+        db.delete(HabitMonth).where(HabitMonth.habit_id == habit_id, HabitMonth.month > since)
+    )
+    keep = (1 << (since.day - 1)) - 1
+    db.session.execute(
+        db.update(HabitMonth)
+        .where(HabitMonth.habit_id == habit_id, HabitMonth.month == month_start(since))
+        .values(completed=HabitMonth.completed.op('&')(keep), skipped=HabitMonth.skipped.op('&')(keep),
+                deleted=HabitMonth.deleted.op('&')(keep))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def list_instances(user_id: str, start: Optional[date] = None, end: Optional[date] = None,
+                   completed: Optional[bool] = None) -> List[Dict]:
+    """
+    A user's habit occurrences, stored, compacted and virtual, newest first.
+
+    Args:
+        user_id (str): Owner of the habits
+        start (date, optional): First date, defaults to each habit's start_date
+        end (date, optional): Last date, defaults to HORIZON_DAYS after today
+        completed (bool, optional): Only completed, or only not completed, occurrences
+
+    Returns:
+        list: HabitInstance.to_dict()-shaped dicts
+    """
+    end = end or date.today() + timedelta(days=HORIZON_DAYS)
+    habits = {habit.id: habit for habit in Habit.query.filter_by(user_id=user_id).all()}
+
+    query = HabitInstance.query.filter(HabitInstance.user_id == user_id, HabitInstance.due_date <= end)
+    if start:
+        query = query.filter(HabitInstance.due_date >= start)
+    stored = {(row.habit_id, row.due_date): row for row in query.all()}
+    compacted = {
+        key: status for key, status in compacted_statuses(user_id, start, end).items()
+        if key not in stored
+    }
+
+    instances = [
+        row.to_dict() for row in stored.values()
+        if not row.deleted and (completed is None or bool(row.completed) == completed)
+    ]
+    for (habit_id, due_date), status in compacted.items():
+        if status == 'deleted' or (completed is not None and (status == 'completed') != completed):
+            continue
+        instance = virtual_instance(habits[habit_id], due_date)
+        instance[status] = True
+        instances.append(instance)
+    if not completed:
+        for habit in habits.values():
+            if not has_occurrences(habit):
+                continue
+            for due_date in occurrence_dates(habit, start or habit.start_date, end):
+                if (habit.id, due_date) not in stored and (habit.id, due_date) not in compacted:
+                    instances.append(virtual_instance(habit, due_date))
+
+    instances.sort(key=lambda instance: instance['due_date'], reverse=True)
+    return instances
+
+
+def materialize_instance(user_id: str, value: str) -> Optional[HabitInstance]:
+    """
+    The stored instance for an occurrence ID, storing it first if it's virtual.
+
+    A compacted day gets a live row with its compacted status. The row is
+    flushed, not committed.
+
+    Returns:
+        HabitInstance or None: None if the ID doesn't name an occurrence of one
+        of the user's habits, or the occurrence was deleted
+    """
+    instance = HabitInstance.query.filter_by(id=value, user_id=user_id).first()
+    if instance is None:
+        parsed = parse_instance_id(value)
+        if parsed is None:
+            return None
+        habit_id, due_date = parsed
+        habit = Habit.query.filter_by(id=habit_id, user_id=user_id).first()
+        if habit is None:
+            return None
+        status = compacted_statuses(user_id, due_date, due_date, habit_id).get((habit_id, due_date))
+        if status == 'deleted':
+            return None
+        if status is None and (not has_occurrences(habit) or due_date not in occurrence_dates(habit, due_date, due_date)):
+            return None
+
+        # Insert unless a row for the day exists, e.g. from a concurrent request
+        now = datetime.utcnow()
+        db.session.execute(insert_ignoring_duplicates(HabitInstance.__table__), [{
+            'id': value,
+            'habit_id': habit_id,
+            'user_id': user_id,
+            'due_date': due_date,
+            'completed': status == 'completed',
+            'skipped': status == 'skipped',
+            'deleted': False,
+            'created_at': now,
+            'updated_at': now
+        }])
+        instance = HabitInstance.query.filter_by(habit_id=habit_id, due_date=due_date).first()
+
+    if instance is None or instance.deleted:
+        return None
+    return instance
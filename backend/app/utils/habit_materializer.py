@@ -0,0 +1,171 @@
+"""
+Rolling-horizon materializer for habit instances.
+
+Occurrences are computed on read, so storing them ahead of time is optional;
+it helps when other tools read the habit_instances table directly. The
+materializer extends every active habit's stored instances up to a horizon
+in chunks of habits, each committed on its own. Every habit keeps a
+`materialized_through` watermark, so a run only writes the days added since
+the last one, and a run cut short by its time budget resumes where it
+stopped. Run it from cron with `flask habits materialize`, or let a daemon
+thread run it once a day at an off-peak hour.
+"""
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import or_
+
+from app.models.db import db
+from app.models.habit import Habit
+from app.utils.habit_instances import BATCH_SIZE, HORIZON_DAYS, generate_batch
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class HabitMaterializer:
+    """
+    Extends stored habit instances up to a horizon, chunk by chunk.
+
+    Attributes:
+        horizon_days (int): Days ahead of today to store instances for
+        chunk_size (int): Habits per chunk and transaction
+    """
+    def __init__(self, horizon_days: int = HORIZON_DAYS, chunk_size: int = BATCH_SIZE):
+        self.horizon_days = horizon_days
+        self.chunk_size = chunk_size
+        self.last_run: Optional[Dict] = None
+
+    def run(self, max_seconds: Optional[float] = None, today: Optional[date] = None) -> Dict:
+        """
+        Materialize every active habit that is behind the horizon.
+
+        Needs an app context.
+
+        Args:
+            max_seconds (float, optional): Stop after the chunk that exceeds this budget
+            today (date, optional): Date to count the horizon from, defaults to today
+
+        Returns:
+            dict: habits, rows_written, chunks, duration_seconds, through and
+            whether the run completed
+        """
+        today = today or date.today()
+        through = today + timedelta(days=self.horizon_days)
+        started = time.monotonic()
+        report = {'through': through.isoformat(), 'habits': 0, 'rows_written': 0, 'chunks': 0, 'complete': False}
+
+        last_id = ''
+        while True:
+            # Keyset over the habits that are behind, so each chunk is one indexed range
+            habits = Habit.query.filter(
+                Habit.is_active.is_(True),
+                Habit.id > last_id,
+                or_(Habit.materialized_through.is_(None), Habit.materialized_through < through)
+            ).order_by(Habit.id).limit(self.chunk_size).all()
+            if not habits:
+                report['complete'] = True
+                break
+
+            windows = [
+                (habit, max(today, habit.materialized_through + timedelta(days=1))
+                 if habit.materialized_through else today)
+                for habit in habits
+            ]
+            try:
+                report['rows_written'] += generate_batch(windows, through)
+                # Keep updated_at, which tracks user edits
+                db.session.execute(
+                    db.update(Habit)
+                    .where(Habit.id.in_([habit.id for habit in habits]))
+                    .values(materialized_through=through, updated_at=Habit.updated_at)
+                    .execution_options(synchronize_session=False)
+                )
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+            report['habits'] += len(habits)
+            report['chunks'] += 1
+            last_id = habits[-1].id
+            if max_seconds is not None and time.monotonic() - started >= max_seconds:
+                break
+
+        report['duration_seconds'] = round(time.monotonic() - started, 3)
+        self.last_run = report
+        logger.info(
+            f"Materialized habit instances through {through}: {report['rows_written']} rows for "
+            f"{report['habits']} habits in {report['chunks']} chunks, {report['duration_seconds']}s"
+            f"{'' if report['complete'] else ' (stopped early, will resume)'}"
+        )
+        return report
+
+
+class MaterializerThread:
+    """
+    Runs the materializer once a day at an off-peak hour in a daemon thread.
+
+    Attributes:
+        app: Flask application the runs happen under
+        materializer (HabitMaterializer): The materializer to run
+        hour (int): Hour of the day (UTC) to run at
+        max_seconds (float): Time budget per run
+    """
+    def __init__(self, app, materializer: HabitMaterializer, hour: int = 3, max_seconds: float = 300):
+        self.app = app
+        self.materializer = materializer
+        self.hour = hour
+        self.max_seconds = max_seconds
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Start the thread (idempotent)"""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='habit-materializer', daemon=True)
+            self._thread.start()
+            logger.info(f"Habit materializer scheduled daily at {self.hour:02d}:00 UTC")
+
+    def seconds_until_next_run(self, now: Optional[datetime] = None) -> float:
+        now = now or datetime.utcnow()
+        next_run = now.replace(hour=self.hour, minute=0, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        return (next_run - now).total_seconds()
+
+    def _run(self):
+        while True:
+            time.sleep(self.seconds_until_next_run())
+            try:
+                with self.app.app_context():
+                    self.materializer.run(max_seconds=self.max_seconds)
+            except Exception as e:
+                logger.error(f"Habit materializer run failed: {e}")
+
+
+def init_habit_materializer(app):
+    """
+    Create the habit materializer for an app and start its thread if enabled.
+
+    Args:
+        app: Flask application instance
+    """
+    materializer = HabitMaterializer(
+        horizon_days=app.config['HABIT_MATERIALIZER_HORIZON'],
+        chunk_size=app.config['HABIT_MATERIALIZER_CHUNK_SIZE']
+    )
+    app.extensions['habit_materializer'] = materializer
+
+    if app.config['HABIT_MATERIALIZER_ENABLED']:
+        MaterializerThread(
+            app, materializer,
+            hour=app.config['HABIT_MATERIALIZER_HOUR'],
+            max_seconds=app.config['HABIT_MATERIALIZER_MAX_SECONDS']
+        ).start()
+
+    return materializer
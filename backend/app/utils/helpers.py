@@ -11,12 +11,14 @@ class APIError(Exception):
         message (str): Error message
         status_code (int): HTTP status code
         payload (dict, optional): Additional data to include in the response
+        headers (dict, optional): Response headers, e.g. Retry-After
     """
-    def __init__(self, message, status_code=400, payload=None):
+    def __init__(self, message, status_code=400, payload=None, headers=None):
         super().__init__(self)
         self.message = message
         self.status_code = status_code
         self.payload = payload
+        self.headers = headers
 
     def to_dict(self):
         """Convert error to dictionary for JSON response"""
@@ -36,4 +38,6 @@ def handle_api_error(error):
     """
     response = jsonify(error.to_dict())
     response.status_code = error.status_code
+    if error.headers:
+        response.headers.update(error.headers)
     return response
\ No newline at end of file
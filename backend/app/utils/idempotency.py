@@ -0,0 +1,193 @@
+"""
+Idempotency-Key support for create endpoints.
+
+A client that retries a create request with the same Idempotency-Key header
+gets the original response back instead of a duplicate item (and, for
+POST /api/content, another classifier call). The first request claims the
+key by inserting an in-progress row; a concurrent duplicate waits for that
+request to finish and then replays its stored response. Keys are scoped to
+the user and expire after IDEMPOTENCY_TTL seconds.
+"""
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import Optional
+
+from flask import current_app, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from app.models.db import db
+from app.models.idempotency_key import IdempotencyKey
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+MAX_KEY_LENGTH = 255
+
+# Expired keys are purged once every this many claims
+PURGE_EVERY = 100
+
+# Response headers stored with the body and replayed with it
+REPLAYED_HEADERS = ('Content-Type', 'Location', 'Retry-After')
+
+_claims = 0
+
+
+def request_fingerprint() -> str:
+    """Hash the method, path, query string and body of the current request"""
+    body = request.get_json(silent=True)
+    payload = json.dumps(body, sort_keys=True) if body is not None else request.get_data(as_text=True)
+    raw = '\n'.join([request.method, request.path, request.query_string.decode('utf-8'), payload])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def idempotent(view):
+    """
+    Honor the Idempotency-Key header on a create endpoint.
+
+    Must be applied below @jwt_required(). Requests without the header are
+    passed through unchanged. Responses with a 5xx or 429 status are not
+    stored, so the client can retry them with the same key.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None:
+            return view(*args, **kwargs)
+
+        key = key.strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters'}), 400
+
+        user_id = get_jwt_identity()
+        fingerprint = request_fingerprint()
+        wait_until = time.monotonic() + current_app.config['IDEMPOTENCY_WAIT']
+        poll_interval = 0.05
+
+        existing = _claim(user_id, key, fingerprint)
+        while existing is not None:
+            if existing.fingerprint != fingerprint:
+                return jsonify({'error': 'Idempotency-Key was already used for a different request'}), 422
+            if existing.status == 'done':
+                return _replay(existing)
+            if time.monotonic() >= wait_until:
+                response = jsonify({'error': 'A request with this Idempotency-Key is still in progress'})
+                response.headers['Retry-After'] = '1'
+                return response, 409
+
+            # Wait for the in-flight request, end the transaction to see its commit
+            db.session.rollback()
+            time.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, 0.5)
+            existing = _claim(user_id, key, fingerprint)
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            _release(user_id, key)
+            raise
+
+        if response.status_code >= 500 or response.status_code == 429:
+            _release(user_id, key)
+        else:
+            _store(user_id, key, response)
+        return response
+
+    return wrapper
+
+
+def _claim(user_id: str, key: str, fingerprint: str) -> Optional[IdempotencyKey]:
+    """
+    Try to claim a key for the current request.
+
+    Returns:
+        IdempotencyKey or None: None when this request owns the key now,
+        otherwise the live record of an earlier request
+    """
+    global _claims
+    config = current_app.config
+
+    for _ in range(3):
+        now = datetime.utcnow()
+        try:
+            # A Core insert, so a record of the same key already loaded in the session doesn't clash
+            db.session.execute(insert(IdempotencyKey).values(
+                user_id=user_id,
+                key=key,
+                fingerprint=fingerprint,
+                status='in_progress',
+                created_at=now,
+                expires_at=now + timedelta(seconds=config['IDEMPOTENCY_TTL'])
+            ))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+        else:
+            _claims += 1
+            if _claims % PURGE_EVERY == 0:
+                _purge_expired()
+            return None
+
+        existing = db.session.get(IdempotencyKey, (user_id, key))
+        if existing is None:
+            continue  # Released in the meantime
+
+        abandoned = (
+            existing.status == 'in_progress'
+            and existing.created_at < now - timedelta(seconds=config['IDEMPOTENCY_LEASE'])
+        )
+        if existing.expires_at > now and not abandoned:
+            return existing
+
+        # Expired, or its request died without finishing: take the key over
+        db.session.delete(existing)
+        db.session.commit()
+
+    raise RuntimeError(f"Could not claim Idempotency-Key '{key}'")
+
+
+def _store(user_id: str, key: str, response):
+    record = db.session.get(IdempotencyKey, (user_id, key))
+    if record is None:
+        return
+    record.status = 'done'
+    record.response_status = response.status_code
+    record.response_body = response.get_data(as_text=True)
+    record.response_headers = json.dumps({
+        name: response.headers[name] for name in REPLAYED_HEADERS if name in response.headers
+    })
+    record.expires_at = datetime.utcnow() + timedelta(seconds=current_app.config['IDEMPOTENCY_TTL'])
+    db.session.commit()
+
+
+def _release(user_id: str, key: str):
+    try:
+        IdempotencyKey.query.filter_by(user_id=user_id, key=key, status='in_progress').delete()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"Could not release Idempotency-Key '{key}': {e}")
+
+
+def _replay(record: IdempotencyKey):
+    response = current_app.response_class(record.response_body, status=record.response_status, mimetype='application/json')
+    # Records stored before headers were kept have none
+    for name, value in json.loads(record.response_headers or '{}').items():
+        response.headers[name] = value
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _purge_expired():
+    try:
+        deleted = IdempotencyKey.query.filter(IdempotencyKey.expires_at < datetime.utcnow()).delete()
+        db.session.commit()
+        logger.debug(f"Purged {deleted} expired idempotency keys")
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"Could not purge expired idempotency keys: {e}")
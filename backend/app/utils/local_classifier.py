@@ -0,0 +1,367 @@
+"""
+Local pre-classifier that answers confident cases without calling Gemini.
+
+A multinomial naive Bayes model over hashed word unigrams and bigrams. It is
+trained from the labels Gemini has already produced (the classification
+cache table), keeps learning from every new Gemini answer, and is only
+trusted when its posterior clears a confidence threshold. Workers only
+learn in memory: the model file is written by `flask classifier train`
+from the shared labels, since each worker's increments cover just the
+requests it served. Due dates and
+frequencies for locally answered items come from the temporal parser.
+"""
+import json
+import math
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import zlib
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.utils.classification_cache import SPLIT
+from app.utils.logger import get_logger
+from app.utils.temporal_parser import TemporalResult, parse_temporal
+
+logger = get_logger(__name__)
+
+LABELS = ('thought', 'todo', 'habit')
+
+# Number of hash buckets for features
+FEATURE_BUCKETS = 2 ** 20
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+# Without parsed temporal data, todos that mention a date or time still need
+# Gemini to extract the due date
+_TEMPORAL_CUE_RE = re.compile(
+    r'\b(today|tonight|tomorrow|tmrw|yesterday|morning|afternoon|evening|noon|midnight'
+    r'|monday|tuesday|wednesday|thursday|friday|saturday|sunday|mon|tue|tues|wed|thu|thur|thurs|fri|sat|sun'
+    r'|week|weekend|month|year|daily|weekly|monthly|every|each|by|before|until|due|next|on'
+    r'|jan|january|feb|february|mar|march|apr|april|may|jun|june|jul|july|aug|august'
+    r'|sep|sept|september|oct|october|nov|november|dec|december)\b'
+    r'|\d',
+    re.IGNORECASE
+)
+
+
+def extract_features(text: str) -> List[int]:
+    """Hash word unigrams and bigrams of the text into feature buckets"""
+    tokens = _TOKEN_RE.findall(text.lower())
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    if tokens:
+        grams.append(f"^{tokens[0]}")  # The first word says a lot ("buy", "i")
+    return [zlib.crc32(gram.encode('utf-8')) % FEATURE_BUCKETS for gram in grams]
+
+
+class NaiveBayesClassifier:
+    """
+    Multinomial naive Bayes over hashed features.
+
+    Attributes:
+        alpha (float): Additive smoothing
+    """
+    def __init__(self, alpha: float = 0.5):
+        self.alpha = alpha
+        self.class_counts = {label: 0 for label in LABELS}
+        self.feature_counts = {label: {} for label in LABELS}
+        self.feature_totals = {label: 0 for label in LABELS}
+        self.vocabulary = set()
+        self._lock = threading.Lock()
+
+    @property
+    def examples(self) -> int:
+        return sum(self.class_counts.values())
+
+    def partial_fit(self, text: str, label: str):
+        """Add one labelled example to the model"""
+        if label not in LABELS:
+            return
+        features = extract_features(text)
+        with self._lock:
+            self.class_counts[label] += 1
+            counts = self.feature_counts[label]
+            for feature in features:
+                counts[feature] = counts.get(feature, 0) + 1
+                self.vocabulary.add(feature)
+            self.feature_totals[label] += len(features)
+
+    def fit(self, examples: Iterable[Tuple[str, str]]):
+        """Add many labelled (text, label) examples"""
+        for text, label in examples:
+            self.partial_fit(text, label)
+        return self
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        """
+        Posterior probability of each label.
+
+        Returns:
+            dict: label -> probability, empty if the model has no examples
+        """
+        total = self.examples
+        if total == 0:
+            return {}
+        features = extract_features(text)
+        vocabulary_size = max(len(self.vocabulary), 1)
+
+        scores = {}
+        with self._lock:
+            for label in LABELS:
+                if self.class_counts[label] == 0:
+                    continue
+                counts = self.feature_counts[label]
+                denominator = self.feature_totals[label] + self.alpha * vocabulary_size
+                score = math.log(self.class_counts[label] / total)
+                for feature in features:
+                    score += math.log((counts.get(feature, 0) + self.alpha) / denominator)
+                scores[label] = score
+
+        top = max(scores.values())
+        exp_scores = {label: math.exp(score - top) for label, score in scores.items()}
+        norm = sum(exp_scores.values())
+        return {label: value / norm for label, value in exp_scores.items()}
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        """Most likely label and its probability"""
+        proba = self.predict_proba(text)
+        if not proba:
+            return None, 0.0
+        label = max(proba, key=proba.get)
+        return label, proba[label]
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                'version': 1,
+                'alpha': self.alpha,
+                'class_counts': dict(self.class_counts),
+                'feature_counts': {
+                    label: {str(feature): count for feature, count in counts.items()}
+                    for label, counts in self.feature_counts.items()
+                },
+                'feature_totals': dict(self.feature_totals)
+            }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'NaiveBayesClassifier':
+        model = cls(alpha=data.get('alpha', 0.5))
+        model.class_counts.update(data['class_counts'])
+        model.feature_totals.update(data['feature_totals'])
+        for label, counts in data['feature_counts'].items():
+            model.feature_counts[label] = {int(feature): count for feature, count in counts.items()}
+            model.vocabulary.update(model.feature_counts[label])
+        return model
+
+    def save(self, path: str):
+        """Write the model to path atomically"""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'NaiveBayesClassifier':
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def load_cached_labels(cache_db_path: str) -> List[Tuple[str, str, float]]:
+    """
+    Read (text, label, created_at) examples from the classification cache.
+
+    Every single-item row there is an answer Gemini gave for that
+    (normalized) text; cached splits of compound text are skipped.
+    """
+    try:
+        conn = sqlite3.connect(cache_db_path)
+        try:
+            return conn.execute(
+                'SELECT text, content_type, created_at FROM classification_cache'
+                ' WHERE content_type != ? ORDER BY created_at',
+                (SPLIT,)
+            ).fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning(f"Could not read classifier labels from '{cache_db_path}': {e}")
+        return []
+
+
+class LocalClassifier:
+    """
+    Decides when the local model can answer instead of Gemini.
+
+    Attributes:
+        model (NaiveBayesClassifier): The underlying model
+        threshold (float): Minimum posterior to answer locally
+        min_examples (int): Training examples needed before answering at all
+    """
+    def __init__(self, model, threshold=0.95, min_examples=200):
+        self.model = model
+        self.threshold = threshold
+        self.min_examples = min_examples
+        self._lock = threading.Lock()
+        self._stats = {
+            'answered': 0,
+            'deferred': 0,
+            'learned': 0
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def classify(self, text: str, temporal: Optional[TemporalResult] = None) -> Optional[Tuple[str, Dict]]:
+        """
+        Answer locally if the model is confident enough.
+
+        Args:
+            text (str): Raw user input
+            temporal (TemporalResult, optional): Dates and recurrence parsed
+                from the text, needed to answer todos and habits with dates
+
+        Returns:
+            tuple or None: (content_type, formatted_data), or None to defer to Gemini
+        """
+        if self.model.examples < self.min_examples:
+            return None
+
+        label, confidence = self.model.predict(text)
+        result = None
+        if confidence >= self.threshold:
+            result = build_local_result(text, label, temporal)
+
+        self._count('answered' if result else 'deferred')
+        if result:
+            logger.debug(f"Local classifier answered '{label}' ({confidence:.3f}) for: {text}")
+        return result
+
+    def learn(self, text: str, label: str):
+        """
+        Learn from a Gemini answer.
+
+        Not saved: the answer is in the classification cache, which the next
+        `flask classifier train` retrains every worker's model from.
+        """
+        self.model.partial_fit(text, label)
+        self._count('learned')
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['examples'] = self.model.examples
+        stats['threshold'] = self.threshold
+        decided = stats['answered'] + stats['deferred']
+        stats['answered_rate'] = round(stats['answered'] / decided, 3) if decided else 0
+        return stats
+
+
+def build_local_result(text: str, label: str, temporal: Optional[TemporalResult] = None) -> Optional[Tuple[str, Dict]]:
+    """
+    Build classifier output for a locally predicted label.
+
+    Dates, times and frequencies come from the temporal parser. Returns None
+    for cases that still need Gemini to extract fields.
+    """
+    if label == 'thought':
+        return 'thought', {'content': text.lower()}
+
+    if temporal is None or temporal.unresolved:
+        if label == 'todo' and not _TEMPORAL_CUE_RE.search(text):
+            return 'todo', {'title': text.lower(), 'description': None, 'due_date': None}
+        return None
+
+    title = (temporal.remainder or text).lower()
+    if label == 'todo' and not temporal.frequency:
+        return 'todo', {'title': title, 'description': None, 'due_date': temporal.due_date}
+    if label == 'habit' and temporal.frequency:
+        return 'habit', {
+            'title': title,
+            'description': None,
+            'frequency': temporal.frequency,
+            'start_date': temporal.start_date,
+            'due_time': temporal.due_time
+        }
+    return None
+
+
+def evaluate(examples: List[Tuple[str, str]], holdout: float = 0.2, threshold: float = 0.95) -> Dict:
+    """
+    Train on the oldest examples and measure agreement on the newest ones.
+
+    Args:
+        examples (list): (text, label) pairs ordered oldest first
+        holdout (float): Fraction of examples used for evaluation
+        threshold (float): Confidence threshold to evaluate
+
+    Returns:
+        dict: Agreement with the LLM labels and fraction of calls avoided
+    """
+    now = datetime.now()
+    split = int(len(examples) * (1 - holdout))
+    train, test = examples[:split], examples[split:]
+    model = NaiveBayesClassifier().fit(train)
+
+    agree = answered = answered_agree = 0
+    per_label = {label: {'total': 0, 'agree': 0} for label in LABELS}
+    for text, label in test:
+        predicted, confidence = model.predict(text)
+        per_label[label]['total'] += 1
+        if predicted == label:
+            agree += 1
+            per_label[label]['agree'] += 1
+        if confidence >= threshold and build_local_result(text, predicted, parse_temporal(text, now)):
+            answered += 1
+            answered_agree += predicted == label
+
+    return {
+        'train_examples': len(train),
+        'test_examples': len(test),
+        'threshold': threshold,
+        'agreement': round(agree / len(test), 3) if test else 0,
+        'calls_avoided': round(answered / len(test), 3) if test else 0,
+        'agreement_when_answered': round(answered_agree / answered, 3) if answered else 0,
+        'per_label_agreement': {
+            label: round(counts['agree'] / counts['total'], 3) if counts['total'] else None
+            for label, counts in per_label.items()
+        }
+    }
+
+
+_local_classifier = None
+_local_classifier_lock = threading.Lock()
+
+
+def get_local_classifier() -> Optional[LocalClassifier]:
+    """
+    Get the process-wide local classifier.
+
+    The model is loaded from CLASSIFIER_LOCAL_MODEL_PATH, or trained from the
+    classification cache if no saved model exists yet.
+
+    Returns:
+        LocalClassifier or None: None when CLASSIFIER_LOCAL_ENABLED is false
+    """
+    global _local_classifier
+    if os.getenv('CLASSIFIER_LOCAL_ENABLED', 'true').lower() != 'true':
+        return None
+    if _local_classifier is None:
+        with _local_classifier_lock:
+            if _local_classifier is None:
+                model_path = os.getenv('CLASSIFIER_LOCAL_MODEL_PATH', 'classifier_model.json')
+                try:
+                    model = NaiveBayesClassifier.load(model_path)
+                except (OSError, ValueError, KeyError):
+                    cache_path = os.getenv('CLASSIFIER_CACHE_PATH', 'classifier_cache.db')
+                    labels = load_cached_labels(cache_path)
+                    model = NaiveBayesClassifier().fit((text, label) for text, label, _ in labels)
+                _local_classifier = LocalClassifier(
+                    model,
+                    threshold=float(os.getenv('CLASSIFIER_LOCAL_THRESHOLD', 0.95)),
+                    min_examples=int(os.getenv('CLASSIFIER_LOCAL_MIN_EXAMPLES', 200))
+                )
+    return _local_classifier
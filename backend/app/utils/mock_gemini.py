@@ -0,0 +1,167 @@
+"""
+Local HTTP stand-in for the Gemini API.
+
+Serves generateContent requests with the deterministic local backend's
+answers, after a latency drawn from a log-normal distribution, and fails a
+configurable fraction of calls. Point the classifier at it with
+GEMINI_BASE_URL to load test the content path without network access.
+"""
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Sequence
+
+from app.utils.classifier_backends import synthesize_response
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_ERROR_STATUS = {429: 'RESOURCE_EXHAUSTED', 500: 'INTERNAL', 503: 'UNAVAILABLE'}
+
+# z-score of the 99th percentile of a standard normal distribution
+_Z_99 = 2.326
+
+
+class MockGeminiServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server emulating Gemini's generateContent endpoint.
+
+    Attributes:
+        latency_median (float): Median response latency in seconds
+        latency_p99 (float): 99th percentile latency in seconds
+        error_rate (float): Fraction of requests answered with an error
+        error_codes (tuple): HTTP status codes to pick errors from
+        requests (int): Requests served so far
+        errors (int): Errors returned so far
+    """
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency_median: float = 0.4,
+                 latency_p99: float = 2.0, error_rate: float = 0.0,
+                 error_codes: Sequence[int] = (429, 500, 503), seed: Optional[int] = None):
+        super().__init__((host, port), _MockGeminiHandler)
+        self.latency_median = latency_median
+        self.latency_p99 = max(latency_p99, latency_median)
+        self.error_rate = error_rate
+        self.error_codes = tuple(error_codes)
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._prefixes = set()
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def sample(self):
+        """Draw (latency, error_code) for one request, error_code None on success"""
+        with self._lock:
+            self.requests += 1
+            if self.latency_median > 0:
+                sigma = math.log(self.latency_p99 / self.latency_median) / _Z_99
+                latency = self._random.lognormvariate(math.log(self.latency_median), sigma)
+            else:
+                latency = 0.0
+            error_code = None
+            if self.error_codes and self._random.random() < self.error_rate:
+                error_code = self._random.choice(self.error_codes)
+                self.errors += 1
+        return latency, error_code
+
+    def seen_prefix(self, system: str) -> bool:
+        """Whether this system instruction was sent before, remembering it"""
+        if not system:
+            return False
+        with self._lock:
+            seen = system in self._prefixes
+            self._prefixes.add(system)
+        return seen
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'requests': self.requests, 'errors': self.errors}
+
+    def start(self) -> threading.Thread:
+        """Serve in a daemon thread and return it"""
+        thread = threading.Thread(target=self.serve_forever, name='mock-gemini', daemon=True)
+        thread.start()
+        return thread
+
+
+class _MockGeminiHandler(BaseHTTPRequestHandler):
+    server: MockGeminiServer
+
+    # Keep connections alive like the real API does
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        # Model lookup, used to warm up client connections
+        path = self.path.split('?')[0]
+        if '/models/' not in path:
+            return self._send(404, _error_body(404, 'NOT_FOUND', f'Unknown path {self.path}'))
+        return self._send(200, {'name': path[path.index('models/'):], 'supportedGenerationMethods': ['generateContent']})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self._send(400, _error_body(400, 'INVALID_ARGUMENT', 'Invalid JSON payload'))
+
+        if not self.path.split('?')[0].endswith(':generateContent'):
+            return self._send(404, _error_body(404, 'NOT_FOUND', f'Unknown method {self.path}'))
+
+        latency, error_code = self.server.sample()
+        time.sleep(latency)
+
+        if error_code:
+            return self._send(error_code, _error_body(error_code, _ERROR_STATUS.get(error_code, 'UNKNOWN'), 'Mock error'))
+
+        prompt = ''.join(
+            part.get('text', '')
+            for content in body.get('contents', [])
+            for part in content.get('parts', [])
+        )
+        system = ''.join(part.get('text', '') for part in (body.get('systemInstruction') or {}).get('parts', []))
+        text = synthesize_response(prompt)
+
+        # Emulate implicit prefix caching of repeated system instructions
+        cached_tokens = len(system) // 4 if self.server.seen_prefix(system) else 0
+        prompt_tokens = (len(system) + len(prompt)) // 4
+        return self._send(200, {
+            'candidates': [{
+                'content': {'role': 'model', 'parts': [{'text': text}]},
+                'finishReason': 'STOP',
+                'index': 0
+            }],
+            'usageMetadata': {
+                'promptTokenCount': prompt_tokens,
+                'candidatesTokenCount': len(text) // 4,
+                'cachedContentTokenCount': cached_tokens,
+                'totalTokenCount': prompt_tokens + len(text) // 4
+            }
+        })
+
+    def _send(self, status: int, payload: Dict):
+        data = json.dumps(payload).encode('utf-8')
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up waiting (timeout), nothing to answer
+            pass
+
+    def log_message(self, format, *args):
+        logger.debug(f"mock-gemini {self.address_string()} {format % args}")
+
+
+def _error_body(code: int, status: str, message: str) -> Dict:
+    return {'error': {'code': code, 'message': message, 'status': status}}
@@ -0,0 +1,127 @@
+"""
+Model routing for the classifier.
+
+Short, simple inputs are sent to a fast, cheap model with a minimal prompt.
+The answer is escalated to a stronger model with the full prompt only when
+it can't be used: the JSON doesn't parse, the type is unknown, or required
+fields are missing. Routing decisions, the escalation rate and per-tier
+latency are logged and counted so the thresholds can be tuned.
+"""
+import os
+import re
+import threading
+from typing import Dict, Optional
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+FAST = 'fast'
+STRONG = 'strong'
+
+# Escalation reasons
+INVALID_JSON = 'invalid_json'
+UNKNOWN_TYPE = 'unknown_type'
+MISSING_FIELDS = 'missing_fields'
+ERROR = 'error'
+
+_SENTENCE_BREAK_RE = re.compile(r'[.!?;]\s+\S|\n')
+
+
+class ModelRouter:
+    """
+    Picks a model tier per input and keeps routing statistics.
+
+    Attributes:
+        fast_model (str): Model for simple inputs, or None to disable routing
+        strong_model (str): Model for everything else and for escalations
+        max_simple_chars (int): Longest input still considered simple
+    """
+    def __init__(self, fast_model: Optional[str], strong_model: str, max_simple_chars: int = 120):
+        self.fast_model = fast_model
+        self.strong_model = strong_model
+        self.max_simple_chars = max_simple_chars
+        self._lock = threading.Lock()
+        self._routed = {FAST: 0, STRONG: 0}
+        self._escalations = {}
+        self._latency = {FAST: [0, 0.0, 0.0], STRONG: [0, 0.0, 0.0]}  # calls, total, max
+
+    def is_simple(self, text: str) -> bool:
+        """Short single-sentence inputs are simple"""
+        text = text.strip()
+        return len(text) <= self.max_simple_chars and not _SENTENCE_BREAK_RE.search(text)
+
+    def route(self, text: str) -> str:
+        """
+        Choose the first tier for an input.
+
+        Returns:
+            str: FAST or STRONG
+        """
+        tier = FAST if self.fast_model and self.is_simple(text) else STRONG
+        with self._lock:
+            self._routed[tier] += 1
+        logger.debug(f"Routing {len(text)}-char input to {tier} tier")
+        return tier
+
+    def model_for(self, tier: str) -> str:
+        return self.fast_model if tier == FAST else self.strong_model
+
+    def record_latency(self, tier: str, seconds: float):
+        with self._lock:
+            latency = self._latency[tier]
+            latency[0] += 1
+            latency[1] += seconds
+            latency[2] = max(latency[2], seconds)
+
+    def record_escalation(self, reason: str, detail: str = ''):
+        with self._lock:
+            self._escalations[reason] = self._escalations.get(reason, 0) + 1
+            routed_fast = self._routed[FAST]
+            escalated = sum(self._escalations.values())
+        logger.info(
+            f"Escalating to {self.strong_model}: {reason}{f' ({detail})' if detail else ''}; "
+            f"escalation rate {escalated}/{routed_fast}"
+        )
+
+    def stats(self) -> Dict:
+        with self._lock:
+            escalated = sum(self._escalations.values())
+            return {
+                'fast_model': self.fast_model,
+                'strong_model': self.strong_model,
+                'routed': dict(self._routed),
+                'escalations': dict(self._escalations),
+                'escalation_rate': round(escalated / self._routed[FAST], 4) if self._routed[FAST] else None,
+                'latency': {
+                    tier: {
+                        'calls': calls,
+                        'avg_ms': round(total / calls * 1000, 1) if calls else None,
+                        'max_ms': round(longest * 1000, 1) if calls else None
+                    }
+                    for tier, (calls, total, longest) in self._latency.items()
+                }
+            }
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    """
+    Get the process-wide model router, configured from the environment.
+
+    Setting CLASSIFIER_FAST_MODEL to an empty string sends every input to the
+    strong model.
+    """
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ModelRouter(
+                    fast_model=os.getenv('CLASSIFIER_FAST_MODEL', 'gemini-2.0-flash-lite') or None,
+                    strong_model=os.getenv('CLASSIFIER_MODEL', 'gemini-2.0-flash'),
+                    max_simple_chars=int(os.getenv('CLASSIFIER_FAST_MAX_CHARS', 120))
+                )
+    return _router
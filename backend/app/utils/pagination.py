@@ -0,0 +1,264 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+A listing is ordered by a fixed list of sort keys, always ending with the
+primary key so the order is total. A page is fetched with a WHERE clause
+that selects the rows after the last one of the previous page, instead of
+an OFFSET, so every page costs the same however deep it is. The cursor
+handed to clients is the last row's sort key values, JSON-encoded and
+base64url'd; clients treat it as opaque.
+
+Listings over several tables (see merged_listing) are a k-way merge of one
+such stream per table, each read in index order and limited to a page, so
+a page never reads more than a page per table.
+"""
+import base64
+import binascii
+import heapq
+import json
+from datetime import date, datetime
+from functools import cmp_to_key
+from typing import Any, List, Optional, Sequence, Tuple
+
+from flask import request
+from sqlalchemy import and_, false, literal, or_
+
+from app.utils.helpers import APIError
+
+# Largest page a client may ask for
+MAX_LIMIT = 200
+
+
+class SortKey:
+    """
+    One column of a listing's order.
+
+    Attributes:
+        column: Model attribute to sort by
+        descending (bool): Sort newest or largest first
+        nulls_last (bool): Sort NULLs after every value, regardless of direction
+    """
+    __slots__ = ('column', 'descending', 'nulls_last')
+
+    def __init__(self, column, descending: bool = False, nulls_last: bool = False):
+        self.column = column
+        self.descending = descending
+        self.nulls_last = nulls_last
+
+    def order_by(self) -> list:
+        clauses = [self.column.is_(None)] if self.nulls_last else []
+        clauses.append(self.column.desc() if self.descending else self.column)
+        return clauses
+
+    def equals(self, value):
+        return self.column.is_(None) if value is None else self.column == value
+
+    def after(self, value):
+        """Rows that sort after value in this column alone"""
+        if value is None:
+            # NULLs come last, nothing sorts after them
+            return false()
+        # A typed bind, since booleans only compare with = as Python values
+        value = literal(value, self.column.type)
+        after = self.column < value if self.descending else self.column > value
+        return or_(after, self.column.is_(None)) if self.nulls_last else after
+
+
+def ordered(query, keys: Sequence[SortKey]):
+    """Apply a listing's order to a query"""
+    return query.order_by(*[clause for key in keys for clause in key.order_by()])
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = json.dumps([value.isoformat() if isinstance(value, (date, datetime)) else value for value in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, keys: Sequence[SortKey], extra: Sequence[type] = ()) -> List[Any]:
+    """
+    The sort key values in a cursor, converted back to the columns' types.
+
+    Args:
+        cursor (str): A cursor from encode_cursor
+        keys (list): Sort keys of the listing
+        extra (list): Types of values the cursor holds after the keys' values
+
+    Raises:
+        APIError: If the cursor is malformed or from another listing
+    """
+    types = [key.column.type.python_type for key in keys] + list(extra)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError
+        return [_from_json(python_type, value) for python_type, value in zip(types, values)]
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+        raise APIError('Invalid cursor', 400)
+
+
+def _from_json(python_type: type, value):
+    if value is None:
+        return None
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    if not isinstance(value, python_type):
+        raise ValueError
+    return value
+
+
+def after_cursor(keys: Sequence[SortKey], values: Sequence[Any]):
+    """
+    WHERE clause for the rows after a cursor in lexicographic order.
+
+    (k1 after v1) OR (k1 = v1 AND k2 after v2) OR ...
+    """
+    terms = []
+    for index, key in enumerate(keys):
+        prefix = [keys[i].equals(values[i]) for i in range(index)]
+        terms.append(and_(*prefix, key.after(values[index])))
+    return or_(*terms)
+
+
+def page_args(default_limit: Optional[int] = None) -> Tuple[Optional[int], Optional[str]]:
+    """
+    The limit and cursor query parameters of the current request.
+
+    Args:
+        default_limit (int, optional): Limit of requests without one, for
+            endpoints that are always paginated
+
+    Returns:
+        tuple: (limit, cursor); limit is None if the client didn't ask for pages
+
+    Raises:
+        APIError: If limit isn't between 1 and MAX_LIMIT
+    """
+    limit = request.args.get('limit')
+    cursor = request.args.get('cursor') or None
+    if limit is None and default_limit is not None:
+        return default_limit, cursor
+    if limit is None:
+        if cursor:
+            raise APIError('cursor needs a limit', 400)
+        return None, None
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise APIError('limit must be an integer', 400)
+    if not 1 <= limit <= MAX_LIMIT:
+        raise APIError(f'limit must be between 1 and {MAX_LIMIT}', 400)
+    return limit, cursor
+
+
+def paginate(query, keys: Sequence[SortKey], limit: int, cursor: Optional[str] = None) -> Tuple[list, Optional[str]]:
+    """
+    One page of a query in the order of keys.
+
+    Args:
+        query: Filtered, unordered query
+        keys (list): Sort keys, ending with a unique column
+        limit (int): Rows per page
+        cursor (str, optional): next_cursor of the previous page
+
+    Returns:
+        tuple: (rows, next_cursor); next_cursor is None on the last page
+    """
+    if cursor:
+        query = query.filter(after_cursor(keys, decode_cursor(cursor, keys)))
+    rows = ordered(query, keys).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([getattr(rows[-1], key.column.key) for key in keys])
+
+
+def listing(query, keys: Sequence[SortKey], serialize=lambda row: row.to_dict()):
+    """
+    The JSON body of a list endpoint, paginated if the request has a limit.
+
+    Without a limit, every row as a list, as before pagination existed.
+    With one, {"items": [...], "next_cursor": ...}.
+    """
+    limit, cursor = page_args()
+    if limit is None:
+        return [serialize(row) for row in ordered(query, keys).all()]
+    rows, next_cursor = paginate(query, keys, limit, cursor)
+    return {'items': [serialize(row) for row in rows], 'next_cursor': next_cursor}
+
+
+def _compare(keys: Sequence[SortKey], left: Sequence[Any], right: Sequence[Any]) -> int:
+    """Compare two rows' sort key values the way keys order them"""
+    for key, a, b in zip(keys, left, right):
+        if a == b:
+            continue
+        if a is None or b is None:
+            if key.nulls_last:
+                return 1 if a is None else -1
+            return -1 if a is None else 1
+        result = -1 if a < b else 1
+        return -result if key.descending else result
+    return 0
+
+
+def merge_pages(sources: Sequence[Tuple[str, Any, Sequence[SortKey]]], limit: Optional[int] = None,
+                cursor: Optional[str] = None) -> Tuple[List[Tuple[str, Any]], Optional[str]]:
+    """
+    One page of several queries merged into one order.
+
+    Every source has sort keys of the same types and directions, e.g.
+    created_at then ID. Rows are merged by those values, and rows with
+    equal values by the order of the sources. Each source is read in its
+    index order with its own keyset condition and LIMIT, so a page reads at
+    most limit + 1 rows per source.
+
+    Args:
+        sources (list): (name, filtered query, sort keys) per source
+        limit (int, optional): Rows per page; every row if None
+        cursor (str, optional): next_cursor of the previous page
+
+    Returns:
+        tuple: ([(name, row)], next_cursor); next_cursor is None on the last page
+    """
+    keys = sources[0][2]
+    values = decode_cursor(cursor, keys, extra=[int]) if cursor else None
+
+    streams = []
+    for rank, (name, query, source_keys) in enumerate(sources):
+        if values is not None:
+            after = after_cursor(source_keys, values[:-1])
+            if rank > values[-1]:
+                # A later source's row with the cursor's own values comes after it
+                after = or_(after, and_(*[key.equals(value) for key, value in zip(source_keys, values)]))
+            query = query.filter(after)
+        query = ordered(query, source_keys)
+        if limit is not None:
+            query = query.limit(limit + 1)
+        streams.append([
+            ([getattr(row, key.column.key) for key in source_keys] + [rank], name, row)
+            for row in query.all()
+        ])
+
+    order = cmp_to_key(lambda a, b: _compare(keys, a[0], b[0]) or a[0][-1] - b[0][-1])
+    merged = list(heapq.merge(*streams, key=order))
+    if limit is None or len(merged) <= limit:
+        return [(name, row) for _, name, row in merged], None
+    page = merged[:limit]
+    return [(name, row) for _, name, row in page], encode_cursor(page[-1][0])
+
+
+def merged_listing(sources: Sequence[Tuple[str, Any, Sequence[SortKey]]], serialize):
+    """
+    The JSON body of a list endpoint over several queries, see merge_pages.
+
+    Args:
+        sources (list): (name, filtered query, sort keys) per source
+        serialize: Called with (name, row) for each row on the page
+    """
+    limit, cursor = page_args()
+    rows, next_cursor = merge_pages(sources, limit, cursor)
+    items = [serialize(name, row) for name, row in rows]
+    if limit is None:
+        return items
+    return {'items': items, 'next_cursor': next_cursor}
@@ -0,0 +1,221 @@
+"""
+Recurrence rules for habits.
+
+A habit's frequency (daily, weekly or monthly) can be refined by its
+frequency_data JSON:
+
+    {"interval": 2}                               every 2nd day, week or month
+    {"weekdays": ["mon", "thu"]}                  on these days of the week
+    {"nth_weekday": [{"n": 2, "weekday": "tue"}]} monthly, on the 2nd Tuesday (n -1 is the last)
+    {"exclude": ["2024-12-25"]}                   never on these dates
+
+The JSON is parsed once into a compiled rule, cached by its inputs, so an
+unchanged habit is never parsed twice. Occurrences in a date range are
+produced by stepping over day ordinals, in time proportional to the number
+of occurrences rather than the number of days.
+"""
+import calendar
+import heapq
+import json
+from datetime import date
+from functools import lru_cache
+from typing import FrozenSet, List, Optional, Tuple
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+FREQUENCIES = ('daily', 'weekly', 'monthly')
+
+WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+_KNOWN_KEYS = {'interval', 'weekdays', 'nth_weekday', 'exclude'}
+
+
+class RecurrenceRule:
+    """
+    A compiled recurrence: frequency, interval, weekdays and exclusions.
+
+    Attributes:
+        frequency (str): daily, weekly or monthly
+        anchor (date): The habit's start date; intervals count from it
+        interval (int): Every how many days, weeks or months
+        weekdays (tuple): Days of the week (0 is Monday), empty for the anchor's
+        nth_weekdays (tuple): (n, weekday) pairs for monthly rules, n -1 is the last
+        exclude (frozenset): Dates that never occur
+    """
+    __slots__ = ('frequency', 'anchor', 'interval', 'weekdays', 'nth_weekdays', 'exclude')
+
+    def __init__(self, frequency: str, anchor: date, interval: int = 1, weekdays: Tuple[int, ...] = (),
+                 nth_weekdays: Tuple[Tuple[int, int], ...] = (), exclude: FrozenSet[date] = frozenset()):
+        self.frequency = frequency
+        self.anchor = anchor
+        self.interval = interval
+        self.weekdays = weekdays
+        self.nth_weekdays = nth_weekdays
+        self.exclude = exclude
+
+    def occurrences(self, start: date, end: date) -> List[date]:
+        """
+        Dates between start and end, inclusive, never before the anchor.
+
+        Returns:
+            list: Occurrence dates in ascending order
+        """
+        start = max(start, self.anchor)
+        if start > end:
+            return []
+
+        if self.frequency == 'monthly':
+            dates = self._monthly(start, end)
+        elif self.weekdays or self.frequency == 'weekly':
+            dates = self._weekly(start.toordinal(), end.toordinal())
+        else:
+            dates = map(date.fromordinal, _stepped(self.anchor.toordinal(), self.interval, start.toordinal(), end.toordinal()))
+
+        if self.exclude:
+            return [day for day in dates if day not in self.exclude]
+        return list(dates)
+
+    def occurs_on(self, day: date) -> bool:
+        return bool(self.occurrences(day, day))
+
+    def _weekly(self, first: int, last: int):
+        # Weeks are counted from the Monday of the anchor's week
+        week_zero = self.anchor.toordinal() - self.anchor.weekday()
+        step = 7 * (self.interval if self.frequency == 'weekly' else 1)
+        weekdays = self.weekdays or (self.anchor.weekday(),)
+        series = [_stepped(week_zero + weekday, step, first, last) for weekday in weekdays]
+        return map(date.fromordinal, heapq.merge(*series) if len(series) > 1 else series[0])
+
+    def _monthly(self, start: date, end: date) -> List[date]:
+        dates = []
+        months_from_anchor = (start.year - self.anchor.year) * 12 + start.month - self.anchor.month
+        # First month of the window that is on the interval
+        index = start.year * 12 + start.month - 1 + (-months_from_anchor) % self.interval
+        last_index = end.year * 12 + end.month - 1
+        while index <= last_index:
+            year, month = divmod(index, 12)
+            month += 1
+            if self.nth_weekdays:
+                days = sorted(filter(None, (_nth_weekday(year, month, n, weekday) for n, weekday in self.nth_weekdays)))
+            else:
+                days = [date(year, month, min(self.anchor.day, calendar.monthrange(year, month)[1]))]
+            dates.extend(day for day in days if start <= day <= end)
+            index += self.interval
+        return dates
+
+
+def _stepped(origin: int, step: int, first: int, last: int) -> range:
+    """Ordinals origin + k * step that fall in [first, last]"""
+    if first <= origin:
+        return range(origin, last + 1, step)
+    return range(first + (origin - first) % step, last + 1, step)
+
+
+def _nth_weekday(year: int, month: int, n: int, weekday: int) -> Optional[date]:
+    """The nth given weekday of a month (n -1 is the last), None if the month has no such day"""
+    first_weekday, days_in_month = calendar.monthrange(year, month)
+    if n > 0:
+        day = 1 + (weekday - first_weekday) % 7 + (n - 1) * 7
+    else:
+        last_weekday = (first_weekday + days_in_month - 1) % 7
+        day = days_in_month - (last_weekday - weekday) % 7 + (n + 1) * 7
+    if 1 <= day <= days_in_month:
+        return date(year, month, day)
+    return None
+
+
+def _weekday(value) -> int:
+    if isinstance(value, int) and not isinstance(value, bool) and 0 <= value <= 6:
+        return value
+    if isinstance(value, str) and value[:3].lower() in WEEKDAYS:
+        return WEEKDAYS.index(value[:3].lower())
+    raise ValueError(f"Invalid weekday: {value!r}")
+
+
+def parse_frequency_data(frequency: str, data: Optional[dict], anchor: date) -> RecurrenceRule:
+    """
+    Build a rule from a frequency and its frequency_data.
+
+    Raises:
+        ValueError: If the frequency or frequency_data is invalid
+    """
+    if frequency not in FREQUENCIES:
+        raise ValueError(f"Invalid frequency: {frequency!r}")
+    data = data or {}
+    if not isinstance(data, dict):
+        raise ValueError("frequency_data must be an object")
+    unknown = set(data) - _KNOWN_KEYS
+    if unknown:
+        raise ValueError(f"Unknown frequency_data keys: {', '.join(sorted(unknown))}")
+
+    interval = data.get('interval', 1)
+    if not isinstance(interval, int) or isinstance(interval, bool) or interval < 1:
+        raise ValueError("interval must be a positive integer")
+
+    weekdays = data.get('weekdays') or []
+    if not isinstance(weekdays, list):
+        raise ValueError("weekdays must be a list")
+    weekdays = tuple(sorted({_weekday(value) for value in weekdays}))
+    if weekdays and frequency == 'monthly':
+        raise ValueError("weekdays can't be used with a monthly frequency, use nth_weekday")
+
+    nth_weekdays = data.get('nth_weekday') or []
+    if isinstance(nth_weekdays, dict):
+        nth_weekdays = [nth_weekdays]
+    if nth_weekdays and frequency != 'monthly':
+        raise ValueError("nth_weekday needs a monthly frequency")
+    parsed_nth = []
+    for entry in nth_weekdays:
+        n = entry.get('n') if isinstance(entry, dict) else None
+        if not isinstance(n, int) or isinstance(n, bool) or n == 0 or not -5 <= n <= 5:
+            raise ValueError("nth_weekday n must be 1 to 5, or -1 to -5 counting from the end")
+        parsed_nth.append((n, _weekday(entry.get('weekday'))))
+
+    exclude = data.get('exclude') or []
+    if not isinstance(exclude, list):
+        raise ValueError("exclude must be a list of dates")
+    try:
+        excluded = frozenset(date.fromisoformat(str(value)[:10]) for value in exclude)
+    except ValueError:
+        raise ValueError("exclude must be a list of YYYY-MM-DD dates")
+
+    return RecurrenceRule(frequency, anchor, interval, weekdays, tuple(sorted(set(parsed_nth))), excluded)
+
+
+@lru_cache(maxsize=16384)
+def compile_rule(frequency: str, frequency_data: Optional[str], anchor: date) -> RecurrenceRule:
+    """
+    Compile a habit's stored recurrence, memoized.
+
+    The cache key is the stored values themselves, so editing a habit
+    compiles a new rule and unchanged habits reuse theirs.
+
+    Args:
+        frequency (str): daily, weekly or monthly
+        frequency_data (str, optional): JSON text as stored on the habit
+        anchor (date): The habit's start date
+
+    Raises:
+        ValueError: If the recurrence is invalid
+    """
+    try:
+        data = json.loads(frequency_data) if frequency_data else None
+    except json.JSONDecodeError as e:
+        raise ValueError(f"frequency_data isn't valid JSON: {e}")
+    return parse_frequency_data(frequency, data, anchor)
+
+
+def habit_rule(habit) -> RecurrenceRule:
+    """
+    The compiled rule of a habit.
+
+    Stored frequency_data that doesn't parse is logged and ignored, so one
+    bad habit can't break a listing.
+    """
+    try:
+        return compile_rule(habit.frequency, habit.frequency_data, habit.start_date)
+    except ValueError as e:
+        logger.warning(f"Ignoring invalid recurrence of habit {habit.id}: {e}")
+        return compile_rule(habit.frequency if habit.frequency in FREQUENCIES else 'daily', None, habit.start_date)
@@ -0,0 +1,199 @@
+"""
+Deadlines, retries and a circuit breaker for calls to the AI provider.
+
+A request gets a latency budget. Every attempt is given a timeout that fits
+in what is left of it, failed attempts are retried with jittered backoff
+while the budget allows, and a circuit breaker stops calling the provider
+after repeated failures or slow calls so requests fail fast instead of
+tying up worker threads.
+"""
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit breaker is open"""
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the latency budget runs out before a call could be made"""
+
+
+class Deadline:
+    """
+    A latency budget measured from creation.
+
+    Attributes:
+        budget (float): Total seconds available
+    """
+    def __init__(self, budget: float):
+        self.budget = budget
+        self._expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        return max(0.0, self._expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    Closed: calls go through. Open: calls are rejected until reset_timeout has
+    passed. Half-open: a single trial call decides whether to close again.
+
+    Attributes:
+        failure_threshold (int): Consecutive failures or slow calls that trip it
+        slow_call_threshold (float): Seconds after which a successful call counts as slow
+        reset_timeout (float): Seconds to stay open before allowing a trial call
+    """
+    def __init__(self, failure_threshold: int = 5, slow_call_threshold: float = 5.0, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = 'closed'
+        self._opened_at = 0.0
+        self._consecutive_failures = 0
+        self._trial_in_flight = False
+        self._stats = {
+            'trips': 0,
+            'rejected': 0,
+            'failures': 0,
+            'slow_calls': 0,
+            'successes': 0
+        }
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == 'open' and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = 'half_open'
+            self._trial_in_flight = False
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may be made now"""
+        with self._lock:
+            state = self._current_state()
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self._stats['rejected'] += 1
+            return False
+
+    def record_success(self, duration: float, slow_call_threshold: Optional[float] = None):
+        with self._lock:
+            if duration > (slow_call_threshold or self.slow_call_threshold):
+                self._stats['slow_calls'] += 1
+                self._record_bad_call()
+                return
+            self._stats['successes'] += 1
+            self._consecutive_failures = 0
+            self._state = 'closed'
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._stats['failures'] += 1
+            self._record_bad_call()
+
+    def _record_bad_call(self):
+        self._consecutive_failures += 1
+        if self._state == 'half_open' or self._consecutive_failures >= self.failure_threshold:
+            if self._state != 'open':
+                self._stats['trips'] += 1
+                logger.warning(f"Circuit breaker opened after {self._consecutive_failures} bad calls")
+            self._state = 'open'
+            self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['state'] = self._current_state()
+            stats['consecutive_failures'] = self._consecutive_failures
+        return stats
+
+
+def call_with_resilience(fn: Callable[[float], object], deadline: Deadline, breaker: Optional[CircuitBreaker] = None,
+                         max_retries: int = 2, call_timeout: float = 5.0, base_delay: float = 0.2,
+                         is_retryable: Callable[[Exception], bool] = lambda e: True,
+                         slow_call_threshold: Optional[float] = None):
+    """
+    Call fn with a per-attempt timeout, retries and circuit breaking.
+
+    Args:
+        fn (callable): Takes the attempt timeout in seconds and makes the call
+        deadline (Deadline): Budget for all attempts together
+        breaker (CircuitBreaker, optional): Breaker guarding the upstream
+        max_retries (int): Attempts after the first one
+        call_timeout (float): Upper bound for a single attempt in seconds
+        base_delay (float): Base for the jittered exponential backoff
+        is_retryable (callable): Decides whether an error is worth retrying
+        slow_call_threshold (float, optional): Override the breaker's slow-call
+            threshold for calls that are expected to take longer
+
+    Returns:
+        The result of fn. Raises CircuitOpenError, DeadlineExceeded or the
+        last error from fn.
+    """
+    attempt = 0
+    while True:
+        if breaker and not breaker.allow():
+            raise CircuitOpenError("Circuit breaker is open")
+
+        timeout = min(call_timeout, deadline.remaining())
+        if timeout <= 0:
+            raise DeadlineExceeded(f"Latency budget of {deadline.budget}s exhausted")
+
+        started = time.monotonic()
+        try:
+            result = fn(timeout)
+        except Exception as e:
+            if breaker:
+                breaker.record_failure()
+            attempt += 1
+            if attempt > max_retries or not is_retryable(e):
+                raise
+            # Full jitter, but never sleep past the deadline
+            delay = min(random.uniform(0, base_delay * (2 ** attempt)), deadline.remaining())
+            logger.info(f"Retrying upstream call in {delay:.2f}s after error: {e}")
+            time.sleep(delay)
+            continue
+
+        if breaker:
+            breaker.record_success(time.monotonic() - started, slow_call_threshold)
+        return result
+
+
+_breaker = None
+_breaker_lock = threading.Lock()
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Get the process-wide circuit breaker for the AI provider"""
+    global _breaker
+    if _breaker is None:
+        with _breaker_lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker(
+                    failure_threshold=int(os.getenv('CLASSIFIER_BREAKER_FAILURES', 5)),
+                    slow_call_threshold=float(os.getenv('CLASSIFIER_BREAKER_SLOW_CALL', 5)),
+                    reset_timeout=float(os.getenv('CLASSIFIER_BREAKER_RESET', 30))
+                )
+    return _breaker
@@ -0,0 +1,139 @@
+"""
+Ranked full-text search over a user's thoughts, todos and habits.
+
+Queries are reduced to their words, so user input never reaches the
+full-text query syntax: every word must match, after stemming, and the
+last one may be the start of a word, for search as you type. Matches in a
+title come before matches only in a description, newest first within each,
+and are paginated with a keyset cursor on (tier, created_at, kind, ID).
+
+Relevance scores like bm25 aren't part of the order: they depend on every
+other row in the index, so a row added or edited between two page fetches
+would shift the scores past the cursor and skip or repeat results. Whether
+a title matches only depends on the row itself.
+"""
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Float, case, exists, func, literal_column, select
+
+from app.models.db import db
+from app.models.habit import Habit
+from app.models.search_index import POSTGRES_CONFIG, search_index, search_index_fts
+from app.models.thought import Thought
+from app.models.todo import Todo
+from app.utils.helpers import APIError
+from app.utils.logger import get_logger
+from app.utils.pagination import SortKey, paginate
+
+logger = get_logger(__name__)
+
+# Words of a query after the first are ignored
+MAX_TERMS = 16
+
+# Results per page when a request has no limit
+DEFAULT_LIMIT = 20
+
+MODELS = {'thought': Thought, 'todo': Todo, 'habit': Habit}
+
+# Underscores separate words in both FTS5 and Postgres
+WORD = re.compile(r'[^\W_]+')
+
+# The FTS5 table's own name, as the subject of MATCH and bm25()
+fts_table = literal_column('search_index_fts')
+
+
+def query_terms(text: str) -> List[str]:
+    """
+    The words of a search query.
+
+    Raises:
+        APIError: If the query has no words
+    """
+    terms = WORD.findall((text or '').lower())[:MAX_TERMS]
+    if not terms:
+        raise APIError('q must contain a word', 400)
+    return terms
+
+
+def _fts5_query(terms: List[str]) -> str:
+    return ' '.join([f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*'])
+
+
+def _tsquery(terms: List[str]) -> str:
+    return ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+
+
+def _ranked(user_id: str, terms: List[str]):
+    """Subquery of the user's matches: kind, item_id, tier (0 if the title matches) and created_at"""
+    if db.engine.dialect.name == 'postgresql':
+        tsquery = func.to_tsquery(POSTGRES_CONFIG, _tsquery(terms))
+        # Only weight A, the title, counts
+        title_score = func.ts_rank(literal_column("'{0, 0, 0, 1}'::float4[]"), search_index.c.document, tsquery,
+                                   type_=Float)
+        query = db.session.query(search_index.c.kind, search_index.c.item_id).filter(
+            search_index.c.document.op('@@')(tsquery)
+        )
+    else:
+        # bm25 is negative for a match; with the description weighted zero, only title matches count
+        title_score = -func.bm25(fts_table, literal_column('1.0'), literal_column('0.0'), type_=Float)
+        query = db.session.query(search_index.c.kind, search_index.c.item_id).join(
+            search_index_fts, search_index.c.id == search_index_fts.c.rowid
+        ).filter(fts_table.op('MATCH')(_fts5_query(terms)))
+
+    created_at = case(
+        *[(search_index.c.kind == kind, select(model.created_at).where(model.id == search_index.c.item_id)
+           .scalar_subquery()) for kind, model in MODELS.items()]
+    )
+    query = query.add_columns(
+        case((title_score > 0, 0), else_=1).label('tier'),
+        created_at.label('created_at')
+    )
+
+    # Deleted habits are kept inactive, and hidden like in the timeline
+    deleted_habit = exists().where(Habit.id == search_index.c.item_id, Habit.is_active.is_(False))
+    query = query.filter(
+        search_index.c.user_id == user_id,
+        ~((search_index.c.kind == 'habit') & deleted_habit)
+    )
+    return query.subquery()
+
+
+def search(user_id: str, text: str, limit: int = DEFAULT_LIMIT,
+           cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    One page of a user's items matching a query, title matches first.
+
+    Args:
+        user_id (str): ID of the user
+        text (str): The search query
+        limit (int): Results per page
+        cursor (str, optional): next_cursor of the previous page
+
+    Returns:
+        tuple: ([{"type", "data"}], next_cursor); next_cursor is None on the last page
+
+    Raises:
+        APIError: If the query has no words or the cursor is invalid
+    """
+    ranked = _ranked(user_id, query_terms(text))
+    keys = [
+        SortKey(ranked.c.tier), SortKey(ranked.c.created_at, descending=True, nulls_last=True),
+        SortKey(ranked.c.kind), SortKey(ranked.c.item_id)
+    ]
+    rows, next_cursor = paginate(db.session.query(ranked), keys, limit, cursor)
+
+    # One query per kind on the page
+    ids = {}
+    for row in rows:
+        ids.setdefault(row.kind, []).append(row.item_id)
+    items = {}
+    for kind, item_ids in ids.items():
+        model = MODELS[kind]
+        for item in model.query.filter(model.id.in_(item_ids), model.user_id == user_id):
+            items[kind, item.id] = item
+
+    return [
+        {'type': row.kind, 'data': items[row.kind, row.item_id].to_dict()}
+        for row in rows if (row.kind, row.item_id) in items
+    ], next_cursor
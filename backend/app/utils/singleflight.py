@@ -0,0 +1,226 @@
+"""
+Request coalescing for identical in-flight classifications.
+
+Concurrent calls with the same key share one upstream call. Inside a process
+followers wait on the leader's thread. Across gunicorn workers the leader
+holds a row in a small SQLite lock table, and followers in other processes
+poll a shared lookup (the classification cache) until the leader's result
+shows up there.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple, Type
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class _Call:
+    """A call in flight in this process"""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key.
+
+    Attributes:
+        db_path (str): SQLite file holding the cross-process lock table,
+            or None to coalesce within this process only
+        lease (float): Seconds before another process's lock is considered stale
+        poll_interval (float): Seconds between checks while waiting on another process
+    """
+    def __init__(self, db_path: Optional[str] = None, lease: float = 30.0, poll_interval: float = 0.05):
+        self.db_path = db_path
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._owner = f"{os.getpid()}"
+        self._stats = {
+            'upstream_calls': 0,
+            'saved_in_process': 0,
+            'saved_across_processes': 0,
+            'lock_errors': 0
+        }
+        if db_path:
+            self._ensure_schema()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _ensure_schema(self):
+        try:
+            self._connect().execute(
+                'CREATE TABLE IF NOT EXISTS classification_inflight ('
+                ' key TEXT PRIMARY KEY,'
+                ' owner TEXT NOT NULL,'
+                ' expires_at REAL NOT NULL)'
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Singleflight lock table unavailable at '{self.db_path}': {e}")
+            self.db_path = None
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def do(self, key: str, fn: Callable, shared_lookup: Optional[Callable] = None,
+           private_errors: Tuple[Type[Exception], ...] = ()):
+        """
+        Run fn once for every concurrent caller with the same key.
+
+        Args:
+            key (str): Identity of the call
+            fn (callable): The upstream call
+            shared_lookup (callable, optional): Returns the leader's result once
+                it is visible to other processes, or None. Enables cross-process
+                coalescing.
+            private_errors (tuple): Error types that belong to the leader's
+                caller rather than to the call, like a per-user quota. Followers
+                don't share them and run the call again themselves.
+
+        Returns:
+            The result of fn (or of the shared lookup). Other errors raised by
+            the leader are re-raised in every waiting thread.
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is not None:
+                    call.followers += 1
+                    leader = False
+                else:
+                    call = _Call()
+                    self._calls[key] = call
+                    leader = True
+
+            if leader:
+                break
+            call.done.wait()
+            if isinstance(call.error, private_errors):
+                continue
+            self._count('saved_in_process')
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run_leader(key, fn, shared_lookup)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def _run_leader(self, key, fn, shared_lookup):
+        """Run fn, or wait for another process that is already running it"""
+        if not self.db_path or shared_lookup is None:
+            self._count('upstream_calls')
+            return fn()
+
+        while True:
+            if self._acquire(key):
+                try:
+                    self._count('upstream_calls')
+                    return fn()
+                finally:
+                    self._release(key)
+
+            # Another process holds the lock; wait for its result to be shared
+            while self._is_locked(key):
+                time.sleep(self.poll_interval)
+                result = shared_lookup()
+                if result is not None:
+                    self._count('saved_across_processes')
+                    return result
+
+            result = shared_lookup()
+            if result is not None:
+                self._count('saved_across_processes')
+                return result
+            # The other process finished without sharing a result; try ourselves
+
+    def _acquire(self, key) -> bool:
+        try:
+            conn = self._connect()
+            now = time.time()
+            conn.execute('DELETE FROM classification_inflight WHERE key = ? AND expires_at < ?', (key, now))
+            inserted = conn.execute(
+                'INSERT OR IGNORE INTO classification_inflight (key, owner, expires_at) VALUES (?, ?, ?)',
+                (key, self._owner, now + self.lease)
+            ).rowcount
+            return inserted == 1
+        except sqlite3.Error as e:
+            # Never block classification on the lock table
+            logger.warning(f"Singleflight lock failed: {e}")
+            self._count('lock_errors')
+            return True
+
+    def _release(self, key):
+        try:
+            self._connect().execute(
+                'DELETE FROM classification_inflight WHERE key = ? AND owner = ?',
+                (key, self._owner)
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Singleflight unlock failed: {e}")
+            self._count('lock_errors')
+
+    def _is_locked(self, key) -> bool:
+        try:
+            row = self._connect().execute(
+                'SELECT 1 FROM classification_inflight WHERE key = ? AND expires_at >= ?',
+                (key, time.time())
+            ).fetchone()
+            return row is not None
+        except sqlite3.Error:
+            self._count('lock_errors')
+            return False
+
+    def stats(self) -> Dict:
+        """Return call counters for this worker"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        stats['calls_saved'] = stats['saved_in_process'] + stats['saved_across_processes']
+        return stats
+
+
+_singleflight = None
+_singleflight_lock = threading.Lock()
+
+
+def get_singleflight() -> SingleFlight:
+    """
+    Get the process-wide classification singleflight.
+
+    The cross-process lock table lives in the classification cache database,
+    since followers in other processes read the leader's result from there.
+    """
+    global _singleflight
+    if _singleflight is None:
+        with _singleflight_lock:
+            if _singleflight is None:
+                cache_enabled = os.getenv('CLASSIFIER_CACHE_ENABLED', 'true').lower() == 'true'
+                _singleflight = SingleFlight(
+                    db_path=os.getenv('CLASSIFIER_CACHE_PATH', 'classifier_cache.db') if cache_enabled else None,
+                    lease=float(os.getenv('CLASSIFIER_SINGLEFLIGHT_LEASE', 30))
+                )
+    return _singleflight
@@ -0,0 +1,452 @@
+"""
+Rule-based extraction of dates, times and recurrence from English text.
+
+Handles the common phrasings users type into the single input field
+("tomorrow at 3pm", "by Friday", "every morning at 7", "june 20th") and
+resolves them against the user's local time. Anything that looks temporal
+but isn't understood is reported as unresolved so the caller can fall back
+to the AI classifier.
+"""
+import calendar
+import re
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+
+WEEKDAYS = {
+    'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3,
+    'friday': 4, 'saturday': 5, 'sunday': 6
+}
+
+# Abbreviations are only trusted after a preposition ("on sat", not "sat down")
+WEEKDAY_ABBREVIATIONS = {
+    'mon': 0, 'tue': 1, 'tues': 1, 'wed': 2, 'thu': 3, 'thur': 3, 'thurs': 3,
+    'fri': 4, 'sat': 5, 'sun': 6
+}
+
+MONTHS = {
+    'january': 1, 'jan': 1, 'february': 2, 'feb': 2, 'march': 3, 'mar': 3,
+    'april': 4, 'apr': 4, 'may': 5, 'june': 6, 'jun': 6, 'july': 7, 'jul': 7,
+    'august': 8, 'aug': 8, 'september': 9, 'sep': 9, 'sept': 9,
+    'october': 10, 'oct': 10, 'november': 11, 'nov': 11, 'december': 12, 'dec': 12
+}
+
+# Default times for vague parts of the day, matching the classifier prompt
+PARTS_OF_DAY = {
+    'morning': time(9, 0),
+    'afternoon': time(15, 0),
+    'evening': time(18, 0),
+    'night': time(20, 0),
+    'tonight': time(20, 0),
+    'noon': time(12, 0),
+    'midday': time(12, 0),
+    'midnight': time(0, 0)
+}
+
+NUMBER_WORDS = {
+    'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+    'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'couple': 2, 'few': 3
+}
+
+_WEEKDAY = r'(monday|tuesday|wednesday|thursday|friday|saturday|sunday)'
+_WEEKDAY_ANY = r'(monday|tuesday|wednesday|thursday|friday|saturday|sunday|mon|tues|tue|wed|thurs|thur|thu|fri|sat|sun)'
+_MONTH = r'(january|february|march|april|june|july|august|september|october|november|december|jan|feb|mar|apr|may|jun|jul|aug|sept|sep|oct|nov|dec)'
+_NUMBER = r'(\d+|a\s+couple(?:\s+of)?|a\s+few|a|an|one|two|three|four|five|six|seven|eight|nine|ten)'
+_PREPOSITION = r'(?:\b(?:on|by|before|until|till|due|for)\s+)?'
+
+# Words that mean the text still has temporal content after parsing
+_LEFTOVER_CUE_RE = re.compile(
+    r'\b(today|tonight|tomorrow|tmrw|yesterday|every|daily|weekly|monthly|yearly|annually|fortnight'
+    r'|weekend|noon|midnight|o\'?clock|biweekly|hourly)\b'
+    r'|\b' + _WEEKDAY + r's?\b'
+    r'|\b' + _MONTH + r'\.?\s+\d'
+    r'|\bnext\s+(week|month|year)\b'
+    r'|\bin\s+' + _NUMBER + r'\s+(minute|hour|day|week|month|year)s?\b'
+    r'|\b\d{1,2}(:\d{2})?\s*(am|pm)\b'
+    r'|\b\d{1,2}:\d{2}\b'
+    r'|\bat\s+\d'
+    r'|\b\d{1,2}/\d{1,2}\b'
+    r'|\b\d{1,2}(st|nd|rd|th)\b',
+    re.IGNORECASE
+)
+
+
+class TemporalResult:
+    """
+    Temporal information extracted from a piece of text.
+
+    Dates and times are local to the user, in the same formats the AI
+    classifier returns them.
+
+    Attributes:
+        due_date (str): "YYYY-MM-DD" or "YYYY-MM-DDTHH:MM:SS", or None
+        due_time (str): "HH:MM" time of day, or None
+        frequency (str): daily, weekly or monthly if the text is recurring
+        start_date (str): "YYYY-MM-DD" first occurrence of a recurrence
+        found (bool): Whether any temporal expression was recognised
+        unresolved (bool): Whether temporal-looking text was left unparsed
+        remainder (str): The text with recognised expressions removed
+        clock_relative (bool): Whether the due day depends on the current time
+            of day, for a time without a date ("at 5" is today or tomorrow)
+    """
+    def __init__(self):
+        self.due_date = None
+        self.due_time = None
+        self.frequency = None
+        self.start_date = None
+        self.found = False
+        self.unresolved = False
+        self.remainder = ''
+        self.clock_relative = False
+
+    def to_dict(self) -> Dict:
+        return {
+            'due_date': self.due_date,
+            'due_time': self.due_time,
+            'frequency': self.frequency,
+            'start_date': self.start_date,
+            'found': self.found,
+            'unresolved': self.unresolved,
+            'remainder': self.remainder,
+            'clock_relative': self.clock_relative
+        }
+
+    def __repr__(self):
+        return f"TemporalResult({self.to_dict()})"
+
+
+def _number(word: str) -> int:
+    if word.isdigit():
+        return int(word)
+    # "a couple of" -> "couple"
+    words = [w for w in word.lower().split() if w not in ('a', 'of')] or ['a']
+    return NUMBER_WORDS[words[0]]
+
+
+def _add_months(day: date, months: int) -> date:
+    month_index = day.month - 1 + months
+    year = day.year + month_index // 12
+    month = month_index % 12 + 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def _next_weekday(today: date, weekday: int, include_today: bool) -> date:
+    days_ahead = (weekday - today.weekday()) % 7
+    if days_ahead == 0 and not include_today:
+        days_ahead = 7
+    return today + timedelta(days=days_ahead)
+
+
+def _upcoming(today: date, month: int, day: int, year: Optional[int]) -> Optional[date]:
+    """The next date with this month and day (this year or next), or None if invalid"""
+    try:
+        if year is not None:
+            return date(year if year >= 100 else 2000 + year, month, day)
+        candidate = date(today.year, month, day)
+        if candidate < today:
+            candidate = date(today.year + 1, month, day)
+        return candidate
+    except ValueError:
+        return None
+
+
+class _Scanner:
+    """Matches patterns against the text and remembers which spans were used"""
+    def __init__(self, text: str):
+        self.text = text
+        self.used: List[Tuple[int, int]] = []
+
+    def _free(self, start, end):
+        return all(end <= used_start or start >= used_end for used_start, used_end in self.used)
+
+    def find(self, pattern: str):
+        """First match of pattern that doesn't overlap an earlier match"""
+        for match in re.finditer(pattern, self.text, re.IGNORECASE):
+            if self._free(match.start(), match.end()):
+                self.used.append((match.start(), match.end()))
+                return match
+        return None
+
+    def remainder(self) -> str:
+        chars = list(self.text)
+        for start, end in self.used:
+            for i in range(start, end):
+                chars[i] = ' '
+        return ''.join(chars)
+
+
+def _parse_frequency(scanner: _Scanner, today: date, result: TemporalResult, times: Dict):
+    match = scanner.find(r'\b(?:every|each)\s+(day|morning|afternoon|evening|night)\b')
+    if match:
+        result.frequency = 'daily'
+        if match.group(1).lower() != 'day':
+            times.setdefault('part_of_day', PARTS_OF_DAY[match.group(1).lower()])
+        return
+
+    if scanner.find(r'\b(daily|nightly|everyday|once\s+a\s+day)\b'):
+        result.frequency = 'daily'
+        return
+
+    match = scanner.find(r'\b(?:every|each)\s+' + _WEEKDAY_ANY + r'\b|\bon\s+' + _WEEKDAY + r's\b')
+    if match:
+        name = (match.group(1) or match.group(2)).lower()
+        weekday = WEEKDAYS.get(name, WEEKDAY_ABBREVIATIONS.get(name))
+        result.frequency = 'weekly'
+        result.start_date = _next_weekday(today, weekday, include_today=True).isoformat()
+        return
+
+    if scanner.find(r'\b(?:every|each)\s+week\b|\bweekly\b|\bonce\s+a\s+week\b'):
+        result.frequency = 'weekly'
+        return
+
+    if scanner.find(r'\b(?:every|each)\s+month\b|\bmonthly\b|\bonce\s+a\s+month\b'):
+        result.frequency = 'monthly'
+
+
+def _parse_time(scanner: _Scanner, times: Dict):
+    match = scanner.find(r'\b(?:at\s+|@\s*)?(\d{1,2})(?::(\d{2}))?\s*(a\.?m\.?|p\.?m\.?)(?=\W|$)')
+    if match:
+        hour, minute = int(match.group(1)), int(match.group(2) or 0)
+        meridiem = match.group(3).lower().replace('.', '')
+        if 1 <= hour <= 12 and minute < 60:
+            hour = hour % 12 + (12 if meridiem == 'pm' else 0)
+            times['explicit'] = time(hour, minute)
+        else:
+            times['invalid'] = True
+        return
+
+    match = scanner.find(r'\b(?:at\s+)?(\d{1,2}):(\d{2})\b')
+    if match:
+        hour, minute = int(match.group(1)), int(match.group(2))
+        if hour < 24 and minute < 60:
+            times['explicit'] = time(hour, minute)
+            times['bare_hour'] = hour <= 12
+        else:
+            times['invalid'] = True
+        return
+
+    match = scanner.find(r'\bat\s+(\d{1,2})(?:\s*o\'?clock)?\b(?!\s*(?:st|nd|rd|th|/|:|%|\.\d))')
+    if match:
+        hour = int(match.group(1))
+        if 1 <= hour <= 12:
+            times['explicit'] = time(hour % 12, 0)
+            times['bare_hour'] = True
+        elif hour < 24:
+            times['explicit'] = time(hour, 0)
+        else:
+            times['invalid'] = True
+
+
+def _parse_part_of_day(scanner: _Scanner, today: date, result: TemporalResult, times: Dict, dates: Dict):
+    match = scanner.find(r'\b(noon|midday|midnight)\b')
+    if match:
+        times.setdefault('part_of_day', PARTS_OF_DAY[match.group(1).lower()])
+
+    if scanner.find(r'\btonight\b'):
+        times.setdefault('part_of_day', PARTS_OF_DAY['tonight'])
+        dates.setdefault('date', today)
+
+    match = scanner.find(r'\b(?:in\s+the\s+|this\s+|at\s+)?(morning|afternoon|evening|night)\b')
+    if match:
+        times.setdefault('part_of_day', PARTS_OF_DAY[match.group(1).lower()])
+
+
+def _parse_date(scanner: _Scanner, now: datetime, times: Dict, dates: Dict):
+    today = now.date()
+
+    if scanner.find(_PREPOSITION + r'\b(?:the\s+)?day\s+after\s+tomorrow\b'):
+        dates['date'] = today + timedelta(days=2)
+        return
+    if scanner.find(_PREPOSITION + r'\b(tomorrow|tmrw|tmr|tomorow)\b'):
+        dates['date'] = today + timedelta(days=1)
+        return
+    if scanner.find(_PREPOSITION + r'\b(today|tdy)\b|\b(?:by\s+)?(?:the\s+)?end\s+of\s+(?:the\s+)?day\b'):
+        dates['date'] = today
+        return
+
+    match = scanner.find(r'\bin\s+' + _NUMBER + r'\s+(minute|min|hour|hr)s?\b|\bin\s+half\s+an\s+hour\b')
+    if match:
+        if match.group(1) is None:
+            moment = now + timedelta(minutes=30)
+        elif match.group(2).startswith('m'):
+            moment = now + timedelta(minutes=_number(match.group(1)))
+        else:
+            moment = now + timedelta(hours=_number(match.group(1)))
+        dates['date'] = moment.date()
+        times['explicit'] = moment.time().replace(second=0, microsecond=0)
+        times['exact'] = True
+        return
+
+    match = scanner.find(r'\bin\s+' + _NUMBER + r'\s+(day|week|month)s?\b')
+    if match:
+        amount, unit = _number(match.group(1)), match.group(2)
+        if unit == 'day':
+            dates['date'] = today + timedelta(days=amount)
+        elif unit == 'week':
+            dates['date'] = today + timedelta(weeks=amount)
+        else:
+            dates['date'] = _add_months(today, amount)
+        return
+
+    match = scanner.find(r'\b(\d{4})-(\d{2})-(\d{2})\b')
+    if match:
+        try:
+            dates['date'] = date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        except ValueError:
+            dates['invalid'] = True
+        return
+
+    match = scanner.find(
+        _PREPOSITION + r'\b' + _MONTH + r'\.?\s+(\d{1,2})(?:st|nd|rd|th)?(?:,?\s+(\d{4}))?\b'
+    )
+    if match:
+        month_name, day_number = match.group(1), match.group(2)
+    else:
+        match = scanner.find(
+            _PREPOSITION + r'\b(?:the\s+)?(\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?' + _MONTH + r'\b(?:,?\s+(\d{4}))?'
+        )
+        if match:
+            day_number, month_name = match.group(1), match.group(2)
+    if match:
+        year = int(match.group(3)) if match.group(3) else None
+        resolved = _upcoming(today, MONTHS[month_name.lower()], int(day_number), year)
+        if resolved:
+            dates['date'] = resolved
+        else:
+            dates['invalid'] = True
+        return
+
+    match = scanner.find(_PREPOSITION + r'\b(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?\b')
+    if match:
+        year = int(match.group(3)) if match.group(3) else None
+        resolved = _upcoming(today, int(match.group(1)), int(match.group(2)), year) if int(match.group(1)) <= 12 else None
+        if resolved:
+            dates['date'] = resolved
+        else:
+            dates['invalid'] = True
+        return
+
+    match = scanner.find(_PREPOSITION + r'\bthe\s+(\d{1,2})(?:st|nd|rd|th)\b')
+    if match:
+        day_number = int(match.group(1))
+        for months_ahead in range(0, 3):
+            candidate_month = _add_months(today.replace(day=1), months_ahead)
+            try:
+                candidate = candidate_month.replace(day=day_number)
+            except ValueError:
+                continue
+            if candidate >= today:
+                dates['date'] = candidate
+                return
+        dates['invalid'] = True
+        return
+
+    if scanner.find(r'\b(?:by\s+)?(?:the\s+)?end\s+of\s+(?:the\s+)?month\b'):
+        dates['date'] = today.replace(day=calendar.monthrange(today.year, today.month)[1])
+        return
+    if scanner.find(r'\bnext\s+month\b'):
+        dates['date'] = _add_months(today.replace(day=1), 1)
+        return
+    if scanner.find(r'\b(?:by\s+)?(?:the\s+)?end\s+of\s+(?:the\s+)?week\b|\b(?:by\s+|later\s+)?this\s+week\b'):
+        dates['date'] = _next_weekday(today, 4, include_today=True)
+        return
+    if scanner.find(r'\bnext\s+week\b'):
+        dates['date'] = _next_weekday(today, 0, include_today=False)
+        return
+    match = scanner.find(r'\b(?:on\s+|by\s+)?(this\s+|next\s+|the\s+)?weekend\b')
+    if match:
+        saturday = _next_weekday(today, 5, include_today=True)
+        if (match.group(1) or '').strip() == 'next':
+            saturday += timedelta(days=7)
+        dates['date'] = saturday
+        return
+
+    match = scanner.find(
+        r'\b(next|this|by|before|until|till|due|on|for)\s+' + _WEEKDAY_ANY + r'\b|\b' + _WEEKDAY + r'\b'
+    )
+    if match:
+        keyword = (match.group(1) or '').lower()
+        name = (match.group(2) or match.group(3)).lower()
+        weekday = WEEKDAYS.get(name, WEEKDAY_ABBREVIATIONS.get(name))
+        # "by friday" on a Friday means today, "next friday" never does
+        include_today = keyword in ('this', 'by', 'before', 'until', 'till', 'due')
+        dates['date'] = _next_weekday(today, weekday, include_today)
+
+
+def _resolve_time(times: Dict) -> Optional[time]:
+    explicit = times.get('explicit')
+    part_of_day = times.get('part_of_day')
+    if explicit is None:
+        return part_of_day
+    if times.get('bare_hour') and part_of_day is not None:
+        # "at 7" in the evening is 19:00
+        if part_of_day.hour >= 12 and explicit.hour < 12:
+            return explicit.replace(hour=explicit.hour + 12)
+        return explicit
+    if times.get('bare_hour') and 1 <= explicit.hour <= 6:
+        # Nobody means 3am by "at 3"
+        return explicit.replace(hour=explicit.hour + 12)
+    return explicit
+
+
+def _clean_remainder(text: str) -> str:
+    words = text.split()
+    # Drop connecting words left dangling by removed expressions
+    dangling = {'at', 'on', 'by', 'in', 'before', 'until', 'till', 'due', 'for', 'the', 'and', 'from', 'starting', ','}
+    while words and words[-1].lower().strip(',.') in dangling:
+        words.pop()
+    while words and words[0].lower().strip(',.') in {'at', 'on', 'by', 'in', ','}:
+        words.pop(0)
+    return ' '.join(words).strip(' ,.;:-')
+
+
+def parse_temporal(text: str, now_in_user_tz: datetime) -> TemporalResult:
+    """
+    Extract dates, times and recurrence from text.
+
+    Args:
+        text (str): Raw user input
+        now_in_user_tz (datetime): Current time in the user's timezone
+
+    Returns:
+        TemporalResult: Extracted values, resolved against now_in_user_tz
+    """
+    result = TemporalResult()
+    scanner = _Scanner(text)
+    today = now_in_user_tz.date()
+    times: Dict = {}
+    dates: Dict = {}
+
+    _parse_frequency(scanner, today, result, times)
+    _parse_date(scanner, now_in_user_tz, times, dates)
+    _parse_time(scanner, times)
+    _parse_part_of_day(scanner, today, result, times, dates)
+
+    remainder = scanner.remainder()
+    result.remainder = _clean_remainder(remainder)
+    result.found = bool(scanner.used)
+    result.unresolved = bool(
+        times.get('invalid') or dates.get('invalid') or _LEFTOVER_CUE_RE.search(remainder)
+    )
+
+    time_of_day = _resolve_time(times)
+    if time_of_day is not None:
+        result.due_time = time_of_day.strftime('%H:%M')
+
+    if result.frequency:
+        if dates.get('date') and not result.start_date:
+            result.start_date = dates['date'].isoformat()
+        return result
+
+    due_day = dates.get('date')
+    if due_day is None and time_of_day is not None:
+        # A bare time means the next time the clock shows it
+        due_day = today if time_of_day > now_in_user_tz.time().replace(tzinfo=None) else today + timedelta(days=1)
+        result.clock_relative = True
+
+    if due_day is not None:
+        if time_of_day is not None:
+            result.due_date = datetime.combine(due_day, time_of_day).strftime('%Y-%m-%dT%H:%M:%S')
+        else:
+            result.due_date = due_day.isoformat()
+
+    return result
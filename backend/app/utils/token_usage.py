@@ -0,0 +1,200 @@
+"""
+Token accounting for classifier requests.
+
+Every model call made while classifying an input is attributed to that
+request, and when the request finishes its input, output and cached prefix
+tokens are written to a ledger table in the shared classifier database,
+together with the content type the input ended up as. `flask classifier
+usage` reports the spend per content type.
+"""
+import contextvars
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_current = contextvars.ContextVar('classifier_request_usage', default=None)
+
+
+class RequestUsage:
+    """
+    Tokens spent by the model calls of one classification request.
+
+    Attributes:
+        kind (str): 'single' or 'batch'
+        content_types (list): Resulting content type per input, None if unclassified
+    """
+    def __init__(self, kind: str = 'single'):
+        self.kind = kind
+        self.content_types: List[Optional[str]] = [None]
+        self.models: List[str] = []
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cached_tokens = 0
+
+    def add(self, model: Optional[str], input_tokens: int, output_tokens: int, cached_tokens: int = 0):
+        self.models.append(model or '')
+        self.input_tokens += input_tokens or 0
+        self.output_tokens += output_tokens or 0
+        self.cached_tokens += cached_tokens or 0
+
+    @property
+    def calls(self) -> int:
+        return len(self.models)
+
+
+@contextmanager
+def track_request(kind: str = 'single'):
+    """
+    Attribute model calls made inside the block to one request.
+
+    The usage is written to the ledger when the block exits, also when it
+    raises. Set `content_types` on the yielded object before leaving.
+    """
+    usage = RequestUsage(kind)
+    token = _current.set(usage)
+    try:
+        yield usage
+    finally:
+        _current.reset(token)
+        ledger = get_usage_ledger()
+        if ledger and usage.calls:
+            ledger.record(usage)
+
+
+def record_call(model: Optional[str], input_tokens: int, output_tokens: int, cached_tokens: int = 0):
+    """Attribute one model call to the request being tracked, if any"""
+    usage = _current.get()
+    if usage is not None:
+        usage.add(model, input_tokens, output_tokens, cached_tokens)
+
+
+class UsageLedger:
+    """
+    Persistent per-request token usage.
+
+    Batch requests are written as one row per input, with the tokens split
+    evenly between the inputs.
+
+    Attributes:
+        db_path (str): Path to the shared SQLite file
+    """
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._ensure_schema()
+
+    def _connect(self):
+        """Get this thread's connection to the shared database"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _ensure_schema(self):
+        try:
+            conn = self._connect()
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS classification_usage ('
+                ' request_id TEXT NOT NULL,'
+                ' created_at REAL NOT NULL,'
+                ' kind TEXT NOT NULL,'
+                ' content_type TEXT,'
+                ' models TEXT NOT NULL,'
+                ' calls INTEGER NOT NULL,'
+                ' input_tokens INTEGER NOT NULL,'
+                ' output_tokens INTEGER NOT NULL,'
+                ' cached_tokens INTEGER NOT NULL)'
+            )
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS ix_classification_usage_created '
+                'ON classification_usage (created_at)'
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Token usage ledger unavailable at '{self.db_path}': {e}")
+
+    def record(self, usage: RequestUsage):
+        request_id = str(uuid.uuid4())
+        now = time.time()
+        items = len(usage.content_types) or 1
+        models = ','.join(usage.models)
+
+        def share(total, position):
+            return total // items + (1 if position < total % items else 0)
+
+        rows = [
+            (request_id, now, usage.kind, content_type, models, usage.calls,
+             share(usage.input_tokens, i), share(usage.output_tokens, i), share(usage.cached_tokens, i))
+            for i, content_type in enumerate(usage.content_types)
+        ]
+        try:
+            conn = self._connect()
+            conn.executemany('INSERT INTO classification_usage VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not record token usage: {e}")
+
+    def report(self, since: Optional[float] = None) -> List[Dict]:
+        """
+        Token spend grouped by content type.
+
+        Args:
+            since (float, optional): Only count requests after this Unix time
+
+        Returns:
+            list: One dict per content type, most expensive first
+        """
+        rows = self._connect().execute(
+            'SELECT COALESCE(content_type, \'unclassified\'), COUNT(*), SUM(calls),'
+            ' SUM(input_tokens), SUM(output_tokens), SUM(cached_tokens)'
+            ' FROM classification_usage WHERE created_at >= ?'
+            ' GROUP BY 1 ORDER BY SUM(input_tokens) + SUM(output_tokens) DESC',
+            (since or 0,)
+        ).fetchall()
+        return [
+            {
+                'content_type': content_type,
+                'items': items,
+                'calls': calls,
+                'input_tokens': input_tokens,
+                'output_tokens': output_tokens,
+                'cached_tokens': cached_tokens,
+                'avg_input_tokens': round(input_tokens / items, 1),
+                'avg_output_tokens': round(output_tokens / items, 1)
+            }
+            for content_type, items, calls, input_tokens, output_tokens, cached_tokens in rows
+        ]
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_usage_ledger() -> Optional[UsageLedger]:
+    """
+    Get the process-wide token usage ledger, configured from the environment.
+
+    Returns:
+        UsageLedger or None: None when CLASSIFIER_USAGE_ENABLED is false
+    """
+    global _ledger
+    if os.getenv('CLASSIFIER_USAGE_ENABLED', 'true').lower() != 'true':
+        return None
+    if _ledger is None:
+        with _ledger_lock:
+            if _ledger is None:
+                _ledger = UsageLedger(
+                    os.getenv('CLASSIFIER_USAGE_PATH') or os.getenv('CLASSIFIER_CACHE_PATH', 'classifier_cache.db')
+                )
+    return _ledger
@@ -0,0 +1,172 @@
+"""
+Benchmark POST /api/content throughput against a mock Gemini server.
+
+Runs the app in-process on a throwaway SQLite database, with the classifier
+pointed at the local Gemini stand-in, and reports throughput and latency
+percentiles. No network access or API key is needed.
+
+    python benchmarks/bench_create_content.py --requests 500 --concurrency 16 --error-rate 0.02
+
+With --users and --noisy-share one user sends a share of the traffic and the
+others split the rest; latency is then reported per user, to check that the
+fair scheduler keeps the quiet users' tail latency flat.
+
+    python benchmarks/bench_create_content.py --users 5 --noisy-share 0.8 --slots 4
+"""
+import sys
+import os
+# Add the parent directory to sys.path
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(BACKEND_DIR)
+
+import argparse
+import json
+import random
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+INPUTS = [
+    "Remember to call mom tonight at 8pm",
+    "I'm feeling really anxious about the presentation tomorrow",
+    "Buy milk from the store",
+    "I wonder if I made the right decision taking this job",
+    "Submit the report by Friday afternoon",
+    "meditate at 7am every day",
+    "Life has been so challenging lately, I need to find more balance",
+    "pay rent on the 1st",
+    "call the dentist next week",
+    "go for a run every morning",
+    "water plants every other day",
+    "pick up dry cleaning",
+]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency-median', type=float, default=0.4)
+    parser.add_argument('--latency-p99', type=float, default=2.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--cache', action='store_true', help='Keep the classification cache enabled')
+    parser.add_argument('--users', type=int, default=1)
+    parser.add_argument('--noisy-share', type=float, default=0.0,
+                        help='Share of the requests sent by the first user')
+    parser.add_argument('--slots', type=int, default=8, help='Concurrent classifier calls (CLASSIFIER_SLOTS)')
+    parser.add_argument('--quota', type=float, default=0,
+                        help='Requests per minute per user (CLASSIFIER_QUOTA_PER_MINUTE), 0 for no quota')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-content-')
+    os.chdir(workdir)
+
+    from app.utils.mock_gemini import MockGeminiServer
+
+    server = MockGeminiServer(
+        latency_median=args.latency_median, latency_p99=args.latency_p99,
+        error_rate=args.error_rate, seed=args.seed
+    )
+    server.start()
+
+    # Configure the app before it's imported, module constants read the environment
+    os.environ.update({
+        'API_KEY': 'mock',
+        'GEMINI_BASE_URL': server.base_url,
+        'CLASSIFIER_BACKEND': 'gemini',
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'CLASSIFIER_CACHE_PATH': os.path.join(workdir, 'classifier_cache.db'),
+        'CLASSIFIER_CACHE_ENABLED': 'true' if args.cache else 'false',
+        'CLASSIFIER_LOCAL_ENABLED': 'false',
+        'CLASSIFIER_QUEUE_AUTOSTART': 'false',
+        'CLASSIFIER_SLOTS': str(args.slots),
+        'CLASSIFIER_QUOTA_PER_MINUTE': str(args.quota),
+    })
+
+    from app import create_app
+    from app.models.db import db
+    from app.utils.resilience import get_circuit_breaker
+    from app.utils.fair_scheduler import get_fair_scheduler
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+
+    client = app.test_client()
+    users = []
+    for n in range(max(1, args.users)):
+        response = client.post('/api/auth/register', json={
+            'name': f'Bench {n}', 'email': f'bench{n}@example.com', 'password': 'bench-password'
+        })
+        users.append({'Authorization': f"Bearer {response.get_json()['token']}"})
+
+    # The first user sends noisy_share of the requests, the others split the rest
+    rng = random.Random(args.seed)
+
+    def pick_user():
+        if not args.noisy_share or len(users) == 1:
+            return rng.randrange(len(users))
+        return 0 if rng.random() < args.noisy_share else rng.randrange(1, len(users))
+
+    owners = [pick_user() for _ in range(args.requests)]
+
+    def create(i):
+        user = owners[i]
+        started = time.perf_counter()
+        response = app.test_client().post('/api/content', headers=users[user], json={
+            'text': INPUTS[i % len(INPUTS)], 'timezone': 'America/New_York'
+        })
+        body = response.get_json() or {}
+        return time.perf_counter() - started, response.status_code, body.get('type'), user
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(create, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, _, _, _ in results]
+    report = {
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_rps': round(args.requests / elapsed, 2),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50) * 1000, 1),
+            'p95': round(percentile(latencies, 0.95) * 1000, 1),
+            'p99': round(percentile(latencies, 0.99) * 1000, 1),
+            'max': round(max(latencies) * 1000, 1)
+        },
+        'status_codes': dict(Counter(status for _, status, _, _ in results)),
+        'types': dict(Counter(content_type for _, _, content_type, _ in results)),
+        'upstream': server.stats(),
+        'circuit_breaker': get_circuit_breaker().stats()
+    }
+    if len(users) > 1:
+        report['per_user'] = {}
+        for user in range(len(users)):
+            mine = [latency for latency, _, _, owner in results if owner == user]
+            report['per_user'][f"{'noisy' if user == 0 else 'quiet'}-{user}"] = {
+                'requests': len(mine),
+                'p50_ms': round(percentile(mine, 0.50) * 1000, 1),
+                'p95_ms': round(percentile(mine, 0.95) * 1000, 1),
+                'max_ms': round(max(mine, default=0) * 1000, 1)
+            }
+        report['scheduler'] = {
+            key: value for key, value in get_fair_scheduler().stats().items() if key != 'users'
+        }
+    print(json.dumps(report, indent=2))
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark habit instance compaction: rows, database size and read time.
+
+Stores a year of daily instances for a number of habits on a throwaway
+SQLite database, about two thirds of them completed, then compacts the
+closed months. Reports the rows, the database file size after VACUUM, and
+the time to list the year and to compute analytics, before and after.
+
+    python benchmarks/bench_habit_compaction.py --habits 20 --days 365
+"""
+import sys
+import os
+# Add the parent directory to sys.path
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(BACKEND_DIR)
+
+import argparse
+import json
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--habits', type=int, default=20)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--repeat', type=int, default=5, help='Reads per measurement')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-compaction-')
+    db_path = os.path.join(workdir, 'bench.db')
+    os.chdir(workdir)
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{db_path}",
+        'CLASSIFIER_BACKEND': 'local',
+        'CLASSIFIER_QUEUE_AUTOSTART': 'false',
+    })
+
+    from app import create_app
+    from app.models.db import db
+    from app.models.habit import Habit, HabitInstance, HabitMonth
+    from app.models.user import User
+    from app.utils.habit_analytics import compute_analytics
+    from app.utils.habit_compaction import compact_instances
+    from app.utils.habit_instances import instance_id, list_instances
+
+    app = create_app()
+    random.seed(1)
+    today = date.today()
+    start = today - timedelta(days=args.days)
+
+    def measure(user_id):
+        db.session.execute(db.text('VACUUM'))
+        timings = {}
+        for name, read in (('list_ms', lambda: list_instances(user_id, start, today)),
+                           ('analytics_ms', lambda: compute_analytics(user_id, today))):
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                read()
+                db.session.expire_all()
+            timings[name] = round((time.perf_counter() - started) / args.repeat * 1000, 1)
+        return {
+            'instance_rows': HabitInstance.query.count(),
+            'month_rows': HabitMonth.query.count(),
+            'db_bytes': os.path.getsize(db_path),
+            **timings
+        }
+
+    with app.app_context():
+        db.create_all()
+        user = User(name='Bench', email='bench@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        habits = [
+            Habit(user_id=user.id, title=f'habit {n}', frequency='daily', start_date=start)
+            for n in range(args.habits)
+        ]
+        db.session.add_all(habits)
+        db.session.flush()
+
+        now = datetime.utcnow()
+        db.session.execute(HabitInstance.__table__.insert(), [
+            {
+                'id': instance_id(habit.id, start + timedelta(days=offset)),
+                'habit_id': habit.id,
+                'user_id': user.id,
+                'due_date': start + timedelta(days=offset),
+                'completed': done,
+                'completed_at': now if done else None,
+                'skipped': not done and random.random() < 0.2,
+                'deleted': False,
+                'created_at': now,
+                'updated_at': now
+            }
+            for habit in habits
+            for offset in range(args.days + 1)
+            for done in (random.random() < 0.66,)
+        ])
+        db.session.commit()
+
+        before = measure(user.id)
+        report = compact_instances()
+        after = measure(user.id)
+
+    print(json.dumps({'before': before, 'compaction': report, 'after': after}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
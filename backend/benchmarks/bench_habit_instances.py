@@ -0,0 +1,82 @@
+"""
+Benchmark habit instance generation: queries and time per batch of habits.
+
+Creates daily habits on a throwaway SQLite database and times
+generate_instances for growing batches, counting the SQL statements it
+issues. The statement count stays constant as the batch grows.
+
+    python benchmarks/bench_habit_instances.py --sizes 1 10 100 1000
+"""
+import sys
+import os
+# Add the parent directory to sys.path
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(BACKEND_DIR)
+
+import argparse
+import json
+import tempfile
+import time
+from datetime import date
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100, 1000])
+    parser.add_argument('--frequency', choices=['daily', 'weekly', 'monthly'], default='daily')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-habits-')
+    os.chdir(workdir)
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'CLASSIFIER_BACKEND': 'local',
+        'CLASSIFIER_QUEUE_AUTOSTART': 'false',
+    })
+
+    from sqlalchemy import event
+
+    from app import create_app
+    from app.models.db import db
+    from app.models.habit import Habit
+    from app.models.user import User
+    from app.utils.habit_instances import generate_instances
+
+    app = create_app()
+    statements = []
+
+    with app.app_context():
+        db.create_all()
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+        results = []
+        for size in args.sizes:
+            user = User(name='Bench', email=f'bench{size}@example.com', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            db.session.add_all(
+                Habit(user_id=user.id, title=f'habit {n}', frequency=args.frequency, start_date=date.today())
+                for n in range(size)
+            )
+            db.session.commit()
+            habits = Habit.query.filter_by(user_id=user.id).all()
+
+            statements.clear()
+            started = time.perf_counter()
+            inserted = generate_instances(habits)
+            elapsed = time.perf_counter() - started
+            queries = len(statements)
+
+            results.append({
+                'habits': size,
+                'rows_inserted': inserted,
+                'queries': queries,
+                'queries_per_habit': round(queries / size, 4),
+                'elapsed_ms': round(elapsed * 1000, 1)
+            })
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark keyset pagination: latency of page 1 versus deep pages.
+
+Stores many thoughts and todos for one user on a throwaway SQLite database
+and times GET /api/thoughts and /api/todos for the first page and for deep
+pages reached with a cursor, next to the same pages fetched with OFFSET.
+Keyset pages cost the same however deep they are; OFFSET pages grow with
+their depth. The merged GET /api/content timeline is timed for a page
+next to the whole unpaginated timeline.
+
+    python benchmarks/bench_pagination.py --rows 50000 --limit 20 --pages 1 100 1000
+"""
+import sys
+import os
+# Add the parent directory to sys.path
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(BACKEND_DIR)
+
+import argparse
+import json
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=20, help='Requests per measurement')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-pagination-')
+    os.chdir(workdir)
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'CLASSIFIER_BACKEND': 'local',
+        'CLASSIFIER_QUEUE_AUTOSTART': 'false',
+    })
+
+    from flask_jwt_extended import create_access_token
+
+    from app import create_app
+    from app.api.thoughts import THOUGHT_ORDER
+    from app.api.todos import TODO_ORDER
+    from app.models.db import db
+    from app.models.thought import Thought
+    from app.models.todo import Todo
+    from app.models.user import User
+    from app.utils.pagination import encode_cursor, ordered
+
+    app = create_app()
+    client = app.test_client()
+    random.seed(1)
+
+    with app.app_context():
+        db.create_all()
+        user = User(name='Bench', email='bench@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        headers = {'Authorization': f'Bearer {create_access_token(identity=user.id)}'}
+
+        now = datetime.utcnow()
+        db.session.execute(Thought.__table__.insert(), [
+            {'id': str(uuid.uuid4()), 'user_id': user.id, 'content': f'thought {n}',
+             'created_at': now - timedelta(minutes=n), 'updated_at': now}
+            for n in range(args.rows)
+        ])
+        db.session.execute(Todo.__table__.insert(), [
+            {'id': str(uuid.uuid4()), 'user_id': user.id, 'title': f'todo {n}', 'completed': random.random() < 0.5,
+             'due_date': now + timedelta(hours=random.randint(0, 2000)) if random.random() < 0.7 else None,
+             'created_at': now - timedelta(minutes=n), 'updated_at': now}
+            for n in range(args.rows)
+        ])
+        db.session.commit()
+
+        results = []
+        for path, model, keys in (('/api/thoughts', Thought, THOUGHT_ORDER), ('/api/todos', Todo, TODO_ORDER)):
+            query = ordered(model.query.filter_by(user_id=user.id), keys)
+            for page in args.pages:
+                skip = (page - 1) * args.limit
+                cursor = None
+                if skip:
+                    last = query.offset(skip - 1).first()
+                    cursor = encode_cursor([getattr(last, key.column.key) for key in keys])
+
+                params = {'limit': args.limit, **({'cursor': cursor} if cursor else {})}
+                started = time.perf_counter()
+                for _ in range(args.repeat):
+                    response = client.get(path, query_string=params, headers=headers)
+                keyset = (time.perf_counter() - started) / args.repeat
+                assert response.status_code == 200 and len(response.get_json()['items']) == args.limit
+
+                started = time.perf_counter()
+                for _ in range(args.repeat):
+                    [row.to_dict() for row in query.offset(skip).limit(args.limit).all()]
+                    db.session.expire_all()
+                offset = (time.perf_counter() - started) / args.repeat
+
+                results.append({
+                    'path': path,
+                    'page': page,
+                    'keyset_ms': round(keyset * 1000, 2),
+                    'offset_ms': round(offset * 1000, 2)
+                })
+
+        # The whole timeline is slow with many rows, so it's fetched once
+        timeline = {}
+        for name, params, repeat in (('page_ms', {'limit': args.limit}, args.repeat), ('everything_ms', {}, 1)):
+            started = time.perf_counter()
+            for _ in range(repeat):
+                response = client.get('/api/content', query_string=params, headers=headers)
+            assert response.status_code == 200
+            timeline[name] = round((time.perf_counter() - started) / repeat * 1000, 2)
+
+    print(json.dumps({'rows': args.rows, 'limit': args.limit, 'results': results, 'timeline': timeline}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark expanding habit recurrence rules into occurrence dates.
+
+Expands a mix of daily, weekday, every-N-days, weekly and nth-weekday
+habits over a date window, first with cold rule caches (parsing
+frequency_data) and then warm, and reports the time per habit.
+
+    python benchmarks/bench_recurrence.py --habits 5000 --days 90
+"""
+import sys
+import os
+# Add the parent directory to sys.path
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(BACKEND_DIR)
+
+import argparse
+import json
+import random
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from app.utils.recurrence import compile_rule, habit_rule
+
+RULES = [
+    ('daily', None),
+    ('daily', {'weekdays': ['mon', 'wed', 'fri']}),
+    ('daily', {'interval': 3}),
+    ('weekly', {'weekdays': ['tue', 'thu'], 'interval': 2}),
+    ('weekly', None),
+    ('monthly', {'nth_weekday': [{'n': 2, 'weekday': 'tue'}, {'n': -1, 'weekday': 'fri'}]}),
+    ('monthly', {'interval': 3}),
+    ('daily', {'exclude': ['2024-12-25', '2025-01-01']}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--habits', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    today = date.today()
+    habits = []
+    for n in range(args.habits):
+        frequency, data = rng.choice(RULES)
+        habits.append(SimpleNamespace(
+            id=str(n), frequency=frequency, frequency_data=json.dumps(data) if data else None,
+            start_date=today - timedelta(days=rng.randrange(365))
+        ))
+
+    end = today + timedelta(days=args.days)
+    report = {'habits': args.habits, 'days': args.days}
+    for run in ('cold', 'warm'):
+        if run == 'cold':
+            compile_rule.cache_clear()
+        started = time.perf_counter()
+        occurrences = sum(len(habit_rule(habit).occurrences(today, end)) for habit in habits)
+        elapsed = time.perf_counter() - started
+        report[run] = {
+            'occurrences': occurrences,
+            'elapsed_ms': round(elapsed * 1000, 1),
+            'us_per_habit': round(elapsed / args.habits * 1e6, 2)
+        }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
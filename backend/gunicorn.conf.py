@@ -0,0 +1,15 @@
+"""
+Gunicorn configuration, picked up automatically by `gunicorn run:app`.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+
+def post_fork(server, worker):
+    # Create the Gemini client and open a connection in each worker, so the
+    # first classification doesn't pay for client setup and the TLS handshake
+    from app.utils.classifier_backends import warm_classifier_backend
+    warm_classifier_backend()
@@ -15,7 +15,10 @@ from app.models.db import db
 from app.models.user import User
 from app.models.thought import Thought
 from app.models.todo import Todo
-from app.models.habit import Habit, HabitInstance
+from app.models.habit import Habit, HabitInstance, HabitMonth
+from app.models.pending_content import PendingContent
+from app.models.idempotency_key import IdempotencyKey
+from app.models import search_index  # Creates the search index with the tables
 
 def init_db():
     """Initialize the database with tables"""
@@ -0,0 +1,53 @@
+"""one habit instance per habit and day
+
+Removes duplicate instances, keeping the one with the most user state,
+then adds the unique (habit_id, due_date) constraint that generation
+relies on.
+
+Revision ID: 7c1f4b8e2d35
+Revises: 5d9e2a7c4b13
+Create Date: 2026-10-17 04:15:30.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1f4b8e2d35'
+down_revision = '5d9e2a7c4b13'
+branch_labels = None
+depends_on = None
+
+UNIQUE_DAY = 'uq_habit_instances_habit_id_due_date'
+
+# Of several instances for the same habit and day, keep the one with the most user state
+DELETE_DUPLICATE_INSTANCES = """
+DELETE FROM habit_instances WHERE id IN (
+    SELECT id FROM (
+        SELECT id, ROW_NUMBER() OVER (
+            PARTITION BY habit_id, due_date
+            ORDER BY CASE WHEN completed THEN 1 ELSE 0 END DESC,
+                     CASE WHEN skipped THEN 1 ELSE 0 END DESC,
+                     updated_at DESC, id
+        ) AS position
+        FROM habit_instances
+    ) ranked
+    WHERE position > 1
+)
+"""
+
+
+def upgrade():
+    # Databases created with db.create_all() may already have it
+    unique = {constraint['name'] for constraint in sa.inspect(op.get_bind()).get_unique_constraints('habit_instances')}
+    if UNIQUE_DAY in unique:
+        return
+    op.execute(DELETE_DUPLICATE_INSTANCES)
+    with op.batch_alter_table('habit_instances') as batch_op:
+        batch_op.create_unique_constraint(UNIQUE_DAY, ['habit_id', 'due_date'])
+
+
+def downgrade():
+    with op.batch_alter_table('habit_instances') as batch_op:
+        batch_op.drop_constraint(UNIQUE_DAY, type_='unique')
@@ -0,0 +1,30 @@
+"""tombstones for deleted habit instances
+
+Revision ID: 9e3a6d1c5f47
+Revises: 7c1f4b8e2d35
+Create Date: 2026-10-17 04:15:40.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e3a6d1c5f47'
+down_revision = '7c1f4b8e2d35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created with db.create_all() may already have it
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('habit_instances')}
+    if 'deleted' in columns:
+        return
+    with op.batch_alter_table('habit_instances') as batch_op:
+        batch_op.add_column(sa.Column('deleted', sa.Boolean(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('habit_instances') as batch_op:
+        batch_op.drop_column('deleted')
@@ -0,0 +1,30 @@
+"""habit materializer watermark
+
+Revision ID: a2f8c4e6b031
+Revises: 9e3a6d1c5f47
+Create Date: 2026-10-17 04:15:50.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a2f8c4e6b031'
+down_revision = '9e3a6d1c5f47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created with db.create_all() may already have it
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('habits')}
+    if 'materialized_through' in columns:
+        return
+    with op.batch_alter_table('habits') as batch_op:
+        batch_op.add_column(sa.Column('materialized_through', sa.Date(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('habits') as batch_op:
+        batch_op.drop_column('materialized_through')
@@ -0,0 +1,40 @@
+"""compacted months of habit instances
+
+Revision ID: b7d5e9a3c146
+Revises: a2f8c4e6b031
+Create Date: 2026-10-17 04:16:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d5e9a3c146'
+down_revision = 'a2f8c4e6b031'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created with db.create_all() may already have it
+    if sa.inspect(op.get_bind()).has_table('habit_months'):
+        return
+    op.create_table(
+        'habit_months',
+        sa.Column('habit_id', sa.String(length=36), nullable=False),
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('user_id', sa.String(length=36), nullable=False),
+        sa.Column('completed', sa.Integer(), nullable=False),
+        sa.Column('skipped', sa.Integer(), nullable=False),
+        sa.Column('deleted', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['habit_id'], ['habits.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('habit_id', 'month')
+    )
+    op.create_index('ix_habit_months_user_id_month', 'habit_months', ['user_id', 'month'])
+
+
+def downgrade():
+    op.drop_index('ix_habit_months_user_id_month', table_name='habit_months')
+    op.drop_table('habit_months')
@@ -0,0 +1,60 @@
+"""composite indexes for list endpoints
+
+Every list endpoint filters by user; these indexes turn those full table
+scans into range scans in the listing's order:
+
+- thoughts, habits and todos by (user_id, created_at, id), for listings,
+  the timeline and their cursors
+- todos by (user_id, completed, due_date IS NULL, due_date, created_at
+  DESC, id DESC), the exact /api/todos order, so it needs no sort
+- todos by (user_id, due_date), for day and date-range windows
+- habit_instances by (user_id, due_date); (habit_id, due_date) is already
+  indexed by its unique constraint
+
+Revision ID: c4e8a1b59d23
+Revises: b7d5e9a3c146
+Create Date: 2026-10-17 04:17:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8a1b59d23'
+down_revision = 'b7d5e9a3c146'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_thoughts_user_id_created_at', 'thoughts', ['user_id', 'created_at', 'id']),
+    ('ix_habits_user_id_created_at', 'habits', ['user_id', 'created_at', 'id']),
+    ('ix_todos_user_id_completed_due_date', 'todos', [
+        'user_id', 'completed', sa.text('(due_date IS NULL)'), 'due_date',
+        sa.text('created_at DESC'), sa.text('id DESC')
+    ]),
+    ('ix_todos_user_id_due_date', 'todos', ['user_id', 'due_date']),
+    ('ix_todos_user_id_created_at', 'todos', ['user_id', 'created_at', 'id']),
+    ('ix_habit_instances_user_id_due_date', 'habit_instances', ['user_id', 'due_date']),
+]
+
+
+def _index_names(table):
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        # SQLite can't reflect expression indexes, so read them from the catalog
+        return set(bind.execute(
+            sa.text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table"), {'table': table}
+        ).scalars())
+    return {index['name'] for index in sa.inspect(bind).get_indexes(table)}
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        if name not in _index_names(table):
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,31 @@
+"""full-text search index
+
+The search index over thoughts, todos and habits (an FTS5 table on
+SQLite, a tsvector table on Postgres) and the triggers that keep it in
+sync, populated from the existing rows. The DDL lives in
+app/models/search_index.py, since db.create_all() runs it too.
+
+Revision ID: e5f1b7c2a934
+Revises: c4e8a1b59d23
+Create Date: 2026-10-17 05:02:00.000000
+
+"""
+from alembic import op
+
+from app.models.search_index import create_search_index, drop_search_index, rebuild_search_index
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5f1b7c2a934'
+down_revision = 'c4e8a1b59d23'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    create_search_index(op.get_bind())
+    rebuild_search_index(op.get_bind())
+
+
+def downgrade():
+    drop_search_index(op.get_bind())
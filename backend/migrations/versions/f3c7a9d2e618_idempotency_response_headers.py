@@ -0,0 +1,30 @@
+"""headers of stored idempotent responses
+
+Revision ID: f3c7a9d2e618
+Revises: e5f1b7c2a934
+Create Date: 2026-10-17 09:40:10.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c7a9d2e618'
+down_revision = 'e5f1b7c2a934'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created with db.create_all() may already have it
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('idempotency_keys')}
+    if 'response_headers' in columns:
+        return
+    with op.batch_alter_table('idempotency_keys') as batch_op:
+        batch_op.add_column(sa.Column('response_headers', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('idempotency_keys') as batch_op:
+        batch_op.drop_column('response_headers')
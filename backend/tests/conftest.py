@@ -0,0 +1,99 @@
+"""
+Shared fixtures: the Flask app, test users and the classifier backend
+"""
+import sys
+import os
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Run offline: deterministic classifier, no shared cache files, no background workers
+os.environ.setdefault('CLASSIFIER_BACKEND', 'local')
+os.environ.setdefault('CLASSIFIER_CACHE_ENABLED', 'false')
+os.environ.setdefault('CLASSIFIER_LOCAL_ENABLED', 'false')
+os.environ.setdefault('CLASSIFIER_USAGE_ENABLED', 'false')
+os.environ.setdefault('CLASSIFIER_QUEUE_AUTOSTART', 'false')
+os.environ.setdefault('JWT_SECRET_KEY', 'test-secret-key-that-is-long-enough')
+
+import itertools
+from datetime import date
+
+import pytest
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """App on a fresh SQLite database in a temporary directory"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'test.db'}")
+
+    from app import create_app
+    from app.models.db import db
+
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers(client):
+    """Authorization header for a freshly registered user"""
+    response = client.post('/api/auth/register', json={
+        'name': 'Test', 'email': 'test@example.com', 'password': 'password'
+    })
+    return {'Authorization': f"Bearer {response.get_json()['token']}"}
+
+
+@pytest.fixture(autouse=True)
+def breaker(monkeypatch):
+    """A fresh circuit breaker per test, so failures don't leak between tests"""
+    import app.utils.ai_classifier as ai_classifier
+    from app.utils.resilience import CircuitBreaker
+
+    breaker = CircuitBreaker()
+    monkeypatch.setattr(ai_classifier, 'get_circuit_breaker', lambda: breaker)
+    return breaker
+
+
+@pytest.fixture
+def backend():
+    """Swap in a classifier backend for one test"""
+    from app.utils.classifier_backends import set_classifier_backend
+
+    def use(new_backend):
+        set_classifier_backend(new_backend)
+        return new_backend
+    yield use
+    set_classifier_backend(None)
+
+
+@pytest.fixture
+def add_habits(app):
+    """Add a new user with the given number of habits starting today; call it in an app context"""
+    from app.models.db import db
+    from app.models.habit import Habit
+    from app.models.user import User
+
+    users = itertools.count()
+
+    def add(count, frequency='daily'):
+        user = User(name='u', email=f'habits{next(users)}@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add_all(
+            Habit(user_id=user.id, title=f'habit {n}', frequency=frequency, start_date=date.today())
+            for n in range(count)
+        )
+        db.session.commit()
+        return Habit.query.filter_by(user_id=user.id).all()
+
+    return add
@@ -0,0 +1,99 @@
+"""
+Tests for the two-tier classification cache
+"""
+import time
+from datetime import date, datetime
+
+import pytz
+
+from app.utils.classification_cache import ClassificationCache, from_relative, make_cache_key, to_relative
+
+NEW_YORK = pytz.timezone('America/New_York')
+# Monday 2025-06-16
+MONDAY = NEW_YORK.localize(datetime(2025, 6, 16, 18, 0))
+NEXT_MONDAY = NEW_YORK.localize(datetime(2025, 6, 23, 9, 0))
+
+
+def test_relative_dates_round_trip():
+    data = {'title': 'call', 'due_date': '2025-06-17T15:00:00', 'start_date': '2025-06-16', 'other': None}
+    relative = to_relative(data, date(2025, 6, 16))
+    assert relative['due_date'] == {'days': 1, 'time': '15:00:00'}
+    assert relative['start_date'] == {'days': 0, 'time': None}
+    assert from_relative(relative, date(2025, 6, 16)) == data
+    # A week later the same offsets resolve against the new day
+    assert from_relative(relative, date(2025, 6, 23)) == dict(
+        data, due_date='2025-06-24T15:00:00', start_date='2025-06-23'
+    )
+
+
+def test_relative_phrases_share_a_key_per_weekday():
+    assert make_cache_key('Buy milk by Friday', MONDAY) == make_cache_key('buy  milk by friday', NEXT_MONDAY)
+    assert make_cache_key('Buy milk by Friday', MONDAY) != make_cache_key(
+        'Buy milk by Friday', NEW_YORK.localize(datetime(2025, 6, 17, 18, 0))
+    )
+
+
+def test_anchored_dates_are_keyed_per_day():
+    assert make_cache_key('dentist on june 20th', MONDAY) != make_cache_key('dentist on june 20th', NEXT_MONDAY)
+    assert make_cache_key('dentist on june 20th', MONDAY) == make_cache_key(
+        'dentist on june 20th', NEW_YORK.localize(datetime(2025, 6, 16, 9, 0))
+    )
+
+
+def test_clock_relative_text_is_not_cached():
+    # "at 5" on Monday at 18:00 is Tuesday, on the next Monday at 09:00 it's that Monday
+    assert make_cache_key('call mom at 5', MONDAY) is None
+    assert make_cache_key('call mom in the evening', MONDAY) is None
+    assert make_cache_key('call mom in 10 minutes', MONDAY) is None
+    assert make_cache_key('call mom tomorrow at 5', MONDAY) is not None
+    assert make_cache_key('call mom on friday at 5', MONDAY) is not None
+
+
+def test_cached_dates_follow_the_day(tmp_path):
+    cache = ClassificationCache(str(tmp_path / 'cache.db'))
+    cache.set('call mom tomorrow at 5pm', MONDAY, 'todo', {'title': 'Call mom', 'due_date': '2025-06-17T17:00:00'})
+    assert cache.get('call mom tomorrow at 5pm', NEXT_MONDAY) == (
+        'todo', {'title': 'Call mom', 'due_date': '2025-06-24T17:00:00'}
+    )
+
+    cache.set('call mom at 5', MONDAY, 'todo', {'title': 'Call mom', 'due_date': '2025-06-17T17:00:00'})
+    assert cache.get('call mom at 5', NEXT_MONDAY) is None
+
+
+def test_memory_tier_evicts_least_recently_used(tmp_path):
+    cache = ClassificationCache(str(tmp_path / 'cache.db'), memory_size=2)
+    for text in ('one', 'two'):
+        cache.set(text, MONDAY, 'thought', {'content': text})
+    cache.get('one', MONDAY)
+    cache.set('three', MONDAY, 'thought', {'content': 'three'})
+
+    assert cache.stats()['memory_entries'] == 2
+    assert set(entry[1]['content'] for entry in cache._memory.values()) == {'one', 'three'}
+    # The evicted entry is still served by the shared tier
+    assert cache.get('two', MONDAY) == ('thought', {'content': 'two'})
+    assert cache.stats()['shared_hits'] == 1
+
+
+def test_shared_tier_is_seen_by_other_workers(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    ClassificationCache(path).set('read a book', MONDAY, 'thought', {'content': 'read a book'})
+
+    other = ClassificationCache(path)
+    assert other.get('read a book', MONDAY) == ('thought', {'content': 'read a book'})
+    assert other.stats()['shared_hits'] == 1
+    assert other.get('read a book', MONDAY) is not None
+    assert other.stats()['memory_hits'] == 1
+
+    other.clear()
+    assert ClassificationCache(path).get('read a book', MONDAY) is None
+
+
+def test_shared_tier_expires_entries(tmp_path, monkeypatch):
+    path = str(tmp_path / 'cache.db')
+    ClassificationCache(path, ttl=60).set('read a book', MONDAY, 'thought', {'content': 'read a book'})
+
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 61)
+    cache = ClassificationCache(path, ttl=60)
+    assert cache.get('read a book', MONDAY) is None
+    assert cache.stats()['misses'] == 1
@@ -0,0 +1,161 @@
+"""
+Tests for background classification of async content
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.db import db
+from app.models.pending_content import PendingContent
+from app.models.thought import Thought
+from app.models.todo import Todo
+from app.models.user import User
+from app.utils import ai_classifier
+from app.utils.ai_classifier import ClassificationError
+from app.utils.classification_queue import ClassificationQueue
+
+
+def add_pending(text, **fields):
+    user = User.query.filter_by(email='test@example.com').one()
+    pending = PendingContent(user_id=user.id, text=text, timezone='UTC', **fields)
+    db.session.add(pending)
+    db.session.commit()
+    return pending.id
+
+
+def queued_ids(classification_queue):
+    return list(classification_queue._queue.queue)
+
+
+@pytest.fixture
+def classify(monkeypatch):
+    """Classifier stand-in that fails the given number of times first"""
+    calls = []
+
+    def fake(text, timezone, fallback=True):
+        calls.append(fallback)
+        if classify.failures:
+            classify.failures -= 1
+            raise ClassificationError('Gemini unavailable')
+        return 'todo', {'title': text, 'description': None, 'due_date': None}
+
+    classify.failures = 0
+    classify.calls = calls
+    monkeypatch.setattr(ai_classifier, 'classify_input', fake)
+    return classify
+
+
+def test_sweeps_queue_each_item_once(app, auth_headers):
+    with app.app_context():
+        classification_queue = ClassificationQueue(app, max_depth=5)
+        classification_queue._started = True  # No worker threads taking items
+        ids = [add_pending(f'item {number}') for number in range(3)]
+        for _ in range(3):
+            classification_queue.sweep()
+        assert classification_queue.submit(ids[0])
+
+        assert queued_ids(classification_queue) == ids
+        assert classification_queue.has_capacity()
+
+
+def test_pending_items_survive_a_restart(app, auth_headers, classify):
+    with app.app_context():
+        pending_id = add_pending('buy milk')
+        # The process that accepted the item died before a worker took it
+        classification_queue = ClassificationQueue(app)
+        classification_queue.sweep()
+        assert queued_ids(classification_queue) == [pending_id]
+
+        classification_queue.process(pending_id)
+        item = db.session.get(PendingContent, pending_id)
+        assert (item.status, item.result_type, item.attempts) == ('done', 'todo', 1)
+        assert db.session.get(Todo, item.result_id).title == 'buy milk'
+
+
+def test_abandoned_claims_are_released_after_the_lease(app, auth_headers, classify):
+    with app.app_context():
+        now = datetime.utcnow()
+        abandoned = add_pending('abandoned', status='processing', attempts=1, claimed_at=now - timedelta(seconds=301))
+        running = add_pending('running', status='processing', attempts=1, claimed_at=now - timedelta(seconds=10))
+
+        classification_queue = ClassificationQueue(app, lease=300)
+        classification_queue.sweep()
+        assert queued_ids(classification_queue) == [abandoned]
+        assert db.session.get(PendingContent, running).status == 'processing'
+
+        classification_queue.process(abandoned)
+        assert db.session.get(PendingContent, abandoned).status == 'done'
+        # A claim still inside its lease isn't taken over
+        classification_queue.process(running)
+        assert db.session.get(PendingContent, running).status == 'processing'
+
+
+def test_failures_are_retried_with_backoff(app, auth_headers, classify):
+    classify.failures = 2
+    with app.app_context():
+        pending_id = add_pending('call the bank')
+        classification_queue = ClassificationQueue(app, max_retries=3, retry_backoff=5.0)
+
+        classification_queue.process(pending_id)
+        item = db.session.get(PendingContent, pending_id)
+        assert (item.status, item.attempts, item.error) == ('pending', 1, 'Gemini unavailable')
+        delay = (item.next_attempt_at - datetime.utcnow()).total_seconds()
+        assert 4 < delay <= 5
+
+        # Not due yet: neither swept nor claimable
+        classification_queue.sweep()
+        assert queued_ids(classification_queue) == []
+        classification_queue.process(pending_id)
+        assert db.session.get(PendingContent, pending_id).attempts == 1
+
+        for expected_delay in (10, 0):
+            item.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+            db.session.commit()
+            classification_queue.process(pending_id)
+            item = db.session.get(PendingContent, pending_id)
+            if expected_delay:
+                delay = (item.next_attempt_at - datetime.utcnow()).total_seconds()
+                assert expected_delay - 1 < delay <= expected_delay
+        assert (item.status, item.attempts) == ('done', 3)
+        # Only the last attempt accepts the thought fallback
+        assert classify.calls == [False, False, True]
+
+
+def test_last_attempt_falls_back_to_a_thought(app, auth_headers, monkeypatch):
+    def classify_input(text, timezone, fallback=True):
+        if not fallback:
+            raise ClassificationError('Gemini unavailable')
+        return 'thought', {'content': text}
+
+    monkeypatch.setattr(ai_classifier, 'classify_input', classify_input)
+    with app.app_context():
+        pending_id = add_pending('something', attempts=2)
+        ClassificationQueue(app, max_retries=3).process(pending_id)
+        item = db.session.get(PendingContent, pending_id)
+        assert (item.status, item.result_type) == ('done', 'thought')
+        assert db.session.get(Thought, item.result_id).content == 'something'
+
+
+def test_item_and_status_are_committed_together(app, auth_headers, classify, monkeypatch):
+    finish = ClassificationQueue._finish
+
+    def fail(self, item, **fields):
+        raise RuntimeError('database went away')
+
+    with app.app_context():
+        pending_id = add_pending('buy milk')
+        classification_queue = ClassificationQueue(app, max_retries=3)
+        monkeypatch.setattr(ClassificationQueue, '_finish', fail)
+        classification_queue.process(pending_id)
+
+        # Recording the status failed, so the new todo went with it
+        assert Todo.query.count() == 0
+        item = db.session.get(PendingContent, pending_id)
+        assert (item.status, item.result_id) == ('pending', None)
+
+        monkeypatch.setattr(ClassificationQueue, '_finish', finish)
+        item.next_attempt_at = None
+        db.session.commit()
+        classification_queue.process(pending_id)
+        assert Todo.query.count() == 1
+        assert db.session.get(PendingContent, pending_id).status == 'done'
@@ -1,31 +1,241 @@
 """
 Test script for the Gemini AI classifier
+
+Runs offline against the deterministic local backend. Set
+CLASSIFIER_BACKEND=gemini and API_KEY to run the script against the live API.
 """
 import sys
 import os
 # Add the parent directory to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.utils.ai_classifier import classify_input
+# Keep the cache and local model out of the way, every input reaches the backend
+os.environ.setdefault('CLASSIFIER_BACKEND', 'local')
+os.environ.setdefault('CLASSIFIER_CACHE_ENABLED', 'false')
+os.environ.setdefault('CLASSIFIER_LOCAL_ENABLED', 'false')
+os.environ.setdefault('CLASSIFIER_USAGE_ENABLED', 'false')
 
-def test_classifier():
-    """Test the AI classifier with various inputs"""
-    test_inputs = [
-        "Remember to call mom tonight at 8pm",
-        "I'm feeling really anxious about the presentation tomorrow",
-        "Buy milk from the store",
-        "I wonder if I made the right decision taking this job",
-        "Submit the report by Friday afternoon",
-        "Life has been so challenging lately, I need to find more balance"
+from datetime import datetime
+
+import pytest
+import pytz
+
+import app.utils.ai_classifier as ai_classifier
+from app.utils.ai_classifier import classify_input, classify_items
+from app.utils.classification_cache import ClassificationCache
+from app.utils.classifier_backends import (
+    Generation, GeminiBackend, LocalBackend, ReplayBackend, ReplayMissError, get_classifier_backend
+)
+from app.utils.mock_gemini import MockGeminiServer
+from app.utils.model_router import ModelRouter
+from app.utils import token_usage
+
+test_inputs = [
+    ("Remember to call mom tonight at 8pm", "todo"),
+    ("I'm feeling really anxious about the presentation tomorrow", "thought"),
+    ("Buy milk from the store", "todo"),
+    ("I wonder if I made the right decision taking this job", "thought"),
+    ("Submit the report by Friday afternoon", "todo"),
+    ("Life has been so challenging lately, I need to find more balance", "thought"),
+    ("meditate at 7am every day", "habit"),
+]
+
+# Define a sample timezone for testing. In a real scenario, this might vary.
+sample_timezone = "America/New_York"
+
+
+@pytest.mark.parametrize("text,expected_type", test_inputs)
+def test_local_backend(backend, text, expected_type):
+    backend(LocalBackend())
+    content_type, data = classify_input(text, sample_timezone, fallback=False)
+    assert content_type == expected_type
+
+
+def test_local_backend_dates(backend):
+    backend(LocalBackend())
+    content_type, data = classify_input("Remember to call mom tonight at 8pm", sample_timezone)
+    assert data['title'] == "call mom"
+    assert data['due_date'].endswith("T20:00:00")
+
+    content_type, data = classify_input("meditate at 7am every day", sample_timezone)
+    assert (data['frequency'], data['due_time']) == ("daily", "07:00")
+
+
+def test_record_then_replay(backend, tmp_path):
+    path = str(tmp_path / "fixtures.json")
+
+    backend(ReplayBackend(path, upstream=LocalBackend()))
+    recorded = [classify_input(text, sample_timezone) for text, _ in test_inputs]
+
+    # A fresh replay backend serves the same answers without an upstream
+    backend(ReplayBackend(path))
+    replayed = [classify_input(text, sample_timezone, fallback=False) for text, _ in test_inputs]
+    assert replayed == recorded
+
+
+def test_replay_miss(backend, tmp_path):
+    backend(ReplayBackend(str(tmp_path / "empty.json")))
+    assert classify_input("Buy milk from the store", sample_timezone) == ("thought", {"content": "Buy milk from the store"})
+    with pytest.raises(ReplayMissError):
+        get_classifier_backend().generate('Text to analyze: "Buy milk"', 1)
+
+
+def test_mock_server(backend):
+    server = MockGeminiServer(latency_median=0.01, latency_p99=0.05, seed=1)
+    server.start()
+    try:
+        backend(GeminiBackend(api_key="mock", base_url=server.base_url))
+        content_type, data = classify_input("Buy milk from the store", sample_timezone, fallback=False)
+        assert (content_type, data['title']) == ("todo", "buy milk from the store")
+
+        # Errors are retried and end in the thought fallback
+        server.error_rate = 1.0
+        content_type, data = classify_input("Pick up dry cleaning", sample_timezone)
+        assert content_type == "thought"
+        assert server.stats()['errors'] >= 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_gemini_backend_reuses_connections(backend):
+    server = MockGeminiServer(latency_median=0, seed=1)
+    server.start()
+    try:
+        gemini = backend(GeminiBackend(api_key="mock", base_url=server.base_url, pool_size=2))
+        gemini.warm_up()
+        for text, _ in test_inputs:
+            classify_input(text, sample_timezone, fallback=False)
+
+        stats = gemini.stats()
+        assert stats['warmed'] and stats['first_call_seconds'] is not None
+        assert stats['connections_opened'] == 1
+        assert stats['connections_reused'] == len(test_inputs)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class ScriptedBackend(LocalBackend):
+    """Local answers, except for models given a canned response"""
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = []
+
+    def generate(self, prompt, timeout, model=None, system=None):
+        self.calls.append(model)
+        if model in self.responses:
+            return Generation(self.responses[model], 100, 10)
+        return super().generate(prompt, timeout, model, system)
+
+
+@pytest.fixture
+def router(monkeypatch):
+    router = ModelRouter(fast_model="fast-model", strong_model="strong-model", max_simple_chars=60)
+    monkeypatch.setattr(ai_classifier, "get_model_router", lambda: router)
+    return router
+
+
+def test_simple_input_stays_on_fast_tier(backend, router):
+    scripted = backend(ScriptedBackend({}))
+    assert classify_input("Buy milk from the store", sample_timezone, fallback=False)[0] == "todo"
+    assert scripted.calls == ["fast-model"]
+    assert router.stats()['escalation_rate'] == 0
+
+
+def test_long_input_goes_to_strong_tier(backend, router):
+    scripted = backend(ScriptedBackend({}))
+    classify_input("Life has been so challenging lately. I need to find more balance", sample_timezone)
+    assert scripted.calls == ["strong-model"]
+
+
+@pytest.mark.parametrize("fast_response,reason", [
+    ("not json", "invalid_json"),
+    ('{"type": "reminder"}', "unknown_type"),
+    ('{"type": "habit", "title": "run", "description": null}', "missing_fields"),
+    ('{"type": "todo", "title": "renew passport", "description": null, "due_date": null}', "missing_fields"),
+])
+def test_escalates_on_doubt(backend, router, fast_response, reason):
+    scripted = backend(ScriptedBackend({"fast-model": fast_response}))
+    # "next year" isn't understood by the temporal parser, so a due date is required
+    content_type, data = classify_input("renew passport next year", sample_timezone, fallback=False)
+    assert scripted.calls == ["fast-model", "strong-model"]
+    assert router.stats()['escalations'] == {reason: 1}
+    assert content_type == "todo"
+
+
+def test_split_compound_input(backend):
+    scripted = backend(ScriptedBackend({}))
+    items = classify_items("buy milk, call mom at 5, and I'm exhausted", sample_timezone)
+    assert [content_type for content_type, _ in items] == ["todo", "todo", "thought"]
+    assert items[1][1]['due_date'].endswith("T17:00:00")
+    assert len(scripted.calls) == 1
+
+
+def test_split_single_entry_uses_classify_input(backend, router):
+    scripted = backend(ScriptedBackend({}))
+    assert classify_items("Buy milk from the store", sample_timezone) == [
+        ("todo", {"title": "buy milk from the store", "description": None, "due_date": None})
+    ]
+    assert scripted.calls == ["fast-model"]
+
+
+def test_split_results_are_cached(backend, monkeypatch, tmp_path):
+    cache = ClassificationCache(str(tmp_path / "cache.db"))
+    monkeypatch.setattr(ai_classifier, "get_classification_cache", lambda: cache)
+    scripted = backend(ScriptedBackend({}))
+
+    text = "buy milk, call mom tomorrow, and I'm exhausted"
+    items = classify_items(text, sample_timezone)
+    assert classify_items(text, sample_timezone) == items
+    assert len(scripted.calls) == 1
+    # The split doesn't stand in for a single classification of the text
+    assert cache.get(text, datetime.now(pytz.timezone(sample_timezone))) is None
+
+
+def test_split_input_answered_as_one_item_first(backend, monkeypatch, tmp_path):
+    cache = ClassificationCache(str(tmp_path / "cache.db"))
+    monkeypatch.setattr(ai_classifier, "get_classification_cache", lambda: cache)
+    scripted = backend(ScriptedBackend({}))
+
+    # Cached whole, the text isn't sent to be split
+    text = "call mom tomorrow, she's waiting"
+    classify_input(text, sample_timezone)
+    assert classify_items(text, sample_timezone) == [classify_input(text, sample_timezone)]
+    assert len(scripted.calls) == 1
+
+    class Confident:
+        def classify(self, text, temporal):
+            return "thought", {"content": text}
+
+    monkeypatch.setattr(ai_classifier, "get_local_classifier", lambda: Confident())
+    assert classify_items("I'm tired. It was a long day", sample_timezone) == [
+        ("thought", {"content": "I'm tired. It was a long day"})
     ]
-    
-    # Define a sample timezone for testing. In a real scenario, this might vary.
-    sample_timezone = "America/New_York" 
+    assert len(scripted.calls) == 1
+
+
+def test_token_usage_report(backend, router, monkeypatch, tmp_path):
+    ledger = token_usage.UsageLedger(str(tmp_path / "usage.db"))
+    monkeypatch.setattr(token_usage, "get_usage_ledger", lambda: ledger)
+    backend(ScriptedBackend({}))
 
-    print(f"Testing Gemini AI Classifier with timezone: {sample_timezone}...")
+    classify_input("Buy milk from the store", sample_timezone)
+    classify_input("Pick up dry cleaning", sample_timezone)
+    classify_input("I wonder if I made the right decision", sample_timezone)
+
+    report = {row['content_type']: row for row in ledger.report()}
+    assert report['todo']['items'] == 2
+    assert report['thought']['items'] == 1
+    assert report['todo']['input_tokens'] > 0 and report['todo']['output_tokens'] > 0
+
+
+def test_classifier():
+    """Test the AI classifier with various inputs"""
+    print(f"Testing AI Classifier ({get_classifier_backend().name} backend) with timezone: {sample_timezone}...")
     print("=" * 50)
-    
-    for text in test_inputs:
+
+    for text, _ in test_inputs:
         print(f"\nInput: {text}")
         try:
             # Pass the sample_timezone to classify_input
@@ -34,7 +244,7 @@ def test_classifier():
             print(f"Formatted data: {data}")
         except Exception as e:
             print(f"Error: {e}")
-    
+
     print("\n" + "=" * 50)
     print("Testing complete!")
 
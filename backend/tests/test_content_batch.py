@@ -0,0 +1,90 @@
+"""
+Tests for classifying several texts in one call with /api/content/batch
+"""
+import json
+
+import pytest
+
+from app.utils.classifier_backends import Generation, LocalBackend
+from app.utils.classifier_prompts import BATCH_INSTRUCTIONS
+
+TEXTS = ['Buy milk from the store', 'I feel great today', 'meditate at 7am every day']
+
+
+class BatchBackend(LocalBackend):
+    """Local backend with a scripted answer to the batch prompt"""
+
+    def __init__(self, batch_response=None):
+        self.batch_response = batch_response
+        self.batch_calls = 0
+        self.single_calls = 0
+
+    def generate(self, prompt, timeout, model=None, system=None):
+        if system == BATCH_INSTRUCTIONS:
+            self.batch_calls += 1
+            if self.batch_response is not None:
+                return Generation(self.batch_response, 100, 10)
+        else:
+            self.single_calls += 1
+        return super().generate(prompt, timeout, model, system)
+
+
+def post_batch(client, auth_headers, texts):
+    return client.post('/api/content/batch', json={'texts': texts, 'timezone': 'UTC'}, headers=auth_headers)
+
+
+def test_rejects_batches_over_the_max_size(app, client, auth_headers, backend):
+    scripted = backend(BatchBackend())
+    app.config['CLASSIFIER_BATCH_MAX_SIZE'] = 2
+
+    response = post_batch(client, auth_headers, TEXTS)
+    assert response.status_code == 400
+    assert 'At most 2' in response.get_json()['error']
+    assert post_batch(client, auth_headers, TEXTS[:2]).status_code == 201
+    assert scripted.batch_calls == 1
+
+
+@pytest.mark.parametrize('texts', [[], 'buy milk', ['buy milk', '  '], ['buy milk', 7]])
+def test_rejects_invalid_texts(client, auth_headers, backend, texts):
+    scripted = backend(BatchBackend())
+    assert post_batch(client, auth_headers, texts).status_code == 400
+    assert scripted.batch_calls == scripted.single_calls == 0
+
+
+def test_results_per_item_in_input_order(client, auth_headers, backend):
+    scripted = backend(BatchBackend())
+    response = post_batch(client, auth_headers, TEXTS)
+    assert response.status_code == 201
+
+    results = response.get_json()
+    assert [(result['index'], result['type']) for result in results] == [(0, 'todo'), (1, 'thought'), (2, 'habit')]
+    assert results[1]['data']['content'] == 'i feel great today'
+    assert results[2]['data']['frequency'] == 'daily'
+    assert (scripted.batch_calls, scripted.single_calls) == (1, 0)
+
+    # Every item was stored
+    assert len(client.get('/api/todos', headers=auth_headers).get_json()) == 1
+    assert len(client.get('/api/thoughts', headers=auth_headers).get_json()) == 1
+
+
+@pytest.mark.parametrize('batch_response,single_calls', [
+    ('not json', 3),
+    ('{"type": "todo"}', 3),
+    # Too short: the entries left out are classified one at a time
+    ('[{"index": 0, "type": "todo", "title": "Buy milk", "description": null, "due_date": null}]', 2),
+    # Too long: entries past the input are ignored
+    (json.dumps([{'type': 'thought', 'content': text} for text in TEXTS + ['extra']]), 0),
+    # Malformed entries, and ones pointing outside the input
+    ('[{"index": 0, "type": "todo"}, "thought", {"index": 9, "type": "thought", "content": "x"},'
+     ' {"index": 2, "type": "thought", "content": "meditate"}]', 2),
+])
+def test_falls_back_to_single_items(client, auth_headers, backend, batch_response, single_calls):
+    scripted = backend(BatchBackend(batch_response))
+    response = post_batch(client, auth_headers, TEXTS)
+    assert response.status_code == 201
+
+    results = response.get_json()
+    assert [result['index'] for result in results] == [0, 1, 2]
+    assert all(result['type'] in ('thought', 'todo', 'habit') for result in results)
+    assert scripted.batch_calls == 1
+    assert scripted.single_calls == single_calls
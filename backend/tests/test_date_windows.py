@@ -0,0 +1,104 @@
+"""
+Tests for local day and date-range windows on list endpoints
+"""
+from datetime import date, datetime
+
+import pytest
+
+from app.models.db import db
+from app.models.habit import Habit
+from app.models.thought import Thought
+from app.models.todo import Todo
+from app.models.user import User
+from app.utils.date_windows import local_window
+from app.utils.helpers import APIError
+
+
+def test_local_window_follows_dst():
+    # Clocks go forward in New York on 2024-03-10, so the day is 23 hours long
+    start, end = local_window(date(2024, 3, 10), date(2024, 3, 10), 'America/New_York')
+    assert start == datetime(2024, 3, 10, 5)
+    assert end == datetime(2024, 3, 11, 4)
+
+
+def test_local_window_open_ended():
+    assert local_window(date(2024, 3, 10), None) == (datetime(2024, 3, 10), None)
+    assert local_window(None, date(2024, 3, 10), 'Asia/Tokyo') == (None, datetime(2024, 3, 10, 15))
+
+
+def test_local_window_rejects_unknown_timezones():
+    with pytest.raises(APIError):
+        local_window(date(2024, 3, 10), None, 'Mars/Olympus')
+
+
+def seed(app):
+    with app.app_context():
+        user = User.query.filter_by(email='test@example.com').one()
+        # 2024-05-01 in Los Angeles is 07:00Z on May 1st to 07:00Z on May 2nd
+        for at in (datetime(2024, 5, 1, 6), datetime(2024, 5, 1, 7), datetime(2024, 5, 1, 20),
+                   datetime(2024, 5, 2, 6), datetime(2024, 5, 2, 7)):
+            db.session.add(Thought(user_id=user.id, content=f'at {at.isoformat()}', created_at=at))
+            db.session.add(Todo(user_id=user.id, title=f'due {at.isoformat()}', due_date=at,
+                                created_at=datetime(2023, 1, 1)))
+        db.session.add(Todo(user_id=user.id, title='someday', created_at=datetime(2024, 5, 1, 12)))
+        db.session.add(Habit(user_id=user.id, title='walk', start_date=date(2024, 5, 1),
+                             created_at=datetime(2024, 5, 1, 12)))
+        db.session.commit()
+
+
+LA_DAY = {'date': '2024-05-01', 'tz': 'America/Los_Angeles'}
+IN_LA_DAY = ['2024-05-01T07:00:00Z', '2024-05-01T20:00:00Z', '2024-05-02T06:00:00Z']
+
+
+def test_thoughts_for_a_local_day(app, client, auth_headers):
+    seed(app)
+    for path in ('/api/thoughts', '/api/content/thoughts'):
+        thoughts = client.get(path, query_string=LA_DAY, headers=auth_headers).get_json()
+        assert sorted(thought['created_at'] for thought in thoughts) == IN_LA_DAY
+
+
+def test_todos_due_on_a_local_day(app, client, auth_headers):
+    seed(app)
+    for path in ('/api/todos', '/api/content/todos'):
+        todos = client.get(path, query_string=LA_DAY, headers=auth_headers).get_json()
+        assert [todo['due_date'] for todo in todos] == IN_LA_DAY
+
+
+def test_content_for_a_local_day(app, client, auth_headers):
+    seed(app)
+    content = client.get('/api/content', query_string=LA_DAY, headers=auth_headers).get_json()
+    by_type = {}
+    for item in content:
+        by_type.setdefault(item['type'], []).append(item['data'])
+    assert sorted(thought['created_at'] for thought in by_type['thought']) == IN_LA_DAY
+    assert sorted(todo['due_date'] for todo in by_type['todo']) == IN_LA_DAY
+    assert [habit['title'] for habit in by_type['habit']] == ['walk']
+
+    paged = client.get('/api/content', query_string=dict(LA_DAY, limit=2), headers=auth_headers).get_json()
+    assert len(paged['items']) == 2 and paged['next_cursor']
+
+
+def test_date_ranges(app, client, auth_headers):
+    seed(app)
+    since = client.get('/api/thoughts', query_string={'from': '2024-05-02'}, headers=auth_headers).get_json()
+    assert sorted(thought['created_at'] for thought in since) == ['2024-05-02T06:00:00Z', '2024-05-02T07:00:00Z']
+
+    until = client.get('/api/thoughts', query_string={'to': '2024-05-01'}, headers=auth_headers).get_json()
+    assert len(until) == 3
+
+    both = client.get('/api/todos', query_string={'from': '2024-05-01', 'to': '2024-05-02'},
+                      headers=auth_headers).get_json()
+    assert len(both) == 5
+
+
+@pytest.mark.parametrize('query', [
+    {'date': '2024-05-01', 'from': '2024-05-01'},
+    {'date': 'May 1st'},
+    {'from': '2024-05-02', 'to': '2024-05-01'},
+    {'date': '2024-05-01', 'tz': 'Nowhere/Special'},
+])
+def test_invalid_windows(client, auth_headers, query):
+    for path in ('/api/content', '/api/thoughts', '/api/todos'):
+        response = client.get(path, query_string=query, headers=auth_headers)
+        assert response.status_code == 400
+        assert 'error' in response.get_json()
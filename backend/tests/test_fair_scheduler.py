@@ -0,0 +1,215 @@
+"""
+Tests for per-user quotas and fair scheduling of classifier calls
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app.utils.ai_classifier as ai_classifier
+import app.utils.fair_scheduler as fair_scheduler
+from app.utils.classification_cache import ClassificationCache
+from app.utils.fair_scheduler import FairScheduler, Throttled, QUOTA, BUSY, charge_to
+from app.utils.singleflight import SingleFlight
+
+
+def test_bucket_throttles_after_burst():
+    scheduler = FairScheduler(rate=1.0, burst=3)
+    for _ in range(3):
+        scheduler.take('alice')
+    with pytest.raises(Throttled) as excinfo:
+        scheduler.take('alice')
+    assert excinfo.value.reason == QUOTA
+    assert 0 < excinfo.value.retry_after <= 1.0
+
+    # Other users have their own bucket
+    scheduler.take('bob')
+
+
+def test_bucket_refills():
+    scheduler = FairScheduler(rate=50.0, burst=1)
+    scheduler.take('alice')
+    time.sleep(0.05)
+    scheduler.take('alice')
+
+
+def test_large_cost_needs_a_full_bucket():
+    scheduler = FairScheduler(rate=1.0, burst=5)
+    scheduler.take('alice', cost=50)
+    with pytest.raises(Throttled):
+        scheduler.take('alice')
+
+
+def test_zero_rate_disables_quota():
+    scheduler = FairScheduler(rate=0, burst=1)
+    for _ in range(10):
+        scheduler.take('alice')
+
+
+def test_slots_are_shared_round_robin():
+    scheduler = FairScheduler(slots=1, per_user=1, rate=0)
+    scheduler.acquire('heavy')
+    order = []
+
+    def run(user_id):
+        scheduler.acquire(user_id)
+        order.append(user_id)
+        scheduler.release(user_id)
+
+    threads = [threading.Thread(target=run, args=('heavy',)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    light = threading.Thread(target=run, args=('light',))
+    light.start()
+    time.sleep(0.05)
+
+    scheduler.release('heavy')
+    for thread in threads + [light]:
+        thread.join(5)
+
+    # The light user is served after one heavy request, not after all of them
+    assert order.index('light') == 1
+    assert order.count('heavy') == 3
+
+
+def test_per_user_cap_leaves_slots_for_others():
+    scheduler = FairScheduler(slots=2, per_user=1, rate=0, max_wait=0.05)
+    scheduler.acquire('heavy')
+    with pytest.raises(Throttled) as excinfo:
+        scheduler.acquire('heavy')
+    assert excinfo.value.reason == BUSY
+    assert scheduler.acquire('light') < 0.05
+
+
+def test_wait_statistics_per_user():
+    scheduler = FairScheduler(slots=1, rate=1.0, burst=1, max_wait=0.05)
+    with scheduler.slot('alice'):
+        with pytest.raises(Throttled):
+            scheduler.acquire('bob')
+    with pytest.raises(Throttled):
+        scheduler.take('alice')
+
+    assert scheduler.user_stats('alice')['requests'] == 1
+    assert scheduler.user_stats('alice')['throttled'] == 1
+    assert scheduler.user_stats('bob')['max_wait_ms'] >= 50
+    stats = scheduler.stats()
+    assert stats['busy_slots'] == 0
+    assert list(stats['users']) == ['bob', 'alice']
+
+
+def test_busy_refunds_the_quota():
+    scheduler = FairScheduler(slots=1, rate=0.01, burst=1, max_wait=0.01)
+    scheduler.acquire('bob')
+    with pytest.raises(Throttled) as excinfo:
+        with scheduler.slot('alice'):
+            pass
+    assert excinfo.value.reason == BUSY
+
+    scheduler.release('bob')
+    with scheduler.slot('alice'):
+        pass
+
+
+def test_over_quota_request_gets_429(client, auth_headers, monkeypatch):
+    scheduler = FairScheduler(rate=0.01, burst=1)
+    monkeypatch.setattr(fair_scheduler, 'get_fair_scheduler', lambda: scheduler)
+
+    assert client.post('/api/content', json={'text': 'buy milk'}, headers=auth_headers).status_code == 201
+    response = client.post('/api/content', json={'text': 'buy eggs'}, headers=auth_headers)
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert response.get_json()['retry_after'] == int(response.headers['Retry-After'])
+
+
+def test_over_quota_request_degrades_to_thought(app, client, auth_headers, monkeypatch):
+    scheduler = FairScheduler(rate=0.01, burst=1)
+    monkeypatch.setattr(fair_scheduler, 'get_fair_scheduler', lambda: scheduler)
+    app.config['CLASSIFIER_THROTTLE_MODE'] = 'degrade'
+
+    client.post('/api/content', json={'text': 'buy milk'}, headers=auth_headers)
+    response = client.post('/api/content', json={'text': 'buy eggs'}, headers=auth_headers)
+    assert response.status_code == 201
+    assert response.get_json()['type'] == 'thought'
+    assert response.get_json()['data']['content'] == 'buy eggs'
+
+
+def test_cache_and_local_answers_are_not_charged(client, auth_headers, monkeypatch, tmp_path):
+    scheduler = FairScheduler(rate=0.01, burst=1)
+    monkeypatch.setattr(fair_scheduler, 'get_fair_scheduler', lambda: scheduler)
+    cache = ClassificationCache(str(tmp_path / 'cache.db'))
+    monkeypatch.setattr(ai_classifier, 'get_classification_cache', lambda: cache)
+
+    for _ in range(3):
+        response = client.post('/api/content', json={'text': 'buy milk'}, headers=auth_headers)
+        assert response.status_code == 201
+    assert client.post('/api/content', json={'text': 'buy eggs'}, headers=auth_headers).status_code == 429
+
+    class Confident:
+        def classify(self, text, temporal):
+            return 'thought', {'content': text}
+
+    monkeypatch.setattr(ai_classifier, 'get_local_classifier', lambda: Confident())
+    response = client.post('/api/content', json={'text': 'buy eggs'}, headers=auth_headers)
+    assert response.status_code == 201
+    # Only the first "buy milk" reached Gemini
+    [user] = scheduler.stats()['users'].values()
+    assert (user['requests'], user['throttled']) == (1, 1)
+
+
+def test_batch_is_charged_for_the_texts_sent(client, auth_headers, monkeypatch, tmp_path):
+    scheduler = FairScheduler(rate=0.01, burst=3)
+    monkeypatch.setattr(fair_scheduler, 'get_fair_scheduler', lambda: scheduler)
+    cache = ClassificationCache(str(tmp_path / 'cache.db'))
+    monkeypatch.setattr(ai_classifier, 'get_classification_cache', lambda: cache)
+
+    assert client.post('/api/content', json={'text': 'buy milk'}, headers=auth_headers).status_code == 201
+    # The cached text is free, the other two use up the bucket
+    texts = ['buy milk', 'buy eggs', 'buy bread']
+    assert client.post('/api/content/batch', json={'texts': texts}, headers=auth_headers).status_code == 201
+    response = client.post('/api/content/batch', json={'texts': ['call mom', 'buy milk']}, headers=auth_headers)
+    assert response.status_code == 429
+
+
+class ThrottledOnceJoined(FairScheduler):
+    """Charges alice only once another caller has joined her flight"""
+
+    def __init__(self, flight, **kwargs):
+        super().__init__(**kwargs)
+        self.flight = flight
+
+    def take(self, user_id, cost=1):
+        for _ in range(1000 if user_id == 'alice' else 0):
+            with self.flight._lock:
+                if any(call.followers for call in self.flight._calls.values()):
+                    break
+            time.sleep(0.005)
+        super().take(user_id, cost)
+
+
+def test_one_users_quota_does_not_throttle_another(monkeypatch):
+    flight = SingleFlight()
+    monkeypatch.setattr(ai_classifier, 'get_singleflight', lambda: flight)
+    scheduler = ThrottledOnceJoined(flight, rate=0.01, burst=1)
+    monkeypatch.setattr(fair_scheduler, 'get_fair_scheduler', lambda: scheduler)
+    FairScheduler.take(scheduler, 'alice')
+
+    def classify(user_id):
+        with charge_to(user_id):
+            return ai_classifier.classify_input('buy milk', 'UTC')
+
+    with ThreadPoolExecutor(2) as pool:
+        alice = pool.submit(classify, 'alice')
+        for _ in range(1000):
+            if flight._calls:
+                break
+            time.sleep(0.005)
+        # Bob asks for the same text while alice's over-quota call leads
+        bob = pool.submit(classify, 'bob')
+        with pytest.raises(Throttled):
+            alice.result(5)
+        assert bob.result(5)[0] == 'todo'
+
+    assert scheduler.user_stats('alice')['throttled'] == 1
+    assert scheduler.user_stats('bob')['requests'] == 1
@@ -0,0 +1,135 @@
+"""
+Tests for habit streak and completion analytics
+"""
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+import app.utils.habit_analytics as habit_analytics
+from app.models.db import db
+from app.utils.habit_analytics import AnalyticsCache, HabitHistory, compute_analytics, summarize
+from app.utils.habit_instances import instance_id
+
+TODAY = date(2024, 3, 20)
+
+
+def history(start_days_ago, completed=(), skipped=(), scheduled=None):
+    """A daily history; days are given as days before TODAY"""
+    result = HabitHistory(TODAY - timedelta(days=start_days_ago))
+    for days_ago in scheduled if scheduled is not None else range(start_days_ago + 1):
+        result.scheduled |= result.bit(TODAY - timedelta(days=days_ago))
+    for days_ago in completed:
+        result.completed |= result.bit(TODAY - timedelta(days=days_ago))
+    for days_ago in skipped:
+        result.skipped |= result.bit(TODAY - timedelta(days=days_ago))
+    return result
+
+
+def test_skipped_days_and_today_do_not_break_streaks():
+    summary = summarize(history(9, completed=[9, 8, 7, 6, 4, 3, 2, 1], skipped=[5]), TODAY)
+    assert summary['current_streak'] == 8
+    assert summary['longest_streak'] == 8
+    assert summary['completion']['7d'] == {'due': 5, 'completed': 5, 'rate': 1.0}
+
+
+def test_missed_day_resets_current_streak():
+    summary = summarize(history(9, completed=[9, 8, 7, 6, 5, 1, 0]), TODAY)
+    assert summary['current_streak'] == 2
+    assert summary['longest_streak'] == 5
+    assert summary['completion']['7d'] == {'due': 7, 'completed': 4, 'rate': round(4 / 7, 4)}
+    assert summary['completion']['90d']['due'] == 10
+
+
+def test_rates_only_count_scheduled_days():
+    weekly = history(21, completed=[21, 14], scheduled=[21, 14, 7, 0])
+    summary = summarize(weekly, TODAY)
+    assert summary['current_streak'] == 0
+    assert summary['longest_streak'] == 2
+    assert summary['completion']['30d'] == {'due': 3, 'completed': 2, 'rate': round(2 / 3, 4)}
+    assert summary['completion']['7d']['rate'] is None
+
+
+def complete(client, auth_headers, habit_id, day, **data):
+    return client.put(f'/api/habits/instances/{instance_id(habit_id, day)}',
+                      json=data or {'completed': True}, headers=auth_headers)
+
+
+def test_analytics_endpoint(client, auth_headers):
+    today = date.today()
+    habit = client.post('/api/habits', json={
+        'title': 'read', 'frequency': 'daily', 'start_date': (today - timedelta(days=4)).isoformat()
+    }, headers=auth_headers).get_json()
+    for days_ago in (4, 3, 1):
+        complete(client, auth_headers, habit['id'], today - timedelta(days=days_ago))
+
+    analytics = client.get('/api/habits/analytics', headers=auth_headers).get_json()
+    assert analytics['date'] == today.isoformat()
+    [summary] = analytics['habits']
+    assert summary['habit_id'] == habit['id']
+    assert summary['current_streak'] == 1
+    assert summary['longest_streak'] == 2
+    assert summary['completion']['7d'] == {'due': 4, 'completed': 3, 'rate': 0.75}
+
+
+def test_cached_analytics_are_invalidated_on_update(client, auth_headers):
+    today = date.today()
+    habit = client.post('/api/habits', json={'title': 'read', 'frequency': 'daily'}, headers=auth_headers).get_json()
+    before = client.get('/api/habits/analytics', headers=auth_headers).get_json()
+    assert before['habits'][0]['current_streak'] == 0
+
+    complete(client, auth_headers, habit['id'], today)
+    after = client.get('/api/habits/analytics', headers=auth_headers).get_json()
+    assert after['habits'][0]['current_streak'] == 1
+
+    stats = client.get('/api/auth/stats', headers=auth_headers).get_json()
+    assert stats['habit_instances_completed'] == 1
+
+
+def test_workers_see_each_others_writes(client, auth_headers, monkeypatch):
+    # Two worker processes, each with its own cache
+    caches = [AnalyticsCache(), AnalyticsCache()]
+    worker = {'cache': caches[0]}
+    monkeypatch.setattr(habit_analytics, 'get_analytics_cache', lambda: worker['cache'])
+
+    def streak():
+        return client.get('/api/habits/analytics', headers=auth_headers).get_json()['habits'][0]['current_streak']
+
+    today = date.today()
+    habit = client.post('/api/habits', json={'title': 'read', 'frequency': 'daily'}, headers=auth_headers).get_json()
+    assert streak() == 0
+    assert streak() == 0
+    assert caches[0].stats()['hits'] == 1
+
+    worker['cache'] = caches[1]
+    complete(client, auth_headers, habit['id'], today)
+    assert streak() == 1
+
+    worker['cache'] = caches[0]
+    assert streak() == 1
+    complete(client, auth_headers, habit['id'], today, completed=False)
+    client.put(f"/api/habits/{habit['id']}", json={'title': 'read more'}, headers=auth_headers)
+    worker['cache'] = caches[1]
+    assert streak() == 0
+    assert client.get('/api/habits/analytics', headers=auth_headers).get_json()['habits'][0]['title'] == 'read more'
+
+
+def test_analytics_use_one_instance_query(app, client, auth_headers):
+    today = date.today()
+    for title in ('read', 'run', 'write'):
+        habit = client.post('/api/habits', json={
+            'title': title, 'frequency': 'daily', 'start_date': (today - timedelta(days=30)).isoformat()
+        }, headers=auth_headers).get_json()
+        complete(client, auth_headers, habit['id'], today - timedelta(days=1))
+
+    with app.app_context():
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            result = compute_analytics(habit['user_id'])
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert len(result['habits']) == 3
+    # Habits, instances and compacted months, whatever the number of habits
+    assert len(statements) == 3
@@ -0,0 +1,172 @@
+"""
+Tests for compacting closed months of habit instances into bitmaps
+"""
+import json
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event
+
+from app.models.db import db
+from app.models.habit import HabitInstance, HabitMonth
+from app.utils.habit_analytics import invalidate_habit_analytics
+from app.utils.habit_compaction import compact_instances
+from app.utils.habit_instances import instance_id, month_start
+
+THIS_MONTH = month_start(date.today())
+START = THIS_MONTH - timedelta(days=45)
+
+# Fields that compaction doesn't keep
+TIMESTAMPS = ('completed_at', 'created_at', 'updated_at')
+
+
+def create_habit(client, auth_headers):
+    return client.post('/api/habits', json={
+        'title': 'stretch', 'frequency': 'daily', 'start_date': START.isoformat()
+    }, headers=auth_headers).get_json()
+
+
+def update(client, auth_headers, habit_id, day, **data):
+    return client.put(f'/api/habits/instances/{instance_id(habit_id, day)}', json=data, headers=auth_headers)
+
+
+def listing(client, auth_headers, **params):
+    params.setdefault('start_date', START.isoformat())
+    params.setdefault('end_date', date.today().isoformat())
+    instances = client.get('/api/habits/instances', query_string=params, headers=auth_headers).get_json()
+    return [{key: value for key, value in instance.items() if key not in TIMESTAMPS} for instance in instances]
+
+
+def seed(client, auth_headers):
+    habit = create_habit(client, auth_headers)
+    update(client, auth_headers, habit['id'], START + timedelta(days=1), completed=True)
+    update(client, auth_headers, habit['id'], START + timedelta(days=2), skipped=True)
+    update(client, auth_headers, habit['id'], THIS_MONTH - timedelta(days=1), completed=True)
+    client.delete(f"/api/habits/instances/{instance_id(habit['id'], START + timedelta(days=3))}",
+                  json={}, headers=auth_headers)
+    update(client, auth_headers, habit['id'], date.today(), completed=True)
+    return habit
+
+
+def test_compaction_keeps_instances_and_analytics(app, client, auth_headers):
+    seed(client, auth_headers)
+    before = listing(client, auth_headers)
+    analytics = client.get('/api/habits/analytics', headers=auth_headers).get_json()
+
+    with app.app_context():
+        report = compact_instances()
+        assert report['complete'] is True
+        assert report['rows_compacted'] == 4
+        assert HabitInstance.query.filter(HabitInstance.due_date < THIS_MONTH).count() == 0
+        assert HabitInstance.query.count() == 1
+        assert HabitMonth.query.count() == report['months_written'] == len({
+            month_start(START + timedelta(days=n)) for n in (1, 3)
+        } | {month_start(THIS_MONTH - timedelta(days=1))})
+        db.session.expire_all()
+
+    assert listing(client, auth_headers) == before
+    assert listing(client, auth_headers, completed='true') == [i for i in before if i['completed']]
+    assert listing(client, auth_headers, completed='false') == [i for i in before if not i['completed']]
+    # Compaction doesn't change analytics, so it doesn't invalidate them; recompute to compare
+    with app.app_context():
+        invalidate_habit_analytics(before[0]['user_id'])
+    assert client.get('/api/habits/analytics', headers=auth_headers).get_json() == analytics
+
+
+def test_compaction_is_idempotent(app, client, auth_headers):
+    seed(client, auth_headers)
+    with app.app_context():
+        compact_instances()
+        again = compact_instances()
+        assert again['rows_compacted'] == again['habits'] == 0
+
+
+def test_rows_stored_during_a_run_are_kept(app, client, auth_headers):
+    habit = seed(client, auth_headers)
+    day = START + timedelta(days=5)
+
+    stored = []
+
+    def store_row(orm_execute_state):
+        # Another worker completes a day after the chunk's rows were read
+        if not stored and orm_execute_state.is_select and HabitMonth in [
+            entity['entity'] for entity in orm_execute_state.statement.column_descriptions
+        ]:
+            stored.append(day)
+            with db.engine.begin() as connection:
+                connection.execute(db.insert(HabitInstance).values(
+                    id=instance_id(habit['id'], day), habit_id=habit['id'], user_id=habit['user_id'],
+                    due_date=day, completed=True, completed_at=datetime.utcnow(), skipped=False
+                ))
+
+    with app.app_context():
+        event.listen(db.session, 'do_orm_execute', store_row)
+        try:
+            assert compact_instances()['rows_compacted'] == 4
+        finally:
+            event.remove(db.session, 'do_orm_execute', store_row)
+        assert stored == [day]
+        assert [row.due_date for row in HabitInstance.query.filter(HabitInstance.due_date < THIS_MONTH)] == [day]
+
+    day_listing = listing(client, auth_headers, start_date=day.isoformat(), end_date=day.isoformat())
+    assert [instance['completed'] for instance in day_listing] == [True]
+    with app.app_context():
+        assert compact_instances()['rows_compacted'] == 1
+        assert HabitInstance.query.filter(HabitInstance.due_date < THIS_MONTH).count() == 0
+    assert listing(client, auth_headers, start_date=day.isoformat(), end_date=day.isoformat()) == day_listing
+
+
+def test_compacted_days_stay_editable(app, client, auth_headers):
+    habit = seed(client, auth_headers)
+    day = START + timedelta(days=1)
+    with app.app_context():
+        compact_instances()
+
+    response = update(client, auth_headers, habit['id'], day, completed=False)
+    assert response.status_code == 200
+    assert response.get_json()['id'] == instance_id(habit['id'], day)
+    assert response.get_json()['completed'] is False
+
+    # The compacted bit is folded back in, and the live row removed, on the next run
+    with app.app_context():
+        assert compact_instances()['rows_compacted'] == 1
+        month = db.session.get(HabitMonth, (habit['id'], month_start(day)))
+        assert not month.completed >> (day.day - 1) & 1
+    day_listing = listing(client, auth_headers, start_date=day.isoformat(), end_date=day.isoformat())
+    assert [instance['completed'] for instance in day_listing] == [False]
+
+
+def test_compacted_deleted_days_stay_deleted(app, client, auth_headers):
+    habit = seed(client, auth_headers)
+    deleted = START + timedelta(days=3)
+    with app.app_context():
+        compact_instances()
+
+    assert update(client, auth_headers, habit['id'], deleted, completed=True).status_code == 404
+    assert listing(client, auth_headers, start_date=deleted.isoformat(), end_date=deleted.isoformat()) == []
+
+
+def test_deleting_all_future_clears_compacted_days(app, client, auth_headers):
+    habit = seed(client, auth_headers)
+    with app.app_context():
+        compact_instances()
+
+    cut = START + timedelta(days=2)
+    response = client.delete(f"/api/habits/instances/{instance_id(habit['id'], cut)}",
+                             json={'delete_all_future': True}, headers=auth_headers)
+    assert response.status_code == 200
+    remaining = listing(client, auth_headers)
+    assert [instance['due_date'] for instance in remaining] == [
+        (START + timedelta(days=1)).isoformat(), START.isoformat()
+    ]
+
+
+def test_compact_cli(app, client, auth_headers):
+    seed(client, auth_headers)
+    result = app.test_cli_runner().invoke(args=['habits', 'compact', '--chunk-size', '1'])
+    assert result.exit_code == 0
+    report = json.loads(result.output)
+    assert report['complete'] is True
+    assert report['rows_compacted'] == 4
+
+    bad = app.test_cli_runner().invoke(args=['habits', 'compact', '--before', 'March'])
+    assert bad.exit_code != 0
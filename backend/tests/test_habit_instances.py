@@ -0,0 +1,226 @@
+"""
+Tests for set-based habit instance generation
+"""
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+from app.models.db import db
+from app.models.habit import Habit, HabitInstance
+from app.utils.habit_instances import (
+    occurrence_dates, generate_instances, insert_ignoring_duplicates, instance_id, parse_instance_id, HORIZON_DAYS,
+    ID_EPOCH
+)
+
+
+def make_habit(frequency='daily', start_date=date(2024, 1, 1), end_date=None, **kwargs):
+    return Habit(title='habit', frequency=frequency, start_date=start_date, end_date=end_date, is_active=True, **kwargs)
+
+
+def test_daily_occurrences():
+    habit = make_habit()
+    assert occurrence_dates(habit, date(2024, 3, 1), date(2024, 3, 3)) == [
+        date(2024, 3, 1), date(2024, 3, 2), date(2024, 3, 3)
+    ]
+
+
+def test_weekly_occurrences_keep_start_weekday():
+    habit = make_habit('weekly', start_date=date(2024, 1, 1))  # a Monday
+    dates = occurrence_dates(habit, date(2024, 3, 6), date(2024, 3, 31))
+    assert dates == [date(2024, 3, 11), date(2024, 3, 18), date(2024, 3, 25)]
+
+
+def test_monthly_occurrences_clamp_to_month_end():
+    habit = make_habit('monthly', start_date=date(2024, 1, 31))
+    dates = occurrence_dates(habit, date(2024, 1, 1), date(2024, 5, 1))
+    assert dates == [date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30)]
+
+
+def test_occurrences_respect_start_and_end_date():
+    habit = make_habit(start_date=date(2024, 3, 2), end_date=date(2024, 3, 4))
+    assert occurrence_dates(habit, date(2024, 3, 1), date(2024, 3, 31)) == [
+        date(2024, 3, 2), date(2024, 3, 3), date(2024, 3, 4)
+    ]
+    assert occurrence_dates(habit, date(2024, 4, 1), date(2024, 4, 30)) == []
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def test_generation_is_idempotent(app, add_habits):
+    with app.app_context():
+        habits = add_habits(3)
+        assert generate_instances(habits) == 3 * (HORIZON_DAYS + 1)
+        assert generate_instances(habits) == 0
+        assert HabitInstance.query.count() == 3 * (HORIZON_DAYS + 1)
+
+
+def test_query_count_does_not_grow_with_habits(app, add_habits):
+    with app.app_context():
+        add_habits(1)
+        add_habits(40)
+        # Load both sets after the last commit, so no attribute needs a refresh
+        few, many = sorted(
+            (Habit.query.filter_by(user_id=user_id).all() for user_id, in db.session.query(Habit.user_id).distinct()),
+            key=len
+        )
+        with count_queries() as one:
+            generate_instances(few, commit=False)
+        with count_queries() as forty:
+            generate_instances(many, commit=False)
+        assert len(one) == len(forty) == 2
+
+
+def test_duplicates_are_ignored(app, add_habits):
+    with app.app_context():
+        habit = add_habits(1)[0]
+        generate_instances([habit])
+        row = {'id': 'duplicate', 'habit_id': habit.id, 'user_id': habit.user_id, 'due_date': date.today()}
+        db.session.execute(insert_ignoring_duplicates(HabitInstance.__table__), [row])
+        db.session.commit()
+        assert HabitInstance.query.filter_by(habit_id=habit.id, due_date=date.today()).count() == 1
+
+
+def test_regenerate_keeps_completed_instances(client, auth_headers):
+    habit = client.post('/api/habits', json={'title': 'run', 'frequency': 'daily'}, headers=auth_headers).get_json()
+    instances = client.get('/api/habits/instances', headers=auth_headers).get_json()
+    tomorrow = next(i for i in instances if i['due_date'] == (date.today() + timedelta(days=1)).isoformat())
+    client.put(f"/api/habits/instances/{tomorrow['id']}", json={'completed': True}, headers=auth_headers)
+
+    response = client.post('/api/habits/regenerate', headers=auth_headers)
+    assert response.status_code == 200
+
+    instances = client.get('/api/habits/instances', headers=auth_headers).get_json()
+    assert len(instances) == HORIZON_DAYS + 1
+    assert {i['habit_id'] for i in instances} == {habit['id']}
+    assert next(i for i in instances if i['id'] == tomorrow['id'])['completed'] is True
+
+
+def test_instance_ids_round_trip():
+    habit_id = '0b1c1f7e-3f4a-4d2b-9c55-0123456789ab'
+    value = instance_id(habit_id, date(2024, 2, 29))
+    assert len(value) == 36
+    assert parse_instance_id(value) == (habit_id, date(2024, 2, 29))
+    assert parse_instance_id(habit_id) is None
+    assert parse_instance_id('not-an-id') is None
+    assert parse_instance_id(instance_id(habit_id, ID_EPOCH)) == (habit_id, ID_EPOCH)
+
+
+def test_habits_cant_start_before_the_id_epoch(client, auth_headers):
+    data = {'title': 'run', 'frequency': 'daily', 'start_date': '1999-12-31'}
+    response = client.post('/api/habits', json=data, headers=auth_headers)
+    assert response.status_code == 400
+    assert '2000-01-01' in response.get_json()['error']
+
+    habit = client.post('/api/habits', json={**data, 'start_date': '2000-01-01'}, headers=auth_headers).get_json()
+    value = instance_id(habit['id'], ID_EPOCH)
+    response = client.put(f'/api/habits/instances/{value}', json={'completed': True}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.get_json()['id'] == value
+
+
+def create_habit(client, auth_headers, **data):
+    return client.post('/api/habits', json={'title': 'run', 'frequency': 'daily', **data}, headers=auth_headers).get_json()
+
+
+def get_instances(client, auth_headers, query=''):
+    return client.get(f'/api/habits/instances{query}', headers=auth_headers).get_json()
+
+
+def test_occurrences_are_virtual_until_touched(app, client, auth_headers):
+    habit = create_habit(client, auth_headers)
+    instances = get_instances(client, auth_headers)
+
+    assert len(instances) == HORIZON_DAYS + 1
+    assert instances[0]['due_date'] > instances[-1]['due_date']
+    assert instances[-1]['habit']['id'] == habit['id']
+    with app.app_context():
+        assert HabitInstance.query.count() == 0
+
+    # The same IDs are served on every read
+    assert [i['id'] for i in get_instances(client, auth_headers)] == [i['id'] for i in instances]
+
+
+def test_completing_an_occurrence_stores_it_under_the_same_id(app, client, auth_headers):
+    create_habit(client, auth_headers)
+    today = get_instances(client, auth_headers)[-1]
+
+    response = client.put(f"/api/habits/instances/{today['id']}", json={'completed': True}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.get_json()['id'] == today['id']
+    assert response.get_json()['completed'] is True
+
+    completed = get_instances(client, auth_headers, '?completed=true')
+    assert [i['id'] for i in completed] == [today['id']]
+    assert len(get_instances(client, auth_headers, '?completed=false')) == HORIZON_DAYS
+    with app.app_context():
+        assert HabitInstance.query.count() == 1
+
+
+def test_deleting_an_occurrence_hides_it(client, auth_headers):
+    create_habit(client, auth_headers)
+    tomorrow = get_instances(client, auth_headers)[-2]
+
+    assert client.delete(f"/api/habits/instances/{tomorrow['id']}", json={}, headers=auth_headers).status_code == 200
+    instances = get_instances(client, auth_headers)
+    assert tomorrow['id'] not in {i['id'] for i in instances}
+    assert len(instances) == HORIZON_DAYS
+    assert client.put(f"/api/habits/instances/{tomorrow['id']}", json={'completed': True},
+                      headers=auth_headers).status_code == 404
+
+
+def test_deleting_all_future_occurrences_ends_the_habit(client, auth_headers):
+    habit = create_habit(client, auth_headers, start_date=(date.today() - timedelta(days=2)).isoformat())
+    today = next(i for i in get_instances(client, auth_headers) if i['due_date'] == date.today().isoformat())
+
+    client.delete(f"/api/habits/instances/{today['id']}", json={'delete_all_future': True}, headers=auth_headers)
+
+    instances = get_instances(client, auth_headers)
+    assert [i['due_date'] for i in instances] == [
+        (date.today() - timedelta(days=1)).isoformat(), (date.today() - timedelta(days=2)).isoformat()
+    ]
+    assert client.get(f"/api/habits/{habit['id']}", headers=auth_headers).get_json()['is_active'] is False
+
+
+def test_deactivating_keeps_past_occurrences(client, auth_headers):
+    start = date.today() - timedelta(days=3)
+    habit = create_habit(client, auth_headers, start_date=start.isoformat())
+    response = client.put(f"/api/habits/{habit['id']}", json={'is_active': False}, headers=auth_headers)
+    assert response.get_json()['end_date'] == date.today().isoformat()
+
+    window = f'?start_date={start.isoformat()}&end_date={date.today().isoformat()}'
+    assert len(get_instances(client, auth_headers, window)) == 4
+    assert len(get_instances(client, auth_headers)) == 4
+    # Its missed days are still counted
+    [summary] = client.get('/api/habits/analytics', headers=auth_headers).get_json()['habits']
+    assert summary['completion']['7d'] == {'due': 3, 'completed': 0, 'rate': 0.0}
+
+    # Reactivating resumes it
+    response = client.put(f"/api/habits/{habit['id']}", json={'is_active': True}, headers=auth_headers)
+    assert response.get_json()['end_date'] is None
+    assert len(get_instances(client, auth_headers)) == 4 + HORIZON_DAYS
+
+
+def test_occurrence_ids_are_checked(client, auth_headers):
+    habit = create_habit(client, auth_headers)
+    other = client.post('/api/auth/register', json={'name': 'Other', 'email': 'other@example.com', 'password': 'pw'})
+    other_headers = {'Authorization': f"Bearer {other.get_json()['token']}"}
+    today = get_instances(client, auth_headers)[-1]
+    before_start = instance_id(habit['id'], date.today() - timedelta(days=1))
+
+    assert client.put(f"/api/habits/instances/{today['id']}", json={'completed': True},
+                      headers=other_headers).status_code == 404
+    assert client.put(f"/api/habits/instances/{before_start}", json={'completed': True},
+                      headers=auth_headers).status_code == 404
@@ -0,0 +1,88 @@
+"""
+Tests for the rolling-horizon habit instance materializer
+"""
+import json
+from datetime import date, datetime, timedelta
+
+from app.models.db import db
+from app.models.habit import Habit, HabitInstance
+from app.utils.habit_materializer import HabitMaterializer, MaterializerThread
+
+
+def test_run_materializes_up_to_the_horizon(app, add_habits):
+    with app.app_context():
+        add_habits(3)
+        report = HabitMaterializer(horizon_days=6).run()
+
+        assert report['complete'] is True
+        assert report['habits'] == 3
+        assert report['rows_written'] == HabitInstance.query.count() == 3 * 7
+        assert report['duration_seconds'] >= 0
+        assert {habit.materialized_through for habit in Habit.query} == {date.today() + timedelta(days=6)}
+
+
+def test_runs_are_incremental(app, add_habits):
+    with app.app_context():
+        add_habits(2)
+        materializer = HabitMaterializer(horizon_days=6)
+        materializer.run()
+
+        again = materializer.run()
+        assert again['habits'] == again['rows_written'] == 0
+
+        tomorrow = materializer.run(today=date.today() + timedelta(days=1))
+        assert tomorrow['habits'] == 2
+        assert tomorrow['rows_written'] == 2
+
+
+def test_watermark_keeps_updated_at(app, add_habits):
+    with app.app_context():
+        add_habits(1)
+        updated_at = Habit.query.one().updated_at
+        HabitMaterializer(horizon_days=1).run()
+        db.session.expire_all()
+        assert Habit.query.one().updated_at == updated_at
+
+
+def test_run_stops_at_budget_and_resumes(app, add_habits):
+    with app.app_context():
+        add_habits(3)
+        materializer = HabitMaterializer(horizon_days=1, chunk_size=1)
+
+        first = materializer.run(max_seconds=0)
+        assert first['complete'] is False
+        assert first['chunks'] == 1
+
+        rest = materializer.run()
+        assert rest['complete'] is True
+        assert rest['habits'] == 2
+        assert HabitInstance.query.count() == 3 * 2
+
+
+def test_materialized_instances_keep_virtual_ids(app, client, auth_headers):
+    client.post('/api/habits', json={'title': 'run', 'frequency': 'daily'}, headers=auth_headers)
+    virtual = client.get('/api/habits/instances', headers=auth_headers).get_json()
+
+    with app.app_context():
+        HabitMaterializer().run()
+        assert HabitInstance.query.count() == len(virtual)
+
+    stored = client.get('/api/habits/instances', headers=auth_headers).get_json()
+    assert [i['id'] for i in stored] == [i['id'] for i in virtual]
+    assert all(i['created_at'] for i in stored)
+
+
+def test_cli_reports_the_run(app, add_habits):
+    with app.app_context():
+        add_habits(2)
+    result = app.test_cli_runner().invoke(args=['habits', 'materialize', '--horizon', '2'])
+    assert result.exit_code == 0
+    report = json.loads(result.output)
+    assert report['rows_written'] == 2 * 3
+    assert report['complete'] is True
+
+
+def test_thread_waits_for_the_off_peak_hour():
+    thread = MaterializerThread(app=None, materializer=None, hour=3)
+    assert thread.seconds_until_next_run(datetime(2024, 1, 1, 2, 0)) == 3600
+    assert thread.seconds_until_next_run(datetime(2024, 1, 1, 3, 0)) == 24 * 3600
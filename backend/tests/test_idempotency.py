@@ -0,0 +1,138 @@
+"""
+Tests for Idempotency-Key handling on create endpoints
+"""
+import threading
+import time
+
+import pytest
+from flask import jsonify
+from flask_jwt_extended import jwt_required
+
+import app.api.content as content_api
+from app.utils.idempotency import idempotent
+
+
+@pytest.mark.parametrize("path,body", [
+    ('/api/content', {'text': 'Buy milk from the store', 'timezone': 'UTC'}),
+    ('/api/thoughts', {'content': 'a quiet morning'}),
+    ('/api/todos', {'title': 'buy milk'}),
+    ('/api/habits', {'title': 'run', 'frequency': 'daily'}),
+])
+def test_retry_returns_original_response(client, auth_headers, path, body):
+    headers = {**auth_headers, 'Idempotency-Key': 'retry-1'}
+    first = client.post(path, json=body, headers=headers)
+    second = client.post(path, json=body, headers=headers)
+
+    assert first.status_code == 201
+    assert second.status_code == 201
+    assert second.get_json() == first.get_json()
+    assert second.headers['Idempotent-Replayed'] == 'true'
+
+
+def test_retry_does_not_reclassify(client, auth_headers, monkeypatch):
+    calls = []
+    classify = content_api.classify_input
+    monkeypatch.setattr(content_api, 'classify_input', lambda *args: calls.append(args) or classify(*args))
+
+    headers = {**auth_headers, 'Idempotency-Key': 'retry-2'}
+    for _ in range(3):
+        client.post('/api/content', json={'text': 'Buy milk', 'timezone': 'UTC'}, headers=headers)
+
+    assert len(calls) == 1
+    assert len(client.get('/api/todos', headers=auth_headers).get_json()) == 1
+
+
+def test_key_reused_for_different_request(client, auth_headers):
+    headers = {**auth_headers, 'Idempotency-Key': 'retry-3'}
+    client.post('/api/todos', json={'title': 'buy milk'}, headers=headers)
+    response = client.post('/api/todos', json={'title': 'buy eggs'}, headers=headers)
+    assert response.status_code == 422
+
+
+def test_without_key_creates_duplicates(client, auth_headers):
+    client.post('/api/todos', json={'title': 'buy milk'}, headers=auth_headers)
+    client.post('/api/todos', json={'title': 'buy milk'}, headers=auth_headers)
+    assert len(client.get('/api/todos', headers=auth_headers).get_json()) == 2
+
+
+def test_keys_are_scoped_per_user(client, auth_headers):
+    other = client.post('/api/auth/register', json={'name': 'Other', 'email': 'other@example.com', 'password': 'pw'})
+    other_headers = {'Authorization': f"Bearer {other.get_json()['token']}", 'Idempotency-Key': 'shared'}
+
+    mine = client.post('/api/todos', json={'title': 'buy milk'}, headers={**auth_headers, 'Idempotency-Key': 'shared'})
+    theirs = client.post('/api/todos', json={'title': 'buy milk'}, headers=other_headers)
+    assert mine.get_json()['id'] != theirs.get_json()['id']
+
+
+def test_concurrent_duplicate_waits_for_result(app, auth_headers, monkeypatch):
+    started = threading.Event()
+    classify = content_api.classify_input
+
+    def slow_classify(*args):
+        started.set()
+        time.sleep(0.5)
+        return classify(*args)
+
+    monkeypatch.setattr(content_api, 'classify_input', slow_classify)
+    headers = {**auth_headers, 'Idempotency-Key': 'concurrent'}
+    body = {'text': 'Buy milk', 'timezone': 'UTC'}
+    responses = []
+
+    def post():
+        responses.append(app.test_client().post('/api/content', json=body, headers=headers))
+
+    leader = threading.Thread(target=post)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=post)
+    follower.start()
+    leader.join()
+    follower.join()
+
+    assert [response.status_code for response in responses] == [201, 201]
+    assert responses[0].get_json() == responses[1].get_json()
+    assert len(app.test_client().get('/api/todos', headers=auth_headers).get_json()) == 1
+
+
+def test_server_errors_are_not_stored(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(content_api, 'classify_input', lambda *args: ('unknown', {}))
+    headers = {**auth_headers, 'Idempotency-Key': 'retry-4'}
+    assert client.post('/api/content', json={'text': 'x'}, headers=headers).status_code == 500
+
+    monkeypatch.undo()
+    assert client.post('/api/content', json={'text': 'x'}, headers=headers).status_code == 201
+
+
+def test_replay_keeps_response_headers(app):
+    @app.route('/api/accepted', methods=['POST'])
+    @jwt_required()
+    @idempotent
+    def accepted():
+        response = jsonify({'status': 'pending'})
+        response.headers['Location'] = '/api/accepted/1'
+        response.headers['Retry-After'] = '3'
+        response.headers['X-Not-Replayed'] = 'x'
+        return response, 202
+
+    client = app.test_client()
+    token = client.post('/api/auth/register', json={
+        'name': 'Test', 'email': 'test@example.com', 'password': 'password'
+    }).get_json()['token']
+    headers = {'Authorization': f"Bearer {token}", 'Idempotency-Key': 'accepted'}
+    client.post('/api/accepted', json={}, headers=headers)
+    replayed = client.post('/api/accepted', json={}, headers=headers)
+
+    assert replayed.status_code == 202
+    assert replayed.headers['Idempotent-Replayed'] == 'true'
+    assert (replayed.headers['Location'], replayed.headers['Retry-After']) == ('/api/accepted/1', '3')
+    assert 'X-Not-Replayed' not in replayed.headers
+
+
+def test_browsers_may_send_the_key(client):
+    preflight = client.options('/api/content', headers={
+        'Origin': 'http://localhost:3000', 'Access-Control-Request-Headers': 'idempotency-key'
+    })
+    assert 'Idempotency-Key' in preflight.headers['Access-Control-Allow-Headers']
+    response = client.get('/api/content')
+    assert 'Idempotency-Key' in response.headers['Access-Control-Allow-Headers']
+    assert 'Retry-After' in response.headers['Access-Control-Expose-Headers']
@@ -0,0 +1,103 @@
+"""
+Tests for the local naive Bayes pre-classifier
+"""
+import json
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from app.utils.local_classifier import LocalClassifier, NaiveBayesClassifier
+from app.utils.temporal_parser import parse_temporal
+
+EXAMPLES = [
+    ('buy milk', 'todo'), ('buy eggs and bread', 'todo'), ('call the bank', 'todo'),
+    ('pay the electricity bill', 'todo'), ('book a dentist appointment', 'todo'), ('buy a birthday gift', 'todo'),
+    ('i feel tired today', 'thought'), ('i wonder why the sky is blue', 'thought'),
+    ('i am so happy with my progress', 'thought'), ('i feel anxious about work', 'thought'),
+    ('life is good', 'thought'), ('i miss my old friends', 'thought'),
+    ('meditate every day', 'habit'), ('run every morning', 'habit'), ('read every night', 'habit'),
+    ('stretch every day', 'habit'), ('journal every evening', 'habit'), ('drink water every day', 'habit'),
+]
+
+
+@pytest.fixture
+def model():
+    return NaiveBayesClassifier().fit(EXAMPLES)
+
+
+def test_fit_and_predict(model):
+    assert model.examples == len(EXAMPLES)
+    assert model.predict('buy bread')[0] == 'todo'
+    assert model.predict('i feel happy')[0] == 'thought'
+    assert model.predict('walk every day')[0] == 'habit'
+
+    proba = model.predict_proba('buy bread')
+    assert set(proba) == {'thought', 'todo', 'habit'}
+    assert sum(proba.values()) == pytest.approx(1)
+
+
+def test_untrained_model_has_no_answer():
+    model = NaiveBayesClassifier()
+    assert model.predict_proba('buy milk') == {}
+    assert model.predict('buy milk') == (None, 0.0)
+    # Unknown labels aren't learned
+    model.partial_fit('buy milk', 'reminder')
+    assert model.examples == 0
+
+
+def test_answers_only_when_confident(model):
+    now = datetime(2025, 6, 16, 9, 0)
+    classifier = LocalClassifier(model, threshold=0.9, min_examples=10)
+    assert classifier.classify('buy bread') == ('todo', {'title': 'buy bread', 'description': None, 'due_date': None})
+    assert classifier.classify('walk every day', parse_temporal('walk every day', now))[0] == 'habit'
+
+    # Words the model hasn't seen leave it unsure
+    assert classifier.classify('quarterly synergy') is None
+    # Confident, but the date needs Gemini without parsed temporal data
+    assert classifier.classify('buy bread by friday') is None
+    assert classifier.stats()['answered'] == 2
+    assert classifier.stats()['deferred'] == 2
+
+    assert LocalClassifier(model, threshold=0.9, min_examples=100).classify('buy bread') is None
+    assert LocalClassifier(model, threshold=1.0, min_examples=10).classify('buy bread') is None
+
+
+def test_save_load_round_trip(model, tmp_path):
+    path = str(tmp_path / 'model.json')
+    model.save(path)
+    loaded = NaiveBayesClassifier.load(path)
+
+    assert loaded.to_dict() == model.to_dict()
+    assert loaded.vocabulary == model.vocabulary
+    for text in ('buy bread', 'i feel happy', 'walk every day', 'quarterly synergy'):
+        assert loaded.predict_proba(text) == pytest.approx(model.predict_proba(text))
+    assert list(tmp_path.iterdir()) == [tmp_path / 'model.json']
+
+
+def test_learning_stays_in_memory(model, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    classifier = LocalClassifier(model, min_examples=10)
+    for _ in range(100):
+        classifier.learn('water the plants', 'todo')
+    assert model.examples == len(EXAMPLES) + 100
+    assert classifier.stats()['learned'] == 100
+    # Workers never write the model file, only `flask classifier train` does
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_train_command_saves_the_shared_labels(app, tmp_path, monkeypatch):
+    cache_path = tmp_path / 'cache.db'
+    model_path = tmp_path / 'model.json'
+    monkeypatch.setenv('CLASSIFIER_CACHE_PATH', str(cache_path))
+    monkeypatch.setenv('CLASSIFIER_LOCAL_MODEL_PATH', str(model_path))
+    conn = sqlite3.connect(cache_path)
+    conn.execute('CREATE TABLE classification_cache (text TEXT, content_type TEXT, created_at REAL)')
+    conn.executemany('INSERT INTO classification_cache VALUES (?, ?, 0)', EXAMPLES)
+    conn.commit()
+    conn.close()
+
+    result = app.test_cli_runner().invoke(args=['classifier', 'train'])
+    assert result.exit_code == 0, result.output
+    assert NaiveBayesClassifier.load(str(model_path)).examples == len(EXAMPLES)
+    assert json.loads(model_path.read_text())['class_counts'] == {'thought': 6, 'todo': 6, 'habit': 6}
@@ -0,0 +1,89 @@
+"""
+Tests for the database migrations
+"""
+from datetime import date, datetime
+
+import pytest
+import sqlalchemy as sa
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from flask_migrate import downgrade, upgrade
+
+from app import create_app
+from app.models import search_index
+from app.models.db import db
+
+# SQLite can't reflect the expression index on todos
+pytestmark = [
+    pytest.mark.filterwarnings('ignore:Skipped unsupported reflection of expression-based index'),
+    pytest.mark.filterwarnings('ignore:autogenerate skipping metadata-specified expression-based index'),
+]
+
+
+@pytest.fixture
+def empty_app(tmp_path, monkeypatch):
+    """An app on a database without tables"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'migrated.db'}")
+    return create_app()
+
+
+def schema_differences(connection):
+    # Autogenerate skips the expression index, which is checked separately, and the search index
+    context = MigrationContext.configure(connection, opts={'include_name': search_index.include_name})
+    return compare_metadata(context, db.metadata)
+
+
+def test_upgrade_builds_the_model_schema(empty_app):
+    with empty_app.app_context():
+        upgrade()
+        with db.engine.connect() as connection:
+            assert schema_differences(connection) == []
+            indexes = connection.execute(sa.text(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'todos'"
+            )).scalars().all()
+            assert 'ix_todos_user_id_completed_due_date' in indexes
+
+
+def test_downgrade_to_base(empty_app):
+    with empty_app.app_context():
+        upgrade()
+        downgrade(revision='base')
+        assert set(sa.inspect(db.engine).get_table_names()) == {'alembic_version'}
+
+
+def test_upgrade_of_a_create_all_database_removes_duplicate_instances(empty_app):
+    """Databases created with create_all() before migrations existed upgrade in place"""
+    with empty_app.app_context():
+        upgrade(revision='3f2a9c1d4e01')
+        with db.engine.begin() as connection:
+            connection.execute(sa.text('DROP TABLE alembic_version'))
+            connection.execute(sa.text(
+                "INSERT INTO users (id, name, email, password_hash) VALUES ('u', 'u', 'u@example.com', 'x')"
+            ))
+            connection.execute(sa.text(
+                "INSERT INTO habits (id, user_id, title, frequency, start_date) VALUES ('h', 'u', 'h', 'daily', :day)"
+            ), {'day': date(2024, 1, 1)})
+            for id_, completed, updated_at in (('a', False, datetime(2024, 1, 3)), ('b', True, datetime(2024, 1, 2)),
+                                               ('c', False, datetime(2024, 1, 4))):
+                connection.execute(sa.text(
+                    "INSERT INTO habit_instances (id, habit_id, user_id, due_date, completed, skipped, updated_at) "
+                    "VALUES (:id, 'h', 'u', :day, :completed, 0, :updated_at)"
+                ), {'id': id_, 'day': date(2024, 1, 1), 'completed': completed, 'updated_at': updated_at})
+
+        upgrade()
+        with db.engine.connect() as connection:
+            assert connection.execute(sa.text('SELECT id FROM habit_instances')).scalars().all() == ['b']
+            unique = {c['name'] for c in sa.inspect(connection).get_unique_constraints('habit_instances')}
+            assert 'uq_habit_instances_habit_id_due_date' in unique
+            assert connection.execute(sa.text('SELECT version_num FROM alembic_version')).scalar() == 'f3c7a9d2e618'
+            # Rows written before the search index existed are indexed
+            assert connection.execute(sa.text('SELECT kind, item_id FROM search_index')).all() == [('habit', 'h')]
+
+
+def test_upgrade_of_a_current_create_all_database_is_a_no_op(empty_app):
+    with empty_app.app_context():
+        db.create_all()
+        upgrade()
+        with db.engine.connect() as connection:
+            assert schema_differences(connection) == []
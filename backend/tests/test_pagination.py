@@ -0,0 +1,132 @@
+"""
+Tests for keyset pagination of list endpoints and the merged content timeline
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.models.db import db
+from app.models.habit import Habit
+from app.models.thought import Thought
+from app.models.todo import Todo
+from app.models.user import User
+from app.utils.pagination import SortKey, decode_cursor, encode_cursor
+
+NOW = datetime(2024, 5, 1, 12, 0, 0)
+
+
+def seed(app):
+    """Rows with tied sort keys, so only the ID tiebreaker orders them"""
+    with app.app_context():
+        user = User.query.filter_by(email='test@example.com').one()
+        for n in range(7):
+            created_at = NOW - timedelta(hours=n // 3)
+            db.session.add(Thought(user_id=user.id, content=f'thought {n}', created_at=created_at))
+            db.session.add(Habit(user_id=user.id, title=f'habit {n}', start_date=date(2024, 5, 1),
+                                 is_active=n % 2 == 0, created_at=created_at))
+        for n, (completed, due_in_days) in enumerate([
+            (False, 2), (False, None), (False, 1), (True, 1), (False, 2), (True, None), (False, None), (True, 1)
+        ]):
+            db.session.add(Todo(
+                user_id=user.id, title=f'todo {n}', completed=completed,
+                due_date=NOW + timedelta(days=due_in_days) if due_in_days is not None else None,
+                created_at=NOW - timedelta(hours=n // 4)
+            ))
+        db.session.commit()
+
+
+def walk(client, auth_headers, path, limit, **params):
+    items, cursor, pages = [], None, 0
+    while True:
+        query = dict(params, limit=limit, **({'cursor': cursor} if cursor else {}))
+        response = client.get(path, query_string=query, headers=auth_headers)
+        assert response.status_code == 200
+        body = response.get_json()
+        assert len(body['items']) <= limit
+        items.extend(body['items'])
+        pages += 1
+        cursor = body['next_cursor']
+        if cursor is None:
+            return items, pages
+
+
+@pytest.mark.parametrize('path, params', [
+    ('/api/thoughts', {}),
+    ('/api/content/thoughts', {}),
+    ('/api/todos', {}),
+    ('/api/todos', {'completed': 'false'}),
+    ('/api/content/todos', {}),
+    ('/api/habits', {}),
+    ('/api/habits', {'is_active': 'true'}),
+])
+@pytest.mark.parametrize('limit', [1, 2, 3, 50])
+def test_pages_cover_the_unpaginated_listing(app, client, auth_headers, path, params, limit):
+    seed(app)
+    everything = client.get(path, query_string=params, headers=auth_headers).get_json()
+    assert isinstance(everything, list) and everything
+
+    items, pages = walk(client, auth_headers, path, limit, **params)
+    assert [item['id'] for item in items] == [item['id'] for item in everything]
+    assert pages == max(1, -(-len(everything) // limit))
+
+
+def test_todo_order_is_kept(app, client, auth_headers):
+    seed(app)
+    items, _ = walk(client, auth_headers, '/api/todos', 2)
+    keys = [(item['completed'], item['due_date'] is None, item['due_date'] or '') for item in items]
+    assert keys == sorted(keys)
+
+
+@pytest.mark.parametrize('query', [
+    {'limit': 0},
+    {'limit': 1000},
+    {'limit': 'ten'},
+    {'cursor': encode_cursor([NOW, 'x'])},
+    {'limit': 5, 'cursor': 'not a cursor'},
+    {'limit': 5, 'cursor': encode_cursor([NOW])},
+])
+def test_invalid_page_arguments(client, auth_headers, query):
+    response = client.get('/api/thoughts', query_string=query, headers=auth_headers)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_cursor_round_trip(app):
+    keys = [SortKey(Todo.completed), SortKey(Todo.due_date, nulls_last=True), SortKey(Todo.id)]
+    values = [True, None, 'abc']
+    assert decode_cursor(encode_cursor(values), keys) == values
+    values = [False, NOW, 'abc']
+    assert decode_cursor(encode_cursor(values), keys) == values
+
+
+@pytest.mark.parametrize('limit', [1, 2, 5, 50])
+def test_timeline_pages_cover_the_unpaginated_timeline(app, client, auth_headers, limit):
+    seed(app)
+    everything = client.get('/api/content', headers=auth_headers).get_json()
+    assert {item['type'] for item in everything} == {'thought', 'todo', 'habit'}
+    assert all(item['data']['is_active'] for item in everything if item['type'] == 'habit')
+    created = [item['data']['created_at'] for item in everything]
+    assert created == sorted(created, reverse=True)
+
+    items, pages = walk(client, auth_headers, '/api/content', limit)
+    assert [(item['type'], item['data']['id']) for item in items] == \
+        [(item['type'], item['data']['id']) for item in everything]
+    assert pages == max(1, -(-len(everything) // limit))
+
+
+def test_timeline_page_reads_a_page_per_table(app, client, auth_headers):
+    seed(app)
+    with app.app_context():
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            body = client.get('/api/content', query_string={'limit': 2}, headers=auth_headers).get_json()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert len(body['items']) == 2
+    selects = [s for s in statements if s.lstrip().upper().startswith('SELECT')]
+    assert len(selects) == 3
+    assert all('LIMIT' in s for s in selects)
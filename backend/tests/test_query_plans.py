@@ -0,0 +1,113 @@
+"""
+Tests that list endpoints read through the composite indexes
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from app.models.db import db
+
+INDEXED_TABLES = ('thoughts', 'todos', 'habits', 'habit_instances', 'habit_months')
+
+
+def seed(client, auth_headers):
+    for day in range(1, 4):
+        client.post('/api/thoughts', json={'content': f'thought {day}'}, headers=auth_headers)
+        client.post('/api/todos', json={'title': f'todo {day}', 'due_date': f'2024-05-0{day}T12:00:00Z'},
+                    headers=auth_headers)
+    client.post('/api/todos', json={'title': 'someday'}, headers=auth_headers)
+    client.post('/api/habits', json={'title': 'walk', 'frequency': 'daily', 'start_date': '2024-05-01'},
+                headers=auth_headers)
+
+
+def query_plans(app, client, auth_headers, path, query=None):
+    """Run a GET and return the query plan of every SELECT it issued"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            response = client.get(path, query_string=query, headers=auth_headers)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+        assert response.status_code == 200
+
+        connection = db.session.connection()
+        plans = [
+            [row[-1] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+            for statement, parameters in statements
+        ]
+    return response.get_json(), plans
+
+
+def assert_indexed(plans, sorted_by_index=True):
+    searched = set()
+    for plan in plans:
+        for step in plan:
+            table = step.split()[1] if step.startswith(('SCAN', 'SEARCH')) else None
+            if table not in INDEXED_TABLES:
+                continue
+            assert step.startswith('SEARCH') and ' INDEX ' in step, plan
+            searched.add(table)
+        if sorted_by_index:
+            assert not any('TEMP B-TREE' in step for step in plan), plan
+    assert searched, plans
+
+
+@pytest.mark.parametrize('path,query', [
+    ('/api/thoughts', None),
+    ('/api/thoughts', {'limit': 2}),
+    ('/api/content/thoughts', None),
+    ('/api/todos', None),
+    ('/api/todos', {'completed': 'false'}),
+    ('/api/todos', {'limit': 2}),
+    ('/api/content/todos', {'completed': 'true'}),
+    ('/api/habits', None),
+    ('/api/habits', {'is_active': 'true', 'limit': 1}),
+    ('/api/content', None),
+    ('/api/content', {'limit': 2}),
+])
+def test_listings_use_an_index_in_their_order(app, client, auth_headers, path, query):
+    seed(client, auth_headers)
+    _, plans = query_plans(app, client, auth_headers, path, query)
+    assert_indexed(plans)
+
+
+def test_cursor_pages_use_an_index_in_their_order(app, client, auth_headers):
+    seed(client, auth_headers)
+    for path in ('/api/thoughts', '/api/todos', '/api/content'):
+        page, _ = query_plans(app, client, auth_headers, path, {'limit': 2})
+        _, plans = query_plans(app, client, auth_headers, path, {'limit': 2, 'cursor': page['next_cursor']})
+        assert_indexed(plans)
+
+
+@pytest.mark.parametrize('path,query', [
+    ('/api/thoughts', {'date': '2024-05-02'}),
+    ('/api/todos', {'from': '2024-05-01', 'to': '2024-05-02'}),
+    ('/api/content', {'date': '2024-05-02', 'tz': 'America/New_York'}),
+    ('/api/habits/instances', {'start_date': '2024-05-01', 'end_date': '2024-05-07'}),
+    ('/api/habits/analytics', None),
+])
+def test_windows_search_an_index_range(app, client, auth_headers, path, query):
+    seed(client, auth_headers)
+    _, plans = query_plans(app, client, auth_headers, path, query)
+    # Due-date windows sort their few matches rather than walking the whole listing order
+    assert_indexed(plans, sorted_by_index=False)
+    assert any(('>' in step or '<' in step) for plan in plans for step in plan)
+
+
+def test_habit_instances_by_habit_use_the_unique_constraint(app, client, auth_headers):
+    seed(client, auth_headers)
+    with app.app_context():
+        plan = [row[-1] for row in db.session.connection().exec_driver_sql(
+            'EXPLAIN QUERY PLAN SELECT id FROM habit_instances WHERE habit_id = ? AND due_date >= ?',
+            ('habit', date(2024, 5, 1))
+        )]
+    assert len(plan) == 1
+    assert plan[0].startswith('SEARCH habit_instances USING INDEX')
+    assert plan[0].endswith('(habit_id=? AND due_date>?)')
@@ -0,0 +1,129 @@
+"""
+Tests for compiled habit recurrence rules
+"""
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from app.models.habit import Habit
+from app.utils.recurrence import compile_rule, habit_rule, parse_frequency_data
+
+MONDAY = date(2024, 1, 1)
+
+
+def rule(frequency, data=None, anchor=MONDAY):
+    return parse_frequency_data(frequency, data, anchor)
+
+
+def test_plain_frequencies():
+    assert rule('daily').occurrences(date(2024, 1, 30), date(2024, 2, 1)) == [
+        date(2024, 1, 30), date(2024, 1, 31), date(2024, 2, 1)
+    ]
+    assert rule('weekly').occurrences(date(2024, 1, 2), date(2024, 1, 22)) == [
+        date(2024, 1, 8), date(2024, 1, 15), date(2024, 1, 22)
+    ]
+    assert rule('monthly', anchor=date(2024, 1, 31)).occurrences(date(2024, 1, 1), date(2024, 4, 30)) == [
+        date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30)
+    ]
+
+
+def test_every_n_days_counts_from_the_anchor():
+    every_third = rule('daily', {'interval': 3})
+    assert every_third.occurrences(date(2024, 1, 5), date(2024, 1, 14)) == [
+        date(2024, 1, 7), date(2024, 1, 10), date(2024, 1, 13)
+    ]
+    assert every_third.occurrences(date(2023, 12, 1), date(2024, 1, 4)) == [date(2024, 1, 1), date(2024, 1, 4)]
+
+
+def test_specific_weekdays():
+    weekdays = rule('daily', {'weekdays': ['mon', 'wednesday', 4]})
+    assert weekdays.occurrences(date(2024, 1, 1), date(2024, 1, 10)) == [
+        date(2024, 1, 1), date(2024, 1, 3), date(2024, 1, 5), date(2024, 1, 8), date(2024, 1, 10)
+    ]
+
+
+def test_weekdays_every_other_week():
+    fortnightly = rule('weekly', {'weekdays': ['tue', 'thu'], 'interval': 2}, anchor=date(2024, 1, 3))
+    assert fortnightly.occurrences(date(2024, 1, 1), date(2024, 1, 31)) == [
+        date(2024, 1, 4), date(2024, 1, 16), date(2024, 1, 18), date(2024, 1, 30)
+    ]
+
+
+def test_nth_weekday_of_month():
+    second_tuesday = rule('monthly', {'nth_weekday': {'n': 2, 'weekday': 'tue'}})
+    assert second_tuesday.occurrences(date(2024, 1, 1), date(2024, 3, 31)) == [
+        date(2024, 1, 9), date(2024, 2, 13), date(2024, 3, 12)
+    ]
+    last_friday = rule('monthly', {'nth_weekday': [{'n': -1, 'weekday': 'fri'}]})
+    assert last_friday.occurrences(date(2024, 1, 1), date(2024, 3, 31)) == [
+        date(2024, 1, 26), date(2024, 2, 23), date(2024, 3, 29)
+    ]
+    # Months without a fifth Monday are skipped
+    fifth_monday = rule('monthly', {'nth_weekday': {'n': 5, 'weekday': 'mon'}})
+    assert fifth_monday.occurrences(date(2024, 1, 1), date(2024, 4, 30)) == [date(2024, 1, 29), date(2024, 4, 29)]
+
+
+def test_every_n_months():
+    quarterly = rule('monthly', {'interval': 3}, anchor=date(2024, 1, 15))
+    assert quarterly.occurrences(date(2024, 2, 1), date(2024, 12, 31)) == [
+        date(2024, 4, 15), date(2024, 7, 15), date(2024, 10, 15)
+    ]
+
+
+def test_exclusions():
+    daily = rule('daily', {'exclude': ['2024-01-02', '2024-01-04']})
+    assert daily.occurrences(date(2024, 1, 1), date(2024, 1, 5)) == [
+        date(2024, 1, 1), date(2024, 1, 3), date(2024, 1, 5)
+    ]
+    assert not daily.occurs_on(date(2024, 1, 2))
+
+
+@pytest.mark.parametrize('frequency,data', [
+    ('hourly', None),
+    ('daily', {'interval': 0}),
+    ('daily', {'weekdays': ['someday']}),
+    ('daily', {'nth_weekday': {'n': 1, 'weekday': 'mon'}}),
+    ('monthly', {'weekdays': ['mon']}),
+    ('monthly', {'nth_weekday': {'n': 0, 'weekday': 'mon'}}),
+    ('daily', {'exclude': ['tomorrow']}),
+    ('daily', {'every': 2}),
+])
+def test_invalid_rules(frequency, data):
+    with pytest.raises(ValueError):
+        rule(frequency, data)
+
+
+def test_compiled_rules_are_cached():
+    data = json.dumps({'weekdays': ['mon']})
+    assert compile_rule('weekly', data, MONDAY) is compile_rule('weekly', data, MONDAY)
+    assert compile_rule('weekly', data, MONDAY) is not compile_rule('weekly', None, MONDAY)
+
+
+def test_invalid_stored_rule_falls_back_to_frequency():
+    habit = Habit(id='h', frequency='daily', frequency_data='{"interval": "x"}', start_date=MONDAY)
+    assert len(habit_rule(habit).occurrences(MONDAY, MONDAY + timedelta(days=6))) == 7
+
+
+def test_habit_api_uses_frequency_data(client, auth_headers):
+    start = date.today() - timedelta(days=date.today().weekday())
+    response = client.post('/api/habits', json={
+        'title': 'gym', 'frequency': 'weekly', 'start_date': start.isoformat(),
+        'frequency_data': {'weekdays': ['mon', 'wed', 'fri']}
+    }, headers=auth_headers)
+    assert response.status_code == 201
+
+    instances = client.get(
+        f'/api/habits/instances?start_date={start.isoformat()}&end_date={(start + timedelta(days=6)).isoformat()}',
+        headers=auth_headers
+    ).get_json()
+    assert sorted(i['due_date'] for i in instances) == [
+        start.isoformat(), (start + timedelta(days=2)).isoformat(), (start + timedelta(days=4)).isoformat()
+    ]
+
+
+def test_habit_api_rejects_invalid_frequency_data(client, auth_headers):
+    response = client.post('/api/habits', json={
+        'title': 'gym', 'frequency': 'daily', 'frequency_data': {'nth_weekday': {'n': 1, 'weekday': 'mon'}}
+    }, headers=auth_headers)
+    assert response.status_code == 400
@@ -0,0 +1,177 @@
+"""
+Tests for deadlines, retries and the circuit breaker, on a fake clock
+"""
+import pytest
+
+from app.utils import resilience
+from app.utils.resilience import CircuitBreaker, CircuitOpenError, Deadline, DeadlineExceeded, call_with_resilience
+
+
+class FakeClock:
+    """Stands in for the time module; sleeping moves the clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FlakyCall:
+    """Fails the given number of times, each attempt taking `duration` seconds or its timeout"""
+
+    def __init__(self, clock, failures=0, duration=0.1, error=ConnectionError):
+        self.clock = clock
+        self.failures = failures
+        self.duration = duration
+        self.error = error
+        self.timeouts = []
+
+    def __call__(self, timeout):
+        self.timeouts.append(timeout)
+        self.clock.now += min(self.duration, timeout)
+        if self.failures:
+            self.failures -= 1
+            raise self.error('upstream failed')
+        return 'ok'
+
+
+class MaxJitter:
+    """Always the longest backoff, so delays are predictable"""
+
+    @staticmethod
+    def uniform(low, high):
+        return high
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience, 'time', clock)
+    monkeypatch.setattr(resilience, 'random', MaxJitter)
+    return clock
+
+
+def test_trips_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.record_failure()
+    # A success in between starts the count again
+    breaker.record_success(0.1)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == 'closed'
+
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert breaker.stats()['trips'] == 1
+
+
+def test_slow_calls_count_as_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=2, slow_call_threshold=5)
+    breaker.record_success(6)
+    # A caller that expects a slow call raises the threshold for it
+    breaker.record_success(6, slow_call_threshold=10)
+    assert breaker.stats()['consecutive_failures'] == 0
+
+    breaker.record_success(6)
+    breaker.record_success(5.5)
+    assert breaker.state == 'open'
+    assert breaker.stats()['slow_calls'] == 3
+
+
+def test_fails_fast_while_open(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    call = FlakyCall(clock, failures=1)
+    with pytest.raises(ConnectionError):
+        call_with_resilience(call, Deadline(10), breaker, max_retries=0)
+
+    clock.now += 29
+    with pytest.raises(CircuitOpenError):
+        call_with_resilience(call, Deadline(10), breaker)
+    assert len(call.timeouts) == 1
+    assert breaker.stats()['rejected'] == 1
+
+
+def test_half_open_allows_one_trial(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.state == 'half_open'
+
+    assert breaker.allow()
+    # Other calls are rejected while the trial is in flight
+    assert not breaker.allow()
+
+    breaker.record_success(0.1)
+    assert breaker.state == 'closed'
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_trial_opens_again(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 30
+
+    call = FlakyCall(clock, failures=1)
+    # One failed trial is enough, without waiting for the threshold, and
+    # the retry is rejected
+    with pytest.raises(CircuitOpenError):
+        call_with_resilience(call, Deadline(10), breaker, max_retries=2)
+    assert len(call.timeouts) == 1
+    assert breaker.state == 'open'
+    assert breaker.stats()['trips'] == 2
+
+    # It waits the full reset timeout again
+    clock.now += 29
+    assert breaker.state == 'open'
+    clock.now += 1
+    assert call_with_resilience(call, Deadline(10), breaker) == 'ok'
+    assert breaker.state == 'closed'
+
+
+def test_retries_with_backoff(clock):
+    call = FlakyCall(clock, failures=2)
+    assert call_with_resilience(call, Deadline(10), max_retries=2, base_delay=0.2) == 'ok'
+    assert len(call.timeouts) == 3
+    # Exponential, 0.2 * 2 ** attempt
+    assert clock.sleeps == pytest.approx([0.4, 0.8])
+
+
+def test_gives_up_after_max_retries(clock):
+    breaker = CircuitBreaker(failure_threshold=10)
+    call = FlakyCall(clock, failures=5)
+    with pytest.raises(ConnectionError):
+        call_with_resilience(call, Deadline(10), breaker, max_retries=2)
+    assert len(call.timeouts) == 3
+    assert breaker.stats()['failures'] == 3
+
+
+def test_does_not_retry_permanent_errors(clock):
+    call = FlakyCall(clock, failures=1, error=ValueError)
+    with pytest.raises(ValueError):
+        call_with_resilience(call, Deadline(10), is_retryable=lambda e: not isinstance(e, ValueError))
+    assert len(call.timeouts) == 1
+    assert clock.sleeps == []
+
+
+def test_attempts_fit_in_the_deadline(clock):
+    call = FlakyCall(clock, failures=2, duration=1)
+    assert call_with_resilience(call, Deadline(5), max_retries=2, call_timeout=4, base_delay=0.2) == 'ok'
+    # Each attempt gets what is left of the budget, at most call_timeout
+    assert call.timeouts == pytest.approx([4, 5 - 1 - 0.4, 5 - 2.4 - 0.8])
+
+
+def test_deadline_exhausted(clock):
+    call = FlakyCall(clock, failures=5, duration=3)
+    with pytest.raises(DeadlineExceeded):
+        call_with_resilience(call, Deadline(5), max_retries=5, call_timeout=4, base_delay=2)
+    # The backoff never sleeps past the deadline, and no attempt starts after it
+    assert call.timeouts == [4]
+    assert clock.sleeps == [2]
@@ -0,0 +1,155 @@
+"""
+Tests for full-text search over thoughts, todos and habits
+"""
+import json
+
+import pytest
+from sqlalchemy import text
+
+from app.models.db import db
+from app.models.todo import Todo
+from app.models.user import User
+from app.utils.search import query_terms
+
+
+def search(client, auth_headers, q, **params):
+    response = client.get('/api/search', query_string=dict(params, q=q), headers=auth_headers)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def titles(page):
+    return [item['data'].get('title') or item['data'].get('content') for item in page['items']]
+
+
+@pytest.fixture
+def seeded(client, auth_headers):
+    client.post('/api/thoughts', json={'content': 'I went running in the park'}, headers=auth_headers)
+    client.post('/api/todos', json={'title': 'Buy shoes', 'description': 'for running the marathon'},
+                headers=auth_headers)
+    client.post('/api/habits', json={'title': 'Running', 'description': 'every morning', 'frequency': 'daily',
+                                     'start_date': '2024-05-01'}, headers=auth_headers)
+
+
+def test_query_terms():
+    assert query_terms('Hello, "world" AND NEAR(x*') == ['hello', 'world', 'and', 'near', 'x']
+    assert query_terms('snake_case') == ['snake', 'case']
+
+
+def test_matches_every_kind_ranked(client, auth_headers, seeded):
+    page = search(client, auth_headers, 'run')
+    assert [item['type'] for item in page['items']][0] == 'habit'
+    assert sorted(item['type'] for item in page['items']) == ['habit', 'thought', 'todo']
+    assert page['next_cursor'] is None
+
+    # Every word must match; the last may be a prefix
+    assert titles(search(client, auth_headers, 'running park')) == ['I went running in the park']
+    assert titles(search(client, auth_headers, 'mara')) == ['Buy shoes']
+    assert titles(search(client, auth_headers, 'swimming')) == []
+
+
+def test_query_syntax_is_not_interpreted(client, auth_headers, seeded):
+    for q in ('"park', 'park*', '(park', 'park)', '-park', 'park:*'):
+        assert titles(search(client, auth_headers, q)) == ['I went running in the park']
+
+
+def test_queries_without_words(client, auth_headers):
+    for q in ('', '  ', '*"'):
+        response = client.get('/api/search', query_string={'q': q}, headers=auth_headers)
+        assert response.status_code == 400
+        assert 'error' in response.get_json()
+
+
+def test_index_follows_updates_and_deletes(client, auth_headers, seeded):
+    todo = search(client, auth_headers, 'marathon')['items'][0]['data']
+    client.put(f"/api/todos/{todo['id']}", json={'description': 'for the race'}, headers=auth_headers)
+    assert titles(search(client, auth_headers, 'marathon')) == []
+    assert titles(search(client, auth_headers, 'race')) == ['Buy shoes']
+
+    thought = search(client, auth_headers, 'park')['items'][0]['data']
+    client.delete(f"/api/thoughts/{thought['id']}", json={}, headers=auth_headers)
+    assert titles(search(client, auth_headers, 'park')) == []
+
+    # Deleted habits are kept inactive, and not found
+    habit = search(client, auth_headers, 'morning')['items'][0]['data']
+    client.delete(f"/api/habits/{habit['id']}", json={}, headers=auth_headers)
+    assert titles(search(client, auth_headers, 'morning')) == []
+
+
+def test_index_follows_bulk_statements(app, client, auth_headers, seeded):
+    with app.app_context():
+        Todo.query.delete()
+        db.session.commit()
+    assert sorted(item['type'] for item in search(client, auth_headers, 'running')['items']) == ['habit', 'thought']
+
+
+def test_results_are_the_users_own(app, client, auth_headers, seeded):
+    response = client.post('/api/auth/register', json={
+        'name': 'Other', 'email': 'other@example.com', 'password': 'password'
+    })
+    other = {'Authorization': f"Bearer {response.get_json()['token']}"}
+    assert search(client, other, 'running')['items'] == []
+
+
+def test_pages(client, auth_headers):
+    for number in range(7):
+        client.post('/api/thoughts', json={'content': f'note {number} ' + 'note ' * number}, headers=auth_headers)
+    everything = search(client, auth_headers, 'note')['items']
+    assert len(everything) == 7
+
+    seen, cursor = [], None
+    while True:
+        params = {'limit': 3} if cursor is None else {'cursor': cursor}
+        page = search(client, auth_headers, 'note', **params)
+        seen += page['items']
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert seen == everything
+
+    response = client.get('/api/search', query_string={'q': 'note', 'cursor': 'nonsense'}, headers=auth_headers)
+    assert response.status_code == 400
+
+
+def test_pages_are_stable_while_items_are_added(client, auth_headers):
+    for number in range(7):
+        client.post('/api/thoughts', json={'content': f'note {number} ' + 'note ' * number}, headers=auth_headers)
+    client.post('/api/todos', json={'title': 'Groceries', 'description': 'note the list'}, headers=auth_headers)
+    everything = titles(search(client, auth_headers, 'note'))
+
+    seen, cursor = [], None
+    for _ in range(10):
+        params = {'limit': 2} if cursor is None else {'limit': 2, 'cursor': cursor}
+        page = search(client, auth_headers, 'note', **params)
+        seen += titles(page)
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+        # Rows added between pages change every bm25 score
+        for _ in range(3):
+            client.post('/api/thoughts', json={'content': 'other words'}, headers=auth_headers)
+            client.post('/api/todos', json={'title': 'note ' * 5}, headers=auth_headers)
+
+    # Nothing is skipped or repeated, later rows sort before the cursor
+    assert seen == everything
+    assert len(set(seen)) == len(seen) == 8
+
+
+def test_rebuild(app, client, auth_headers, seeded):
+    with app.app_context():
+        db.session.execute(text('DELETE FROM search_index_fts'))
+        db.session.execute(text('DELETE FROM search_index'))
+        db.session.commit()
+    assert search(client, auth_headers, 'running')['items'] == []
+
+    result = app.test_cli_runner().invoke(args=['search', 'rebuild'])
+    assert result.exit_code == 0, result.output
+    assert json.loads(result.output)['indexed'] == {'thought': 1, 'todo': 1, 'habit': 1}
+    assert len(search(client, auth_headers, 'running')['items']) == 3
+
+    # And the triggers keep working on the rebuilt index
+    with app.app_context():
+        user = User.query.filter_by(email='test@example.com').one()
+        db.session.add(Todo(user_id=user.id, title='Running club'))
+        db.session.commit()
+    assert len(search(client, auth_headers, 'running')['items']) == 4
@@ -0,0 +1,130 @@
+"""
+Tests for coalescing identical in-flight classifications
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.utils.singleflight import SingleFlight
+
+CALLERS = 5
+
+
+def wait_for_followers(flight, key, followers):
+    """Block until the given number of callers are waiting on the leader"""
+    for _ in range(1000):
+        with flight._lock:
+            call = flight._calls.get(key)
+            if call is not None and call.followers == followers:
+                return
+        time.sleep(0.005)
+    raise AssertionError(f'{followers} followers never joined')
+
+
+def test_concurrent_calls_share_one_upstream_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return {'type': 'todo'}
+
+    with ThreadPoolExecutor(CALLERS) as pool:
+        futures = [pool.submit(flight.do, 'buy milk', fn) for _ in range(CALLERS)]
+        wait_for_followers(flight, 'buy milk', CALLERS - 1)
+        release.set()
+        results = [future.result(5) for future in futures]
+
+    assert len(calls) == 1
+    # Every caller gets the leader's result itself
+    assert all(result is results[0] for result in results)
+    stats = flight.stats()
+    assert (stats['upstream_calls'], stats['saved_in_process'], stats['in_flight']) == (1, CALLERS - 1, 0)
+
+    # Once it's done, the next call with the key runs again
+    flight.do('buy milk', fn)
+    assert len(calls) == 2
+
+
+def test_different_keys_are_not_coalesced():
+    flight = SingleFlight()
+    assert [flight.do(key, lambda key=key: key) for key in ('a', 'b')] == ['a', 'b']
+    assert flight.stats()['upstream_calls'] == 2
+
+
+def test_leader_errors_reach_every_caller():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fn():
+        release.wait(5)
+        raise TimeoutError('Gemini timed out')
+
+    with ThreadPoolExecutor(CALLERS) as pool:
+        futures = [pool.submit(flight.do, 'buy milk', fn) for _ in range(CALLERS)]
+        wait_for_followers(flight, 'buy milk', CALLERS - 1)
+        release.set()
+        for future in futures:
+            with pytest.raises(TimeoutError, match='Gemini timed out'):
+                future.result(5)
+
+    # The failed call isn't remembered
+    assert flight.do('buy milk', lambda: 'ok') == 'ok'
+
+
+def test_waits_for_the_result_of_another_process(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    other = SingleFlight(path)
+    flight = SingleFlight(path, poll_interval=0.01)
+    shared = {}
+    calls = []
+
+    # The other process is classifying the same text
+    assert other._acquire('buy milk')
+    with ThreadPoolExecutor(1) as pool:
+        future = pool.submit(flight.do, 'buy milk', lambda: calls.append(1), lambda: shared.get('buy milk'))
+        time.sleep(0.05)
+        assert not future.done()
+        shared['buy milk'] = ('todo', {'title': 'buy milk'})
+        assert future.result(5) == ('todo', {'title': 'buy milk'})
+    other._release('buy milk')
+
+    assert calls == []
+    assert flight.stats()['saved_across_processes'] == 1
+    assert flight.stats()['upstream_calls'] == 0
+
+
+def test_runs_itself_when_the_other_process_shares_nothing(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    other = SingleFlight(path)
+    flight = SingleFlight(path, poll_interval=0.01)
+
+    assert other._acquire('buy milk')
+    with ThreadPoolExecutor(1) as pool:
+        future = pool.submit(flight.do, 'buy milk', lambda: 'classified here', lambda: None)
+        time.sleep(0.05)
+        # The other process failed, its lock goes without a shared result
+        other._release('buy milk')
+        assert future.result(5) == 'classified here'
+    assert flight.stats()['upstream_calls'] == 1
+    assert not flight._is_locked('buy milk')
+
+
+def test_stale_locks_are_taken_over(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    # A process that died holding the lock, its lease already expired
+    assert SingleFlight(path, lease=-1)._acquire('buy milk')
+
+    flight = SingleFlight(path)
+    assert flight.do('buy milk', lambda: 'classified here', lambda: None) == 'classified here'
+    assert flight.stats()['upstream_calls'] == 1
+
+
+def test_unusable_lock_table_coalesces_in_process_only(tmp_path):
+    flight = SingleFlight(str(tmp_path / 'missing' / 'cache.db'))
+    assert flight.db_path is None
+    assert flight.do('buy milk', lambda: 'ok', lambda: None) == 'ok'
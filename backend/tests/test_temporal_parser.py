@@ -0,0 +1,191 @@
+"""
+Table-driven tests for the rule-based temporal parser
+"""
+import sys
+import os
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from datetime import datetime
+
+import pytest
+import pytz
+
+from app.utils.temporal_parser import parse_temporal
+
+# Monday 2025-06-16, 10:00 in New York
+NOW = pytz.timezone('America/New_York').localize(datetime(2025, 6, 16, 10, 0))
+
+# (text, due_date, due_time)
+TODO_CASES = [
+    # Relative days
+    ("Call John tomorrow at 3pm", "2025-06-17T15:00:00", "15:00"),
+    ("call john tomorrow", "2025-06-17", None),
+    ("submit report today", "2025-06-16", None),
+    ("pay rent today at 5pm", "2025-06-16T17:00:00", "17:00"),
+    ("buy cake the day after tomorrow", "2025-06-18", None),
+    ("email boss tmrw", "2025-06-17", None),
+    ("finish slides by end of day", "2025-06-16", None),
+    ("call mom tonight", "2025-06-16T20:00:00", "20:00"),
+    ("call mom tonight at 8pm", "2025-06-16T20:00:00", "20:00"),
+    ("call mom tonight at 9", "2025-06-16T21:00:00", "21:00"),
+    ("gym tomorrow morning", "2025-06-17T09:00:00", "09:00"),
+    ("meeting tomorrow afternoon", "2025-06-17T15:00:00", "15:00"),
+    ("dinner tomorrow evening", "2025-06-17T18:00:00", "18:00"),
+    ("lunch with sam tomorrow at noon", "2025-06-17T12:00:00", "12:00"),
+    ("deploy tomorrow at midnight", "2025-06-17T00:00:00", "00:00"),
+    ("meet at noon tomorrow", "2025-06-17T12:00:00", "12:00"),
+    ("fix the button tomorrow", "2025-06-17", None),
+    ("book a salon tomorrow", "2025-06-17", None),
+    # Weekdays
+    ("Buy groceries by Friday", "2025-06-20", None),
+    ("buy groceries friday", "2025-06-20", None),
+    ("call the bank on wednesday", "2025-06-18", None),
+    ("dentist on thu", "2025-06-19", None),
+    ("renew license by fri", "2025-06-20", None),
+    ("report due monday", "2025-06-16", None),
+    ("team sync on monday", "2025-06-23", None),
+    ("team sync next monday", "2025-06-23", None),
+    ("haircut next friday", "2025-06-20", None),
+    ("finish essay this sunday", "2025-06-22", None),
+    ("call grandma saturday at 2pm", "2025-06-21T14:00:00", "14:00"),
+    ("pickup on tuesday at 10:30am", "2025-06-17T10:30:00", "10:30"),
+    ("standup thursday 9am", "2025-06-19T09:00:00", "09:00"),
+    # Weeks, weekends, months
+    ("plan trip next week", "2025-06-23", None),
+    ("clean garage this weekend", "2025-06-21", None),
+    ("visit parents next weekend", "2025-06-28", None),
+    ("finish report by end of the week", "2025-06-20", None),
+    ("pay invoices by the end of the month", "2025-06-30", None),
+    ("renew gym next month", "2025-07-01", None),
+    # Offsets
+    ("check oven in 20 minutes", "2025-06-16T10:20:00", "10:20"),
+    ("call back in an hour", "2025-06-16T11:00:00", "11:00"),
+    ("stretch in half an hour", "2025-06-16T10:30:00", "10:30"),
+    ("follow up in 3 days", "2025-06-19", None),
+    ("follow up in two weeks", "2025-06-30", None),
+    ("dentist checkup in a month", "2025-07-16", None),
+    ("water plants in a couple days", "2025-06-18", None),
+    # Calendar dates
+    ("doctor on June 20", "2025-06-20", None),
+    ("doctor on june 20th at 4pm", "2025-06-20T16:00:00", "16:00"),
+    ("flight jul 4", "2025-07-04", None),
+    ("party on 5 july", "2025-07-05", None),
+    ("taxes due the 15th of april", "2026-04-15", None),
+    ("anniversary dec. 3", "2025-12-03", None),
+    ("conference march 3, 2026", "2026-03-03", None),
+    ("move out 2025-08-31", "2025-08-31", None),
+    ("vet 6/20", "2025-06-20", None),
+    ("vet appointment 7/1/2025 at 9am", "2025-07-01T09:00:00", "09:00"),
+    ("pay card on the 25th", "2025-06-25", None),
+    ("pay card on the 1st", "2025-07-01", None),
+    # Times without dates
+    ("call john at 3pm", "2025-06-16T15:00:00", "15:00"),
+    ("call john at 3", "2025-06-16T15:00:00", "15:00"),
+    ("alarm at 7am", "2025-06-17T07:00:00", "07:00"),
+    ("call at 9:45 am", "2025-06-17T09:45:00", "09:45"),
+    ("call at 17:30", "2025-06-16T17:30:00", "17:30"),
+    ("coffee at 11 o'clock", "2025-06-16T11:00:00", "11:00"),
+    ("call at 4 p.m.", "2025-06-16T16:00:00", "16:00"),
+    ("call at 12pm", "2025-06-16T12:00:00", "12:00"),
+    ("call at 12am", "2025-06-17T00:00:00", "00:00"),
+    # No temporal content
+    ("Remember to breathe", None, None),
+    ("buy milk", None, None),
+    ("I'm feeling really anxious about the presentation", None, None),
+    ("read 3 chapters", None, None),
+    ("I may go to the party", None, None),
+    ("the cat sat down", None, None),
+]
+
+# (text, frequency, due_time, start_date)
+HABIT_CASES = [
+    ("exercise at 6pm daily", "daily", "18:00", None),
+    ("meditate at 7am every day", "daily", "07:00", None),
+    ("every morning at 7 go for a run", "daily", "07:00", None),
+    ("journal every evening", "daily", "18:00", None),
+    ("read every night", "daily", "20:00", None),
+    ("walk the dog each morning", "daily", "09:00", None),
+    ("floss nightly", "daily", None, None),
+    ("stretch once a day", "daily", None, None),
+    ("drink water everyday", "daily", None, None),
+    ("clean the house weekly", "weekly", None, None),
+    ("call parents every week", "weekly", None, None),
+    ("take out trash every tuesday", "weekly", None, "2025-06-17"),
+    ("swim every monday at 6pm", "weekly", "18:00", "2025-06-16"),
+    ("yoga on saturdays", "weekly", None, "2025-06-21"),
+    ("laundry every sun", "weekly", None, "2025-06-22"),
+    ("pay bills monthly", "monthly", None, None),
+    ("review budget every month", "monthly", None, None),
+    ("deep clean once a month", "monthly", None, None),
+    ("run daily starting tomorrow", "daily", None, "2025-06-17"),
+    ("piano practice daily at 5:30pm", "daily", "17:30", None),
+]
+
+# Text that looks temporal but isn't understood
+UNRESOLVED_CASES = [
+    "water plants every other day",
+    "renew passport next year",
+    "review goals every 3 days",
+    "do taxes yearly",
+    "doctor on feb 30",
+    "call at 25:00",
+    "meeting at 13pm",
+    "dentist 13/45",
+    "check in biweekly",
+]
+
+
+@pytest.mark.parametrize("text,due_date,due_time", TODO_CASES)
+def test_todo_dates(text, due_date, due_time):
+    result = parse_temporal(text, NOW)
+    assert result.due_date == due_date
+    assert result.due_time == due_time
+    assert result.frequency is None
+    assert not result.unresolved
+
+
+@pytest.mark.parametrize("text,frequency,due_time,start_date", HABIT_CASES)
+def test_habit_recurrence(text, frequency, due_time, start_date):
+    result = parse_temporal(text, NOW)
+    assert result.frequency == frequency
+    assert result.due_time == due_time
+    assert result.start_date == start_date
+    assert result.due_date is None
+    assert not result.unresolved
+
+
+@pytest.mark.parametrize("text", UNRESOLVED_CASES)
+def test_unresolved(text):
+    assert parse_temporal(text, NOW).unresolved
+
+
+@pytest.mark.parametrize("text,remainder", [
+    ("Call John tomorrow at 3pm", "Call John"),
+    ("Buy groceries by Friday", "Buy groceries"),
+    ("meditate at 7am every day", "meditate"),
+    ("every morning at 7 go for a run", "go for a run"),
+    ("doctor on june 20th at 4pm", "doctor"),
+    # Prepositions only match whole words
+    ("meet at noon tomorrow", "meet"),
+    ("fix the button tomorrow", "fix the button"),
+    ("book a salon tomorrow", "book a salon"),
+    ("pay the salon by friday", "pay the salon"),
+    ("buy milk", "buy milk"),
+])
+def test_remainder(text, remainder):
+    assert parse_temporal(text, NOW).remainder == remainder
+
+
+def test_resolves_against_user_timezone():
+    # 23:30 in New York is already the next day in Tokyo
+    utc_now = pytz.utc.localize(datetime(2025, 6, 17, 3, 30))
+    new_york = parse_temporal("call john tomorrow", utc_now.astimezone(pytz.timezone('America/New_York')))
+    tokyo = parse_temporal("call john tomorrow", utc_now.astimezone(pytz.timezone('Asia/Tokyo')))
+    assert new_york.due_date == "2025-06-17"
+    assert tokyo.due_date == "2025-06-18"
+
+
+def test_bare_time_rolls_to_tomorrow_when_passed():
+    late = NOW.replace(hour=16)
+    assert parse_temporal("call john at 3pm", late).due_date == "2025-06-17T15:00:00"
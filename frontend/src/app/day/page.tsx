@@ -10,7 +10,7 @@ import HabitItem from "../components/HabitItem";
 import { useConfirmation } from "../components/useConfirmation";
 import { api, Thought, Todo, HabitInstance } from "../../lib/api";
 import { formatDate, formatDueDateTime } from "../../lib/utils"
-import { getLocalDateString, utcToLocalDateString } from "../../lib/date-utils";
+import { getLocalDateString } from "../../lib/date-utils";
 
 export default function MyDayPage() {
   const [isAuthenticated, setIsAuthenticated] = useState(false);
@@ -33,51 +33,22 @@ export default function MyDayPage() {
     console.log(`Today's date for comparison: ${result}`);
     return result;
   };
-    // Fetch all content
+    // Fetch today's content
   const fetchContent = useCallback(async () => {
     try {
-      const data = await api.content.getAll();
-      
-      // Get today's date for filtering
+      // Get today's date; the server converts it to UTC bounds in our timezone
       const todayStr = getTodayDateString();
-      console.log("Today's date for filtering:", todayStr);
-        // Filter todos due today, thoughts created today, and habits due today
+      const data = await api.content.getAll({ date: todayStr });
+      
+      // The server returns todos due today and thoughts created today
       const todosForToday: Todo[] = [];
       const thoughtsForToday: Thought[] = [];
       const habitsForToday: HabitInstance[] = [];
-        // Process each content item (only thoughts and todos now)
       data.forEach(item => {
         if (item.type === 'todo') {
-          const todo = item.data as Todo;
-          // Check if due date is today - using our date utility functions
-          if (todo.due_date) {
-            // Convert UTC timestamp to local date for comparison
-            const todoLocalDate = utcToLocalDateString(todo.due_date);
-            
-            console.log(`Todo due_date raw value: ${todo.due_date}`);
-            console.log(`Converted local date: ${todoLocalDate}`);
-            console.log(`Comparing with today's date: ${todayStr}`);
-            
-            if (todoLocalDate === todayStr) {
-              console.log(`✅ Todo matched for today: ${todo.title}`);
-              todosForToday.push(todo);
-            }
-          }
+          todosForToday.push(item.data as Todo);
         } else if (item.type === 'thought') {
-          const thought = item.data as Thought;
-          // Check if created today using our date utility
-          if (thought.created_at) {
-            // Convert UTC timestamp to local date for comparison
-            const thoughtLocalDate = utcToLocalDateString(thought.created_at);
-            
-            console.log(`Thought created_at raw value: ${thought.created_at}`);
-            console.log(`Converted local date: ${thoughtLocalDate}`);
-            console.log(`Comparing with today's date: ${todayStr}`);
-            
-            if (thoughtLocalDate === todayStr) {
-              thoughtsForToday.push(thought);
-            }
-          }
+          thoughtsForToday.push(item.data as Thought);
         }
       });
 
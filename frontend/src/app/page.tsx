@@ -11,6 +11,8 @@ import { useConfirmation } from "./components/useConfirmation";
 import { api, ContentItem, Thought, Todo, Habit } from "../lib/api";
 import { formatDate, formatDueDateTime } from "../lib/utils";
 
+const RECENT_ITEMS = 5;
+
 export default function Home() {
   const [text, setText] = useState("");
   const [isSubmitting, setIsSubmitting] = useState(false);
@@ -32,11 +34,11 @@ export default function Home() {
     handleConfirm, 
     handleCancel 
   } = useConfirmation();
-  // Fetch all content
+  // Fetch the newest content, only RECENT_ITEMS are shown
   const fetchContent = useCallback(async () => {
     try {
-      const data = await api.content.getAll();
-      setContent(data);
+      const page = await api.content.getPage(RECENT_ITEMS);
+      setContent(page.items);
     } catch (error) {
       console.error('Error fetching content:', error);
     }
@@ -96,13 +98,17 @@ export default function Home() {
     try {
       if (isAuthenticated) {
         // Send to the backend for AI processing
-        const newContent = await api.content.create(text);
+        const newItems = await api.content.create(text);
         
         // Show success notification
-        const contentType = newContent.type === 'thought' ? 'Thought' : 'Todo';
-        showNotification(`${contentType} created successfully!`);
+        if (newItems.length === 1) {
+          const contentType = newItems[0].type === 'thought' ? 'Thought' : 'Todo';
+          showNotification(`${contentType} created successfully!`);
+        } else {
+          showNotification(`${newItems.length} items created successfully!`);
+        }
         
-        // Refresh all content to ensure it's up to date with server
+        // Refresh the recent content to ensure it's up to date with server
         fetchContent();
       } else {
         // If not authenticated, just show a demo message
@@ -394,7 +400,7 @@ export default function Home() {
                     </Link>
                   </div>
                   <div>
-                    {content.slice(0, 5).map(item => renderContentItem(item))}
+                    {content.slice(0, RECENT_ITEMS).map(item => renderContentItem(item))}
                   </div>
                 </div>
               )}
@@ -11,6 +11,8 @@ import { useConfirmation } from "../components/useConfirmation";
 import { api, ContentItem, Thought, Todo, Habit } from "../../lib/api";
 import { formatDate, formatDueDateTime } from "../../lib/utils";
 
+const PAGE_SIZE = 50;
+
 export default function ThoughtsPage() {  
   const [isAuthenticated, setIsAuthenticated] = useState(false);
   const [content, setContent] = useState<ContentItem[]>([]);
@@ -22,6 +24,8 @@ export default function ThoughtsPage() {
   });
   const [filter, setFilter] = useState<'all' | 'thought' | 'todo' | 'habit'>('all');
   const [loadingItems, setLoadingItems] = useState<Record<string, boolean>>({});
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
     // Confirmation modal state
   const { 
     showConfirmation, 
@@ -29,17 +33,34 @@ export default function ThoughtsPage() {
     handleConfirm, 
     handleCancel 
   } = useConfirmation();
-  // Fetch all content
+  // Fetch the first page of content
   const fetchContent = useCallback(async () => {
     try {
-      const data = await api.content.getAll();
-      setContent(data);
+      const page = await api.content.getPage(PAGE_SIZE);
+      setContent(page.items);
+      setNextCursor(page.next_cursor);
     } catch (error) {
       console.error('Error fetching content:', error);
       showNotification('Failed to load your content. Please try again.', 'error');
     }
   }, []);
 
+  // Fetch the next page and append it
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setIsLoadingMore(true);
+    try {
+      const page = await api.content.getPage(PAGE_SIZE, nextCursor);
+      setContent(prevContent => [...prevContent, ...page.items]);
+      setNextCursor(page.next_cursor);
+    } catch (error) {
+      console.error('Error fetching content:', error);
+      showNotification('Failed to load your content. Please try again.', 'error');
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   // Check if user is authenticated and fetch content
   useEffect(() => {
     const token = localStorage.getItem('token');
@@ -373,6 +394,10 @@ export default function ThoughtsPage() {
                     <div>
                       {getFilteredContent().map(item => renderContentItem(item))}
                     </div>
+                  ) : nextCursor ? (
+                    <div className="text-center py-12">
+                      <p className="text-gray-500 text-lg">nothing here on the loaded pages.</p>
+                    </div>
                   ) : (
                     <div className="text-center py-12">                      <p className="text-gray-500 text-lg">
                         {filter === 'all' 
@@ -392,6 +417,20 @@ export default function ThoughtsPage() {
                       </Link>
                     </div>
                   )}
+
+                  {/* Load more button */}
+                  {nextCursor && (
+                    <div className="mt-12 text-center">
+                      <button
+                        onClick={loadMore}
+                        disabled={isLoadingMore}
+                        className="bg-black text-white px-6 py-3 rounded-md shadow-md hover:shadow-lg transition-shadow font-medium flex items-center gap-2 mx-auto"
+                      >
+                        {isLoadingMore && <Spinner size="sm" />}
+                        {isLoadingMore ? 'loading...' : 'load more'}
+                      </button>
+                    </div>
+                  )}
                 </div>
               )}
             </div>
@@ -11,6 +11,9 @@ import { api, ContentItem, Thought, Todo, HabitInstance } from "../../lib/api";
 import { formatDate, formatDueDateTime } from "../../lib/utils";
 import { getLocalDateString, utcToLocalDateString } from "../../lib/date-utils";
 
+const PAGE_SIZE = 50;
+const DAYS_PER_PAGE = 7;
+
 interface DayData {
   date: string;
   displayDate: string;
@@ -21,12 +24,14 @@ interface DayData {
 
 export default function TimelinePage() {
   const [isAuthenticated, setIsAuthenticated] = useState(false);
-  const [userName, setUserName] = useState("");  const [daysToShow, setDaysToShow] = useState(7); // Start with 7 days (one week)
+  const [userName, setUserName] = useState("");  const [daysToShow, setDaysToShow] = useState(DAYS_PER_PAGE); // Start with one week
   const [timelineData, setTimelineData] = useState<DayData[]>([]);
   const [allContent, setAllContent] = useState<ContentItem[]>([]);
   const [habitInstances, setHabitInstances] = useState<HabitInstance[]>([]);
   const [loadingItems, setLoadingItems] = useState<Record<string, boolean>>({});
   const [isLoadingMore, setIsLoadingMore] = useState(false);
+  // Cursor into the content of the last week loaded, null once all of it is
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [notification, setNotification] = useState({
     isVisible: false,
     message: "",
@@ -61,28 +66,49 @@ export default function TimelinePage() {
     
     return dates;
   }, []);
-  // Fetch all content from API
+  // Local dates of numDays days, starting firstDay days from today
+  const dayWindow = (firstDay: number, numDays: number) => {
+    const first = new Date();
+    first.setDate(first.getDate() + firstDay);
+    const last = new Date(first);
+    last.setDate(first.getDate() + numDays - 1);
+    return { from: getLocalDateString(first), to: getLocalDateString(last) };
+  };
+
+  // Fetch the first page of content and the habit instances of numDays days,
+  // starting firstDay days from today
+  const fetchDays = async (firstDay: number, numDays: number) => {
+    const today = new Date();
+    const startDate = new Date(today);
+    startDate.setDate(today.getDate() + firstDay);
+    const endDate = new Date(today);
+    endDate.setDate(today.getDate() + firstDay + numDays - 1); // -1 to match frontend range
+    const [page, habitInstancesData] = await Promise.all([
+      api.content.getPage(PAGE_SIZE, null, dayWindow(firstDay, numDays)),
+      api.habits.getInstances(
+        startDate.toISOString().split('T')[0],
+        endDate.toISOString().split('T')[0]
+      )
+    ]);
+    console.log(`Requesting habit instances from ${startDate.toISOString().split('T')[0]} to ${endDate.toISOString().split('T')[0]}`);
+    console.log('Fetched habit instances:', habitInstancesData);
+    return { page, habitInstancesData };
+  };
+
+  // Fetch the first week from API
   const fetchContent = useCallback(async () => {
     try {
       console.log("Fetching content for timeline");
-      const data = await api.content.getAll();
-      setAllContent(data);
-        // Also fetch habit instances for the current time range
-      const today = new Date();
-      const endDate = new Date(today);
-      endDate.setDate(today.getDate() + daysToShow - 1); // -1 to match frontend range
-        const habitInstancesData = await api.habits.getInstances(
-        today.toISOString().split('T')[0],
-        endDate.toISOString().split('T')[0]
-      );
-      console.log(`Requesting habit instances from ${today.toISOString().split('T')[0]} to ${endDate.toISOString().split('T')[0]}`);
-      console.log('Fetched habit instances:', habitInstancesData);
+      const { page, habitInstancesData } = await fetchDays(0, DAYS_PER_PAGE);
+      setAllContent(page.items);
+      setNextCursor(page.next_cursor);
       setHabitInstances(habitInstancesData);
+      setDaysToShow(DAYS_PER_PAGE);
     } catch (error) {
       console.error('Error fetching content:', error);
       showNotification('Failed to load your content. Please try again.', 'error');
     }
-  }, [daysToShow]);
+  }, []);
   // Organize content by date
   const organizeContentByDate = useCallback(() => {
     const dateRange = generateDateRange(daysToShow);
@@ -212,13 +238,31 @@ export default function TimelinePage() {
       isVisible: false
     }));
   };
-  // Load more days
-  const loadMoreDays = () => {
+  // Load the rest of the last week's content, a page at a time, then the next week
+  const loadMoreDays = async () => {
     setIsLoadingMore(true);
-    setTimeout(() => {
-      setDaysToShow(prev => prev + 7);
+    try {
+      if (nextCursor) {
+        const page = await api.content.getPage(
+          PAGE_SIZE,
+          nextCursor,
+          dayWindow(daysToShow - DAYS_PER_PAGE, DAYS_PER_PAGE)
+        );
+        setAllContent(prev => [...prev, ...page.items]);
+        setNextCursor(page.next_cursor);
+      } else {
+        const { page, habitInstancesData } = await fetchDays(daysToShow, DAYS_PER_PAGE);
+        setAllContent(prev => [...prev, ...page.items]);
+        setNextCursor(page.next_cursor);
+        setHabitInstances(prev => [...prev, ...habitInstancesData]);
+        setDaysToShow(prev => prev + DAYS_PER_PAGE);
+      }
+    } catch (error) {
+      console.error('Error fetching content:', error);
+      showNotification('Failed to load your content. Please try again.', 'error');
+    } finally {
       setIsLoadingMore(false);
-    }, 500); // Small delay for UX
+    }
   };
 
   // Todo completion toggle
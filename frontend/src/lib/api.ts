@@ -70,6 +70,30 @@ export interface ContentItem {
   data: Thought | Todo | Habit;
 }
 
+export interface DateWindow {
+  date?: string;
+  from?: string;
+  to?: string;
+}
+
+// Several lines, a semicolon or a list of three or more comma-separated entries.
+// A single comma ("call mom tomorrow, she's waiting") is usually one item.
+const looksLikeSeveralItems = (text: string) => {
+  const trimmed = text.trim();
+  return /[\n;]/.test(trimmed) || (trimmed.match(/,/g) || []).length >= 2;
+};
+
+// Query parameters for a window of local days, in the browser's timezone
+const windowParams = (params: URLSearchParams, window?: DateWindow) => {
+  if (window?.date) params.append('date', window.date);
+  if (window?.from) params.append('from', window.from);
+  if (window?.to) params.append('to', window.to);
+  if (window?.date || window?.from || window?.to) {
+    params.append('tz', Intl.DateTimeFormat().resolvedOptions().timeZone);
+  }
+  return params;
+};
+
 // Helper for making authenticated requests
 const fetchWithAuth = async (url: string, options: RequestInit = {}) => {
   // Get token from local storage
@@ -161,16 +185,41 @@ export const api = {
   
   // Content endpoints (AI-classified thoughts/todos)
   content: {
-    create: async (text: string): Promise<ContentItem> => {
+    create: async (text: string): Promise<ContentItem[]> => {
       const timezone = Intl.DateTimeFormat().resolvedOptions().timeZone;
-      return fetchWithAuth('/content', {
+      // split: compound input ("buy milk, call mom at 5, water plants") creates one item per
+      // entry, but splitting costs a bigger AI call, so only ask when there clearly are several
+      const split = looksLikeSeveralItems(text);
+      const response = await fetchWithAuth('/content', {
         method: 'POST',
-        body: JSON.stringify({ text, timezone }), // Add timezone to the request body
+        body: JSON.stringify({ text, timezone, split }), // Add timezone to the request body
       });
+      return split ? (response as { items: ContentItem[] }).items : [response as ContentItem];
+    },
+    
+    // With a window, only thoughts created and todos due on those local days are returned
+    getAll: async (window?: DateWindow): Promise<ContentItem[]> => {
+      const params = windowParams(new URLSearchParams(), window);
+      const query = params.toString() ? `?${params.toString()}` : '';
+      return fetchWithAuth(`/content${query}`);
+    },
+    
+    // Newest first, at most limit items; pass next_cursor back for the following page
+    getPage: async (
+      limit: number,
+      cursor?: string | null,
+      window?: DateWindow
+    ): Promise<{ items: ContentItem[]; next_cursor: string | null }> => {
+      const params = windowParams(new URLSearchParams({ limit: String(limit) }), window);
+      if (cursor) params.append('cursor', cursor);
+      return fetchWithAuth(`/content?${params.toString()}`);
     },
     
-    getAll: async (): Promise<ContentItem[]> => {
-      return fetchWithAuth('/content');
+    // Title matches first, then newest; pass next_cursor back for the following page
+    search: async (q: string, cursor?: string): Promise<{ items: ContentItem[]; next_cursor: string | null }> => {
+      const params = new URLSearchParams({ q });
+      if (cursor) params.append('cursor', cursor);
+      return fetchWithAuth(`/search?${params.toString()}`);
     },
   },
   